@@ -0,0 +1,81 @@
+"""
+Adaptive vs fixed candidate depth with RRF fusion: candidates fetched per
+query, latency and agreement of the fused top-k with a deep fetch.
+
+    python benchmarks/bench_adaptive_depth.py --chunks 20000 --queries 300 --top-k 10 --max-factor 8
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import time
+import numpy as np
+
+from benchmarks.synthetic import make_corpus, make_queries, fake_context, HashingEmbedder, percentiles
+from src.local_vector_store import LocalVectorStore
+from src.bm25_index import BM25Index
+from src.retriever import HybridRetriever
+from src.cache import LRUCache
+from src.fusion import fuse, leg_arrays
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--words-per-query", type=int, default=3)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--max-factor", type=int, default=8)
+    args = parser.parse_args()
+
+    chunks = make_corpus(args.chunks)
+    for chunk in chunks:
+        chunk["context"] = fake_context(chunk)
+    embedder = HashingEmbedder()
+    embedder.embed_chunks(chunks)
+    store = LocalVectorStore(path=None)
+    store.add_chunks(chunks)
+    bm25 = BM25Index()
+    bm25.add_documents(chunks)
+    queries = make_queries(chunks, args.queries, words_per_query=args.words_per_query)
+
+    max_depth = args.top_k * args.max_factor
+
+    def deep_fetch(query):
+        """One fetch at the maximum adaptive depth: the reference top-k."""
+        vector = store.search(embedder.embed_query(query), top_k=max_depth, with_payload=["chunk_id"])
+        lexical = bm25.search(query, top_k=max_depth)
+        return fuse(*leg_arrays(vector), *leg_arrays(lexical), top_k=args.top_k, strategy="rrf").ids.tolist()
+
+    latencies, deep = [], []
+    for query in queries:
+        t0 = time.perf_counter()
+        deep.append(deep_fetch(query))
+        latencies.append(time.perf_counter() - t0)
+
+    print(f"{'depth':<22}{'avg depth':>10}{'p50 ms':>10}{'p99 ms':>10}{'same as deep':>14}")
+    stats = percentiles(latencies)
+    print(f"{f'fixed top_k * {args.max_factor}':<22}{max_depth:>10.1f}{stats['p50_ms']:>10.2f}{stats['p99_ms']:>10.2f}{1:>14.1%}")
+    for name, adaptive in (("fixed top_k * 2", False), ("adaptive", True)):
+        retriever = HybridRetriever(
+            store, bm25, embedder,
+            fusion="rrf",
+            adaptive_depth=adaptive,
+            max_depth_factor=args.max_factor,
+            result_cache=LRUCache(0)
+        )
+        latencies, depths, same = [], [], []
+        for query, expected in zip(queries, deep):
+            t0 = time.perf_counter()
+            results = retriever.retrieve(query, top_k=args.top_k)
+            latencies.append(time.perf_counter() - t0)
+            depths.append(results.depth)
+            same.append([r["chunk_id"] for r in results] == expected)
+        stats = percentiles(latencies)
+        print(f"{name:<22}{np.mean(depths):>10.1f}{stats['p50_ms']:>10.2f}{stats['p99_ms']:>10.2f}{np.mean(same):>14.1%}")
+        retriever.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Cold start: import time of the main modules and time to first query.
+
+Every measurement runs in a fresh interpreter (without ANTHROPIC_API_KEY, to
+check query-only use does not need it). Time to first query attaches to a
+persisted local store and BM25 index with `load_retriever`, like the query
+server, and answers one query. By default the hashing embedder stands in for
+the model; `--real-model` loads the configured sentence-transformers model.
+
+    python benchmarks/bench_cold_start.py --repeats 5
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Only the standard library at module level: child runs time their own imports
+import argparse
+import json
+import statistics
+import subprocess
+import tempfile
+import time
+
+MODULES = ["config", "src.retriever", "src.vector_store", "src.local_vector_store",
+           "src.contextualizer", "src.reranker", "src.server"]
+HEAVY = ["torch", "sentence_transformers", "qdrant_client", "anthropic"]
+
+
+def child_import(module: str) -> dict:
+    start = time.perf_counter()
+    __import__(module)
+    seconds = time.perf_counter() - start
+    return {"seconds": seconds, "heavy": [name for name in HEAVY if name in sys.modules]}
+
+
+def child_first_query(index_dir: str, store_path: str, real_model: bool) -> dict:
+    start = time.perf_counter()
+    from src.server import load_retriever
+    imported = time.perf_counter()
+    embedder = None
+    if not real_model:
+        from benchmarks.synthetic import HashingEmbedder
+        embedder = HashingEmbedder()
+    retriever = load_retriever(index_dir, "local", collection_name="cold_start", embedder=embedder, path=store_path)
+    loaded = time.perf_counter()
+    retriever.retrieve("cold start query", top_k=5)
+    done = time.perf_counter()
+    retriever.close()
+    return {"import": imported - start, "load": loaded - imported, "query": done - loaded, "total": done - start}
+
+
+def run_child(*args: str) -> dict:
+    env = {key: value for key, value in os.environ.items() if key != "ANTHROPIC_API_KEY"}
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", *args],
+        check=True, capture_output=True, text=True, env=env
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def build_index(directory: str, n_chunks: int) -> None:
+    from benchmarks.synthetic import make_corpus, fake_context, HashingEmbedder
+    from src.local_vector_store import LocalVectorStore
+    from src.bm25_index import BM25Index
+    from src.server import BM25_FILE
+
+    chunks = make_corpus(n_chunks)
+    for chunk in chunks:
+        chunk["context"] = fake_context(chunk)
+    HashingEmbedder().embed_chunks(chunks)
+    LocalVectorStore(collection_name="cold_start", path=directory).add_chunks(chunks)
+    bm25 = BM25Index()
+    bm25.add_documents(chunks)
+    bm25.save(os.path.join(directory, "index", BM25_FILE))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--real-model", action="store_true", help="Load the configured embedding model")
+    parser.add_argument("--child", nargs="+", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        if args.child[0] == "import":
+            print(json.dumps(child_import(args.child[1])))
+        else:
+            print(json.dumps(child_first_query(args.child[1], args.child[2], args.child[3] == "1")))
+        return
+
+    print(f"{'import':<26}{'median ms':>10}  heavy modules loaded")
+    for module in MODULES:
+        runs = [run_child("import", module) for _ in range(args.repeats)]
+        median = statistics.median(run["seconds"] for run in runs) * 1000
+        print(f"{module:<26}{median:>10.1f}  {', '.join(runs[0]['heavy']) or '-'}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        build_index(directory, args.chunks)
+        runs = [
+            run_child("first-query", os.path.join(directory, "index"), directory, "1" if args.real_model else "0")
+            for _ in range(args.repeats)
+        ]
+    print(f"\nTime to first query ({'real model' if args.real_model else 'hashing embedder'}, {args.chunks} chunks)")
+    for stage in ("import", "load", "query", "total"):
+        print(f"  {stage:<8}{statistics.median(run[stage] for run in runs) * 1000:>10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Recall vs size for embedding compression: PCA / Matryoshka projection and float16 storage.
+
+Embeds a synthetic corpus once (hashing embedder, or the configured model
+with --real-model), then for every (method, dimension, dtype) stores the
+projected contextual embeddings in a LocalVectorStore and measures
+recall@k of vector search against exact search over the full float32
+embeddings, next to the stored bytes per chunk (both vectors), the JSON
+bytes per point a Qdrant upsert sends and the share of the embeddings'
+energy a PCA projection keeps.
+
+    python benchmarks/bench_compression.py --chunks 20000 --dimensions 64 128 192 --real-model
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import json
+import time
+import numpy as np
+
+from benchmarks.synthetic import make_corpus, make_queries, fake_context, HashingEmbedder
+from src.chunk_store import ChunkStore
+from src.compression import EmbeddingProjection
+from src.local_vector_store import LocalVectorStore
+from config import EMBEDDING_MODEL_DIMENSION
+
+
+def recall(store: LocalVectorStore, queries: np.ndarray, truth: np.ndarray, top_k: int) -> float:
+    hits = store.search_batch(queries, top_k=top_k, with_payload=["chunk_id"])
+    found = sum(len({h["chunk_id"] for h in results} & set(expected.tolist())) for results, expected in zip(hits, truth))
+    return found / truth.size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--dimensions", type=int, nargs="+", default=[64, 128, 192, 256])
+    parser.add_argument("--methods", nargs="+", choices=["pca", "matryoshka"], default=["pca", "matryoshka"])
+    parser.add_argument("--real-model", action="store_true", help="Embed with the configured model")
+    args = parser.parse_args()
+
+    chunks = make_corpus(args.chunks, words_per_chunk=60)
+    for chunk in chunks:
+        chunk["context"] = fake_context(chunk)
+    if args.real_model:
+        from src.embedder import Embedder
+        embedder = Embedder()
+    else:
+        embedder = HashingEmbedder(dimension=EMBEDDING_MODEL_DIMENSION)
+    store = embedder.embed_chunks(ChunkStore.build(chunks, dtype="float32"))
+    matrices = {name: np.asarray(store.embeddings[name], dtype=np.float32) for name in store.embeddings}
+    query_vectors = np.asarray(embedder.embed_queries(make_queries(chunks, args.queries)), dtype=np.float32)
+
+    full = matrices["contextual_embedding"] / np.linalg.norm(matrices["contextual_embedding"], axis=1, keepdims=True)
+    full_queries = query_vectors / np.linalg.norm(query_vectors, axis=1, keepdims=True)
+    truth = np.argsort(-(full_queries @ full.T), axis=1)[:, :args.top_k] + 1  # chunk_ids start at 1
+
+    settings = [("none", EMBEDDING_MODEL_DIMENSION)] + [
+        (method, dimension) for method in args.methods for dimension in args.dimensions
+        if dimension < EMBEDDING_MODEL_DIMENSION
+    ]
+    print(f"{'method':<12}{'dim':>6}{'dtype':>9}{'recall@k':>10}{'bytes/chunk':>13}{'JSON/point':>12}{'fit s':>8}{'energy':>10}")
+    for method, dimension in settings:
+        t0 = time.perf_counter()
+        if method == "none":
+            projection = None
+            projected = {name: matrix for name, matrix in matrices.items()}
+            projected_queries = query_vectors
+        else:
+            projection = EmbeddingProjection.fit(np.concatenate(list(matrices.values())), dimension, method)
+            projected = {name: projection.transform(matrix) for name, matrix in matrices.items()}
+            projected_queries = projection.transform(query_vectors)
+        fit_seconds = time.perf_counter() - t0
+        energy = projection.retained_energy if projection is not None else None
+        json_bytes = sum(len(json.dumps(projected[name][0].tolist())) for name in projected)
+
+        for dtype in ("float32", "float16"):
+            vector_store = LocalVectorStore(path=None, dtype=dtype, dimension=dimension)
+            vector_store.add_chunks([
+                {
+                    "chunk_id": i + 1,
+                    "chunk_text": "",
+                    "context": "",
+                    "embedding": projected["embedding"][i],
+                    "contextual_embedding": projected["contextual_embedding"][i]
+                }
+                for i in range(len(chunks))
+            ])
+            bytes_per_chunk = 2 * dimension * np.dtype(dtype).itemsize
+            print(
+                f"{method:<12}{dimension:>6}{dtype:>9}{recall(vector_store, projected_queries, truth, args.top_k):>10.3f}"
+                f"{bytes_per_chunk:>13}{json_bytes:>12}{fit_seconds:>8.2f}"
+                + (f"{energy:>10.1%}" if energy is not None else f"{'':>10}")
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Concurrent-load harness: throughput and tail latency of one shared HybridRetriever as clients grow.
+
+N client threads hammer a single retriever (local vector store, hashing
+embedder with an artificial per-query delay standing in for the model).
+Every answer is checked against a single-threaded reference run, and
+clients scribble over the results they get back, the way callers such as
+the reranker annotate them, so shared-state leaks show up as mismatches.
+
+    python benchmarks/bench_concurrency.py --chunks 20000 --clients 1 2 4 8 16 32 --requests 200
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+from benchmarks.synthetic import make_corpus, make_queries, fake_context, HashingEmbedder, percentiles
+from src.bm25_index import BM25Index
+from src.cache import LRUCache
+from src.dedup import DuplicateMap
+from src.local_vector_store import LocalVectorStore
+from src.retriever import HybridRetriever
+
+
+class LoadReport(NamedTuple):
+    """
+    Outcome of one `run_load`.
+
+    Attributes:
+        clients: Concurrent client threads
+        requests: Queries answered (including failed ones)
+        errors: Queries that raised
+        mismatches: Answers that differ from the reference
+        qps: Queries per second of wall time
+        latency: p50/p90/p99/mean in milliseconds
+    """
+    clients: int
+    requests: int
+    errors: int
+    mismatches: int
+    qps: float
+    latency: Dict[str, float]
+
+
+def answer(results) -> List:
+    """What a query returned, comparable across runs: keys, text and references."""
+    return [
+        (r['doc_id'], r['chunk_id'], r['chunk_text'], [ref['chunk_id'] for ref in r.get('references') or []])
+        for r in results
+    ]
+
+
+def run_load(
+    retriever: HybridRetriever,
+    queries: List[str],
+    clients: int,
+    requests_per_client: int,
+    expected: Optional[Dict[str, List]] = None,
+    top_k: int = 10
+) -> LoadReport:
+    """
+    Drive `retriever` from `clients` threads, each sending
+    `requests_per_client` queries back to back (client i starts at query i,
+    so clients overlap on some queries and not on others).
+
+    Args:
+        expected: Query -> `answer(...)` of a reference run; answers that
+            differ are counted as mismatches
+        top_k: Results per query
+
+    Returns:
+        LoadReport
+    """
+    latencies, errors, mismatches = [], [0], [0]
+    lock = threading.Lock()
+    start_line = threading.Barrier(clients + 1)
+
+    def client(index: int) -> None:
+        own_latencies, own_errors, own_mismatches = [], 0, 0
+        start_line.wait()
+        for n in range(requests_per_client):
+            query = queries[(index + n) % len(queries)]
+            t0 = time.perf_counter()
+            try:
+                results = retriever.retrieve(query, top_k=top_k)
+            except Exception:
+                own_errors += 1
+                continue
+            finally:
+                own_latencies.append(time.perf_counter() - t0)
+            if expected is not None and answer(results) != expected[query]:
+                own_mismatches += 1
+            for result in results:  # Callers own their results and may change them
+                result['chunk_text'] = None
+                result.setdefault('references', []).append({'chunk_id': -1})
+        with lock:
+            latencies.extend(own_latencies)
+            errors[0] += own_errors
+            mismatches[0] += own_mismatches
+
+    threads = [threading.Thread(target=client, args=(i,), name=f"load-client-{i}") for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    start_line.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    return LoadReport(clients, len(latencies), errors[0], mismatches[0], len(latencies) / wall, percentiles(latencies))
+
+
+def build_retriever(chunks: List[Dict], embed_delay: float, result_cache: bool) -> HybridRetriever:
+    """
+    One shared retriever over `chunks`: local vector store, BM25 index and a
+    DuplicateMap citing a fake copy of every tenth chunk.
+    """
+    HashingEmbedder().embed_chunks(chunks)
+    store = LocalVectorStore(path=None)
+    store.add_chunks(chunks)
+    bm25 = BM25Index()
+    bm25.add_documents(chunks)
+    duplicates = DuplicateMap({
+        (chunk['doc_id'], chunk['chunk_id']): [{'doc_id': 'copy', 'chunk_id': chunk['chunk_id'] + 100000}]
+        for chunk in chunks[::10]
+    })
+    return HybridRetriever(
+        store, bm25, HashingEmbedder(delay=embed_delay),
+        duplicates=duplicates,
+        result_cache=None if result_cache else LRUCache(0)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--requests", type=int, default=100, help="Queries per client")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--embed-delay-ms", type=float, default=2.0, help="Hashing embedder delay per query")
+    parser.add_argument("--result-cache", action="store_true", help="Keep the result cache on (repeated queries hit it)")
+    args = parser.parse_args()
+
+    chunks = make_corpus(args.chunks)
+    for chunk in chunks:
+        chunk["doc_id"] = "bench"
+        chunk["context"] = fake_context(chunk)
+    retriever = build_retriever(chunks, args.embed_delay_ms / 1000, args.result_cache)
+    queries = make_queries(chunks, args.queries)
+    expected = {query: answer(retriever.retrieve(query, top_k=args.top_k)) for query in queries}
+
+    print(f"{'clients':>8}{'requests':>10}{'qps':>10}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'errors':>8}{'mismatch':>10}")
+    for clients in args.clients:
+        report = run_load(retriever, queries, clients, args.requests, expected=expected, top_k=args.top_k)
+        print(
+            f"{report.clients:>8}{report.requests:>10}{report.qps:>10.1f}{report.latency['p50_ms']:>10.2f}"
+            f"{report.latency['p90_ms']:>10.2f}{report.latency['p99_ms']:>10.2f}{report.errors:>8}{report.mismatches:>10}"
+        )
+    retriever.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Fusion latency vs candidate depth: dict-based merge vs `src.fusion.fuse`.
+
+    python benchmarks/bench_fusion.py --depths 20 200 2000 --top-k 10
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import timeit
+import numpy as np
+
+from src.fusion import fuse, FUSION_STRATEGIES
+
+
+def dict_merge(vector_results, bm25_results, top_k):
+    """Per-result dicts and Python loops, as the retriever fused before."""
+    merged = {}
+    for results, key in ((vector_results, 'vector_score'), (bm25_results, 'bm25_score')):
+        scores = [r['score'] for r in results]
+        low, high = min(scores), max(scores)
+        for r in results:
+            entry = merged.setdefault(r['chunk_id'], {'chunk_id': r['chunk_id'], 'vector_score': 0.0, 'bm25_score': 0.0})
+            entry[key] = (r['score'] - low) / (high - low) if high > low else 1.0
+    for entry in merged.values():
+        entry['combined_score'] = 0.5 * entry['vector_score'] + 0.5 * entry['bm25_score']
+    return sorted(merged.values(), key=lambda x: x['combined_score'], reverse=True)[:top_k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--depths", type=int, nargs="+", default=[20, 200, 2000])
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'depth':>8}{'dict merge us':>16}" + "".join(f"{s + ' us':>12}" for s in FUSION_STRATEGIES))
+    for depth in args.depths:
+        vector_ids = rng.choice(depth * 2, size=depth, replace=False)
+        bm25_ids = rng.choice(depth * 2, size=depth, replace=False)
+        # Legs return hits best first
+        vector_scores = np.sort(rng.random(depth))[::-1]
+        bm25_scores = np.sort(rng.random(depth) * 20)[::-1]
+        vector_results = [{'chunk_id': int(i), 'score': float(s)} for i, s in zip(vector_ids, vector_scores)]
+        bm25_results = [{'chunk_id': int(i), 'score': float(s)} for i, s in zip(bm25_ids, bm25_scores)]
+
+        row = f"{depth:>8}"
+        seconds = timeit.timeit(lambda: dict_merge(vector_results, bm25_results, args.top_k), number=args.repeat)
+        row += f"{seconds / args.repeat * 1e6:>16.1f}"
+        for strategy in FUSION_STRATEGIES:
+            seconds = timeit.timeit(
+                lambda: fuse(vector_ids, vector_scores, bm25_ids, bm25_scores, args.top_k, strategy=strategy),
+                number=args.repeat
+            )
+            row += f"{seconds / args.repeat * 1e6:>12.1f}"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+p50/p99 retrieval latency with sequential vs concurrent search legs.
+
+Runs offline on a synthetic corpus with the local vector store and a hashing
+embedder (with an artificial per-query delay standing in for the model).
+
+    python benchmarks/bench_parallel_legs.py --chunks 20000 --queries 400 --clients 1 8
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.synthetic import make_corpus, make_queries, fake_context, HashingEmbedder, percentiles
+from src.local_vector_store import LocalVectorStore
+from src.bm25_index import BM25Index
+from src.retriever import HybridRetriever
+
+
+def run(retriever: HybridRetriever, queries, clients: int):
+    latencies = []
+
+    def one(query):
+        t0 = time.perf_counter()
+        retriever.retrieve(query, top_k=10)
+        latencies.append(time.perf_counter() - t0)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(one, queries))
+    wall = time.perf_counter() - start
+    return percentiles(latencies), len(queries) / wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=400)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--embed-delay-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    chunks = make_corpus(args.chunks)
+    for chunk in chunks:
+        chunk["context"] = fake_context(chunk)
+    embedder = HashingEmbedder(delay=args.embed_delay_ms / 1000)
+    HashingEmbedder().embed_chunks(chunks)
+    store = LocalVectorStore(path=None)
+    store.add_chunks(chunks)
+    bm25 = BM25Index()
+    bm25.add_documents(chunks)
+    queries = make_queries(chunks, args.queries)
+
+    print(f"{'legs':<12}{'clients':>8}{'p50 ms':>10}{'p99 ms':>10}{'qps':>10}")
+    for parallel in (False, True):
+        retriever = HybridRetriever(store, bm25, embedder, parallel_legs=parallel)
+        for clients in args.clients:
+            stats, qps = run(retriever, queries, clients)
+            print(f"{'parallel' if parallel else 'sequential':<12}{clients:>8}"
+                  f"{stats['p50_ms']:>10.2f}{stats['p99_ms']:>10.2f}{qps:>10.1f}")
+        retriever.close()
+
+
+if __name__ == "__main__":
+    main()
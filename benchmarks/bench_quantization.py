@@ -0,0 +1,93 @@
+"""
+Recall vs latency vs memory for the collection quantization profiles.
+
+Requires a running Qdrant (see README). Builds one collection per profile
+from the same synthetic clustered vectors, measures recall@k against exact
+NumPy ground truth, query latency, and the estimated vector RAM footprint.
+
+    python benchmarks/bench_quantization.py --points 50000 --queries 200
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import time
+import numpy as np
+
+from src.vector_store import QdrantStorage
+from config import EMBEDDING_DIMENSION
+
+# name -> (collection kwargs, per-query search kwargs)
+PROFILES = {
+    "float32": ({"quantization": "none"}, {}),
+    "float32-ef128": ({"quantization": "none"}, {"hnsw_ef": 128}),
+    "scalar-int8": ({"quantization": "scalar"}, {"rescore": True, "oversampling": 2.0}),
+    "scalar-int8-on-disk": ({"quantization": "scalar", "on_disk": True}, {"rescore": True, "oversampling": 2.0}),
+    "binary": ({"quantization": "binary"}, {"rescore": True, "oversampling": 3.0}),
+    "binary-no-rescore": ({"quantization": "binary"}, {"rescore": False}),
+}
+
+
+def clustered_vectors(n: int, rng: np.random.Generator, n_clusters: int = 64) -> np.ndarray:
+    """Unit vectors drawn around random centroids, closer to real embeddings than pure noise."""
+    centroids = rng.standard_normal((n_clusters, EMBEDDING_DIMENSION))
+    labels = rng.integers(0, n_clusters, size=n)
+    vectors = centroids[labels] + 0.5 * rng.standard_normal((n, EMBEDDING_DIMENSION))
+    vectors = vectors.astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def ram_bytes_per_vector(collection_kwargs: dict) -> float:
+    """Estimated resident bytes per named vector (ignores the HNSW graph)."""
+    quantized = {"none": 0, "scalar": EMBEDDING_DIMENSION, "binary": EMBEDDING_DIMENSION / 8}
+    original = 0 if collection_kwargs.get("on_disk") else 4 * EMBEDDING_DIMENSION
+    return original + quantized[collection_kwargs.get("quantization", "none")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--points", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = clustered_vectors(args.points, rng)
+    queries = clustered_vectors(args.queries, rng)
+    truth = np.argsort(-(queries @ vectors.T), axis=1)[:, :args.top_k] + 1
+
+    print(f"{'profile':<22}{'recall@k':>10}{'p50 ms':>10}{'p99 ms':>10}{'MB/vector set':>16}")
+    for name, (collection_kwargs, search_kwargs) in PROFILES.items():
+        collection = f"bench_quant_{name.replace('-', '_')}"
+        storage = QdrantStorage(collection_name=collection, **collection_kwargs)
+        storage.client.delete_collection(collection_name=collection)
+        storage._create_collection()
+        for start in range(0, args.points, 1000):
+            storage.add_chunks([
+                {
+                    "chunk_id": i + 1,
+                    "chunk_text": "",
+                    "context": "",
+                    "embedding": vectors[i],
+                    "contextual_embedding": vectors[i]
+                }
+                for i in range(start, min(start + 1000, args.points))
+            ])
+
+        latencies, hits = [], 0
+        for qi, query in enumerate(queries):
+            t0 = time.perf_counter()
+            results = storage.search(query, top_k=args.top_k, **search_kwargs)
+            latencies.append(time.perf_counter() - t0)
+            hits += len({r["chunk_id"] for r in results} & set(truth[qi].tolist()))
+
+        ms = np.array(latencies) * 1000
+        megabytes = ram_bytes_per_vector(collection_kwargs) * args.points / 1e6
+        print(f"{name:<22}{hits / truth.size:>10.3f}{np.percentile(ms, 50):>10.2f}"
+              f"{np.percentile(ms, 99):>10.2f}{megabytes:>16.1f}")
+        storage.client.delete_collection(collection_name=collection)
+
+
+if __name__ == "__main__":
+    main()
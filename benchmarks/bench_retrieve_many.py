@@ -0,0 +1,56 @@
+"""
+Throughput of batch retrieval (`retrieve_many`) vs a loop of `retrieve`.
+
+Runs offline on a synthetic corpus with the local vector store and a hashing
+embedder (with an artificial per-forward-pass delay standing in for the model).
+
+    python benchmarks/bench_retrieve_many.py --chunks 20000 --queries 1000 --batch-sizes 1 32 256
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import time
+
+from benchmarks.synthetic import make_corpus, make_queries, fake_context, HashingEmbedder
+from src.local_vector_store import LocalVectorStore
+from src.bm25_index import BM25Index
+from src.retriever import HybridRetriever
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 32, 256])
+    parser.add_argument("--embed-delay-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    chunks = make_corpus(args.chunks)
+    for chunk in chunks:
+        chunk["context"] = fake_context(chunk)
+    HashingEmbedder().embed_chunks(chunks)
+    store = LocalVectorStore(path=None)
+    store.add_chunks(chunks)
+    bm25 = BM25Index()
+    bm25.add_documents(chunks)
+    queries = make_queries(chunks, args.queries)
+    retriever = HybridRetriever(store, bm25, HashingEmbedder(delay=args.embed_delay_ms / 1000))
+
+    print(f"{'mode':<20}{'qps':>10}")
+    start = time.perf_counter()
+    for query in queries:
+        retriever.retrieve(query, top_k=10)
+    print(f"{'retrieve loop':<20}{len(queries) / (time.perf_counter() - start):>10.1f}")
+
+    for batch_size in args.batch_sizes:
+        start = time.perf_counter()
+        for i in range(0, len(queries), batch_size):
+            retriever.retrieve_many(queries[i:i + batch_size], top_k=10)
+        print(f"{f'batch {batch_size}':<20}{len(queries) / (time.perf_counter() - start):>10.1f}")
+    retriever.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+"""
+End-to-end benchmark suite: ingestion throughput per stage and query latency.
+
+Generates a synthetic document of the requested size and runs the whole
+pipeline offline: load, chunk, contextualize (fake contexts instead of
+Claude), embed (hashing embedder unless --real-model), upsert and BM25
+build. Then measures p50/p90/p99 latency of BM25 alone, the vector leg
+alone and `HybridRetriever.retrieve`, and latency plus recall@top_k
+(against "exhaustive") of `retrieve` under each search profile. Results are
+written as JSON; compare two result files to flag regressions between
+commits.
+
+    python benchmarks/bench_suite.py --chunks 5000 --output results/head.json
+    python benchmarks/bench_suite.py --compare results/base.json results/head.json --threshold 0.1
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import json
+import math
+import platform
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Dict, List
+
+from benchmarks.synthetic import make_document, make_queries, fake_context, HashingEmbedder, percentiles
+from src.bm25_index import BM25Index
+from src.cache import LRUCache
+from src.profiles import SEARCH_PROFILES
+from src.retriever import HybridRetriever
+from src.vector_store import create_vector_store
+from config import chunk_size, chunk_overlap
+
+INGEST_STAGES = ("load", "chunk", "contextualize", "embed", "upsert", "bm25_build")
+QUERY_MODES = ("bm25", "vector", "hybrid")
+LATENCY_KEYS = ("p50_ms", "p90_ms", "p99_ms")
+
+
+def word_chunks(text: str, size: int, overlap: int) -> List[Dict]:
+    """
+    Whitespace-token chunking with `chunk_text`'s size/overlap semantics, for
+    machines without the tiktoken encoding files (--chunker words).
+    """
+    if not 0 <= overlap < size:
+        raise ValueError(f"Overlap must be in [0, size), got size={size}, overlap={overlap}")
+    words = text.split()
+    chunks = []
+    start = 0
+    while start < len(words):
+        end = min(start + size, len(words))
+        chunks.append({
+            "chunk_text": " ".join(words[start:end]),
+            "start_token": start,
+            "end_token": end,
+            "chunk_id": len(chunks) + 1
+        })
+        start += size - overlap
+    return chunks
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_ingestion(args, directory: str):
+    """
+    Run every ingestion stage once; returns (stages, chunks, embedder, store, bm25).
+    """
+    # ~1.3 tokens per word; chunks advance by chunk_size - chunk_overlap tokens
+    words_per_chunk = max(1, int((chunk_size - chunk_overlap) / 1.3))
+    document_path = os.path.join(directory, "document.txt")
+    with open(document_path, "w", encoding="utf-8") as f:
+        f.write(make_document(args.chunks, words_per_chunk=words_per_chunk, seed=args.seed))
+
+    stages = {}
+
+    def timed(stage: str, items, fn, unit: str = "chunks"):
+        # `items=None` counts the stage's output
+        t0 = time.perf_counter()
+        result = fn()
+        seconds = time.perf_counter() - t0
+        items = len(result) if items is None else items
+        stages[stage] = {"seconds": seconds, "items": items, "per_second": items / max(seconds, 1e-9), "unit": unit}
+        return result
+
+    def load():
+        with open(document_path, encoding="utf-8") as f:
+            return f.read()
+    text = timed("load", os.path.getsize(document_path) / 1e6, load, unit="MB")
+
+    if args.chunker == "tiktoken":
+        from src.chunker import chunk_text
+        chunk = lambda: chunk_text(text, chunk_size_tokens=chunk_size, chunk_overlap=chunk_overlap)
+    else:
+        word_size = max(1, int(chunk_size / 1.3))
+        chunk = lambda: word_chunks(text, word_size, int(chunk_overlap / 1.3))
+    chunks = timed("chunk", None, chunk)
+
+    def contextualize():
+        for chunk in chunks:
+            if args.context_delay_ms:
+                time.sleep(args.context_delay_ms / 1000)
+            chunk["context"] = fake_context(chunk)
+    timed("contextualize", len(chunks), contextualize)
+
+    if args.real_model:
+        from src.embedder import Embedder
+        embedder = Embedder()
+        embedder.warm_up()  # Model loading is a cold-start cost, see bench_cold_start.py
+    else:
+        embedder = HashingEmbedder(delay=args.embed_delay_ms / 1000)
+    timed("embed", len(chunks), lambda: embedder.embed_chunks(chunks))
+
+    store_options = {"path": directory} if args.backend == "local" else {"url": args.qdrant_url}
+    store = create_vector_store(args.backend, collection_name="bench_suite", **store_options)
+    store.reset()
+    timed("upsert", len(chunks), lambda: store.add_chunks(chunks))
+
+    bm25 = BM25Index()
+    timed("bm25_build", len(chunks), lambda: bm25.add_documents(chunks))
+    return stages, chunks, embedder, store, bm25
+
+
+def run_queries(args, chunks, embedder, store, bm25) -> Dict[str, Dict[str, float]]:
+    queries = make_queries(chunks, args.queries, seed=args.seed + 1)
+    # No result cache: every query does the full work
+    retriever = HybridRetriever(store, bm25, embedder, result_cache=LRUCache(0), embedding_cache=LRUCache(0))
+    modes = {
+        "bm25": lambda q: bm25.search(q, top_k=args.top_k),
+        "vector": lambda q: store.search(embedder.embed_query(q), top_k=args.top_k),
+        "hybrid": lambda q: retriever.retrieve(q, top_k=args.top_k)
+    }
+    results = {}
+    for mode in QUERY_MODES:
+        fn = modes[mode]
+        for query in queries[:args.warmup]:
+            fn(query)
+        latencies = []
+        for query in queries:
+            t0 = time.perf_counter()
+            fn(query)
+            latencies.append(time.perf_counter() - t0)
+        results[mode] = percentiles(latencies)
+        results[mode]["qps"] = len(queries) / sum(latencies)
+    retriever.close()
+    return results
+
+
+def run_profiles(args, chunks, embedder, store, bm25) -> Dict[str, Dict[str, float]]:
+    """
+    Latency of `retrieve` under each search profile, and the share of the
+    "exhaustive" top_k each profile finds (recall).
+    """
+    queries = make_queries(chunks, args.queries, seed=args.seed + 1)
+    retriever = HybridRetriever(store, bm25, embedder, result_cache=LRUCache(0), embedding_cache=LRUCache(0))
+    found = {}
+    results = {}
+    # Exhaustive first: it is the reference for the others
+    for name in sorted(SEARCH_PROFILES, key=lambda name: name != "exhaustive"):
+        for query in queries[:args.warmup]:
+            retriever.retrieve(query, top_k=args.top_k, profile=name)
+        latencies, found[name] = [], []
+        for query in queries:
+            t0 = time.perf_counter()
+            hits = retriever.retrieve(query, top_k=args.top_k, profile=name)
+            latencies.append(time.perf_counter() - t0)
+            found[name].append({(hit['doc_id'], hit['chunk_id']) for hit in hits})
+        results[name] = percentiles(latencies)
+        results[name]["qps"] = len(queries) / sum(latencies)
+        results[name]["recall"] = sum(
+            len(got & expected) / max(len(expected), 1) for got, expected in zip(found[name], found["exhaustive"])
+        ) / len(queries)
+    retriever.close()
+    return results
+
+
+def run_suite(args) -> Dict:
+    with tempfile.TemporaryDirectory() as directory:
+        stages, chunks, embedder, store, bm25 = run_ingestion(args, directory)
+        query = run_queries(args, chunks, embedder, store, bm25)
+        profiles = run_profiles(args, chunks, embedder, store, bm25)
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "chunks": len(chunks),
+            "args": vars(args)
+        },
+        "ingest": stages,
+        "query": query,
+        "profiles": profiles
+    }
+
+
+def print_results(results: Dict) -> None:
+    print(f"Commit {results['meta']['commit']}, {results['meta']['chunks']} chunks\n")
+    print(f"{'stage':<16}{'seconds':>10}{'per second':>14}")
+    for stage in INGEST_STAGES:
+        row = results["ingest"][stage]
+        print(f"{stage:<16}{row['seconds']:>10.3f}{row['per_second']:>14.1f} {row['unit']}")
+    print(f"\n{'query':<16}" + "".join(f"{key:>10}" for key in LATENCY_KEYS) + f"{'qps':>10}")
+    for mode in QUERY_MODES:
+        row = results["query"][mode]
+        print(f"{mode:<16}" + "".join(f"{row[key]:>10.2f}" for key in LATENCY_KEYS) + f"{row['qps']:>10.1f}")
+    print(f"\n{'profile':<16}" + "".join(f"{key:>10}" for key in LATENCY_KEYS) + f"{'qps':>10}{'recall':>10}")
+    for name, row in results.get("profiles", {}).items():
+        print(
+            f"{name:<16}" + "".join(f"{row[key]:>10.2f}" for key in LATENCY_KEYS)
+            + f"{row['qps']:>10.1f}{row['recall']:>10.1%}"
+        )
+
+
+def compare(baseline: Dict, current: Dict, threshold: float) -> List[str]:
+    """
+    Print both runs side by side; returns the metrics that got worse by more
+    than `threshold` (relative): lower throughput or higher latency.
+    """
+    regressions = []
+
+    def row(name: str, before: float, after: float, higher_is_better: bool) -> None:
+        if before:
+            change = (after - before) / before
+        else:  # Anything moving off zero is an unbounded change
+            change = math.copysign(math.inf, after) if after else 0.0
+        worse = -change if higher_is_better else change
+        flag = "REGRESSION" if worse > threshold else ("improved" if worse < -threshold else "")
+        if flag == "REGRESSION":
+            regressions.append(name)
+        print(f"{name:<28}{before:>14.2f}{after:>14.2f}{change:>+10.1%}  {flag}")
+
+    print(f"{'metric':<28}{baseline['meta']['commit']:>14}{current['meta']['commit']:>14}{'change':>10}")
+    for stage in INGEST_STAGES:
+        if stage in baseline["ingest"] and stage in current["ingest"]:
+            row(f"ingest.{stage}/s", baseline["ingest"][stage]["per_second"],
+                current["ingest"][stage]["per_second"], higher_is_better=True)
+    for mode in QUERY_MODES:
+        if mode in baseline["query"] and mode in current["query"]:
+            for key in LATENCY_KEYS:
+                row(f"query.{mode}.{key}", baseline["query"][mode][key],
+                    current["query"][mode][key], higher_is_better=False)
+    for name in baseline.get("profiles", {}):
+        if name in current.get("profiles", {}):
+            before, after = baseline["profiles"][name], current["profiles"][name]
+            for key in LATENCY_KEYS:
+                row(f"profile.{name}.{key}", before[key], after[key], higher_is_better=False)
+            row(f"profile.{name}.recall", before["recall"], after["recall"], higher_is_better=True)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=2000, help="Approximate chunks in the synthetic document")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backend", choices=["local", "qdrant"], default="local")
+    parser.add_argument("--qdrant-url", default=":memory:")
+    parser.add_argument("--chunker", choices=["tiktoken", "words"], default="tiktoken",
+                        help="words: whitespace chunking, no tiktoken encoding files needed")
+    parser.add_argument("--real-model", action="store_true", help="Embed with the configured model")
+    parser.add_argument("--embed-delay-ms", type=float, default=0.0, help="Hashing embedder delay per text")
+    parser.add_argument("--context-delay-ms", type=float, default=0.0, help="Fake contextualizer delay per chunk")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"),
+                        help="Compare two result files instead of running")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative change flagged as a regression")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            baseline = json.load(f)
+        with open(args.compare[1]) as f:
+            current = json.load(f)
+        regressions = compare(baseline, current, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print(f"\nNo regressions above {args.threshold:.0%}")
+        return
+
+    results = run_suite(args)
+    print_results(results)
+    if args.output:
+        directory = os.path.dirname(args.output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Compare query latency of the REST and gRPC transports, sync and async.
+
+Requires a running Qdrant (see README). Uses random unit vectors, so no
+embedding model is needed.
+
+    python benchmarks/bench_transport.py --points 5000 --queries 500 --concurrency 32
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import asyncio
+import time
+import numpy as np
+
+from src.vector_store import QdrantStorage, AsyncQdrantStorage
+from config import EMBEDDING_DIMENSION
+
+COLLECTION = "bench_transport"
+
+
+def random_vectors(n: int, rng: np.random.Generator) -> np.ndarray:
+    vectors = rng.standard_normal((n, EMBEDDING_DIMENSION)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def report(label: str, latencies: list, wall: float) -> None:
+    ms = np.array(latencies) * 1000
+    print(f"{label:<28} p50={np.percentile(ms, 50):7.2f}ms  "
+          f"p99={np.percentile(ms, 99):7.2f}ms  "
+          f"qps={len(latencies) / wall:8.1f}")
+
+
+def bench_sync(prefer_grpc: bool, queries: np.ndarray) -> None:
+    storage = QdrantStorage(collection_name=COLLECTION, prefer_grpc=prefer_grpc)
+    latencies = []
+    start = time.perf_counter()
+    for query in queries:
+        t0 = time.perf_counter()
+        storage.search(query, top_k=20)
+        latencies.append(time.perf_counter() - t0)
+    report(f"sync {'gRPC' if prefer_grpc else 'REST'}", latencies, time.perf_counter() - start)
+
+
+async def bench_async(prefer_grpc: bool, queries: np.ndarray, concurrency: int) -> None:
+    storage = await AsyncQdrantStorage.create(
+        collection_name=COLLECTION,
+        prefer_grpc=prefer_grpc,
+        pool_size=concurrency
+    )
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(query):
+        async with semaphore:
+            t0 = time.perf_counter()
+            await storage.search(query, top_k=20)
+            latencies.append(time.perf_counter() - t0)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(q) for q in queries))
+    wall = time.perf_counter() - start
+    await storage.close()
+    report(f"async {'gRPC' if prefer_grpc else 'REST'} (c={concurrency})", latencies, wall)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--points", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+
+    print(f"Loading {args.points} random points into '{COLLECTION}'...")
+    storage = QdrantStorage(collection_name=COLLECTION)
+    storage.client.delete_collection(collection_name=COLLECTION)
+    storage._create_collection()
+    vectors = random_vectors(args.points, rng)
+    batch = 500
+    for start in range(0, args.points, batch):
+        storage.add_chunks([
+            {
+                "chunk_id": i + 1,
+                "chunk_text": f"chunk {i + 1}",
+                "context": "",
+                "embedding": vectors[i],
+                "contextual_embedding": vectors[i]
+            }
+            for i in range(start, min(start + batch, args.points))
+        ])
+
+    queries = random_vectors(args.queries, rng)
+    bench_sync(False, queries)
+    bench_sync(True, queries)
+    asyncio.run(bench_async(False, queries, args.concurrency))
+    asyncio.run(bench_async(True, queries, args.concurrency))
+
+    storage.client.delete_collection(collection_name=COLLECTION)
+
+
+if __name__ == "__main__":
+    main()
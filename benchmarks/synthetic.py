@@ -0,0 +1,138 @@
+"""
+Synthetic corpora and offline stand-ins for benchmarks.
+
+Nothing here calls Claude or downloads a model, so benchmarks built on it
+run offline and give repeatable numbers for a given seed.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import time
+import zlib
+import numpy as np
+from typing import List, Dict
+
+from src.chunk_store import ChunkStore
+from config import EMBEDDING_DIMENSION
+
+
+def make_vocabulary(size: int, rng: np.random.Generator) -> List[str]:
+    """Pronounceable pseudo-words, unique within the vocabulary."""
+    consonants, vowels = "bcdfghjklmnprstvz", "aeiou"
+    words = set()
+    while len(words) < size:
+        length = int(rng.integers(2, 5))
+        words.add("".join(
+            consonants[rng.integers(len(consonants))] + vowels[rng.integers(len(vowels))]
+            for _ in range(length)
+        ))
+    return sorted(words)
+
+
+def make_corpus(
+    n_chunks: int,
+    words_per_chunk: int = 150,
+    vocabulary_size: int = 5000,
+    seed: int = 0
+) -> List[Dict]:
+    """
+    Chunks with Zipf-distributed words, shaped like `chunk_text()` output.
+    """
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array(make_vocabulary(vocabulary_size, rng))
+    ranks = np.arange(1, vocabulary_size + 1)
+    probabilities = (1.0 / ranks) / np.sum(1.0 / ranks)
+    chunks = []
+    for i in range(n_chunks):
+        words = rng.choice(vocabulary, size=words_per_chunk, p=probabilities)
+        chunks.append({
+            "chunk_text": " ".join(words),
+            "start_token": i * words_per_chunk,
+            "end_token": (i + 1) * words_per_chunk,
+            "chunk_id": i + 1
+        })
+    return chunks
+
+
+def make_document(n_chunks: int, **kwargs) -> str:
+    """A single document whose text chunks roughly into `n_chunks` chunks."""
+    return "\n\n".join(chunk["chunk_text"] for chunk in make_corpus(n_chunks, **kwargs))
+
+
+def make_queries(chunks: List[Dict], n_queries: int, words_per_query: int = 4, seed: int = 1) -> List[str]:
+    """Queries made of words sampled from random chunks, so every query has matches."""
+    rng = np.random.default_rng(seed)
+    queries = []
+    for _ in range(n_queries):
+        words = chunks[int(rng.integers(len(chunks)))]["chunk_text"].split()
+        picks = rng.choice(len(words), size=min(words_per_query, len(words)), replace=False)
+        queries.append(" ".join(words[i] for i in sorted(picks)))
+    return queries
+
+
+def fake_context(chunk: Dict) -> str:
+    """Stand-in for the Claude-generated context."""
+    return f"This is chunk {chunk['chunk_id']} from the synthetic benchmark document."
+
+
+class HashingEmbedder:
+    """
+    Offline stand-in for Embedder: signed feature hashing of the tokens into
+    EMBEDDING_DIMENSION dimensions, L2-normalized. Texts sharing words get
+    similar vectors, which is enough to exercise the vector leg.
+
+    Args:
+        delay: Seconds to sleep per encoded text, to mimic model latency
+    """
+
+    def __init__(self, dimension: int = EMBEDDING_DIMENSION, delay: float = 0.0) -> None:
+        self.dimension = dimension
+        self.delay = delay
+
+    def embed_text(self, text: str) -> np.ndarray:
+        if self.delay:
+            time.sleep(self.delay)
+        return self._hash(text)
+
+    def _hash(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for token in text.lower().split():
+            h = zlib.crc32(token.encode("utf-8"))
+            vector[h % self.dimension] += 1.0 if (h >> 31) & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def embed_query(self, query: str) -> np.ndarray:
+        return self.embed_text(query)
+
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        # One simulated forward pass for the whole batch
+        if self.delay:
+            time.sleep(self.delay)
+        return np.stack([self._hash(query) for query in queries])
+
+    def embed_chunks(self, chunks):
+        if isinstance(chunks, ChunkStore) and len(chunks):
+            original_texts = chunks.texts("chunk_text")
+            contextual_texts = [
+                f"{context}\n\n{text}" for context, text in zip(chunks.texts("context"), original_texts)
+            ]
+            chunks.set_embeddings("embedding", np.stack([self.embed_text(t) for t in original_texts]))
+            chunks.set_embeddings("contextual_embedding", np.stack([self.embed_text(t) for t in contextual_texts]))
+            return chunks
+        for chunk in chunks:
+            chunk["embedding"] = self.embed_text(chunk["chunk_text"])
+            chunk["contextual_embedding"] = self.embed_text(f"{chunk['context']}\n\n{chunk['chunk_text']}")
+        return chunks
+
+
+def percentiles(latencies: List[float]) -> Dict[str, float]:
+    """p50/p90/p99/mean in milliseconds."""
+    ms = np.array(latencies) * 1000
+    return {
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p90_ms": float(np.percentile(ms, 90)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "mean_ms": float(np.mean(ms))
+    }
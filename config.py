@@ -12,28 +12,123 @@ from dotenv import load_dotenv
 # Load environment variables from a .env file if it exists
 load_dotenv()
 
-# API key for accessing the language model service
+# API key for accessing the language model service. Only needed when Claude
+# is actually called (real contexts), so it is checked there, not at import.
 API_KEY = os.getenv("ANTHROPIC_API_KEY")
-if not API_KEY:
-    raise ValueError("ANTHROPIC_API_KEY environment variable is not set.")  
+
+
+def get_api_key() -> str:
+    """
+    The Anthropic API key; raises ValueError if it is not set.
+    """
+    api_key = os.getenv("ANTHROPIC_API_KEY") or API_KEY
+    if not api_key:
+        raise ValueError("ANTHROPIC_API_KEY environment variable is not set.")
+    return api_key
 
 # Qdrant configuration
 QDRANT_URL = os.getenv("QDRANT_URL", "http://localhost:6333")
-# QDRANT_API_KEY = os.getenv("QDRANT_API_KEY", None) 
+# QDRANT_API_KEY = os.getenv("QDRANT_API_KEY", None)
 COLLECTION_NAME ="contextual_retrieval"
+# gRPC skips JSON serialization of the query vector (set QDRANT_PREFER_GRPC=true)
+QDRANT_PREFER_GRPC = os.getenv("QDRANT_PREFER_GRPC", "false").lower() == "true"
+QDRANT_GRPC_PORT = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
+QDRANT_POOL_SIZE = int(os.getenv("QDRANT_POOL_SIZE", "10"))  # Connections shared by the async client
+
+# Collection memory profile (see benchmarks/bench_quantization.py to pick one)
+QDRANT_QUANTIZATION = os.getenv("QDRANT_QUANTIZATION", "none")  # none | scalar (int8) | binary
+QDRANT_ON_DISK_VECTORS = os.getenv("QDRANT_ON_DISK_VECTORS", "false").lower() == "true"
+QDRANT_HNSW_M = int(os.getenv("QDRANT_HNSW_M", "16"))  # Qdrant default
+QDRANT_HNSW_EF_CONSTRUCT = int(os.getenv("QDRANT_HNSW_EF_CONSTRUCT", "100"))  # Qdrant default
+# Store BM25 sparse vectors in the collection so hybrid fusion can run server-side
+QDRANT_SPARSE_BM25 = os.getenv("QDRANT_SPARSE_BM25", "false").lower() == "true"
+
+# Vector store backend: "qdrant" (server) or "local" (in-process, memory-mapped NumPy)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "qdrant")
+LOCAL_VECTOR_STORE_PATH = os.getenv("LOCAL_VECTOR_STORE_PATH", "data/vector_store")
+LOCAL_VECTOR_DTYPE = os.getenv("LOCAL_VECTOR_DTYPE", "float32")  # float32 | float16
+
+# Persisted lexical index and chunk text for `main.py --save-index` and the query server
+INDEX_DIR = os.getenv("INDEX_DIR", "data/index")
+CHUNK_STORE_DTYPE = os.getenv("CHUNK_STORE_DTYPE", "float32")  # Embedding matrices in ChunkStore: float32 | float16
+# Resolved metadata filters (matching row sets) cached per BM25 / local vector index
+FILTER_CACHE_SIZE = int(os.getenv("FILTER_CACHE_SIZE", "64"))
+
+# Index bundles (python -m src.bundle): bulk loading into a vector store
+BUNDLE_UPLOAD_BATCH_SIZE = int(os.getenv("BUNDLE_UPLOAD_BATCH_SIZE", "256"))  # Points per upsert
+BUNDLE_UPLOAD_WORKERS = int(os.getenv("BUNDLE_UPLOAD_WORKERS", "4"))  # Concurrent upserts (Qdrant)
+
+# Query server (python -m src.server)
+SERVER_HOST = os.getenv("SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+SERVER_MAX_BATCH_SIZE = int(os.getenv("SERVER_MAX_BATCH_SIZE", "32"))  # Queries per retrieve_many call
+SERVER_BATCH_WAIT_MS = float(os.getenv("SERVER_BATCH_WAIT_MS", "5"))  # How long a batch waits to fill up
+
+# Instrumentation (src/metrics.py): spans, counters and latency histograms
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() == "true"
+METRICS_LOG = os.getenv("METRICS_LOG", "false").lower() == "true"  # Log every span and trace at DEBUG
+METRICS_TRACE_HISTORY = int(os.getenv("METRICS_TRACE_HISTORY", "1000"))  # Recent per-query traces kept
 
 # Chunking config
 chunk_size = 800  # token per chunk
 chunk_overlap = 200  # token overlap between chunks
 
+# Near-duplicate chunks (MinHash/LSH, src/dedup.py) share one contextualized, embedded canonical chunk.
+# Opt-in: it changes which chunks are indexed, and with them chunk counts and BM25 statistics
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "false").lower() == "true"
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.85"))  # Estimated Jaccard similarity of word shingles
+DEDUP_NUM_PERM = int(os.getenv("DEDUP_NUM_PERM", "128"))  # MinHash signature length
+DEDUP_BANDS = int(os.getenv("DEDUP_BANDS", "32"))  # LSH bands (DEDUP_NUM_PERM / DEDUP_BANDS rows each)
+DEDUP_SHINGLE_SIZE = int(os.getenv("DEDUP_SHINGLE_SIZE", "3"))  # Words per shingle
+
 # Embedding model configuration
 EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"  # Example embedding model name
-EMBEDDING_DIMENSION = 384  # Dimension for the chosen embedding model
+EMBEDDING_MODEL_DIMENSION = 384  # Output dimension of the chosen embedding model
+# Optional compression between the embedder and the vector store (src/compression.py, see
+# benchmarks/bench_compression.py to pick one): none | pca (fitted on the corpus) | matryoshka (truncation)
+EMBEDDING_COMPRESSION = os.getenv("EMBEDDING_COMPRESSION", "none")
+EMBEDDING_COMPRESSED_DIMENSION = int(os.getenv("EMBEDDING_COMPRESSED_DIMENSION", "128"))
+# Dimension of the stored and query vectors: follows the compression profile
+EMBEDDING_DIMENSION = EMBEDDING_MODEL_DIMENSION if EMBEDDING_COMPRESSION == "none" else EMBEDDING_COMPRESSED_DIMENSION
+EMBEDDING_BATCH_SIZE = 32  # Texts per forward pass when embedding in bulk
+# Model calls running at once when many threads share one Embedder (each already uses torch's intra-op threads)
+EMBEDDER_MAX_CONCURRENCY = int(os.getenv("EMBEDDER_MAX_CONCURRENCY", "1"))
 
 # Retrieval configuration
 TOP_K_RETRIEVAL = 20  # Number of top similar chunks to retrieve
 TOP_K_FINAL = 5 # After re-ranking
 
+# Reranker (cross-encoder, CPU)
+RERANKER_MODEL_NAME = os.getenv("RERANKER_MODEL_NAME", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "8"))  # Pairs per forward pass
+RERANK_MAX_LENGTH = int(os.getenv("RERANK_MAX_LENGTH", "256"))  # Tokens per (query, passage) pair
+RERANK_WEIGHT = float(os.getenv("RERANK_WEIGHT", "0.8"))  # Cross-encoder share of the final score
+RERANK_MAX_SCORE = 1.0  # Sigmoid-activated cross-encoder scores lie in [0, 1]
+RERANK_LATENCY_BUDGET = float(os.environ["RERANK_LATENCY_BUDGET"]) if os.getenv("RERANK_LATENCY_BUDGET") else None  # seconds
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "10000"))
+RERANK_CACHE_TTL = float(os.getenv("RERANK_CACHE_TTL", "3600"))  # seconds
+RETRIEVER_MAX_WORKERS = int(os.getenv("RETRIEVER_MAX_WORKERS", "8"))  # Threads shared by the search legs
+# Per-leg deadlines in seconds; a leg that misses it is dropped and results are marked partial
+VECTOR_LEG_TIMEOUT = float(os.environ["VECTOR_LEG_TIMEOUT"]) if os.getenv("VECTOR_LEG_TIMEOUT") else None
+BM25_LEG_TIMEOUT = float(os.environ["BM25_LEG_TIMEOUT"]) if os.getenv("BM25_LEG_TIMEOUT") else None
+
+# Score fusion: "minmax" (weighted sum of min-max scores), "zscore" or "rrf" (Reciprocal Rank Fusion)
+FUSION_STRATEGY = os.getenv("FUSION_STRATEGY", "minmax")
+RRF_K = int(os.getenv("RRF_K", "60"))
+# With RRF fusion, fetch top_k candidates per leg and double until the fused top_k is final,
+# up to top_k * CANDIDATE_DEPTH_MAX_FACTOR. Other strategies have no such bound and always fetch
+# top_k * 2, so this defaults to on only with rrf (and "true" with another strategy is rejected)
+ADAPTIVE_CANDIDATE_DEPTH = os.getenv("ADAPTIVE_CANDIDATE_DEPTH", str(FUSION_STRATEGY == "rrf")).lower() == "true"
+CANDIDATE_DEPTH_MAX_FACTOR = int(os.getenv("CANDIDATE_DEPTH_MAX_FACTOR", "8"))
+# Default per-query search profile (see src.profiles): fast | balanced | exhaustive
+SEARCH_PROFILE = os.getenv("SEARCH_PROFILE", "balanced")
+
+# Retriever caches (LRU + TTL); size 0 disables a cache
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024"))
+QUERY_EMBEDDING_CACHE_TTL = float(os.getenv("QUERY_EMBEDDING_CACHE_TTL", "3600"))  # seconds
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "1024"))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "300"))  # seconds; results are also dropped when the index changes
+
 
 # Claude model configuration  
 CLAUDE_MODEL = "claude-3-5-haiku-20241022"
@@ -8,19 +8,44 @@ Load a PDF and ask questions using hybrid search!
 
 import sys
 import os
+import json
+import hashlib
+import threading
 from pathlib import Path
 
 # Add project root to path
 sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
 
-from src.document_loader import load_document
+from src.document_loader import load_document_pages, join_pages
 from src.chunker import chunk_text
 from src.contextualizer import add_context_to_chunk
 from src.embedder import Embedder
-from src.vector_store import QdrantStorage
-from src.bm25_index import BM25Index
+from src.compression import CompressedEmbedder, with_stored_projection
+from src.vector_store import create_vector_store
+from src.bm25_index import BM25Index, SAVED_FIELDS
 from src.retriever import HybridRetriever
-from config import chunk_size, chunk_overlap
+from src.chunk_store import ChunkStore
+from src.metadata import annotate_chunks, chunk_key
+from src.dedup import MinHashDeduplicator, DuplicateMap
+from src.snapshots import SnapshotManager, versioned_name
+from config import (
+    chunk_size,
+    chunk_overlap,
+    VECTOR_BACKEND,
+    TOP_K_RETRIEVAL,
+    INDEX_DIR,
+    EMBEDDING_MODEL_NAME,
+    EMBEDDING_DIMENSION,
+    EMBEDDING_COMPRESSION,
+    CLAUDE_MODEL,
+    DEDUP_ENABLED,
+    DEDUP_THRESHOLD
+)
+
+# Written next to the saved BM25 index: the corpus fingerprint it was built from
+FINGERPRINT_FILE = "fingerprint"
+# Alias of the live collection; every ingestion writes a new versioned collection behind it
+SESSION_COLLECTION = "interactive_session"
 
 def print_banner():
     """Print welcome banner"""
@@ -30,26 +55,41 @@ def print_banner():
     print("Powered by: Contextual Embeddings + Hybrid Search")
     print("=" * 70 + "\n")
 
-def load_and_process_document(pdf_path: str, use_mock_context: bool = False):
+def ingest_document(pdf_path: str, embedder, storage, backend: str, use_mock_context: bool, server_side_fusion: bool):
     """
-    Load and process a PDF document through the entire pipeline.
-
-    Args:
-        pdf_path: Path to PDF file
-        use_mock_context: If True, use mock context (fast). If False, use Claude API (slower but better)
+    Full ingestion: load, chunk, drop near-duplicate chunks, contextualize,
+    embed and store the document, and build the BM25 index (None with
+    server-side fusion). `storage` should be a new, empty collection: the
+    live one keeps serving queries until the new version is published.
 
     Returns:
-        Tuple of (chunks, embedder, vector_store, bm25_index, hybrid_retriever)
+        Tuple of (chunk_store, bm25_index, duplicates); the ChunkStore holds
+        the canonical chunks' text and both embedding matrices, the
+        DuplicateMap references the dropped copies
     """
     print(f"📄 Loading document: {pdf_path}")
-    document_text = load_document(pdf_path)
+    document_text, page_starts = join_pages(load_document_pages(pdf_path))
     print(f"✅ Loaded {len(document_text)} characters")
 
     # Step 1: Chunk the document
     print(f"\n📦 Chunking document (size={chunk_size}, overlap={chunk_overlap})...")
     chunks = chunk_text(document_text, chunk_size_tokens=chunk_size, chunk_overlap=chunk_overlap)
+    # Document metadata in every payload, for filtered search over multi-document collections
+    annotate_chunks(chunks, document_id(pdf_path), source=pdf_path, document_text=document_text, page_starts=page_starts)
     print(f"✅ Created {len(chunks)} chunks")
 
+    # Near-duplicates (repeated headers, disclaimers, copied sections) share their canonical chunk
+    duplicates = DuplicateMap()
+    if DEDUP_ENABLED:
+        deduplication = MinHashDeduplicator().deduplicate(chunks)
+        chunks, duplicates = deduplication.chunks, deduplication.duplicates
+        stats = deduplication.stats
+        print(
+            f"✅ Found {stats['duplicates']} near-duplicate chunks: skipping {stats['duplicates']} context calls, "
+            f"{2 * stats['duplicates']} embeddings, {stats['duplicates']} stored points and "
+            f"{stats['duplicate_words']} words of BM25 postings"
+        )
+
     # Step 2: Add context to chunks
     print(f"\n🧠 Adding context to chunks...")
     if use_mock_context:
@@ -63,26 +103,174 @@ def load_and_process_document(pdf_path: str, use_mock_context: bool = False):
             add_context_to_chunk(chunk, document_text)
         print(f"\n✅ Added context to all {len(chunks)} chunks")
 
+    # Columnar from here on: the embedder, vector store and BM25 index read the store's columns
+    chunk_store = ChunkStore.build(chunks)
+
     # Step 3: Generate embeddings
     print(f"\n🎯 Generating embeddings...")
-    embedder = Embedder()
-    enriched_chunks = embedder.embed_chunks(chunks)
+    enriched_chunks = embedder.embed_chunks(chunk_store)
     print(f"✅ Generated dual embeddings for {len(enriched_chunks)} chunks")
 
-    # Step 4: Store in Qdrant
-    print(f"\n💾 Storing in vector database (Qdrant)...")
-    storage = QdrantStorage(collection_name="interactive_session")
-    # Clear existing data
-    storage.client.delete_collection(collection_name=storage.collection_name)
-    storage._create_collection()
+    # Step 4: Store in the vector database
+    print(f"\n💾 Storing in vector database ({backend})...")
     storage.add_chunks(enriched_chunks)
-    print(f"✅ Stored in Qdrant with dual vectors")
+    print(f"✅ Stored in {backend} vector store with dual vectors")
 
     # Step 5: Build BM25 index
-    print(f"\n📇 Building BM25 index...")
-    bm25_index = BM25Index()
-    bm25_index.add_documents(enriched_chunks)
-    print(f"✅ Built BM25 index")
+    if server_side_fusion:
+        bm25_index = None
+        print(f"\n📇 BM25 sparse vectors stored in Qdrant, skipping local BM25 index")
+    else:
+        print(f"\n📇 Building BM25 index...")
+        bm25_index = BM25Index()
+        bm25_index.add_documents(enriched_chunks)
+        print(f"✅ Built BM25 index")
+
+    return enriched_chunks, bm25_index, duplicates
+
+def build_version(pdf_path: str, embedder, storage, backend: str, use_mock_context: bool, server_side_fusion: bool):
+    """
+    Ingest the document into `storage` and record its duplicate references,
+    the embedding projection (with compression) and the corpus fingerprint
+    there.
+
+    Returns:
+        Tuple of (chunk_store, bm25_index, duplicates), see `ingest_document`
+    """
+    chunk_store, bm25_index, duplicates = ingest_document(
+        pdf_path, embedder, storage, backend, use_mock_context, server_side_fusion
+    )
+    storage.set_metadata(duplicates.to_metadata())
+    if isinstance(embedder, CompressedEmbedder):
+        # Queries against this collection must be projected the same way
+        storage.set_metadata(embedder.projection.to_metadata())
+    # Recorded last: an interrupted ingestion is never mistaken for a complete one
+    storage.set_metadata({"fingerprint": corpus_fingerprint(pdf_path, use_mock_context, server_side_fusion)})
+    return chunk_store, bm25_index, duplicates
+
+def reingest(manager: SnapshotManager, pdf_path: str, embedder, backend: str, use_mock_context: bool, server_side_fusion: bool):
+    """
+    Re-ingest the document into a new collection and publish it; queries
+    keep running on the live version meanwhile.
+    """
+    storage = manager.new_vector_store()
+    _, bm25_index, duplicates = build_version(
+        pdf_path, embedder, storage, backend, use_mock_context, server_side_fusion
+    )
+    snapshot = manager.publish(storage, bm25_index, duplicates=duplicates)
+    print(f"\n✅ Published {snapshot}")
+
+def document_id(pdf_path: str) -> str:
+    """doc_id of an ingested file: its name without the extension."""
+    return Path(pdf_path).stem
+
+def corpus_fingerprint(pdf_path: str, use_mock_context: bool, server_side_fusion: bool) -> str:
+    """
+    Fingerprint of everything that determines the indexed corpus: the document
+    bytes, chunking, embedding model, context source and sparse vectors.
+    A collection stored with the same fingerprint can be reused as is.
+    """
+    digest = hashlib.sha256()
+    with open(pdf_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    settings = {
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "embedding_model": EMBEDDING_MODEL_NAME,
+        "embedding_dimension": EMBEDDING_DIMENSION,
+        "embedding_compression": EMBEDDING_COMPRESSION,
+        "context": "mock" if use_mock_context else CLAUDE_MODEL,
+        "server_side_fusion": server_side_fusion,
+        "doc_id": document_id(pdf_path),
+        "dedup_threshold": DEDUP_THRESHOLD if DEDUP_ENABLED else None
+    }
+    digest.update(json.dumps(settings, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+def read_saved_fingerprint(path: str):
+    """Fingerprint stored with the saved BM25 index, or None if there is none."""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return f.read().strip()
+
+def load_and_process_document(
+    pdf_path: str,
+    use_mock_context: bool = False,
+    backend: str = VECTOR_BACKEND,
+    server_side_fusion: bool = False,
+    save_index: bool = False,
+    rebuild: bool = False
+):
+    """
+    Load and process a PDF document through the entire pipeline.
+
+    If the collection already holds this document, ingested with the same
+    settings (see `corpus_fingerprint`), it is reused: contexts and
+    embeddings are not regenerated and BM25 is loaded from INDEX_DIR or
+    rebuilt from the stored payloads.
+
+    Args:
+        pdf_path: Path to PDF file
+        use_mock_context: If True, use mock context (fast). If False, use Claude API (slower but better)
+        backend: Vector store backend, "qdrant" or "local"
+        server_side_fusion: Store BM25 sparse vectors in Qdrant and fuse there (no local BM25 index)
+        save_index: Also write the BM25 chunks and a chunk store to INDEX_DIR, so
+            `python -m src.server` can serve them without re-ingesting
+        rebuild: Re-ingest even if a compatible collection exists
+
+    Returns:
+        Tuple of (chunk_store, embedder, vector_store, bm25_index, hybrid_retriever)
+    """
+    if server_side_fusion and backend != "qdrant":
+        raise ValueError("Server-side fusion requires the qdrant backend")
+
+    # Load the embedding model in the background while the document is parsed and contextualized
+    embedder = Embedder()
+    embedder.warm_up(background=True)
+    if EMBEDDING_COMPRESSION != "none":
+        # The projection is fitted on this document's embeddings, or read from a reused collection
+        embedder = CompressedEmbedder(embedder)
+
+    fingerprint = corpus_fingerprint(pdf_path, use_mock_context, server_side_fusion)
+    store_options = {"sparse": True} if server_side_fusion else {}
+    storage = create_vector_store(backend, collection_name=SESSION_COLLECTION, **store_options)
+    fingerprint_path = os.path.join(INDEX_DIR, FINGERPRINT_FILE)
+
+    if not rebuild and storage.is_compatible(fingerprint):
+        print(f"♻️  Reattaching to the existing {backend} collection ({storage.count()} chunks, same document and settings)")
+        enriched_chunks = ChunkStore.build(
+            sorted(storage.scroll(SAVED_FIELDS[2:]), key=chunk_key)
+        )
+        stored_metadata = storage.metadata()
+        duplicates = DuplicateMap.from_metadata(stored_metadata)
+        embedder = with_stored_projection(embedder, stored_metadata)
+        if server_side_fusion:
+            bm25_index = None
+        elif read_saved_fingerprint(fingerprint_path) == fingerprint:
+            bm25_index = BM25Index.load(os.path.join(INDEX_DIR, "bm25.jsonl"))
+            print(f"✅ Loaded saved BM25 index from {INDEX_DIR}")
+        else:
+            bm25_index = BM25Index()
+            bm25_index.add_documents(enriched_chunks)
+            print(f"✅ Rebuilt BM25 index from {len(enriched_chunks)} stored chunks")
+    else:
+        previous, storage = storage, storage.sibling(versioned_name(SESSION_COLLECTION))
+        enriched_chunks, bm25_index, duplicates = build_version(
+            pdf_path, embedder, storage, backend, use_mock_context, server_side_fusion
+        )
+        storage.set_alias(SESSION_COLLECTION)
+        previous.drop()  # Nothing queries the outdated collection yet
+
+    if save_index:
+        if bm25_index is None:
+            raise ValueError("--save-index needs the local BM25 index (not --server-fusion)")
+        bm25_index.save(os.path.join(INDEX_DIR, "bm25.jsonl"))
+        enriched_chunks.save(os.path.join(INDEX_DIR, "chunks"))
+        with open(fingerprint_path, "w") as f:
+            f.write(fingerprint)
+        print(f"✅ Saved BM25 index and chunk store to {INDEX_DIR}")
 
     # Step 6: Initialize hybrid retriever
     print(f"\n🔗 Initializing hybrid retriever...")
@@ -91,9 +279,14 @@ def load_and_process_document(pdf_path: str, use_mock_context: bool = False):
         bm25_index=bm25_index,
         embedder=embedder,
         vector_weight=0.5,
-        bm25_weight=0.5
+        bm25_weight=0.5,
+        server_side_fusion=server_side_fusion,
+        duplicates=duplicates
     )
-    print(f"✅ Hybrid retriever ready (50% vector + 50% BM25)")
+    if server_side_fusion:
+        print(f"✅ Hybrid retriever ready (server-side RRF fusion)")
+    else:
+        print(f"✅ Hybrid retriever ready (50% vector + 50% BM25)")
 
     return enriched_chunks, embedder, storage, bm25_index, hybrid_retriever
 
@@ -109,9 +302,12 @@ def display_results(results, show_full_text: bool = False):
         print(f"{'='*70}")
         print(f"Result #{i}")
         print(f"{'='*70}")
+        if result.get('rerank_score') is not None:
+            print(f"🎯 Rerank Score:   {result['rerank_score']:.4f} (cross-encoder)")
         print(f"📈 Combined Score: {result['combined_score']:.4f}")
-        print(f"   ├─ Vector Score:  {result['vector_score']:.4f} (semantic similarity)")
-        print(f"   └─ BM25 Score:    {result['bm25_score']:.4f} (keyword matching)")
+        if 'vector_score' in result:
+            print(f"   ├─ Vector Score:  {result['vector_score']:.4f} (semantic similarity)")
+            print(f"   └─ BM25 Score:    {result['bm25_score']:.4f} (keyword matching)")
         print(f"\n💬 Context:")
         print(f"   {result['context']}")
         print(f"\n📝 Text:")
@@ -124,10 +320,31 @@ def display_results(results, show_full_text: bool = False):
                 print(f"   {text[:200]}...")
             else:
                 print(f"   {text}")
+        if result.get('references'):
+            cited = ", ".join(
+                f"{ref['doc_id']} p.{ref['page']}" if ref.get('page') is not None else f"{ref['doc_id']} #{ref['chunk_id']}"
+                for ref in result['references']
+            )
+            print(f"\n📎 Also appears in: {cited}")
         print()
 
-def interactive_session(hybrid_retriever, chunks):
-    """Run interactive Q&A session"""
+def chunk_texts(snapshot) -> list:
+    """
+    chunk_text of every chunk in `snapshot`: from its chunk store when that
+    is a ChunkStore, otherwise from the vector store's payloads.
+    """
+    if isinstance(snapshot.chunk_store, ChunkStore):
+        return snapshot.chunk_store.texts('chunk_text')
+    return [payload.get('chunk_text') or '' for payload in snapshot.vector_store.scroll(fields=['chunk_text'])]
+
+def interactive_session(hybrid_retriever, reranker=None, reload=None):
+    """
+    Run interactive Q&A session
+
+    `reload`, if given, re-ingests the document in the background (the
+    'reload' command); questions are answered from the live version until
+    the new one is published, and 'stats' describes the live version.
+    """
     print("\n" + "=" * 70)
     print("💡 INTERACTIVE SESSION STARTED")
     print("=" * 70)
@@ -155,21 +372,34 @@ def interactive_session(hybrid_retriever, chunks):
                 print("\n📖 Available commands:")
                 print("  - Ask any question about the document")
                 print("  - 'stats' - Show document statistics")
+                if reload is not None:
+                    print("  - 'reload' - Re-ingest the document in the background")
                 print("  - 'quit' or 'exit' - End session")
                 print()
                 continue
 
             if query.lower() == 'stats':
+                texts = chunk_texts(hybrid_retriever.snapshot)
+                characters = sum(len(text) for text in texts)
                 print(f"\n📊 Document Statistics:")
-                print(f"   Total chunks: {len(chunks)}")
-                print(f"   Total characters: {sum(len(c['chunk_text']) for c in chunks)}")
-                print(f"   Average chunk size: {sum(len(c['chunk_text']) for c in chunks) // len(chunks)} chars")
+                print(f"   Total chunks: {len(texts)}")
+                print(f"   Total characters: {characters}")
+                print(f"   Average chunk size: {characters // max(len(texts), 1)} chars")
                 print()
                 continue
 
+            if query.lower() == 'reload' and reload is not None:
+                threading.Thread(target=reload, daemon=True).start()
+                print("\n🔄 Re-ingesting in the background; keep asking questions\n")
+                continue
+
             # Perform hybrid search
             print(f"\n🔎 Searching...")
-            results = hybrid_retriever.retrieve(query, top_k=3)
+            if reranker is not None:
+                candidates = hybrid_retriever.retrieve(query, top_k=TOP_K_RETRIEVAL)
+                results = reranker.rerank(query, candidates, top_n=3)
+            else:
+                results = hybrid_retriever.retrieve(query, top_k=3)
 
             # Display results
             display_results(results, show_full_text=False)
@@ -194,17 +424,27 @@ def main():
 
     # Check for PDF path argument
     if len(sys.argv) < 2:
-        print("Usage: python main.py <path-to-pdf> [--real-context]")
+        print("Usage: python main.py <path-to-pdf> [--real-context] [--local-store] [--server-fusion] [--rerank] [--save-index] [--rebuild]")
         print("\nExample:")
         print("  python main.py data/mydocument.pdf")
         print("  python main.py data/mydocument.pdf --real-context")
         print("\nOptions:")
         print("  --real-context: Use Claude API for context generation (slower but better)")
         print("                  Default: Uses mock context for speed")
+        print("  --local-store:  Use the in-process vector store instead of a Qdrant server")
+        print("  --server-fusion: Store BM25 as Qdrant sparse vectors and fuse server-side")
+        print("  --rerank:       Rerank the top candidates with a cross-encoder")
+        print("  --save-index:   Persist BM25 and chunk text for `python -m src.server`")
+        print("  --rebuild:      Re-ingest even if the collection already holds this document")
         return
 
     pdf_path = sys.argv[1]
     use_real_context = '--real-context' in sys.argv
+    backend = 'local' if '--local-store' in sys.argv else VECTOR_BACKEND
+    server_side_fusion = '--server-fusion' in sys.argv
+    use_reranker = '--rerank' in sys.argv
+    save_index = '--save-index' in sys.argv
+    rebuild = '--rebuild' in sys.argv
 
     # Check if file exists
     if not Path(pdf_path).exists():
@@ -213,17 +453,34 @@ def main():
 
     try:
         # Process document
-        chunks, embedder, storage, bm25_index, hybrid_retriever = load_and_process_document(
+        _, embedder, storage, bm25_index, hybrid_retriever = load_and_process_document(
             pdf_path,
-            use_mock_context=not use_real_context
+            use_mock_context=not use_real_context,
+            backend=backend,
+            server_side_fusion=server_side_fusion,
+            save_index=save_index,
+            rebuild=rebuild
         )
 
         print("\n" + "="*70)
         print("✅ DOCUMENT LOADED AND INDEXED SUCCESSFULLY!")
         print("="*70)
 
+        reranker = None
+        if use_reranker:
+            from src.reranker import Reranker
+            print(f"\n🎯 Loading reranker...")
+            reranker = Reranker()
+            reranker.warm_up()
+            print(f"✅ Reranker ready")
+
+        manager = SnapshotManager(hybrid_retriever, alias=SESSION_COLLECTION)
+        reload = lambda: reingest(
+            manager, pdf_path, embedder, backend, not use_real_context, server_side_fusion
+        )
+
         # Start interactive session
-        interactive_session(hybrid_retriever, chunks)
+        interactive_session(hybrid_retriever, reranker, reload)
 
     except Exception as e:
         print(f"\n❌ Error processing document: {e}")
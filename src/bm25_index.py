@@ -1,12 +1,59 @@
-from rank_bm25 import BM25Okapi
-from typing import List, Dict
+from typing import List, Dict, Optional, Union
+import json
+import os
 import numpy as np
+from src import metrics
+from src.lazy import lazy_import
+from src.chunk_store import ChunkStore
+from src.metadata import FilterIndex, Selection, chunk_key, metadata_columns
+
+rank_bm25 = lazy_import("rank_bm25")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Simple tokenization by splitting on whitespace and converting to lowercase.
+
+    This is the analyzer shared by BM25Index and the sparse vectors stored
+    in Qdrant, so both lexical paths see exactly the same terms.
+
+    Args:
+        text: Text to tokenize
+
+    Returns:
+        List of tokens
+    """
+    return text.lower().split()
+
+
+def document_text(chunk: Dict) -> str:
+    """
+    Text indexed for a chunk: context and chunk_text combined
+    (similar to the contextual embedding).
+    """
+    return f"{chunk.get('context','')} {chunk['chunk_text']}"
+
+
+# Chunk fields written by BM25Index.save (embeddings are not needed to rebuild the index)
+SAVED_FIELDS = ("doc_id", "chunk_id", "chunk_text", "context", "source", "page", "tags")
+
+# Upper bound on the (queries x documents) score matrix built per block in search_many
+_MAX_SCORE_CELLS = 1 << 24
+
 
 class BM25Index:
     def __init__(self) -> None:
-        self.bm25 = None            # The BM25 index Object.
+        self.bm25 = None            # The BM25Okapi object (None when opened with `open_postings`)
         self.documents = []         # Store original chunks
         self.tokenized_corpus =[]   # Store Tokenized versions
+        # Postings (CSR by term): documents containing each term and the
+        # precomputed BM25 weight of the term in that document
+        self.vocabulary = {}        # term -> term id
+        self.postings_ptr = None    # term id -> slice start/end into the arrays below
+        self.postings_docs = None
+        self.postings_weights = None
+        self.filter_index = None    # Per-value row sets of the document metadata, for filtered search
+        self.version = 0            # Bumped on every change, for caches keyed on the index
 
     def _tokenize(self, text: str) -> List[str]:
         """
@@ -18,57 +65,320 @@ class BM25Index:
         Returns:
             List of tokens
         """
-        return text.lower().split()
+        return tokenize(text)
     
-    def add_documents(self, chunks: List[Dict]) -> None:
+    @metrics.timed("bm25.add_documents")
+    def add_documents(self, chunks: Union[List[Dict], ChunkStore]) -> None:
         """
         Add document chunks to the BM25 index.
         
         Args:
-            chunks: List of chunks with 'chunk_text' and 'chunk_id' fields
+            chunks: List of chunks with 'chunk_text' and 'chunk_id' fields, or a
+                ChunkStore (kept as is; results are read from its columns)
+
+        The index is built aside and its attributes are replaced together at
+        the end. Indexes serving queries are not rebuilt in place, though:
+        build a new BM25Index and publish it (see src.snapshots).
         """
-        self.documents = chunks
+        filter_index = FilterIndex(
+            **(chunks.metadata_columns if isinstance(chunks, ChunkStore) else metadata_columns(chunks))
+        )
 
         # Tokenize corpus - combine context and chunk_text for better matching
-        self.tokenized_corpus = []
-        for chunk in chunks:
+        if isinstance(chunks, ChunkStore):
+            texts = [
+                f"{context} {text}" for context, text in zip(chunks.texts('context'), chunks.texts('chunk_text'))
+            ]
+        else:
             # Combine context and chunk_text (similar to contextual embedding!)
-            combined_text = f"{chunk.get('context','')} {chunk['chunk_text']}"
-            tokens = self._tokenize(combined_text)
-            self.tokenized_corpus.append(tokens)
+            texts = [document_text(chunk) for chunk in chunks]
+        tokenized_corpus = [self._tokenize(text) for text in texts]
         # Create BM25 index
-        self.bm25 = BM25Okapi(self.tokenized_corpus)
+        bm25 = rank_bm25.BM25Okapi(tokenized_corpus)
+        vocabulary, postings_ptr, postings_docs, postings_weights = self._build_postings(bm25)
 
-    def search(self, query: str, top_k: int = 5) -> List[Dict]:
+        self.documents = chunks
+        self.filter_index = filter_index
+        self.tokenized_corpus = tokenized_corpus
+        self.bm25 = bm25
+        self.vocabulary = vocabulary
+        self.postings_ptr = postings_ptr
+        self.postings_docs = postings_docs
+        self.postings_weights = postings_weights
+        self.version += 1
+
+    @staticmethod
+    def _build_postings(bm25) -> tuple:
+        """
+        Precompute, for every term, the documents containing it and the full
+        BM25Okapi contribution idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * dl / avgdl)).
+
+        A query then only touches the postings of its own terms instead of
+        looping over every document per term like `BM25Okapi.get_scores`,
+        and many queries can be scored with one `np.bincount`.
+
+        Returns:
+            (vocabulary, postings_ptr, postings_docs, postings_weights)
+        """
+        vocabulary = {}
+        term_ids, doc_ids, term_freqs = [], [], []
+        for doc_idx, freqs in enumerate(bm25.doc_freqs):
+            for term, tf in freqs.items():
+                term_ids.append(vocabulary.setdefault(term, len(vocabulary)))
+                doc_ids.append(doc_idx)
+                term_freqs.append(tf)
+
+        term_ids = np.array(term_ids, dtype=np.int64)
+        order = np.argsort(term_ids, kind="stable")
+        docs = np.array(doc_ids, dtype=np.int64)[order]
+        tf = np.array(term_freqs, dtype=np.float64)[order]
+
+        idf = np.zeros(len(vocabulary), dtype=np.float64)
+        for term, term_id in vocabulary.items():
+            idf[term_id] = bm25.idf.get(term) or 0
+        doc_len = np.array(bm25.doc_len, dtype=np.float64)
+        norm = bm25.k1 * (1 - bm25.b + bm25.b * doc_len[docs] / bm25.avgdl)
+
+        postings_ptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(vocabulary)), out=postings_ptr[1:])
+        weights = idf[term_ids[order]] * tf * (bm25.k1 + 1) / (tf + norm)
+        return vocabulary, postings_ptr, docs, weights
+
+    def _score_batch(self, tokenized_queries: List[List[str]], selection: Optional[Selection] = None) -> np.ndarray:
+        """
+        BM25 scores of every document for a batch of tokenized queries.
+
+        With a `selection` (see FilterIndex.select) postings are masked with
+        its per-document bitmap and only the selected documents get a score,
+        so the cost follows the query terms' postings and the subset size,
+        not the corpus size.
+
+        Returns:
+            (n_queries, n_documents) score matrix, or (n_queries, n_selected)
+            in the order of `selection.rows`
+        """
+        n_docs = len(self.documents) if selection is None else len(selection.rows)
+        positions, weights = [], []
+        for qi, tokens in enumerate(tokenized_queries):
+            for token in tokens:
+                term_id = self.vocabulary.get(token)
+                if term_id is None:
+                    continue
+                start, end = self.postings_ptr[term_id], self.postings_ptr[term_id + 1]
+                docs = self.postings_docs[start:end]
+                term_weights = self.postings_weights[start:end]
+                if selection is not None:
+                    keep = selection.mask[docs]
+                    docs = np.searchsorted(selection.rows, docs[keep])
+                    term_weights = term_weights[keep]
+                positions.append(docs + qi * n_docs)
+                weights.append(term_weights)
+        size = len(tokenized_queries) * n_docs
+        if not positions:
+            return np.zeros((len(tokenized_queries), n_docs))
+        scores = np.bincount(
+            np.concatenate(positions),
+            weights=np.concatenate(weights),
+            minlength=size
+        )
+        return scores.reshape(len(tokenized_queries), n_docs)
+
+    def _prune_terms(self, tokens: List[str], max_terms: Optional[int]) -> List[str]:
+        """
+        Occurrences of the query's `max_terms` rarest indexed terms (shortest
+        postings, i.e. highest idf); all tokens when `max_terms` is None.
+        """
+        if max_terms is None:
+            return tokens
+        lengths = {}
+        for token in tokens:
+            term_id = self.vocabulary.get(token)
+            if term_id is not None:
+                lengths[token] = int(self.postings_ptr[term_id + 1] - self.postings_ptr[term_id])
+        if len(lengths) <= max_terms:
+            return tokens
+        keep = set(sorted(lengths, key=lambda token: (lengths[token], token))[:max_terms])
+        return [token for token in tokens if token in keep]
+
+    def _top_results(self, scores: np.ndarray, top_k: int, rows: Optional[np.ndarray] = None) -> List[Dict]:
+        """
+        Top-k documents of one score vector, positive scores only. `rows`
+        maps score positions to documents when only a subset was scored.
+        """
+        k = min(top_k, len(scores))
+        if k <= 0:
+            return []
+        top_indices = np.argpartition(-scores, k - 1)[:k]
+        top_indices = top_indices[np.argsort(-scores[top_indices], kind="stable")]
+
+        results = []
+        for idx in top_indices:
+            if scores[idx] > 0: # Only return results with positive scores
+                chunk = self.documents[idx if rows is None else rows[idx]]
+                doc_id, chunk_id = chunk_key(chunk)
+                results.append({
+                    'doc_id': doc_id,
+                    'chunk_id': chunk_id,
+                    'chunk_text': chunk['chunk_text'],
+                    'context': chunk.get('context',''),
+                    'score': float(scores[idx])
+                })
+        return results
+
+    @metrics.timed("bm25.search")
+    def search(
+        self,
+        query: str,
+        top_k: int = 5,
+        filter: Optional[Dict] = None,
+        max_terms: Optional[int] = None
+    ) -> List[Dict]:
         """
         Search the BM25 index for the most relevant document chunks.
             
         Args:
             query: The search query string
             top_k: Number of top results to return
+            filter: Metadata filter (see src.metadata); only matching chunks are scored
+            max_terms: Score only the query's `max_terms` rarest terms (see src.profiles)
             
         Returns:
             List of top_k most relevant document chunks
             """
-        if self.bm25 is None:
+        if self.postings_ptr is None:
             raise ValueError("BM25 index is not initialized. Add documents first.")
             
         # Tokenize the query
-        tokenized_query = self._tokenize(query)
+        tokenized_query = self._prune_terms(self._tokenize(query), max_terms)
+        selection = self.filter_index.select(filter)
 
-        # Get BM25 scores
-        scores = self.bm25.get_scores(tokenized_query)
-            
-        # Get top_k indices sorted descending by score
-        top_indices = np.argsort(scores)[::-1][:top_k]
-            
+        # Get BM25 scores (same values as self.bm25.get_scores, from the postings)
+        scores = self._score_batch([tokenized_query], selection)[0]
+
+        # Get top_k results sorted descending by score
+        return self._top_results(scores, top_k, None if selection is None else selection.rows)
+
+    @metrics.timed("bm25.search_many")
+    def search_many(
+        self,
+        queries: List[str],
+        top_k: int = 5,
+        filter: Optional[Dict] = None,
+        max_terms: Optional[int] = None
+    ) -> List[List[Dict]]:
+        """
+        Search the BM25 index for a batch of queries.
+
+        All queries in a block are scored together with one vectorized pass
+        over their terms' postings.
+
+        Args:
+            queries: The search query strings
+            top_k: Number of top results to return per query
+            filter: Metadata filter applied to every query
+            max_terms: Score only each query's `max_terms` rarest terms
+
+        Returns:
+            One list of top_k results per query, in input order
+        """
+        if self.postings_ptr is None:
+            raise ValueError("BM25 index is not initialized. Add documents first.")
+
+        tokenized = [self._prune_terms(self._tokenize(query), max_terms) for query in queries]
+        selection = self.filter_index.select(filter)
+        rows = None if selection is None else selection.rows
+        block = max(1, _MAX_SCORE_CELLS // max(1, len(self.documents) if rows is None else len(rows)))
         results = []
-        for idx in top_indices:
-            if scores[idx] > 0: # Only return results with positive scores
-                results.append({
-                    'chunk_id': self.documents[idx]['chunk_id'],
-                    'chunk_text': self.documents[idx]['chunk_text'],
-                    'context': self.documents[idx].get('context',''),
-                    'score': float(scores[idx])
-                })
+        for start in range(0, len(tokenized), block):
+            for scores in self._score_batch(tokenized[start:start + block], selection):
+                results.append(self._top_results(scores, top_k, rows))
         return results
+
+    def save(self, path: str) -> None:
+        """
+        Write the indexed chunks to `path` as JSON lines.
+
+        Only the text and metadata fields are stored; `load` re-tokenizes
+        them, which is much cheaper than re-extracting and re-embedding the
+        document.
+        """
+        if self.postings_ptr is None:
+            raise ValueError("BM25 index is not initialized. Add documents first.")
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for chunk in self.documents:
+                f.write(json.dumps({field: chunk.get(field) for field in SAVED_FIELDS}) + "\n")
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        """
+        Rebuild an index from chunks written with `save`.
+        """
+        with open(path, encoding="utf-8") as f:
+            chunks = ChunkStore.build(json.loads(line) for line in f)
+        index = cls()
+        index.add_documents(chunks)
+        return index
+
+    def save_postings(self, path: str) -> None:
+        """
+        Write the postings to directory `path`, so `open_postings` can serve
+        queries without tokenizing the corpus again.
+
+        The documents themselves are not written: the postings refer to them
+        by position, so save them alongside (e.g. as the ChunkStore the
+        index was built from).
+
+        Layout:
+            postings.json          vocabulary (terms in term-id order) and document count
+            postings_ptr.npy, postings_docs.npy, postings_weights.npy
+        """
+        if self.postings_ptr is None:
+            raise ValueError("BM25 index is not initialized. Add documents first.")
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "postings_ptr.npy"), self.postings_ptr)
+        np.save(os.path.join(path, "postings_docs.npy"), self.postings_docs)
+        np.save(os.path.join(path, "postings_weights.npy"), self.postings_weights)
+        terms = sorted(self.vocabulary, key=self.vocabulary.get)
+        with open(os.path.join(path, "postings.json"), "w", encoding="utf-8") as f:
+            json.dump({"documents": len(self.documents), "terms": terms}, f)
+
+    @classmethod
+    def open_postings(cls, path: str, documents: ChunkStore) -> "BM25Index":
+        """
+        Memory-map postings written with `save_postings`.
+
+        Args:
+            path: Directory written by `save_postings`
+            documents: The chunks the index was built from, in the same order
+        """
+        with open(os.path.join(path, "postings.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta["documents"] != len(documents):
+            raise ValueError(f"Postings cover {meta['documents']} documents, got {len(documents)}")
+        index = cls()
+        index.documents = documents
+        index.filter_index = FilterIndex(**documents.metadata_columns)
+        index.vocabulary = {term: term_id for term_id, term in enumerate(meta["terms"])}
+        index.postings_ptr = np.load(os.path.join(path, "postings_ptr.npy"), mmap_mode="r")
+        index.postings_docs = np.load(os.path.join(path, "postings_docs.npy"), mmap_mode="r")
+        index.postings_weights = np.load(os.path.join(path, "postings_weights.npy"), mmap_mode="r")
+        index.version += 1
+        return index
+
+    @classmethod
+    def from_vector_store(cls, vector_store) -> "BM25Index":
+        """
+        Rebuild an index from the chunk text stored in a vector store's
+        payloads (one scroll over the collection, no vectors transferred).
+        """
+        chunks = ChunkStore.build(
+            sorted(vector_store.scroll(SAVED_FIELDS[2:]), key=chunk_key)  # Fields besides the key
+        )
+        index = cls()
+        index.add_documents(chunks)
+        return index
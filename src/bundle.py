@@ -0,0 +1,250 @@
+"""
+Portable index bundles: bootstrap a query replica without re-ingesting.
+
+A bundle is a directory holding everything retrieval needs: the chunk
+payloads and both embedding matrices (a ChunkStore), the BM25 postings and
+a manifest describing how they were produced. Exporting reads an existing
+collection; importing bulk-loads the vectors into any backend, so a new
+replica makes no Claude or embedding calls.
+
+    python -m src.bundle export data/bundle              # from the live collection
+    python -m src.bundle import data/bundle              # on the replica
+    python -m src.server --index-dir data/bundle         # serve it
+
+Layout of a bundle directory (also a valid `--index-dir` for the server):
+    manifest.json   format, embedding model, dimension, compression and dtype,
+                    context model and prompt hash, chunk count, collection
+                    metadata (with the embedding projection, if any) and
+                    the SHA-256 of every other file
+    chunks/         ChunkStore with both embedding matrices, float32 or
+                    float16 (memory-mapped on import)
+    bm25/           BM25 postings (see BM25Index.save_postings)
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+import warnings
+from typing import Dict, NamedTuple
+
+from src import metrics
+from src.bm25_index import BM25Index, SAVED_FIELDS
+from src.chunk_store import ChunkStore
+from src.compression import METADATA_KEY as PROJECTION_KEY
+from src.metadata import chunk_key
+from src.snapshots import versioned_name
+from src.vector_store import create_vector_store
+from config import (
+    VECTOR_BACKEND,
+    EMBEDDING_MODEL_NAME,
+    EMBEDDING_DIMENSION,
+    CLAUDE_MODEL,
+    CONTEXT_PROMPT,
+    CHUNK_STORE_DTYPE,
+    BUNDLE_UPLOAD_BATCH_SIZE,
+    BUNDLE_UPLOAD_WORKERS,
+    QDRANT_SPARSE_BM25
+)
+
+BUNDLE_FORMAT = 1
+MANIFEST_FILE = "manifest.json"
+CHUNK_STORE_DIR = "chunks"
+POSTINGS_DIR = "bm25"
+
+
+class Bundle(NamedTuple):
+    """
+    An imported bundle: the memory-mapped chunk store, the BM25 index over
+    it and the manifest.
+    """
+    chunk_store: ChunkStore
+    bm25_index: BM25Index
+    manifest: Dict
+
+
+def prompt_hash(prompt: str = CONTEXT_PROMPT) -> str:
+    """SHA-256 of the context prompt template, recorded in the manifest."""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+def _file_digests(path: str) -> Dict[str, str]:
+    """SHA-256 of every file under `path` except the manifest, by relative path."""
+    digests = {}
+    for directory, _, files in os.walk(path):
+        for name in files:
+            full = os.path.join(directory, name)
+            relative = os.path.relpath(full, path).replace(os.sep, "/")
+            if relative == MANIFEST_FILE:
+                continue
+            digest = hashlib.sha256()
+            with open(full, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+            digests[relative] = digest.hexdigest()
+    return dict(sorted(digests.items()))
+
+
+@metrics.timed("bundle.export")
+def export_bundle(vector_store, path: str, dtype: str = CHUNK_STORE_DTYPE) -> Dict:
+    """
+    Write the chunks, vectors and BM25 postings of a collection to a bundle.
+
+    The collection is read with one scroll (payloads and vectors); the BM25
+    postings are built from the exported chunks, so their rows match the
+    chunk store. The bundle is written next to `path` and renamed into
+    place, so a reader never sees a partial bundle.
+
+    Args:
+        vector_store: VectorStore to export
+        path: Bundle directory to create (must not exist)
+        dtype: Precision of the stored embedding matrices, "float32" or
+            "float16" (half the bundle size)
+
+    Returns:
+        The manifest
+    """
+    if os.path.exists(path):
+        raise FileExistsError(f"Bundle directory '{path}' already exists")
+    chunks = sorted(vector_store.scroll(SAVED_FIELDS[2:], with_vectors=True), key=chunk_key)
+    if not chunks:
+        raise ValueError(f"Collection '{vector_store.collection_name}' is empty; nothing to export")
+    chunk_store = ChunkStore.build(chunks, dtype=dtype)
+    del chunks
+    bm25_index = BM25Index()
+    bm25_index.add_documents(chunk_store)
+
+    partial = f"{path}.partial"
+    shutil.rmtree(partial, ignore_errors=True)
+    chunk_store.save(os.path.join(partial, CHUNK_STORE_DIR))
+    bm25_index.save_postings(os.path.join(partial, POSTINGS_DIR))
+    collection_metadata = vector_store.metadata()
+    manifest = {
+        "format": BUNDLE_FORMAT,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "embedding_model": EMBEDDING_MODEL_NAME,
+        "embedding_dimension": int(chunk_store.embeddings["embedding"].shape[1]),
+        "embedding_compression": (collection_metadata.get(PROJECTION_KEY) or {}).get("method", "none"),
+        "embedding_dtype": chunk_store.dtype.name,
+        "context_model": CLAUDE_MODEL,
+        "context_prompt_sha256": prompt_hash(),
+        "chunks": len(chunk_store),
+        "collection_metadata": collection_metadata,
+        "files": _file_digests(partial)
+    }
+    with open(os.path.join(partial, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(partial, path)
+    metrics.count("bundle.exported_chunks", len(chunk_store))
+    return manifest
+
+
+def read_manifest(path: str, verify: bool = True) -> Dict:
+    """
+    Read a bundle's manifest and check it can be served by this process.
+
+    Raises ValueError if the format is unknown, the embedding model or
+    dimension differs from the configured one (queries would not match the
+    stored vectors) or, with `verify`, a file is missing or corrupted. A
+    different context prompt only warns: the stored contexts stay usable.
+    """
+    with open(os.path.join(path, MANIFEST_FILE), encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != BUNDLE_FORMAT:
+        raise ValueError(f"Unsupported bundle format {manifest.get('format')!r}, expected {BUNDLE_FORMAT}")
+    if (manifest["embedding_model"], manifest["embedding_dimension"]) != (EMBEDDING_MODEL_NAME, EMBEDDING_DIMENSION):
+        raise ValueError(
+            f"Bundle was embedded with {manifest['embedding_model']} ({manifest['embedding_dimension']} dimensions), "
+            f"this process queries with {EMBEDDING_MODEL_NAME} ({EMBEDDING_DIMENSION} dimensions)"
+        )
+    if manifest["context_prompt_sha256"] != prompt_hash():
+        warnings.warn("Bundle contexts were generated with a different CONTEXT_PROMPT")
+    if verify:
+        digests = _file_digests(path)
+        for name, digest in manifest["files"].items():
+            if digests.get(name) != digest:
+                raise ValueError(f"Bundle file '{name}' is missing or does not match the manifest")
+    return manifest
+
+
+@metrics.timed("bundle.import")
+def import_bundle(
+    path: str,
+    vector_store,
+    batch_size: int = BUNDLE_UPLOAD_BATCH_SIZE,
+    workers: int = BUNDLE_UPLOAD_WORKERS,
+    verify: bool = True
+) -> Bundle:
+    """
+    Load a bundle's vectors into `vector_store` and open its chunk store and
+    BM25 postings.
+
+    The chunk store is memory-mapped and streamed to the vector store in
+    batches (`VectorStore.bulk_add`, concurrent on Qdrant). The collection
+    metadata (fingerprint, near-duplicate references) is copied last, so an
+    interrupted import is never mistaken for a complete one.
+
+    Args:
+        path: Bundle directory
+        vector_store: Target store, normally a new empty collection
+        batch_size: Points per upload batch
+        workers: Concurrent upload batches
+        verify: Check every file against the manifest checksums first
+
+    Returns:
+        Bundle with the chunk store, the BM25 index and the manifest
+    """
+    manifest = read_manifest(path, verify=verify)
+    chunk_store = ChunkStore.open(os.path.join(path, CHUNK_STORE_DIR))
+    vector_store.bulk_add(chunk_store, batch_size=batch_size, workers=workers)
+    vector_store.set_metadata(manifest["collection_metadata"])
+    bm25_index = BM25Index.open_postings(os.path.join(path, POSTINGS_DIR), chunk_store)
+    metrics.count("bundle.imported_chunks", len(chunk_store))
+    return Bundle(chunk_store, bm25_index, manifest)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or import a portable index bundle")
+    parser.add_argument("command", choices=("export", "import"))
+    parser.add_argument("path", help="Bundle directory")
+    parser.add_argument("--collection", default="interactive_session", help="Collection (or alias) to read or replace")
+    parser.add_argument("--local-store", action="store_true", help="Use the in-process vector store")
+    parser.add_argument("--server-fusion", action="store_true", default=QDRANT_SPARSE_BM25,
+                        help="The collection stores BM25 sparse vectors (built with main.py --server-fusion)")
+    parser.add_argument("--workers", type=int, default=BUNDLE_UPLOAD_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=BUNDLE_UPLOAD_BATCH_SIZE)
+    parser.add_argument("--dtype", choices=("float32", "float16"), default=CHUNK_STORE_DTYPE,
+                        help="Precision of the exported embeddings")
+    args = parser.parse_args()
+
+    backend = "local" if args.local_store else VECTOR_BACKEND
+    if args.server_fusion and backend != "qdrant":
+        parser.error("--server-fusion requires the qdrant backend")
+    # Same schema as the collection main.py built, or is_compatible never matches a hybrid collection
+    store_options = {"sparse": True} if args.server_fusion else {}
+    live = create_vector_store(backend, collection_name=args.collection, **store_options)
+    if args.command == "export":
+        manifest = export_bundle(live, args.path, dtype=args.dtype)
+        print(f"Exported {manifest['chunks']} chunks from '{live.collection_name}' to {args.path}")
+        return
+
+    fingerprint = read_manifest(args.path, verify=False)["collection_metadata"].get("fingerprint")
+    if fingerprint is not None and live.is_compatible(fingerprint):
+        print(f"'{args.collection}' already holds this bundle ({live.count()} chunks)")
+        return
+    # Loaded into a new collection and switched to under the alias, like a re-ingestion
+    store = live.sibling(versioned_name(args.collection))
+    start = time.perf_counter()
+    bundle = import_bundle(args.path, store, batch_size=args.batch_size, workers=args.workers)
+    store.set_alias(args.collection)
+    live.drop()
+    print(
+        f"Imported {bundle.manifest['chunks']} chunks into '{store.collection_name}' "
+        f"in {time.perf_counter() - start:.1f}s; serve with: python -m src.server --index-dir {args.path}"
+        + (" --local-store" if args.local_store else "")
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+def normalize_query(query: str) -> str:
+    """
+    Cache key form of a query: lowercased, whitespace collapsed.
+
+    Matches the BM25 analyzer (`tokenize`), so two queries with the same
+    normalized form always get the same lexical results.
+    """
+    return " ".join(query.lower().split())
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache with an optional time-to-live per entry.
+
+    Entries are evicted when the cache holds more than `max_size` items
+    (least recently used first) or when they are older than `ttl` seconds.
+    Hits and misses are counted for `stats()`.
+
+    Args:
+        max_size: Maximum number of entries; 0 disables the cache
+        ttl: Seconds an entry stays valid, None for no expiry
+        clock: Time source (monotonic seconds), replaceable in tests
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        ttl: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Value stored under `key`, or `default` if missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, stored_at = entry
+                if self.ttl is None or self.clock() - stored_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.evictions += 1
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """
+        Store `value` under `key`, evicting the least recently used entries
+        beyond `max_size`.
+        """
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, self.clock())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """
+        Drop every entry (counters are kept).
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Hit/miss counters and hit rate since the cache was created.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
@@ -0,0 +1,305 @@
+import json
+import os
+import numpy as np
+from collections.abc import Mapping
+from typing import List, Dict, Iterable, Iterator, Optional
+from src import metrics
+from src.metadata import NO_PAGE, metadata_columns, split_key
+from config import CHUNK_STORE_DTYPE
+
+TEXT_FIELDS = ("chunk_text", "context")
+# Document metadata columns (see src.metadata), always present
+METADATA_COLUMNS = ("doc_ids", "sources", "pages", "tag_offsets", "tag_values")
+EMBEDDING_NAMES = ("embedding", "contextual_embedding")
+SUPPORTED_DTYPES = ("float32", "float16")
+
+
+class ChunkView(Mapping):
+    """
+    Read-only, dict-like view of one row of a ChunkStore.
+
+    Holds only the store and the row number: text is decoded from the
+    buffer on access and embeddings are returned as rows of the store's
+    matrices (NumPy views, not copies). `dict(view)` materializes a copy.
+    """
+
+    __slots__ = ("store", "row")
+
+    def __init__(self, store: "ChunkStore", row: int) -> None:
+        self.store = store
+        self.row = row
+
+    def __getitem__(self, key: str):
+        return self.store.value(self.row, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.store.columns)
+
+    def __len__(self) -> int:
+        return len(self.store.columns)
+
+    def __repr__(self) -> str:
+        return f"ChunkView(row={self.row}, chunk_id={self['chunk_id']!r})"
+
+
+class ChunkStore:
+    """
+    Columnar chunk store: one contiguous array per column instead of one
+    dict per chunk.
+
+    Every text field of every chunk lives in one UTF-8 buffer, located by an
+    offsets array; chunk IDs and document metadata (doc_id, source, page,
+    tags in CSR form) are arrays; each embedding type is a 2-D float32 or
+    float16 matrix with one row per chunk. Iterating or indexing the store
+    yields lightweight `ChunkView`s, so code written for chunk
+    dicts (`chunk['chunk_text']`, `chunk.get('context', '')`) reads straight
+    from the columns. Embedder, BM25Index and the vector stores also accept
+    a store directly and read whole columns.
+
+    Saved to disk the buffer and arrays are memory-mapped, so opening a store
+    costs nothing up front and `hydrate` only touches the pages of the chunks
+    it returns. Chunks are looked up by (doc_id, chunk_id) through rows
+    sorted by that key and two `searchsorted` calls instead of a per-chunk dict.
+
+    Layout of a saved store directory:
+        meta.json       field names, embedding names, dtype and chunk count
+        chunk_ids.npy   chunk IDs in row order
+        order.npy       rows sorted by (doc_id, chunk_id) (for lookups)
+        doc_ids.npy, sources.npy, pages.npy, tag_offsets.npy, tag_values.npy
+                        document metadata columns
+        offsets.npy     int64 [n_rows * n_fields + 1] byte offsets into text.bin
+        text.bin        UTF-8 text, row-major (row 0 field 0, row 0 field 1, ...)
+        <name>.npy      [n_rows, dimension] matrix per embedding type
+    """
+
+    def __init__(
+        self,
+        chunk_ids: np.ndarray,
+        offsets: np.ndarray,
+        buffer: np.ndarray,
+        fields: Iterable[str] = TEXT_FIELDS,
+        embeddings: Optional[Dict[str, np.ndarray]] = None,
+        dtype: str = CHUNK_STORE_DTYPE,
+        metadata: Optional[Dict[str, np.ndarray]] = None
+    ) -> None:
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"Unsupported dtype '{dtype}', expected one of {SUPPORTED_DTYPES}")
+        self.chunk_ids = chunk_ids
+        self.offsets = offsets
+        self.buffer = buffer
+        self.fields = tuple(fields)
+        self.dtype = np.dtype(dtype)
+        self.embeddings: Dict[str, np.ndarray] = {}
+        if metadata is None:  # Every chunk in the default document
+            metadata = metadata_columns({"chunk_id": chunk_id} for chunk_id in chunk_ids)
+        self.metadata_columns = metadata
+        self._order = np.lexsort((chunk_ids, self.metadata_columns["doc_ids"]))
+        self._index_sorted_keys()
+        for name, matrix in (embeddings or {}).items():
+            self.set_embeddings(name, matrix)
+
+    @classmethod
+    def build(
+        cls,
+        chunks: Iterable[Dict],
+        fields: Iterable[str] = TEXT_FIELDS,
+        dtype: str = CHUNK_STORE_DTYPE
+    ) -> "ChunkStore":
+        """
+        Build an in-memory store from chunk dictionaries.
+
+        Embedding columns ('embedding', 'contextual_embedding') are kept
+        when every chunk has them; document metadata defaults to the
+        default document with no source, page or tags.
+        """
+        chunks = list(chunks)
+        fields = tuple(fields)
+        encoded = [
+            (chunk.get(field) or "").encode("utf-8")
+            for chunk in chunks
+            for field in fields
+        ]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        buffer = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        chunk_ids = np.array([chunk["chunk_id"] for chunk in chunks])
+        embeddings = {
+            name: np.stack([np.asarray(chunk[name]) for chunk in chunks])
+            for name in EMBEDDING_NAMES
+            if chunks and all(chunk.get(name) is not None for chunk in chunks)
+        }
+        return cls(chunk_ids, offsets, buffer, fields, embeddings, dtype, metadata_columns(chunks))
+
+    def _index_sorted_keys(self) -> None:
+        self._sorted_docs = self.metadata_columns["doc_ids"][self._order]
+        self._sorted_ids = self.chunk_ids[self._order]
+
+    def set_embeddings(self, name: str, matrix: np.ndarray) -> None:
+        """
+        Store (or replace) the embedding matrix `name`, one row per chunk,
+        converted to the store's dtype.
+        """
+        matrix = np.asarray(matrix, dtype=self.dtype)
+        if matrix.ndim != 2 or len(matrix) != len(self):
+            raise ValueError(f"Expected a ({len(self)}, dimension) matrix for '{name}', got shape {matrix.shape}")
+        self.embeddings[name] = matrix
+
+    def save(self, path: str) -> None:
+        """
+        Write the store to `path` so it can be memory-mapped with `open`.
+        """
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "chunk_ids.npy"), self.chunk_ids)
+        np.save(os.path.join(path, "order.npy"), self._order)
+        np.save(os.path.join(path, "offsets.npy"), self.offsets)
+        with open(os.path.join(path, "text.bin"), "wb") as f:
+            f.write(self.buffer.tobytes())
+        for name, matrix in self.embeddings.items():
+            np.save(os.path.join(path, f"{name}.npy"), matrix)
+        for name, column in self.metadata_columns.items():
+            np.save(os.path.join(path, f"{name}.npy"), column)
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({
+                "fields": list(self.fields),
+                "embeddings": list(self.embeddings),
+                "dtype": self.dtype.name,
+                "count": len(self)
+            }, f)
+
+    @classmethod
+    def open(cls, path: str) -> "ChunkStore":
+        """
+        Memory-map a store previously written with `save`.
+        """
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        text_path = os.path.join(path, "text.bin")
+        if os.path.getsize(text_path) == 0:
+            buffer = np.zeros(0, dtype=np.uint8)  # mmap cannot map an empty file
+        else:
+            buffer = np.memmap(text_path, dtype=np.uint8, mode="r")
+        store = cls.__new__(cls)
+        store.chunk_ids = np.load(os.path.join(path, "chunk_ids.npy"), mmap_mode="r")
+        store.offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+        store.buffer = buffer
+        store.fields = tuple(meta["fields"])
+        store.dtype = np.dtype(meta.get("dtype", "float32"))
+        store.embeddings = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+            for name in meta.get("embeddings", [])
+        }
+        if os.path.exists(os.path.join(path, "doc_ids.npy")):
+            store.metadata_columns = {
+                name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in METADATA_COLUMNS
+            }
+        else:  # Saved before document metadata: every chunk is in the default document
+            store.metadata_columns = metadata_columns({"chunk_id": i} for i in store.chunk_ids)
+        store._order = np.load(os.path.join(path, "order.npy"), mmap_mode="r")
+        store._index_sorted_keys()
+        return store
+
+    def __len__(self) -> int:
+        return len(self.chunk_ids)
+
+    def __getitem__(self, row: int) -> ChunkView:
+        n = len(self)
+        if not -n <= row < n:
+            raise IndexError(f"Row {row} out of range for {n} chunks")
+        return ChunkView(self, row % n)
+
+    def __iter__(self) -> Iterator[ChunkView]:
+        return (ChunkView(self, row) for row in range(len(self)))
+
+    @property
+    def columns(self) -> tuple:
+        """Keys of every chunk view: chunk_id, the metadata, the text fields, then the embeddings."""
+        return ("chunk_id", "doc_id", "source", "page", "tags") + self.fields + tuple(self.embeddings)
+
+    def _row(self, key) -> Optional[int]:
+        doc_id, chunk_id = split_key(key)
+        # Rows are sorted by doc_id, then chunk_id: find the document's range, then the chunk in it
+        low = int(np.searchsorted(self._sorted_docs, doc_id, side="left"))
+        high = int(np.searchsorted(self._sorted_docs, doc_id, side="right"))
+        pos = low + int(np.searchsorted(self._sorted_ids[low:high], chunk_id))
+        if pos < high and self._sorted_ids[pos] == chunk_id:
+            return int(self._order[pos])
+        return None
+
+    def get(self, key) -> Optional[ChunkView]:
+        """
+        View of the chunk with `key` ((doc_id, chunk_id), or a chunk_id of
+        the default document), or None if it is not stored.
+        """
+        row = self._row(key)
+        return None if row is None else ChunkView(self, row)
+
+    def text(self, row: int, field: str) -> str:
+        """
+        Decode one text field of the chunk stored at `row`.
+        """
+        segment = row * len(self.fields) + self.fields.index(field)
+        start, end = self.offsets[segment], self.offsets[segment + 1]
+        return bytes(self.buffer[start:end]).decode("utf-8")
+
+    def texts(self, field: str) -> List[str]:
+        """
+        One text field of every chunk, in row order.
+        """
+        column = self.fields.index(field)
+        stride = len(self.fields)
+        buffer = self.buffer
+        offsets = self.offsets
+        return [
+            bytes(buffer[offsets[row * stride + column]:offsets[row * stride + column + 1]]).decode("utf-8")
+            for row in range(len(self))
+        ]
+
+    def value(self, row: int, key: str):
+        """
+        One column of the chunk at `row`: the chunk_id, a decoded text field,
+        or a row of an embedding matrix (a view, not a copy).
+        """
+        if key == "chunk_id":
+            return self.chunk_ids[row].item()
+        if key == "doc_id":
+            return str(self.metadata_columns["doc_ids"][row])
+        if key == "source":
+            return str(self.metadata_columns["sources"][row])
+        if key == "page":
+            page = int(self.metadata_columns["pages"][row])
+            return None if page == NO_PAGE else page
+        if key == "tags":
+            offsets = self.metadata_columns["tag_offsets"]
+            return [str(tag) for tag in self.metadata_columns["tag_values"][offsets[row]:offsets[row + 1]]]
+        if key in self.fields:
+            return self.text(row, key)
+        matrix = self.embeddings.get(key)
+        if matrix is None:
+            raise KeyError(key)
+        return matrix[row]
+
+    @metrics.timed("chunk_store.hydrate")
+    def hydrate(self, chunk_ids: Iterable, fields: Iterable[str] = TEXT_FIELDS) -> Dict:
+        """
+        Fetch text fields for many chunks.
+
+        Args:
+            chunk_ids: Chunk keys (doc_id, chunk_id), or chunk_ids of the default document
+            fields: Text fields to return
+
+        Returns:
+            Dict mapping each requested key to {'doc_id', 'chunk_id', *fields};
+            unknown keys are skipped
+        """
+        fields = list(fields)
+        hydrated = {}
+        for key in chunk_ids:
+            row = self._row(key)
+            if row is not None:
+                doc_id, chunk_id = split_key(key)
+                hydrated[key] = {
+                    "doc_id": doc_id,
+                    "chunk_id": chunk_id,
+                    **{field: self.text(row, field) for field in fields}
+                }
+        return hydrated
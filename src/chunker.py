@@ -1,5 +1,6 @@
 import tiktoken 
 from config import chunk_size, chunk_overlap
+from src import metrics
 
 def count_tokens(text: str, model_name: str = "gpt-3.5-turbo") -> int:
     """Count the number of tokens in a given text using tiktoken."""
@@ -8,6 +9,7 @@ def count_tokens(text: str, model_name: str = "gpt-3.5-turbo") -> int:
     return len(tokens)
 
 
+@metrics.timed("chunker.chunk_text")
 def chunk_text(text: str, chunk_size_tokens: int = chunk_size, chunk_overlap: int = chunk_overlap, model_name: str = "gpt-3.5-turbo") -> list[dict]:
     """Chunk the input text into smaller pieces based on token count."""
     encoding = tiktoken.encoding_for_model(model_name)
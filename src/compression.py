@@ -0,0 +1,249 @@
+"""
+Embedding compression between the Embedder and the vector store.
+
+Every chunk stores two EMBEDDING_MODEL_DIMENSION float32 vectors, which is
+what memory and network cost scale with. A CompressedEmbedder wraps the
+embedder and maps every vector, chunks and queries alike, through one
+EmbeddingProjection to EMBEDDING_COMPRESSED_DIMENSION dimensions:
+
+    pca         principal directions fitted on the corpus (both embedding
+                types) at the first `embed_chunks`; keeps the directions
+                holding most of the corpus' embedding energy
+    matryoshka  the first dimensions of each vector; only sensible for
+                models trained with Matryoshka representation learning
+
+Projected vectors are re-normalized, so cosine search works unchanged.
+The projection is stored in the collection metadata next to the corpus
+fingerprint (`to_metadata`), so a restarted process, the query server and
+bundle replicas project queries exactly like the stored chunks were
+projected. float16 storage (LOCAL_VECTOR_DTYPE, CHUNK_STORE_DTYPE, bundle
+export) halves the size again; `benchmarks/bench_compression.py` reports
+recall against size for each combination.
+
+    embedder = CompressedEmbedder(Embedder(), method="pca", dimension=128)
+    embedder.embed_chunks(chunk_store)                  # fits, then projects
+    storage.set_metadata(embedder.projection.to_metadata())
+"""
+import base64
+from typing import Dict, Optional
+import numpy as np
+from src import metrics
+from src.chunk_store import ChunkStore, EMBEDDING_NAMES
+from config import EMBEDDING_COMPRESSION, EMBEDDING_COMPRESSED_DIMENSION
+
+COMPRESSION_METHODS = ("none", "pca", "matryoshka")
+# Key of the projection in collection metadata (see `VectorStore.metadata`)
+METADATA_KEY = "projection"
+
+
+def _encode(array: np.ndarray) -> str:
+    return base64.b64encode(np.ascontiguousarray(array, dtype=np.float32).tobytes()).decode("ascii")
+
+
+def _decode(text: str, shape) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(text), dtype=np.float32).reshape(shape)
+
+
+def _unit_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms > 0, norms, 1.0)
+
+
+class EmbeddingProjection:
+    """
+    Linear map from model embeddings to `dimension` dimensions.
+
+    Args:
+        method: "pca" or "matryoshka"
+        dimension: Output dimension
+        source_dimension: Dimension of the model embeddings
+        components: (source_dimension, dimension) projection matrix (pca)
+        retained_energy: Share of the corpus embeddings' squared norm kept (pca)
+    """
+
+    def __init__(
+        self,
+        method: str,
+        dimension: int,
+        source_dimension: int,
+        components: Optional[np.ndarray] = None,
+        retained_energy: Optional[float] = None
+    ) -> None:
+        if method not in COMPRESSION_METHODS[1:]:
+            raise ValueError(f"Unknown compression method '{method}', expected one of {COMPRESSION_METHODS[1:]}")
+        if not 0 < dimension <= source_dimension:
+            raise ValueError(f"Cannot project {source_dimension} dimensions to {dimension}")
+        if method == "pca" and components is None:
+            raise ValueError("A pca projection needs its components")
+        self.method = method
+        self.dimension = dimension
+        self.source_dimension = source_dimension
+        self.components = components
+        self.retained_energy = retained_energy
+
+    @classmethod
+    @metrics.timed("compression.fit")
+    def fit(cls, matrix: np.ndarray, dimension: int, method: str = "pca") -> "EmbeddingProjection":
+        """
+        Fit a projection on the rows of `matrix` (model embeddings).
+
+        PCA takes the top eigenvectors of the (uncentered) second-moment
+        matrix, a (source_dimension x source_dimension) problem whatever the
+        corpus size. Not centering keeps inner products, hence cosine
+        rankings, as close as possible to the full embeddings'.
+        """
+        matrix = np.asarray(matrix, dtype=np.float64)
+        source_dimension = matrix.shape[1]
+        if method != "pca":
+            return cls(method, dimension, source_dimension)
+        if len(matrix) == 0:
+            raise ValueError("Fitting a pca projection needs embeddings")
+        eigenvalues, eigenvectors = np.linalg.eigh(matrix.T @ matrix)
+        order = np.argsort(eigenvalues)[::-1][:dimension]
+        total = eigenvalues.sum()
+        return cls(
+            method,
+            dimension,
+            source_dimension,
+            components=eigenvectors[:, order].astype(np.float32),
+            retained_energy=float(eigenvalues[order].sum() / total) if total > 0 else 1.0
+        )
+
+    def transform(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        Project one vector or a matrix of row vectors; the results are
+        float32 and unit length.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.shape[-1] != self.source_dimension:
+            raise ValueError(f"Expected {self.source_dimension}-dimension embeddings, got {vectors.shape[-1]}")
+        if self.method == "matryoshka":
+            projected = vectors[..., :self.dimension]
+        else:
+            projected = vectors @ self.components
+        return _unit_rows(projected)
+
+    def to_metadata(self) -> Dict:
+        """JSON-compatible form, for `VectorStore.set_metadata`."""
+        stored = {"method": self.method, "dimension": self.dimension, "source_dimension": self.source_dimension}
+        if self.method == "pca":
+            stored.update(components=_encode(self.components), retained_energy=self.retained_energy)
+        return {METADATA_KEY: stored}
+
+    @classmethod
+    def from_metadata(cls, metadata: Dict) -> Optional["EmbeddingProjection"]:
+        """Projection stored with `to_metadata`, or None if the metadata has none."""
+        stored = metadata.get(METADATA_KEY)
+        if not stored:
+            return None
+        components = None
+        if stored["method"] == "pca":
+            components = _decode(stored["components"], (stored["source_dimension"], stored["dimension"]))
+        return cls(
+            stored["method"],
+            stored["dimension"],
+            stored["source_dimension"],
+            components=components,
+            retained_energy=stored.get("retained_energy")
+        )
+
+    def __repr__(self) -> str:
+        return f"EmbeddingProjection({self.method}, {self.source_dimension} -> {self.dimension})"
+
+
+class CompressedEmbedder:
+    """
+    Embedder wrapper that projects every embedding it returns.
+
+    The projection is fitted on the first corpus passed to `embed_chunks`
+    unless one is given; later corpora (re-ingestion) reuse it, so queries
+    against every published version go through the same projection.
+
+    Args:
+        embedder: Embedder (or stand-in) producing model embeddings
+        method: "pca" or "matryoshka"
+        dimension: Output dimension; checked against the wrapped embedder's
+            `dimension` up front when it has one, else when the projection is fitted
+        projection: Already fitted projection (e.g. from collection metadata)
+    """
+
+    def __init__(
+        self,
+        embedder,
+        method: str = EMBEDDING_COMPRESSION,
+        dimension: int = EMBEDDING_COMPRESSED_DIMENSION,
+        projection: Optional[EmbeddingProjection] = None
+    ) -> None:
+        if projection is None and method not in COMPRESSION_METHODS[1:]:
+            raise ValueError(f"Unknown compression method '{method}', expected one of {COMPRESSION_METHODS[1:]}")
+        source_dimension = getattr(embedder, "dimension", None)
+        if projection is None and source_dimension is not None and not 0 < dimension <= source_dimension:
+            raise ValueError(f"Cannot project {source_dimension} dimensions to {dimension}")
+        if projection is None and dimension <= 0:
+            raise ValueError(f"Cannot project to {dimension} dimensions")
+        self.embedder = embedder
+        self.method = projection.method if projection is not None else method
+        self.dimension = projection.dimension if projection is not None else dimension
+        self.projection = projection
+
+    @property
+    def loaded(self) -> bool:
+        return getattr(self.embedder, "loaded", True)
+
+    def warm_up(self, background: bool = False):
+        return self.embedder.warm_up(background=background)
+
+    def _require_projection(self) -> EmbeddingProjection:
+        if self.projection is None:
+            raise RuntimeError("No projection yet: embed a corpus with embed_chunks first, or pass one")
+        return self.projection
+
+    def embed_text(self, text: str) -> np.ndarray:
+        return self._require_projection().transform(self.embedder.embed_text(text))
+
+    def embed_query(self, query: str) -> np.ndarray:
+        return self._require_projection().transform(self.embedder.embed_query(query))
+
+    def embed_queries(self, queries: list) -> np.ndarray:
+        return self._require_projection().transform(self.embedder.embed_queries(queries))
+
+    @metrics.timed("compression.embed_chunks")
+    def embed_chunks(self, chunks):
+        """
+        Embed `chunks` with the wrapped embedder, fit the projection on both
+        embedding types if there is none yet, and replace the embeddings
+        with their projections.
+        """
+        chunks = self.embedder.embed_chunks(chunks)
+        if len(chunks) == 0:
+            return chunks
+        if isinstance(chunks, ChunkStore):
+            matrices = {name: chunks.embeddings[name] for name in EMBEDDING_NAMES}
+        else:
+            matrices = {name: np.stack([np.asarray(chunk[name]) for chunk in chunks]) for name in EMBEDDING_NAMES}
+        if self.projection is None:
+            self.projection = EmbeddingProjection.fit(
+                np.concatenate(list(matrices.values())), self.dimension, self.method
+            )
+        for name, matrix in matrices.items():
+            projected = self.projection.transform(matrix)
+            if isinstance(chunks, ChunkStore):
+                chunks.set_embeddings(name, projected)
+            else:
+                for chunk, row in zip(chunks, projected):
+                    chunk[name] = row
+        return chunks
+
+
+def with_stored_projection(embedder, metadata: Dict):
+    """
+    `embedder` projecting queries like the collection with `metadata` was
+    projected: wrapped in a CompressedEmbedder if a projection is stored,
+    as is otherwise.
+    """
+    projection = EmbeddingProjection.from_metadata(metadata)
+    if projection is None:
+        return embedder
+    if isinstance(embedder, CompressedEmbedder):
+        embedder = embedder.embedder
+    return CompressedEmbedder(embedder, projection=projection)
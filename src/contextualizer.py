@@ -1,7 +1,28 @@
-import anthropic
-from config import API_KEY, CLAUDE_MODEL, CONTEXT_PROMPT
-from anthropic.types import Message, TextBlock
+import threading
+from src import metrics
+from src.lazy import lazy_import
+from config import get_api_key, CLAUDE_MODEL, CONTEXT_PROMPT
 
+# Loaded on the first Claude call; mock-context and query-only runs never import it
+anthropic = lazy_import("anthropic")
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Shared Anthropic client, created on first use (this is where the API key is checked).
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = anthropic.Anthropic(api_key=get_api_key())
+    return _client
+
+
+@metrics.timed("contextualizer.generate_context")
 def generate_context_for_chunk(chunk_text: str, document_text:str) -> str:
     """
     Use Claude API to generate contextual description for a chunk.
@@ -14,9 +35,8 @@ def generate_context_for_chunk(chunk_text: str, document_text:str) -> str:
         str: The contextual description
     """
 
+    client = get_client()
 
-    client = anthropic.Anthropic(api_key=API_KEY)
-    
     prompt = CONTEXT_PROMPT.format(
         doc_content=document_text,
         chunk_content=chunk_text
@@ -31,7 +51,12 @@ def generate_context_for_chunk(chunk_text: str, document_text:str) -> str:
         ]
     )
 
-    context = response.content[0].text if isinstance(response.content[0], TextBlock) else str(response.content[0])
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        metrics.count("contextualizer.tokens", usage.input_tokens, kind="input")
+        metrics.count("contextualizer.tokens", usage.output_tokens, kind="output")
+
+    context = response.content[0].text if isinstance(response.content[0], anthropic.types.TextBlock) else str(response.content[0])
     return context
 
 
@@ -0,0 +1,216 @@
+"""
+Near-duplicate chunk detection at ingestion (MinHash + LSH).
+
+Corporate documents repeat headers, disclaimers and whole sections. Every
+copy would cost a Claude call, two embeddings, a vector store point and
+BM25 postings, so right after chunking each chunk is compared with the
+earlier ones: chunks whose word shingles are estimated to overlap by at
+least `threshold` (Jaccard similarity) become references of the first such
+chunk, the canonical one. Only canonical chunks are contextualized,
+embedded and indexed; a DuplicateMap keeps, per canonical chunk, the
+(doc_id, chunk_id, source, page) of every copy so results can still cite
+all of them.
+
+    deduplication = MinHashDeduplicator().deduplicate(chunks)
+    chunks = deduplication.chunks            # canonical chunks only
+    deduplication.duplicates.get(key)        # copies of a canonical chunk
+    deduplication.stats                      # work avoided
+"""
+import re
+import zlib
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+import numpy as np
+from src import metrics
+from src.metadata import chunk_key, chunk_metadata
+from config import DEDUP_THRESHOLD, DEDUP_NUM_PERM, DEDUP_BANDS, DEDUP_SHINGLE_SIZE
+
+# Hash permutations h(x) = (a * x + b) mod p over 31-bit shingle hashes; the
+# product stays below 2**62, so uint64 arithmetic does not overflow
+_PRIME = (1 << 31) - 1
+_WORD = re.compile(r"\w+")
+# Key of the duplicate references in collection metadata (see `VectorStore.metadata`)
+METADATA_KEY = "duplicates"
+
+
+def shingles(text: str, size: int = DEDUP_SHINGLE_SIZE) -> List[str]:
+    """
+    Overlapping runs of `size` words (lowercased); a shorter text is one shingle.
+    """
+    words = _WORD.findall(text.lower())
+    if len(words) <= size:
+        return [" ".join(words)] if words else []
+    return [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+
+
+class DuplicateMap:
+    """
+    Canonical chunk key -> references to its near-duplicate copies.
+
+    A reference holds the copy's doc_id, chunk_id, source and page. The map
+    is stored in the collection metadata after ingestion (`to_metadata`), so
+    a restarted process or the query server can cite every copy again.
+    """
+
+    def __init__(self, references: Optional[Dict[Tuple, List[Dict]]] = None) -> None:
+        self.references: Dict[Tuple, List[Dict]] = references or {}
+
+    def add(self, canonical_key: Tuple, reference: Dict) -> None:
+        self.references.setdefault(canonical_key, []).append(reference)
+
+    def get(self, key: Tuple) -> List[Dict]:
+        """References of the copies of the chunk with `key` (empty if it has none)."""
+        return self.references.get(key, [])
+
+    def __len__(self) -> int:
+        """Number of duplicate chunks (not canonical chunks)."""
+        return sum(len(references) for references in self.references.values())
+
+    def to_metadata(self) -> Dict:
+        """JSON-compatible form, for `VectorStore.set_metadata`."""
+        return {METADATA_KEY: [[doc_id, chunk_id, refs] for (doc_id, chunk_id), refs in self.references.items()]}
+
+    @classmethod
+    def from_metadata(cls, metadata: Dict) -> "DuplicateMap":
+        """Map stored with `to_metadata` (empty if the metadata has none)."""
+        return cls({
+            (doc_id, chunk_id): refs for doc_id, chunk_id, refs in metadata.get(METADATA_KEY) or []
+        })
+
+
+class Deduplication(NamedTuple):
+    """
+    Result of `MinHashDeduplicator.deduplicate`.
+
+    Attributes:
+        chunks: Canonical chunks, in input order
+        duplicates: References of the dropped copies, by canonical key
+        stats: Counts of the work avoided (see `deduplicate`)
+    """
+    chunks: List[Dict]
+    duplicates: DuplicateMap
+    stats: Dict[str, int]
+
+
+class MinHashDeduplicator:
+    """
+    MinHash signatures of word shingles, bucketed with LSH banding.
+
+    A signature is the minimum of `num_perm` hash permutations over a
+    chunk's shingles; the fraction of equal positions between two signatures
+    estimates their Jaccard similarity. The signature is cut into `bands`
+    bands: chunks sharing any band land in the same bucket and become
+    candidates, and only candidates are compared, so finding duplicates
+    costs about one signature per chunk instead of all pairs.
+
+    Args:
+        threshold: Minimum estimated Jaccard similarity of a near-duplicate
+        num_perm: Signature length (must be a multiple of `bands`)
+        bands: LSH bands; more bands find less similar candidates
+        shingle_size: Words per shingle
+        seed: Seed of the hash permutations
+    """
+
+    def __init__(
+        self,
+        threshold: float = DEDUP_THRESHOLD,
+        num_perm: int = DEDUP_NUM_PERM,
+        bands: int = DEDUP_BANDS,
+        shingle_size: int = DEDUP_SHINGLE_SIZE,
+        seed: int = 0
+    ) -> None:
+        if not 0 < threshold <= 1:
+            raise ValueError(f"threshold must be in (0, 1], got {threshold}")
+        if bands <= 0 or num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, size=num_perm, dtype=np.uint64)
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """
+        MinHash signature (uint64[num_perm]) of a text, or None if it has no words.
+        """
+        hashes = np.array(
+            [zlib.crc32(shingle.encode("utf-8")) & _PRIME for shingle in set(shingles(text, self.shingle_size))],
+            dtype=np.uint64
+        )
+        if len(hashes) == 0:
+            return None
+        return ((self._a[:, None] * hashes[None, :] + self._b[:, None]) % _PRIME).min(axis=1)
+
+    def find_duplicates(self, texts: Iterable[str]) -> List[int]:
+        """
+        Index of the canonical text of every text: itself, or the first
+        earlier text it near-duplicates. Texts without words are always
+        canonical.
+        """
+        buckets: Dict[Tuple[int, bytes], List[int]] = {}
+        signatures: List[Optional[np.ndarray]] = []
+        canonical: List[int] = []
+        for i, text in enumerate(texts):
+            signature = self.signature(text)
+            signatures.append(signature)
+            canonical.append(i)
+            if signature is None:
+                continue
+            bands = [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+            seen = set()
+            for band in bands:
+                for candidate in buckets.get(band, ()):
+                    if candidate in seen:
+                        continue
+                    seen.add(candidate)
+                    if np.mean(signatures[candidate] == signature) >= self.threshold:
+                        canonical[i] = candidate
+                        break
+                if canonical[i] != i:
+                    break
+            if canonical[i] == i:  # Only canonical texts are indexed, so copies never chain
+                for band in bands:
+                    buckets.setdefault(band, []).append(i)
+        return canonical
+
+    @metrics.timed("dedup.deduplicate")
+    def deduplicate(self, chunks: List[Dict]) -> Deduplication:
+        """
+        Drop near-duplicate chunks, keeping references to them.
+
+        Chunks are compared on 'chunk_text', so this runs before
+        contextualization. Set the document metadata (`annotate_chunks`)
+        first: references record each copy's doc_id, chunk_id, source and page.
+
+        Returns:
+            Deduplication with the canonical chunks, the DuplicateMap and
+            stats: 'chunks' (input), 'canonical', 'duplicates' and
+            'duplicate_words' (words that are not contextualized, embedded
+            or indexed)
+        """
+        canonical = self.find_duplicates(chunk["chunk_text"] for chunk in chunks)
+        duplicates = DuplicateMap()
+        kept = []
+        duplicate_words = 0
+        for i, chunk in enumerate(chunks):
+            if canonical[i] == i:
+                kept.append(chunk)
+                continue
+            duplicate_words += len(chunk["chunk_text"].split())
+            doc_id, chunk_id = chunk_key(chunk)
+            metadata = chunk_metadata(chunk)
+            duplicates.add(chunk_key(chunks[canonical[i]]), {
+                "doc_id": doc_id,
+                "chunk_id": chunk_id,
+                "source": metadata["source"],
+                "page": metadata["page"]
+            })
+        metrics.count("dedup.duplicates", len(chunks) - len(kept))
+        return Deduplication(kept, duplicates, {
+            "chunks": len(chunks),
+            "canonical": len(kept),
+            "duplicates": len(chunks) - len(kept),
+            "duplicate_words": duplicate_words
+        })
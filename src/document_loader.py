@@ -1,16 +1,32 @@
-
+from typing import List, Tuple
 import PyPDF2
+from src import metrics
 
 
 def load_pdf(file_path: str) -> str:
     """Load and extract text from a PDF file."""
-    text = ""
+    return join_pages(load_pdf_pages(file_path))[0]
+
+
+def load_pdf_pages(file_path: str) -> List[str]:
+    """Extract the text of every page of a PDF file."""
     with open(file_path, "rb") as file:
         reader = PyPDF2.PdfReader(file)
-        for page in reader.pages:
-            text += page.extract_text() + "\n"
-    return text
+        return [page.extract_text() for page in reader.pages]
+
+
+def join_pages(pages: List[str]) -> Tuple[str, List[int]]:
+    """
+    Join page texts into one document (one newline after each page), like
+    `load_pdf`, and return the character offset where every page starts.
+    """
+    starts, position = [], 0
+    for page in pages:
+        starts.append(position)
+        position += len(page) + 1
+    return "".join(page + "\n" for page in pages), starts
 
+@metrics.timed("document_loader.load_document")
 def load_document(file_path: str) -> str:
     """Load and extract text from a document based on its file extension."""
     if file_path.lower().endswith(".pdf"):
@@ -18,5 +34,10 @@ def load_document(file_path: str) -> str:
     else:
         raise ValueError(f"Unsupported file format: {file_path}" )
 
-
-
+@metrics.timed("document_loader.load_document_pages")
+def load_document_pages(file_path: str) -> List[str]:
+    """Load the text of every page of a document based on its file extension."""
+    if file_path.lower().endswith(".pdf"):
+        return load_pdf_pages(file_path)
+    else:
+        raise ValueError(f"Unsupported file format: {file_path}" )
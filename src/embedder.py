@@ -1,19 +1,102 @@
-from sentence_transformers import SentenceTransformer
+import threading
+from typing import Optional, Union
 import numpy as np
-from config import EMBEDDING_MODEL_NAME, EMBEDDING_DIMENSION
+from src import metrics
+from src.lazy import lazy_import
+from src.chunk_store import ChunkStore
+from config import EMBEDDING_MODEL_NAME, EMBEDDING_MODEL_DIMENSION, EMBEDDING_DIMENSION, EMBEDDING_BATCH_SIZE, EMBEDDER_MAX_CONCURRENCY
+
+# torch comes with it; imported when the model is first needed
+sentence_transformers = lazy_import("sentence_transformers")
 
 class Embedder:
-    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME):
-        """Initialize the embedder with a pre-trained model."""
-        self.model = SentenceTransformer(model_name)
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME, model=None, max_concurrency: int = EMBEDDER_MAX_CONCURRENCY):
+        """
+        Initialize the embedder. The model is loaded on first use (or by
+        `warm_up()`), so constructing an Embedder is cheap.
+
+        One Embedder may be shared by many threads: the model is loaded once
+        and at most `max_concurrency` encode calls run at a time, the others
+        wait. Each call already spreads over torch's intra-op threads, so
+        more concurrent calls mostly oversubscribe the CPU.
+        """
+        self.model_name = model_name
+        self._model = model
+        self._lock = threading.Lock()
+        self._encode_slots = threading.BoundedSemaphore(max_concurrency)
+
+    @property
+    def model(self):
+        """The SentenceTransformer, loaded on first access."""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = sentence_transformers.SentenceTransformer(self.model_name)
+        return self._model
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    @property
+    def dimension(self) -> Optional[int]:
+        """
+        Output dimension of the model: asked from a loaded SentenceTransformer,
+        else EMBEDDING_MODEL_DIMENSION for the configured model (without
+        loading it); None for another model that is not loaded yet.
+        """
+        if self._model is not None and hasattr(self._model, "get_sentence_embedding_dimension"):
+            return self._model.get_sentence_embedding_dimension()
+        return EMBEDDING_MODEL_DIMENSION if self.model_name == EMBEDDING_MODEL_NAME else None
+
+    def warm_up(self, background: bool = False):
+        """
+        Load the model and run one encode so the first query does not pay for it.
+
+        Args:
+            background: Do it in a daemon thread and return the thread
+
+        Returns:
+            The warm-up thread if background, else None
+        """
+        if background:
+            thread = threading.Thread(target=self.warm_up, name="embedder-warm-up", daemon=True)
+            thread.start()
+            return thread
+        self._encode("warm up")
+        return None
+
+    def _encode(self, texts, **kwargs) -> np.ndarray:
+        """`model.encode`, limited to `max_concurrency` concurrent calls."""
+        model = self.model  # Loaded outside the slot, so waiting callers do not hold one
+        with self._encode_slots:
+            return model.encode(texts, **kwargs)
 
     def embed_text(self, text: str) -> np.ndarray:
         """Generate embedding for the given text."""
-        embedding = self.model.encode(text)
+        embedding = self._encode(text)
         return embedding #type: ignore
 
-    def embed_chunks(self, chunks: list[dict]) -> list[dict]:
-        """Generate embeddings for a list of text chunks."""
+    @metrics.timed("embedder.embed_chunks")
+    def embed_chunks(self, chunks: Union[list[dict], ChunkStore]) -> Union[list[dict], ChunkStore]:
+        """
+        Generate embeddings for a list of text chunks.
+
+        A ChunkStore is embedded column-wise in batched forward passes and
+        the two matrices are written into the store.
+        """
+        if isinstance(chunks, ChunkStore):
+            if len(chunks) == 0:
+                return chunks
+            original_texts = chunks.texts('chunk_text')
+            contextual_texts = [
+                f"{context}\n\n{text}" for context, text in zip(chunks.texts('context'), original_texts)
+            ]
+            chunks.set_embeddings('embedding', self._encode(original_texts, batch_size=EMBEDDING_BATCH_SIZE))
+            chunks.set_embeddings(
+                'contextual_embedding', self._encode(contextual_texts, batch_size=EMBEDDING_BATCH_SIZE)
+            )
+            return chunks
         for chunk in chunks:
             # Get original text
             original_text = chunk['chunk_text']
@@ -24,7 +107,12 @@ class Embedder:
             chunk['embedding'] = self.embed_text(original_text)
             chunk['contextual_embedding'] = self.embed_text(contextual_text)
         return chunks
+    @metrics.timed("embedder.embed_query")
     def embed_query(self, query: str) -> np.ndarray:
         """Embed a search query"""
         return self.embed_text(query)
-    
\ No newline at end of file
+
+    @metrics.timed("embedder.embed_queries")
+    def embed_queries(self, queries: list[str], batch_size: int = EMBEDDING_BATCH_SIZE) -> np.ndarray:
+        """Embed many search queries in batched forward passes (one row per query)."""
+        return self._encode(queries, batch_size=batch_size) #type: ignore
@@ -0,0 +1,254 @@
+import numpy as np
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+from src.metadata import chunk_key
+from config import RRF_K
+
+FUSION_STRATEGIES = ("minmax", "zscore", "rrf")
+_INT64_MAX = np.iinfo(np.int64).max
+
+
+class FusedCandidates(NamedTuple):
+    """
+    Top-k output of `fuse`, best first. Per-leg arrays hold the leg's
+    normalized contribution and the candidate's position in that leg's
+    input (-1 if the leg did not return it).
+    """
+    ids: np.ndarray
+    scores: np.ndarray
+    vector_scores: np.ndarray
+    bm25_scores: np.ndarray
+    vector_positions: np.ndarray
+    bm25_positions: np.ndarray
+
+
+def leg_arrays(results: List[Dict], keys: Optional[Dict] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Split search hits into (ids, scores) arrays.
+
+    Without `keys` the IDs are the hits' chunk_ids. With a `keys` dict
+    (shared by the legs being fused) every chunk key (doc_id, chunk_id) is
+    interned to an integer, so chunks of different documents with the same
+    chunk_id stay apart; `list(keys)[i]` is the chunk key of ID i.
+    """
+    if keys is None:
+        ids = np.array([r['chunk_id'] for r in results])
+    else:
+        ids = np.fromiter(
+            (keys.setdefault(chunk_key(r), len(keys)) for r in results), dtype=np.int64, count=len(results)
+        )
+    scores = np.fromiter((r['score'] for r in results), dtype=np.float64, count=len(results))
+    return ids, scores
+
+
+def minmax(scores: np.ndarray) -> np.ndarray:
+    """
+    Min-max normalization to [0, 1]; all-equal scores map to 1.0.
+    """
+    if len(scores) == 0:
+        return scores.astype(np.float64)
+    low, high = scores.min(), scores.max()
+    if high == low:
+        return np.ones(len(scores))
+    return (scores - low) / (high - low)
+
+
+def zscore(scores: np.ndarray) -> np.ndarray:
+    """
+    Standard-score normalization; all-equal scores map to 0.0.
+    """
+    if len(scores) == 0:
+        return scores.astype(np.float64)
+    std = scores.std()
+    if std == 0:
+        return np.zeros(len(scores))
+    return (scores - scores.mean()) / std
+
+
+def rrf(scores: np.ndarray, k: int = RRF_K) -> np.ndarray:
+    """
+    Reciprocal Rank Fusion term 1 / (k + rank), rank 1 being the best score.
+    Only the order of the scores matters.
+    """
+    ranks = np.arange(1, len(scores) + 1, dtype=np.float64)
+    # Search legs already return hits best first; only sort when they do not
+    if np.any(scores[1:] > scores[:-1]):
+        ranks[np.argsort(-scores, kind="stable")] = ranks.copy()
+    return 1.0 / (k + ranks)
+
+
+def _normalize(scores: np.ndarray, strategy: str, rrf_k: int) -> Tuple[np.ndarray, float]:
+    """
+    Normalized scores of one leg, plus the value used for candidates the
+    leg did not return.
+    """
+    if strategy == "minmax":
+        return minmax(scores), 0.0
+    if strategy == "zscore":
+        normalized = zscore(scores)
+        # Missing candidates ranked below the leg's cutoff: no better than its worst hit
+        return normalized, float(normalized.min()) if len(normalized) else 0.0
+    if strategy == "rrf":
+        return rrf(scores, rrf_k), 0.0
+    raise ValueError(f"Unknown fusion strategy '{strategy}', expected one of {FUSION_STRATEGIES}")
+
+
+def _group(candidates: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    First position of every distinct ID and the group of every candidate,
+    like `np.unique(..., return_index=True, return_inverse=True)`.
+
+    Integer IDs (the common case) take a faster path: a plain sort of
+    `id * n + position` keeps first occurrences first without a stable
+    argsort.
+    """
+    n = len(candidates)
+    if candidates.dtype.kind not in "iu" or int(np.abs(candidates).max()) >= _INT64_MAX // (2 * n):
+        _, first_seen, inverse = np.unique(candidates, return_index=True, return_inverse=True)
+        return first_seen, inverse.ravel()
+    keys = np.sort(candidates.astype(np.int64) * n + np.arange(n))
+    # Floor division keeps the position in [0, n) for negative IDs as well
+    ids, order = np.divmod(keys, n)
+    new = np.empty(n, dtype=bool)
+    new[0] = True
+    np.not_equal(ids[1:], ids[:-1], out=new[1:])
+    inverse = np.empty(n, dtype=np.int64)
+    inverse[order] = np.cumsum(new) - 1
+    return order[new], inverse
+
+
+def fuse(
+    vector_ids: np.ndarray,
+    vector_scores: np.ndarray,
+    bm25_ids: np.ndarray,
+    bm25_scores: np.ndarray,
+    top_k: int,
+    strategy: str = "minmax",
+    weights: Sequence[float] = (0.5, 0.5),
+    rrf_k: int = RRF_K
+) -> FusedCandidates:
+    """
+    Fuse the vector and BM25 candidate lists and keep the top_k.
+
+    Candidates are merged by ID with a single sort, each leg's scores
+    are normalized (min-max, z-score or RRF) and combined as a weighted
+    sum, and only the final top_k are selected with `argpartition`. Ties
+    keep the order in which candidates first appear (vector leg first).
+
+    Args:
+        vector_ids, vector_scores: Vector leg candidates
+        bm25_ids, bm25_scores: BM25 leg candidates
+        top_k: Number of fused candidates to return
+        strategy: "minmax", "zscore" or "rrf"
+        weights: (vector, bm25) weights of the weighted sum
+        rrf_k: Rank offset of Reciprocal Rank Fusion
+
+    Returns:
+        FusedCandidates for the top_k, best first
+    """
+    vector_norm, vector_missing = _normalize(np.asarray(vector_scores, dtype=np.float64), strategy, rrf_k)
+    bm25_norm, bm25_missing = _normalize(np.asarray(bm25_scores, dtype=np.float64), strategy, rrf_k)
+
+    n_vector = len(vector_ids)
+    parts = [ids for ids in (vector_ids, bm25_ids) if len(ids)]
+    if not parts or top_k <= 0:
+        empty = np.zeros(0)
+        positions = np.zeros(0, dtype=np.int64)
+        return FusedCandidates(np.array([]), empty, empty, empty, positions, positions)
+    candidates = np.concatenate(parts)
+    first_seen, inverse = _group(candidates)
+    n = len(first_seen)
+
+    vector_positions = np.full(n, -1, dtype=np.int64)
+    vector_positions[inverse[:n_vector]] = np.arange(n_vector)
+    bm25_positions = np.full(n, -1, dtype=np.int64)
+    bm25_positions[inverse[n_vector:]] = np.arange(len(bm25_ids))
+
+    vector_part = np.full(n, vector_missing)
+    vector_part[inverse[:n_vector]] = vector_norm
+    bm25_part = np.full(n, bm25_missing)
+    bm25_part[inverse[n_vector:]] = bm25_norm
+    combined = weights[0] * vector_part + weights[1] * bm25_part
+
+    k = min(top_k, n)
+    top = np.argpartition(-combined, k - 1)[:k]
+    top = top[np.lexsort((first_seen[top], -combined[top]))]
+
+    return FusedCandidates(
+        candidates[first_seen[top]],
+        combined[top],
+        vector_part[top],
+        bm25_part[top],
+        vector_positions[top],
+        bm25_positions[top]
+    )
+
+
+def rrf_top_k_is_final(
+    vector_ids: np.ndarray,
+    vector_scores: np.ndarray,
+    bm25_ids: np.ndarray,
+    bm25_scores: np.ndarray,
+    top_k: int,
+    depth: int,
+    weights: Sequence[float] = (0.5, 0.5),
+    rrf_k: int = RRF_K
+) -> Tuple[bool, float]:
+    """
+    Whether deeper candidate lists could still change the RRF top_k.
+
+    RRF scores depend only on ranks, and a candidate that a leg did not
+    return ranks below `depth` in that leg, so it can gain at most
+    1 / (rrf_k + depth + 1) from it. That bounds every candidate's final
+    score from below (missing legs count 0) and above (missing legs at the
+    cutoff). The top_k is final once each member's lower bound is at least
+    the upper bound of everything ranked after it, unseen candidates
+    included. A leg that returned fewer than `depth` hits is exhausted.
+
+    Args:
+        vector_ids, vector_scores: Vector leg candidates (up to `depth`)
+        bm25_ids, bm25_scores: BM25 leg candidates (up to `depth`)
+        top_k: Number of fused results wanted
+        depth: Candidates requested from each leg
+        weights: (vector, bm25) weights
+        rrf_k: Rank offset of Reciprocal Rank Fusion
+
+    Returns:
+        (final, overlap): overlap is the fraction of the current top_k
+        that both legs returned
+    """
+    n_vector = len(vector_ids)
+    vector_cut = 0.0 if n_vector < depth else 1.0 / (rrf_k + depth + 1)
+    bm25_cut = 0.0 if len(bm25_ids) < depth else 1.0 / (rrf_k + depth + 1)
+    unseen = weights[0] * vector_cut + weights[1] * bm25_cut
+
+    parts = [ids for ids in (vector_ids, bm25_ids) if len(ids)]
+    if not parts:
+        return unseen == 0.0, 0.0
+    first_seen, inverse = _group(np.concatenate(parts))
+    n = len(first_seen)
+    vector_rrf = rrf(np.asarray(vector_scores, dtype=np.float64), rrf_k)
+    bm25_rrf = rrf(np.asarray(bm25_scores, dtype=np.float64), rrf_k)
+
+    vector_low = np.zeros(n)
+    vector_low[inverse[:n_vector]] = vector_rrf
+    vector_high = np.full(n, vector_cut)
+    vector_high[inverse[:n_vector]] = vector_rrf
+    bm25_low = np.zeros(n)
+    bm25_low[inverse[n_vector:]] = bm25_rrf
+    bm25_high = np.full(n, bm25_cut)
+    bm25_high[inverse[n_vector:]] = bm25_rrf
+    lower = weights[0] * vector_low + weights[1] * bm25_low
+    upper = weights[0] * vector_high + weights[1] * bm25_high
+
+    # Same order as `fuse`: by lower bound (the current score), ties by first appearance
+    order = np.lexsort((first_seen, -lower))
+    k = min(top_k, n)
+    both = (vector_low[order[:k]] > 0) & (bm25_low[order[:k]] > 0)
+    overlap = float(both.mean())
+    if n < top_k:
+        return unseen == 0.0, overlap
+
+    # Best score anything ranked after position i could still reach
+    after = np.append(upper[order][1:], unseen)
+    best_after = np.maximum.accumulate(after[::-1])[::-1]
+    return bool(np.all(lower[order][:k] >= best_after[:k])), overlap
@@ -0,0 +1,40 @@
+import importlib
+import threading
+from types import ModuleType
+from typing import Optional
+
+
+class LazyModule:
+    """
+    Module proxy that imports the real module on first attribute access.
+
+    Keeps heavy dependencies (torch via sentence_transformers, qdrant_client,
+    anthropic) off the import path of code that never uses them, e.g.
+    query-only use with the local vector store or mock contexts.
+    """
+
+    def __init__(self, name: str) -> None:
+        self._name = name
+        self._module: Optional[ModuleType] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> ModuleType:
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    """
+    `module = lazy_import("package.module")` instead of `import package.module`.
+    """
+    return LazyModule(name)
@@ -0,0 +1,477 @@
+import json
+import os
+import shutil
+import numpy as np
+from typing import List, Dict, Optional, Iterable, Iterator, Union
+from config import (
+    COLLECTION_NAME,
+    EMBEDDING_DIMENSION,
+    TOP_K_RETRIEVAL,
+    LOCAL_VECTOR_STORE_PATH,
+    LOCAL_VECTOR_DTYPE
+)
+from src import metrics
+from src.vector_store import VectorStore, PayloadSelector, TEXT_FIELDS, SCROLL_BATCH_SIZE, KEY_FIELDS
+from src.chunk_store import ChunkStore
+from src.metadata import FilterIndex, chunk_key, chunk_metadata, split_key
+
+VECTOR_NAMES = ("embedding", "contextual_embedding")
+SUPPORTED_DTYPES = ("float32", "float16")
+# float16 rows are upcast in blocks, NumPy has no BLAS kernel for half precision
+_FLOAT16_BLOCK_ROWS = 65536
+
+
+class LocalVectorStore(VectorStore):
+    """
+    In-process vector store backed by one NumPy matrix per named vector.
+
+    Vectors are L2-normalized on insert, so cosine similarity is a single
+    matrix-vector product followed by `argpartition` for the top-k - the
+    same exact scores Qdrant returns for a COSINE collection. With a `path`
+    the matrices are memory-mapped files and survive restarts; with
+    `path=None` everything stays in RAM.
+
+    Layout of `<path>/<collection_name>/`:
+        meta.json                 size, capacity, dimension, dtype and collection metadata
+        <vector_name>.bin         row-major matrix, `capacity` rows
+        payloads.jsonl            append log of [row, payload] entries
+
+    Like Qdrant with its deterministic point IDs, adding a chunk key
+    (doc_id, chunk_id) that is already stored overwrites that chunk instead
+    of duplicating it.
+
+    An alias is a `<path>/<alias>.alias` file holding a collection name;
+    opening the alias as `collection_name` opens that collection.
+
+    Filtered searches resolve the filter to a row set with a FilterIndex
+    (built on first use after a change) and score only those rows, so a
+    query scoped to a small part of the collection costs about as much as
+    a collection holding only that part.
+    """
+
+    def __init__(
+        self,
+        collection_name: str = COLLECTION_NAME,
+        path: Optional[str] = LOCAL_VECTOR_STORE_PATH,
+        dtype: str = LOCAL_VECTOR_DTYPE,
+        dimension: int = EMBEDDING_DIMENSION
+    ) -> None:
+        """
+        Args:
+            collection_name: Name of the collection (a subdirectory of `path`), or an alias of one
+            path: Directory for the memory-mapped files, or None to keep everything in RAM
+            dtype: Storage precision, "float32" or "float16"
+            dimension: Vector dimension
+        """
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"Unsupported dtype '{dtype}', expected one of {SUPPORTED_DTYPES}")
+        self.path = path
+        self.collection_name = self._resolve_alias(collection_name)
+        self.dtype = np.dtype(dtype)
+        self.dimension = dimension
+        self.directory = os.path.join(path, self.collection_name) if path else None
+
+        self._size = 0
+        self._capacity = 0
+        self._vectors: Dict[str, np.ndarray] = {}
+        self._payloads: List[Dict] = []
+        self._rows: Dict = {}  # chunk key -> row of its latest version
+        self._metadata: Dict = {}
+        self._filter_index: Optional[FilterIndex] = None
+        self._open()
+
+    # ------------------------------------------------------------------
+    # Storage management
+    # ------------------------------------------------------------------
+
+    def _resolve_alias(self, name: str) -> str:
+        """
+        Collection `name` points to if it is an alias, else `name` itself.
+        """
+        if self.path and os.path.exists(os.path.join(self.path, f"{name}.alias")):
+            with open(os.path.join(self.path, f"{name}.alias")) as f:
+                return f.read().strip()
+        return name
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _open(self) -> None:
+        """
+        Attach to an existing collection on disk, or start an empty one.
+        """
+        self._filter_index = None
+        if self.directory is None or not os.path.exists(self._file("meta.json")):
+            self._size = 0
+            self._capacity = 0
+            self._vectors = {
+                name: np.zeros((0, self.dimension), dtype=self.dtype) for name in VECTOR_NAMES
+            }
+            self._payloads = []
+            self._rows = {}
+            self._metadata = {}
+            return
+
+        with open(self._file("meta.json")) as f:
+            meta = json.load(f)
+        if meta["dimension"] != self.dimension or meta["dtype"] != self.dtype.name:
+            raise ValueError(
+                f"Collection '{self.collection_name}' was created with dimension "
+                f"{meta['dimension']} and dtype {meta['dtype']}, not "
+                f"{self.dimension} and {self.dtype.name}"
+            )
+        self._size = meta["size"]
+        self._capacity = meta["capacity"]
+        self._metadata = meta.get("metadata", {})
+        self._vectors = {name: self._map(name, self._capacity) for name in VECTOR_NAMES}
+        self._payloads = [None] * self._size
+        if self._size:  # Metadata can be written before the first chunk
+            with open(self._file("payloads.jsonl")) as f:
+                for line in f:
+                    row, payload = json.loads(line)
+                    if row < self._size:  # Rows past `size` were never committed
+                        self._payloads[row] = payload
+        self._rows = {chunk_key(payload): row for row, payload in enumerate(self._payloads)}
+
+    def _map(self, name: str, capacity: int) -> np.ndarray:
+        """
+        Memory-map the matrix file for `name` with `capacity` rows.
+        """
+        if capacity == 0:
+            return np.zeros((0, self.dimension), dtype=self.dtype)
+        return np.memmap(
+            self._file(f"{name}.bin"),
+            dtype=self.dtype,
+            mode="r+",
+            shape=(capacity, self.dimension)
+        )
+
+    def _reserve(self, needed: int) -> None:
+        """
+        Grow every matrix so that it can hold at least `needed` rows.
+        """
+        if needed <= self._capacity:
+            return
+        capacity = max(needed, 2 * self._capacity, 1024)
+
+        if self.directory is None:
+            for name in VECTOR_NAMES:
+                grown = np.zeros((capacity, self.dimension), dtype=self.dtype)
+                grown[:self._size] = self._vectors[name][:self._size]
+                self._vectors[name] = grown
+        else:
+            os.makedirs(self.directory, exist_ok=True)
+            row_bytes = self.dimension * self.dtype.itemsize
+            for name in VECTOR_NAMES:
+                matrix = self._vectors.pop(name)
+                if isinstance(matrix, np.memmap):
+                    matrix.flush()
+                del matrix
+                # Row-major layout: extending the file keeps existing rows in place
+                with open(self._file(f"{name}.bin"), "ab") as f:
+                    f.truncate(capacity * row_bytes)
+                self._vectors[name] = self._map(name, capacity)
+        self._capacity = capacity
+
+    def _write_meta(self) -> None:
+        meta = {
+            "size": self._size,
+            "capacity": self._capacity,
+            "dimension": self.dimension,
+            "dtype": self.dtype.name,
+            "metadata": self._metadata
+        }
+        tmp = self._file("meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._file("meta.json"))
+
+    # ------------------------------------------------------------------
+    # VectorStore interface
+    # ------------------------------------------------------------------
+
+    @metrics.timed("vector_store.add_chunks", backend="local")
+    def add_chunks(self, chunks: Union[List[Dict], ChunkStore]) -> None:
+        """
+        Add document chunks to the collection.
+
+        Args:
+            chunks: List of document chunks with 'embedding' and 'contextual_embedding',
+                or a ChunkStore (its embedding matrices are read as a whole)
+        """
+        if not chunks:
+            return
+        # Existing chunk keys keep their row, new ones are appended
+        rows = []
+        end = self._size
+        for chunk in chunks:
+            key = chunk_key(chunk)
+            row = self._rows.get(key)
+            if row is None:
+                row = end
+                end += 1
+                self._rows[key] = row
+            rows.append(row)
+        self._reserve(end)
+        rows = np.array(rows)
+
+        for name in VECTOR_NAMES:
+            if isinstance(chunks, ChunkStore):
+                matrix = np.asarray(chunks.embeddings[name], dtype=np.float32)
+            else:
+                matrix = np.stack([np.asarray(chunk[name], dtype=np.float32) for chunk in chunks])
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            self._vectors[name][rows] = matrix / norms
+
+        payloads = [
+            {
+                "chunk_text": chunk["chunk_text"],
+                "context": chunk["context"],
+                "chunk_id": chunk["chunk_id"],
+                **chunk_metadata(chunk)
+            }
+            for chunk in chunks
+        ]
+        self._payloads.extend([None] * (end - self._size))
+        for row, payload in zip(rows.tolist(), payloads):
+            self._payloads[row] = payload
+        self._size = end
+        self._filter_index = None
+
+        if self.directory is not None:
+            for matrix in self._vectors.values():
+                matrix.flush()
+            with open(self._file("payloads.jsonl"), "a") as f:
+                for row, payload in zip(rows.tolist(), payloads):
+                    f.write(json.dumps([row, payload]) + "\n")
+            # meta.json is written last: its size is what a reader trusts
+            self._write_meta()
+        self.version += 1
+
+    def _scores(self, matrix: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        """
+        Cosine scores of every stored row against normalized float32 queries.
+
+        Args:
+            matrix: Stored vectors, one row per chunk
+            queries: 2-D array, one normalized query per row
+
+        Returns:
+            (n_queries, n_rows) score matrix
+        """
+        if matrix.dtype == np.float32:
+            return queries @ matrix.T
+        scores = np.empty((len(queries), len(matrix)), dtype=np.float32)
+        for start in range(0, len(matrix), _FLOAT16_BLOCK_ROWS):
+            block = matrix[start:start + _FLOAT16_BLOCK_ROWS]
+            scores[:, start:start + len(block)] = queries @ block.astype(np.float32).T
+        return scores
+
+    def _hits(
+        self,
+        scores: np.ndarray,
+        k: int,
+        with_payload: PayloadSelector,
+        rows: Optional[np.ndarray] = None
+    ) -> List[Dict]:
+        """
+        Top-k of one score vector as result dictionaries. `rows` maps score
+        positions to stored rows when only a subset was scored.
+        """
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.lexsort((top, -scores[top]))]  # Ties in row order, like a full sort
+        stored = top if rows is None else rows[top]
+
+        if with_payload is True:
+            return [{**self._payloads[r], "score": float(scores[i])} for i, r in zip(top, stored)]
+        fields = list(KEY_FIELDS) + [f for f in (with_payload or []) if f not in KEY_FIELDS]
+        return [
+            {**{f: self._payloads[r].get(f) for f in fields}, "score": float(scores[i])}
+            for i, r in zip(top, stored)
+        ]
+
+    def filter_index(self) -> FilterIndex:
+        """
+        FilterIndex over the stored rows, rebuilt after the collection changes.
+        """
+        index = self._filter_index
+        if index is None:
+            index = self._filter_index = FilterIndex.from_chunks(self._payloads[:self._size])
+        return index
+
+    @metrics.timed("vector_store.search", backend="local")
+    def search(
+        self,
+        query_vector: np.ndarray,
+        top_k: int = TOP_K_RETRIEVAL,
+        use_contextual: bool = True,
+        hnsw_ef: Optional[int] = None,
+        exact: bool = False,
+        rescore: Optional[bool] = None,
+        oversampling: Optional[float] = None,
+        with_payload: PayloadSelector = True,
+        filter: Optional[Dict] = None
+    ) -> List[Dict]:
+        """
+        Exact top-k search over the stored vectors.
+
+        The HNSW and quantization parameters are accepted for interface
+        compatibility and ignored: every search here is already exact.
+
+        Args:
+            query_vector: The query embedding
+            top_k: Number of results to return
+            use_contextual: Whether to use contextual embeddings
+            with_payload: True for the full payload, or a list of payload fields
+            filter: Metadata filter (see src.metadata); only matching rows are scored
+
+        Returns:
+            List of matching chunks with scores
+        """
+        return self.search_batch(
+            np.asarray(query_vector)[None, :],
+            top_k=top_k,
+            use_contextual=use_contextual,
+            with_payload=with_payload,
+            filter=filter
+        )[0]
+
+    @metrics.timed("vector_store.search_batch", backend="local")
+    def search_batch(
+        self,
+        query_vectors: np.ndarray,
+        top_k: int = TOP_K_RETRIEVAL,
+        use_contextual: bool = True,
+        hnsw_ef: Optional[int] = None,
+        exact: bool = False,
+        rescore: Optional[bool] = None,
+        oversampling: Optional[float] = None,
+        with_payload: PayloadSelector = True,
+        filter: Optional[Dict] = None
+    ) -> List[List[Dict]]:
+        """
+        Exact top-k search for many queries with a single matrix multiply.
+
+        Args:
+            query_vectors: 2-D array, one query embedding per row
+            top_k, use_contextual, with_payload, filter: As in `search`
+
+        Returns:
+            One list of matching chunks per query, in input order
+        """
+        queries = np.asarray(query_vectors, dtype=np.float32)
+        selection = self.filter_index().select(filter) if filter else None
+        rows = None if selection is None else selection.rows
+        k = min(top_k, self._size if rows is None else len(rows))
+        if k <= 0:
+            return [[] for _ in range(len(queries))]
+        vector_name = "contextual_embedding" if use_contextual else "embedding"
+        matrix = self._vectors[vector_name][:self._size]
+        if rows is not None:
+            matrix = matrix[rows]  # Gather the matching rows: the multiply only touches the subset
+
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        scores = self._scores(matrix, queries / norms)
+        return [self._hits(row, k, with_payload, rows) for row in scores]
+
+    @metrics.timed("vector_store.hydrate", backend="local")
+    def hydrate(self, chunk_ids: Iterable, fields: Iterable[str] = TEXT_FIELDS) -> Dict:
+        """
+        Look up payload fields for many chunks.
+
+        Args:
+            chunk_ids: Chunk keys (doc_id, chunk_id), or chunk_ids of the default document
+            fields: Payload fields to return
+
+        Returns:
+            Dict mapping each requested item to its payload (doc_id, chunk_id plus `fields`)
+        """
+        fields = list(fields)
+        hydrated = {}
+        for item in chunk_ids:
+            key = split_key(item)
+            row = self._rows.get(key)
+            if row is not None:
+                payload = self._payloads[row]
+                hydrated[item] = {"doc_id": key[0], "chunk_id": key[1], **{f: payload.get(f) for f in fields}}
+        return hydrated
+
+    def reset(self) -> None:
+        """
+        Drop every stored chunk, including the files on disk.
+        """
+        self._vectors = {}
+        if self.directory is not None and os.path.exists(self.directory):
+            shutil.rmtree(self.directory)
+        self._open()
+        self.version += 1
+
+    def sibling(self, collection_name: str) -> "LocalVectorStore":
+        """
+        Store for another collection under the same path, with the same dtype
+        and dimension.
+        """
+        return LocalVectorStore(collection_name, path=self.path, dtype=self.dtype.name, dimension=self.dimension)
+
+    def set_alias(self, alias: str) -> None:
+        """
+        Point `alias` at this collection by atomically replacing the alias
+        file. In-memory stores (`path=None`) have nothing to point at.
+        """
+        if not self.path or alias == self.collection_name:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        target = os.path.join(self.path, f"{alias}.alias")
+        with open(f"{target}.tmp", "w") as f:
+            f.write(self.collection_name)
+        os.replace(f"{target}.tmp", target)
+
+    def drop(self) -> None:
+        """
+        Delete the collection, including the files on disk.
+        """
+        self.reset()
+
+    def count(self) -> int:
+        """
+        Number of stored chunks.
+        """
+        return self._size
+
+    def scroll(
+        self,
+        fields: Iterable[str] = TEXT_FIELDS,
+        batch_size: int = SCROLL_BATCH_SIZE,
+        with_vectors: bool = False
+    ) -> Iterator[Dict]:
+        """
+        Payloads (doc_id, chunk_id plus `fields`) of the latest version of
+        every chunk, in insertion order, with both normalized vectors (as
+        float32) if `with_vectors`. `batch_size` is unused: payloads are in
+        memory.
+        """
+        fields = list(fields)
+        for row in sorted(self._rows.values()):
+            payload = self._payloads[row]
+            item = {**dict(zip(KEY_FIELDS, chunk_key(payload))), **{f: payload.get(f) for f in fields}}
+            if with_vectors:
+                for name in VECTOR_NAMES:
+                    item[name] = np.asarray(self._vectors[name][row], dtype=np.float32)
+            yield item
+
+    def metadata(self) -> Dict:
+        """
+        Collection metadata, kept in meta.json next to the vectors.
+        """
+        return dict(self._metadata)
+
+    def set_metadata(self, metadata: Dict) -> None:
+        """
+        Merge `metadata` into the collection metadata (and write it to disk).
+        """
+        self._metadata.update(metadata)
+        if self.directory is not None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._write_meta()
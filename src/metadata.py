@@ -0,0 +1,296 @@
+"""
+Document metadata on chunks, chunk keys and metadata filters.
+
+Every chunk can carry metadata about the document it came from:
+
+    doc_id   str        identifies the document; chunk_id is only unique within it
+    source   str        where the document came from (path, URL)
+    page     int        page the chunk starts on (1-based)
+    tags     list[str]  free-form labels
+
+A chunk is identified by its key (doc_id, chunk_id). Chunks without a doc_id
+belong to the default document (DEFAULT_DOC_ID), so single-document
+collections keep working with bare chunk_ids.
+
+Filters are plain dicts with one condition per field, all of which must hold:
+
+    {"doc_id": "annual-2023"}            field equals the value
+    {"source": ["a.pdf", "b.pdf"]}       field equals any of the values
+    {"tags": "finance"}                  chunk has the tag (any of them, for a list)
+    {"page": {"gte": 3, "lte": 7}}       inclusive range, either bound optional
+
+The vector leg applies a filter as a Qdrant payload filter over indexed
+fields (or with a FilterIndex in LocalVectorStore), the BM25 leg with the
+FilterIndex built next to its postings.
+"""
+import bisect
+from typing import Dict, Hashable, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
+from src.cache import LRUCache
+from src.lazy import lazy_import
+from config import FILTER_CACHE_SIZE
+
+models = lazy_import("qdrant_client.models")
+
+METADATA_FIELDS = ("doc_id", "source", "page", "tags")
+KEYWORD_FIELDS = ("doc_id", "source", "tags")
+INTEGER_FIELDS = ("page",)
+DEFAULT_DOC_ID = ""
+NO_PAGE = -1  # Page column value of chunks without a page
+_RANGE_BOUNDS = ("gte", "lte")
+
+
+def chunk_key(chunk) -> Tuple:
+    """
+    (doc_id, chunk_id) of a chunk, payload or search hit.
+    """
+    return (chunk.get("doc_id") or DEFAULT_DOC_ID, chunk["chunk_id"])
+
+
+def split_key(item) -> Tuple:
+    """
+    (doc_id, chunk_id) from a chunk key, or from a bare chunk_id of the default document.
+    """
+    return item if isinstance(item, tuple) else (DEFAULT_DOC_ID, item)
+
+
+def chunk_metadata(chunk) -> Dict:
+    """
+    The metadata fields of a chunk, with defaults for missing ones.
+    """
+    return {
+        "doc_id": chunk.get("doc_id") or DEFAULT_DOC_ID,
+        "source": chunk.get("source") or "",
+        "page": chunk.get("page"),
+        "tags": list(chunk.get("tags") or [])
+    }
+
+
+def annotate_chunks(
+    chunks: List[Dict],
+    doc_id: str,
+    source: str = "",
+    tags: Sequence[str] = (),
+    document_text: Optional[str] = None,
+    page_starts: Optional[Sequence[int]] = None
+) -> List[Dict]:
+    """
+    Set the document metadata on chunks of one document (in place).
+
+    With `document_text` and `page_starts` (character offset of every page,
+    see `src.document_loader.join_pages`), each chunk also gets the page its
+    text starts on. Chunks are located in order with `str.find`; a chunk
+    that cannot be found keeps the page of the previous one.
+
+    Returns:
+        The same chunks
+    """
+    position, page = 0, 1 if page_starts else None
+    for chunk in chunks:
+        chunk["doc_id"] = doc_id
+        chunk["source"] = source
+        chunk["tags"] = list(tags)
+        if page_starts and document_text is not None:
+            found = document_text.find(chunk["chunk_text"][:64], position)
+            if found >= 0:
+                position = found
+                page = bisect.bisect_right(page_starts, found)
+            chunk["page"] = page
+    return chunks
+
+
+def normalize_filter(filter: Optional[Dict]) -> Optional[Dict]:
+    """
+    Validate a filter and bring it to canonical form: keyword conditions as
+    a tuple of accepted values, ranges as {"gte": ..., "lte": ...}.
+
+    Returns:
+        The canonical filter, or None for no filter (None or {})
+
+    Raises:
+        ValueError: Unknown field or malformed condition
+    """
+    if not filter:
+        return None
+    if not isinstance(filter, dict):
+        raise ValueError(f"A filter is a dict of field conditions, got {type(filter).__name__}")
+    canonical = {}
+    for field, condition in filter.items():
+        if field not in METADATA_FIELDS:
+            raise ValueError(f"Unknown filter field '{field}', expected one of {METADATA_FIELDS}")
+        if isinstance(condition, dict):
+            if field not in INTEGER_FIELDS or not condition or set(condition) - set(_RANGE_BOUNDS):
+                raise ValueError(f"Invalid range for '{field}': {condition!r} (use 'gte'/'lte' on {INTEGER_FIELDS})")
+            canonical[field] = {bound: int(condition[bound]) for bound in _RANGE_BOUNDS if bound in condition}
+        else:
+            values = tuple(condition) if isinstance(condition, (list, tuple, set)) else (condition,)
+            if not values:
+                raise ValueError(f"No accepted values for '{field}'")
+            if field in INTEGER_FIELDS:
+                values = tuple(int(value) for value in values)
+            elif not all(isinstance(value, str) for value in values):
+                raise ValueError(f"'{field}' values must be strings, got {condition!r}")
+            canonical[field] = tuple(sorted(set(values)))
+    return canonical
+
+
+def filter_key(filter: Optional[Dict]) -> Optional[Hashable]:
+    """
+    Hashable form of a filter, for cache keys and for grouping queries.
+    """
+    canonical = normalize_filter(filter)
+    if canonical is None:
+        return None
+    return tuple(
+        (field, tuple(sorted(condition.items())) if isinstance(condition, dict) else condition)
+        for field, condition in sorted(canonical.items())
+    )
+
+
+def to_qdrant_filter(filter: Optional[Dict]):
+    """
+    The filter as a Qdrant `Filter` (all conditions in `must`), or None.
+    """
+    canonical = normalize_filter(filter)
+    if canonical is None:
+        return None
+    conditions = []
+    for field, condition in sorted(canonical.items()):
+        if isinstance(condition, dict):
+            conditions.append(models.FieldCondition(key=field, range=models.Range(**condition)))
+        elif len(condition) == 1:
+            conditions.append(models.FieldCondition(key=field, match=models.MatchValue(value=condition[0])))
+        else:
+            conditions.append(models.FieldCondition(key=field, match=models.MatchAny(any=list(condition))))
+    return models.Filter(must=conditions)
+
+
+def metadata_columns(chunks: Iterable) -> Dict[str, np.ndarray]:
+    """
+    Metadata of many chunks as columns: doc_ids and sources (string arrays),
+    pages (int64, NO_PAGE when unknown) and tags in CSR form (tag_offsets
+    into tag_values).
+    """
+    doc_ids, sources, pages, tag_values, tag_counts = [], [], [], [], []
+    for chunk in chunks:
+        metadata = chunk_metadata(chunk)
+        doc_ids.append(metadata["doc_id"])
+        sources.append(metadata["source"])
+        pages.append(NO_PAGE if metadata["page"] is None else int(metadata["page"]))
+        tag_values.extend(metadata["tags"])
+        tag_counts.append(len(metadata["tags"]))
+    tag_offsets = np.zeros(len(tag_counts) + 1, dtype=np.int64)
+    np.cumsum(tag_counts, out=tag_offsets[1:])
+    return {
+        "doc_ids": np.array(doc_ids, dtype=str),
+        "sources": np.array(sources, dtype=str),
+        "pages": np.array(pages, dtype=np.int64),
+        "tag_offsets": tag_offsets,
+        "tag_values": np.array(tag_values, dtype=str)
+    }
+
+
+def _postings(values: np.ndarray, rows: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    value -> sorted rows holding it, grouped with one sort.
+    """
+    if len(values) == 0:
+        return {}
+    distinct, inverse = np.unique(values, return_inverse=True)
+    order = np.argsort(inverse, kind="stable")
+    bounds = np.cumsum(np.bincount(inverse, minlength=len(distinct)))[:-1]
+    return {
+        str(value): np.unique(group)
+        for value, group in zip(distinct.tolist(), np.split(rows[order], bounds))
+    }
+
+
+class Selection(NamedTuple):
+    """
+    Rows matching a filter: sorted row numbers and the same set as a
+    per-row bitmap (boolean mask).
+    """
+    rows: np.ndarray
+    mask: np.ndarray
+
+
+class FilterIndex:
+    """
+    Precomputed per-value row sets over the metadata of an index's rows.
+
+    Keyword fields map every value to the sorted rows holding it; pages are
+    kept sorted with their rows so a range is two binary searches. Resolving
+    a filter intersects the row sets of its conditions, smallest first, and
+    the resulting Selection is cached by filter. A scoped query then only
+    touches the selected rows.
+
+    Args:
+        doc_ids, sources, pages, tag_offsets, tag_values: Columns as
+            returned by `metadata_columns`
+        cache_size: Resolved filters kept
+    """
+
+    def __init__(
+        self,
+        doc_ids: np.ndarray,
+        sources: np.ndarray,
+        pages: np.ndarray,
+        tag_offsets: np.ndarray,
+        tag_values: np.ndarray,
+        cache_size: int = FILTER_CACHE_SIZE
+    ) -> None:
+        self.size = len(doc_ids)
+        rows = np.arange(self.size, dtype=np.int64)
+        tag_rows = np.repeat(rows, np.diff(np.asarray(tag_offsets)))
+        self.postings = {
+            "doc_id": _postings(np.asarray(doc_ids), rows),
+            "source": _postings(np.asarray(sources), rows),
+            "tags": _postings(np.asarray(tag_values), tag_rows)
+        }
+        pages = np.asarray(pages)
+        self._page_order = np.argsort(pages, kind="stable")
+        self._sorted_pages = pages[self._page_order]
+        self._cache = LRUCache(cache_size)
+
+    @classmethod
+    def from_chunks(cls, chunks: Iterable, cache_size: int = FILTER_CACHE_SIZE) -> "FilterIndex":
+        """Build the index from chunk dicts (or views), one row per chunk."""
+        return cls(**metadata_columns(chunks), cache_size=cache_size)
+
+    def _condition_rows(self, field: str, condition) -> np.ndarray:
+        if isinstance(condition, dict):
+            low = np.searchsorted(self._sorted_pages, max(condition.get("gte", 0), 0), side="left")
+            high = np.searchsorted(self._sorted_pages, condition.get("lte", np.iinfo(np.int64).max), side="right")
+            return np.sort(self._page_order[low:high])
+        if field in INTEGER_FIELDS:
+            return np.sort(np.concatenate([self._condition_rows(field, {"gte": v, "lte": v}) for v in condition]))
+        empty = np.zeros(0, dtype=np.int64)
+        groups = [self.postings[field].get(value, empty) for value in condition]
+        if len(groups) == 1:
+            return groups[0]
+        return np.unique(np.concatenate(groups))
+
+    def select(self, filter: Optional[Dict]) -> Optional[Selection]:
+        """
+        Rows matching `filter`, or None when there is no filter (every row).
+        """
+        key = filter_key(filter)
+        if key is None:
+            return None
+        selection = self._cache.get(key)
+        if selection is None:
+            canonical = normalize_filter(filter)
+            groups = sorted(
+                (self._condition_rows(field, condition) for field, condition in canonical.items()),
+                key=len
+            )
+            rows = groups[0]
+            for group in groups[1:]:
+                if len(rows) == 0:
+                    break
+                rows = np.intersect1d(rows, group, assume_unique=True)
+            mask = np.zeros(self.size, dtype=bool)
+            mask[rows] = True
+            selection = Selection(rows, mask)
+            self._cache.put(key, selection)
+        return selection
@@ -0,0 +1,331 @@
+"""
+Lightweight instrumentation: timing spans, counters and latency histograms.
+
+Disabled by default (`METRICS_ENABLED`). While disabled, `span()` returns a
+shared no-op context manager and `timed`, `count`, `observe` and
+`record_trace` return after a single flag check, so instrumented hot paths
+cost about one extra function call.
+
+    from src import metrics
+
+    metrics.enable()                       # or METRICS_ENABLED=true
+    with metrics.span("bm25.search"):
+        ...
+    metrics.count("retriever.result_cache", outcome="hit")
+    print(metrics.prometheus_text())       # served at GET /metrics by src.server
+
+Everything is recorded in a `MetricsRegistry` (in memory; tests pass their
+own). Exporters additionally receive every span and trace as it happens,
+e.g. `LogExporter` writes them to the `contextual_retrieval.metrics` logger.
+"""
+import functools
+import inspect
+import logging
+import re
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Sequence, Tuple
+from config import METRICS_ENABLED, METRICS_LOG, METRICS_TRACE_HISTORY
+
+# Latency buckets in seconds, from sub-millisecond BM25 lookups to Claude calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+class Histogram:
+    """
+    Cumulative-bucket latency histogram (Prometheus semantics).
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # Last slot: above every bucket
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """
+        Upper bound of the bucket holding the q-quantile (inf above the last bucket).
+        """
+        if self.count == 0:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets + (float("inf"),), self.counts):
+            seen += n
+            if seen >= target:
+                return bound
+        return float("inf")
+
+
+class MetricsRegistry:
+    """
+    Thread-safe in-memory store of counters, histograms and recent traces.
+
+    Args:
+        trace_history: Number of most recent traces kept
+    """
+
+    def __init__(self, trace_history: int = METRICS_TRACE_HISTORY) -> None:
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self.traces: deque = deque(maxlen=trace_history)
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1.0, **labels) -> None:
+        key = (name, _labels(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0.0) + value
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        key = (name, _labels(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def add_trace(self, trace: Dict) -> None:
+        with self._lock:
+            self.traces.append(trace)
+
+    def counter(self, name: str, **labels) -> float:
+        """Current value of a counter (0 if never incremented)."""
+        return self.counters.get((name, _labels(labels)), 0.0)
+
+    def histogram(self, name: str, **labels) -> Optional[Histogram]:
+        """The histogram for `name` and `labels`, or None if nothing was observed."""
+        return self.histograms.get((name, _labels(labels)))
+
+    def clear(self) -> None:
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.traces.clear()
+
+
+class LogExporter:
+    """
+    Logs every span and trace (DEBUG by default) to a standard logger.
+    """
+
+    def __init__(self, logger: Optional[logging.Logger] = None, level: int = logging.DEBUG) -> None:
+        self.logger = logger or logging.getLogger("contextual_retrieval.metrics")
+        self.level = level
+
+    def export_span(self, name: str, seconds: float, labels: Dict) -> None:
+        if self.logger.isEnabledFor(self.level):
+            extra = " ".join(f"{key}={value}" for key, value in labels.items())
+            self.logger.log(self.level, "span %s %.3f ms %s", name, seconds * 1000, extra)
+
+    def export_trace(self, trace: Dict) -> None:
+        if self.logger.isEnabledFor(self.level):
+            stages = " ".join(f"{stage}={seconds * 1000:.3f}ms" for stage, seconds in trace["stages"].items())
+            self.logger.log(self.level, "trace %s %s", trace["name"], stages)
+
+
+class _State:
+    enabled = False
+    registry = MetricsRegistry()
+    exporters: List = []
+
+
+_state = _State()
+
+
+def enable(registry: Optional[MetricsRegistry] = None, exporters: Optional[Sequence] = None) -> MetricsRegistry:
+    """
+    Turn instrumentation on.
+
+    Args:
+        registry: Registry to record into; keeps the current one if None
+        exporters: Objects with `export_span(name, seconds, labels)` and
+            `export_trace(trace)`; keeps the current ones if None
+
+    Returns:
+        The active registry
+    """
+    if registry is not None:
+        _state.registry = registry
+    if exporters is not None:
+        _state.exporters = list(exporters)
+    _state.enabled = True
+    return _state.registry
+
+
+def disable() -> None:
+    """Turn instrumentation off (recorded data is kept)."""
+    _state.enabled = False
+
+
+def enabled() -> bool:
+    return _state.enabled
+
+
+def registry() -> MetricsRegistry:
+    return _state.registry
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("name", "labels", "start", "seconds")
+
+    def __init__(self, name: str, labels: Dict) -> None:
+        self.name = name
+        self.labels = labels
+        self.seconds = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, *exc) -> None:
+        self.seconds = time.perf_counter() - self.start
+        labels = dict(self.labels, error=exc_type.__name__) if exc_type is not None else self.labels
+        _state.registry.observe(self.name, self.seconds, **labels)
+        for exporter in _state.exporters:
+            exporter.export_span(self.name, self.seconds, labels)
+
+
+def span(name: str, **labels):
+    """
+    Context manager timing a block into the `name` histogram (no-op when disabled).
+    A block that raises is recorded with an `error` label.
+    """
+    if not _state.enabled:
+        return _NOOP_SPAN
+    return _Span(name, labels)
+
+
+def timed(name: str, **labels):
+    """
+    Decorator form of `span`; coroutine functions are timed until they return.
+    """
+    def decorate(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                if not _state.enabled:
+                    return await fn(*args, **kwargs)
+                with _Span(name, labels):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _state.enabled:
+                return fn(*args, **kwargs)
+            with _Span(name, labels):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def count(name: str, value: float = 1.0, **labels) -> None:
+    """Increment the counter `name` (no-op when disabled)."""
+    if _state.enabled:
+        _state.registry.inc(name, value, **labels)
+
+
+def observe(name: str, seconds: float, **labels) -> None:
+    """Record a duration measured elsewhere (no-op when disabled)."""
+    if _state.enabled:
+        _state.registry.observe(name, seconds, **labels)
+
+
+def record_trace(name: str, stages: Dict[str, float], **attributes) -> None:
+    """
+    Record one request's latency breakdown: each stage goes into the
+    `{name}.stage` histogram (label `stage`) and the whole trace is kept in
+    the registry's recent traces and passed to the exporters.
+    """
+    if not _state.enabled:
+        return
+    for stage, seconds in stages.items():
+        _state.registry.observe(f"{name}.stage", seconds, stage=stage)
+    trace = {"name": name, "stages": dict(stages), **attributes}
+    _state.registry.add_trace(trace)
+    for exporter in _state.exporters:
+        exporter.export_trace(trace)
+
+
+def _metric_name(name: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def _format_labels(labels: Labels, extra: Tuple = ()) -> str:
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (
+        (key, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in pairs
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+def prometheus_text(metrics_registry: Optional[MetricsRegistry] = None) -> str:
+    """
+    Render a registry in the Prometheus text exposition format: counters as
+    `<name>_total`, histograms as `<name>_seconds` buckets, sum and count.
+    """
+    metrics_registry = metrics_registry or _state.registry
+    with metrics_registry._lock:
+        counters = sorted(metrics_registry.counters.items())
+        histograms = sorted(
+            ((key, list(h.buckets), list(h.counts), h.sum, h.count) for key, h in metrics_registry.histograms.items()),
+            key=lambda item: item[0]
+        )
+    lines = []
+    typed = set()
+    for (name, labels), value in counters:
+        metric = _metric_name(name) + "_total"
+        if metric not in typed:
+            lines.append(f"# TYPE {metric} counter")
+            typed.add(metric)
+        lines.append(f"{metric}{_format_labels(labels)} {value:g}")
+    for (name, labels), buckets, counts, total, n in histograms:
+        metric = _metric_name(name) + "_seconds"
+        if metric not in typed:
+            lines.append(f"# TYPE {metric} histogram")
+            typed.add(metric)
+        cumulative = 0
+        for bound, bucket_count in zip(buckets, counts):
+            cumulative += bucket_count
+            lines.append(f"{metric}_bucket{_format_labels(labels, (('le', f'{bound:g}'),))} {cumulative}")
+        lines.append(f"{metric}_bucket{_format_labels(labels, (('le', '+Inf'),))} {n}")
+        lines.append(f"{metric}_sum{_format_labels(labels)} {total:g}")
+        lines.append(f"{metric}_count{_format_labels(labels)} {n}")
+    return "\n".join(lines) + "\n"
+
+
+if METRICS_ENABLED:
+    enable(exporters=[LogExporter()] if METRICS_LOG else [])
@@ -0,0 +1,106 @@
+"""
+Per-query search profiles: trade latency for recall at query time.
+
+A SearchProfile bundles the knobs a query may turn: the vector leg's HNSW
+search depth (or exact search), the candidate depth requested from each
+leg, BM25 query-term pruning and which legs run at all. Callers pick a
+named profile or spell out their own:
+
+    retriever.retrieve(query, profile="fast")            # interactive UI
+    retriever.retrieve(query, profile="exhaustive")      # offline evaluation
+    retriever.retrieve(query, profile={"base": "fast", "hnsw_ef": 64})
+    retriever.retrieve(query, profile={"bm25": False})   # vector leg only
+"""
+from typing import Dict, NamedTuple, Optional, Union
+from config import CANDIDATE_DEPTH_MAX_FACTOR
+
+
+class SearchProfile(NamedTuple):
+    """
+    Search settings of one query. The defaults leave everything to the
+    retriever and the collection (the "balanced" profile).
+
+    Attributes:
+        hnsw_ef: HNSW candidate list size of the vector search (None = collection default)
+        exact: Exact (brute-force) vector search instead of HNSW
+        rescore: Rescore quantized candidates with the original vectors (None = collection default)
+        oversampling: Quantized candidates fetched per result before rescoring
+        depth_factor: Candidates requested from each leg, in multiples of
+            top_k, in a single round (None = the retriever's depth policy)
+        bm25_max_terms: Score only this many of the query's rarest terms
+            (shortest postings); common terms cost the most and move
+            scores the least (None = every term)
+        vector: Run the vector leg
+        bm25: Run the BM25 leg
+    """
+    hnsw_ef: Optional[int] = None
+    exact: bool = False
+    rescore: Optional[bool] = None
+    oversampling: Optional[float] = None
+    depth_factor: Optional[int] = None
+    bm25_max_terms: Optional[int] = None
+    vector: bool = True
+    bm25: bool = True
+
+    def vector_options(self) -> Dict:
+        """Keyword arguments for `VectorStore.search` / `search_batch` (non-defaults only)."""
+        options = {"hnsw_ef": self.hnsw_ef, "rescore": self.rescore, "oversampling": self.oversampling}
+        options = {name: value for name, value in options.items() if value is not None}
+        if self.exact:
+            options["exact"] = True
+        return options
+
+    def bm25_options(self) -> Dict:
+        """Keyword arguments for `BM25Index.search` / `search_many` (non-defaults only)."""
+        return {} if self.bm25_max_terms is None else {"max_terms": self.bm25_max_terms}
+
+
+SEARCH_PROFILES: Dict[str, SearchProfile] = {
+    # Shallow HNSW search, top_k candidates per leg, at most 4 BM25 terms
+    "fast": SearchProfile(hnsw_ef=32, depth_factor=1, bm25_max_terms=4),
+    "balanced": SearchProfile(),
+    # Exact vector search with rescoring, the deepest candidate lists, every term
+    "exhaustive": SearchProfile(exact=True, rescore=True, depth_factor=CANDIDATE_DEPTH_MAX_FACTOR)
+}
+
+
+def resolve_profile(profile: Union[str, Dict, SearchProfile, None]) -> SearchProfile:
+    """
+    SearchProfile from a profile name, a dict of settings (optionally on
+    top of a named "base" profile) or a SearchProfile; None is "balanced".
+
+    Raises:
+        ValueError: Unknown name or setting, or a setting out of range
+    """
+    if profile is None:
+        return SEARCH_PROFILES["balanced"]
+    if isinstance(profile, str):
+        if profile not in SEARCH_PROFILES:
+            raise ValueError(f"Unknown search profile '{profile}', expected one of {tuple(SEARCH_PROFILES)}")
+        return SEARCH_PROFILES[profile]
+    if isinstance(profile, dict):
+        settings = dict(profile)
+        base = resolve_profile(settings.pop("base", None))
+        unknown = set(settings) - set(SearchProfile._fields)
+        if unknown:
+            raise ValueError(f"Unknown search profile settings {sorted(unknown)}, expected {SearchProfile._fields}")
+        profile = base._replace(**settings)
+    if not isinstance(profile, SearchProfile):
+        raise ValueError(f"A search profile is a name, a dict or a SearchProfile, got {type(profile).__name__}")
+    for name in ("exact", "vector", "bm25", "rescore"):
+        value = getattr(profile, name)
+        if not isinstance(value, bool) and not (name == "rescore" and value is None):
+            raise ValueError(f"{name} must be true or false, got {value!r}")
+    if profile.oversampling is not None and (
+        isinstance(profile.oversampling, bool)
+        or not isinstance(profile.oversampling, (int, float))
+        or profile.oversampling < 1
+    ):
+        raise ValueError(f"oversampling must be a number >= 1, got {profile.oversampling!r}")
+    if not (profile.vector or profile.bm25):
+        raise ValueError("A search profile must run at least one leg")
+    for name in ("hnsw_ef", "depth_factor", "bm25_max_terms"):
+        value = getattr(profile, name)
+        if value is not None and (not isinstance(value, int) or isinstance(value, bool) or value < 1):
+            raise ValueError(f"{name} must be a positive integer, got {value!r}")
+    return profile
@@ -0,0 +1,235 @@
+from typing import List, Dict, Optional
+import threading
+import time
+import numpy as np
+from src import metrics
+from src.lazy import lazy_import
+from src.cache import LRUCache, normalize_query
+from src.fusion import minmax
+from src.retriever import RetrievalResults
+from config import (
+    RERANKER_MODEL_NAME,
+    RERANK_BATCH_SIZE,
+    RERANK_MAX_LENGTH,
+    RERANK_WEIGHT,
+    RERANK_MAX_SCORE,
+    RERANK_LATENCY_BUDGET,
+    RERANK_CACHE_SIZE,
+    RERANK_CACHE_TTL,
+    TOP_K_FINAL
+)
+
+sentence_transformers = lazy_import("sentence_transformers")
+
+# Rough characters per token, to cut passages before tokenization
+_CHARS_PER_TOKEN = 4
+
+
+class Reranker:
+    """
+    Cross-encoder reranking stage for the candidates of HybridRetriever.
+
+    (query, passage) pairs are scored in batched CPU forward passes, in
+    retrieval order. The final score blends the cross-encoder score with
+    the min-max normalized retrieval score:
+
+        final = weight * rerank_score + (1 - weight) * retrieval_score
+
+    Cross-encoder scores lie in [0, max_score] (sigmoid output), so a
+    candidate that has not been scored yet can reach at most
+    weight * max_score + (1 - weight) * its retrieval score. Scoring stops
+    as soon as that bound for the next candidate cannot beat the current
+    top_n, or when the next batch would not fit the latency budget.
+    Scores are cached per (query, chunk).
+    """
+
+    def __init__(
+        self,
+        model_name: str = RERANKER_MODEL_NAME,
+        model=None,
+        batch_size: int = RERANK_BATCH_SIZE,
+        max_length: int = RERANK_MAX_LENGTH,
+        weight: float = RERANK_WEIGHT,
+        max_score: float = RERANK_MAX_SCORE,
+        budget: Optional[float] = RERANK_LATENCY_BUDGET,
+        cache: Optional[LRUCache] = None
+    ) -> None:
+        """
+        Args:
+            model_name: Cross-encoder model to load when `model` is not given
+            model: Anything with `predict(pairs, batch_size=...)` returning one
+                score per (query, passage) pair
+            batch_size: Pairs per forward pass; early stopping and the
+                budget are checked between batches
+            max_length: Maximum input length in tokens (passages are also
+                cut to about this many tokens before tokenization)
+            weight: Weight of the cross-encoder score in the final score;
+                1.0 ranks by the cross-encoder alone (no early stopping)
+            max_score: Upper bound of the model's scores
+            budget: Default latency budget in seconds (None = no limit)
+            cache: Score cache; defaults to an LRUCache sized by RERANK_CACHE_SIZE/_TTL
+        """
+        self.model_name = model_name
+        self.max_length = max_length
+        self._model = model  # Loaded on first use unless given
+        self._lock = threading.Lock()
+        self.batch_size = batch_size
+        self.max_chars = max_length * _CHARS_PER_TOKEN
+        self.weight = weight
+        self.max_score = max_score
+        self.budget = budget
+        self.cache = cache if cache is not None else LRUCache(RERANK_CACHE_SIZE, RERANK_CACHE_TTL)
+        self._seconds_per_pair = None  # Running estimate used for the budget
+
+    @property
+    def model(self):
+        """The cross-encoder, loaded on first access."""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = sentence_transformers.CrossEncoder(
+                        self.model_name, device="cpu", max_length=self.max_length
+                    )
+        return self._model
+
+    def warm_up(self, background: bool = False):
+        """
+        Load the model ahead of the first rerank (in a daemon thread if
+        background, which is returned).
+        """
+        if background:
+            thread = threading.Thread(target=self.warm_up, name="reranker-warm-up", daemon=True)
+            thread.start()
+            return thread
+        self.model.predict([("warm up", "warm up")])
+        return None
+
+    def _passage(self, result: Dict) -> str:
+        """
+        Text scored against the query: context and chunk text, capped in length.
+        """
+        context = result.get('context') or ''
+        text = f"{context}\n\n{result['chunk_text']}" if context else result['chunk_text']
+        return text[:self.max_chars]
+
+    def _key(self, query_key: str, result: Dict, passage: str):
+        # The passage hash keeps a re-ingested chunk with new text from hitting stale scores
+        return (query_key, result.get('doc_id'), result['chunk_id'], hash(passage))
+
+    def _predict(self, query: str, passages: List[str]) -> np.ndarray:
+        t0 = time.perf_counter()
+        scores = np.asarray(
+            self.model.predict([(query, passage) for passage in passages], batch_size=len(passages)),
+            dtype=np.float64
+        ).reshape(-1)
+        per_pair = (time.perf_counter() - t0) / len(passages)
+        self._seconds_per_pair = per_pair if self._seconds_per_pair is None else (
+            0.8 * self._seconds_per_pair + 0.2 * per_pair
+        )
+        return scores
+
+    @metrics.timed("reranker.rerank")
+    def rerank(
+            self,
+            query: str,
+            results: List[Dict],
+            top_n: int = TOP_K_FINAL,
+            budget: Optional[float] = None
+        ) -> List[Dict]:
+        """
+        Rerank retrieval results with the cross-encoder.
+
+        Args:
+            query: The search query
+            results: Candidates from HybridRetriever.retrieve (best first)
+            top_n: Number of results to return
+            budget: Latency budget in seconds for this call; defaults to the
+                reranker's budget. Batches are skipped once the measured
+                per-pair latency says they would not fit (the first batch
+                of a fresh reranker always runs, to measure it)
+
+        Returns:
+            RetrievalResults with the top_n candidates, best first. Each
+            result is a copy with 'rerank_score' (None if the candidate was
+            not scored) and 'final_score'. If the budget ran out before the
+            top_n was settled, `partial` is set and `failed_legs['rerank']`
+            says so; unscored candidates then follow the scored ones in
+            retrieval order.
+        """
+        start = time.perf_counter()
+        budget = self.budget if budget is None else budget
+        candidates = [dict(result) for result in results]
+        retrieval = minmax(np.array(
+            [r.get('combined_score', r.get('score', 0.0)) for r in candidates],
+            dtype=np.float64
+        ))
+        # Score in retrieval order so the early-stopping bound only decreases
+        order = np.argsort(-retrieval, kind="stable")
+        query_key = normalize_query(query)
+
+        scores = np.full(len(candidates), np.nan)
+        passages = {}
+        for i in order.tolist():
+            passages[i] = self._passage(candidates[i])
+            cached = self.cache.get(self._key(query_key, candidates[i], passages[i]))
+            if cached is not None:
+                scores[i] = cached
+
+        out_of_budget = False
+        while True:
+            unscored = [i for i in order.tolist() if np.isnan(scores[i])]
+            if not unscored:
+                break
+            # Stop once the best score the next candidate could reach cannot enter the top_n
+            final = self.weight * scores + (1 - self.weight) * retrieval
+            scored_final = np.sort(final[~np.isnan(final)])[::-1]
+            bound = self.weight * self.max_score + (1 - self.weight) * retrieval[unscored[0]]
+            if len(scored_final) >= top_n and scored_final[top_n - 1] >= bound:
+                break
+
+            batch = unscored[:self.batch_size]
+            if budget is not None and self._seconds_per_pair is not None:
+                elapsed = time.perf_counter() - start
+                if elapsed + self._seconds_per_pair * len(batch) > budget:
+                    out_of_budget = True
+                    break
+
+            batch_scores = self._predict(query, [passages[i] for i in batch])
+            metrics.count("reranker.pairs_scored", len(batch))
+            for i, score in zip(batch, batch_scores.tolist()):
+                scores[i] = score
+                self.cache.put(self._key(query_key, candidates[i], passages[i]), score)
+
+        for i, candidate in enumerate(candidates):
+            scored = not np.isnan(scores[i])
+            candidate['rerank_score'] = float(scores[i]) if scored else None
+            candidate['final_score'] = float(
+                self.weight * scores[i] + (1 - self.weight) * retrieval[i]
+            ) if scored else None
+
+        ranked = sorted(
+            (i for i in range(len(candidates)) if not np.isnan(scores[i])),
+            key=lambda i: -candidates[i]['final_score']
+        ) + [i for i in order.tolist() if np.isnan(scores[i])]
+
+        failed = dict(getattr(results, 'failed_legs', {}))
+        # The budget check comes after the early-stopping check: running out
+        # means unscored candidates could still have entered the top_n
+        if out_of_budget:
+            failed['rerank'] = 'latency budget exceeded'
+        timings = dict(getattr(results, 'timings', {}))
+        timings['rerank'] = time.perf_counter() - start
+        return RetrievalResults(
+            [candidates[i] for i in ranked[:top_n]],
+            partial=bool(failed),
+            failed_legs=failed,
+            timings=timings,
+            depth=getattr(results, 'depth', None),
+            rounds=getattr(results, 'rounds', 1)
+        )
+
+    def cache_stats(self) -> Dict[str, float]:
+        """
+        Hit/miss counters and hit rate of the score cache.
+        """
+        return self.cache.stats()
@@ -1,70 +1,405 @@
-from typing import List, Dict
+from typing import List, Dict, Optional, Union
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
 import numpy as np
-from src.vector_store import QdrantStorage
+from src.vector_store import VectorStore
 from src.bm25_index import BM25Index
 from src.embedder import Embedder
+from src import metrics
+from src.cache import LRUCache, normalize_query
+from src.fusion import fuse, leg_arrays, rrf_top_k_is_final, FUSION_STRATEGIES
+from src.metadata import DEFAULT_DOC_ID, filter_key
+from src.snapshots import IndexSnapshot
+from src.profiles import SearchProfile, resolve_profile
+from config import (
+    RETRIEVER_MAX_WORKERS,
+    VECTOR_LEG_TIMEOUT,
+    BM25_LEG_TIMEOUT,
+    FUSION_STRATEGY,
+    RRF_K,
+    ADAPTIVE_CANDIDATE_DEPTH,
+    CANDIDATE_DEPTH_MAX_FACTOR,
+    QUERY_EMBEDDING_CACHE_SIZE,
+    QUERY_EMBEDDING_CACHE_TTL,
+    RESULT_CACHE_SIZE,
+    RESULT_CACHE_TTL,
+    SEARCH_PROFILE
+)
+
+
+class RetrievalResults(list):
+    """
+    List of fused results plus how they were obtained.
+
+    Attributes:
+        partial: True if a search leg timed out or failed and only the
+            other leg contributed
+        failed_legs: Leg name ("vector" / "bm25") -> error description
+        timings: Leg name -> seconds spent in that leg
+        cached: True if the results were served from the result cache
+        depth: Candidates requested from each leg in the final round
+        rounds: Number of candidate fetches (more than 1 with adaptive depth)
+        profile: SearchProfile the results were retrieved with
+    """
+
+    def __init__(
+        self,
+        results=(),
+        partial: bool = False,
+        failed_legs=None,
+        timings=None,
+        cached: bool = False,
+        depth: Optional[int] = None,
+        rounds: int = 1,
+        profile: Optional[SearchProfile] = None
+    ):
+        super().__init__(results)
+        self.partial = partial
+        self.failed_legs = failed_legs or {}
+        self.timings = timings or {}
+        self.cached = cached
+        self.depth = depth
+        self.rounds = rounds
+        self.profile = profile
+
+
+def _scope(filter: Optional[Dict]) -> Dict:
+    """
+    Keyword arguments passing `filter` to a search leg; unfiltered queries
+    call the legs exactly as before, so legs without filter support still work.
+    """
+    return {} if not filter else {"filter": filter}
+
+
+def _copy_results(results: List[Dict]) -> List[Dict]:
+    """
+    Copies of result dicts that share nothing mutable with the originals
+    (the 'references' lists included), for the result cache.
+    """
+    copies = []
+    for result in results:
+        copy = dict(result)
+        if copy.get('references') is not None:
+            copy['references'] = [dict(reference) for reference in copy['references']]
+        copies.append(copy)
+    return copies
+
 
 class HybridRetriever:
+    """
+    Hybrid (vector + BM25) retrieval over one live IndexSnapshot.
+
+    One retriever serves any number of threads at once. Queries only read
+    shared state: the snapshot reference (read once per query), the indexes
+    and the caches (LRUCache is locked; results go in and come out as
+    copies, embeddings are stored read-only). Every result dict a query
+    returns is new and owned by the caller. Per-query work runs on the
+    caller's thread plus at most RETRIEVER_MAX_WORKERS shared leg threads,
+    and the embedder bounds concurrent model calls (EMBEDDER_MAX_CONCURRENCY).
+    Only `publish` changes what queries see, with one reference swap.
+    """
+
     def __init__(
         self,
-        vector_store: QdrantStorage,
-        bm25_index: BM25Index,
+        vector_store: VectorStore,
+        bm25_index: Optional[BM25Index],
         embedder: Embedder,
         vector_weight: float = 0.5,
-        bm25_weight: float = 0.5
+        bm25_weight: float = 0.5,
+        server_side_fusion: bool = False,
+        chunk_store=None,
+        parallel_legs: bool = True,
+        vector_timeout: Optional[float] = VECTOR_LEG_TIMEOUT,
+        bm25_timeout: Optional[float] = BM25_LEG_TIMEOUT,
+        executor: Optional[ThreadPoolExecutor] = None,
+        embedding_cache: Optional[LRUCache] = None,
+        result_cache: Optional[LRUCache] = None,
+        fusion: str = FUSION_STRATEGY,
+        rrf_k: int = RRF_K,
+        adaptive_depth: bool = ADAPTIVE_CANDIDATE_DEPTH,
+        max_depth_factor: int = CANDIDATE_DEPTH_MAX_FACTOR,
+        duplicates=None,
+        profile: Union[str, Dict, SearchProfile] = SEARCH_PROFILE
     ):
         """
         Initialize hybrid retriever with both search systems.
         
         Args:
-            vector_store: QdrantStorage instance
-            bm25_index: BM25Index instance
+            vector_store: VectorStore backend (QdrantStorage or LocalVectorStore)
+            bm25_index: BM25Index instance (not needed with server_side_fusion)
             embedder: Embedder instance for query embedding
             vector_weight: Weight for vector search scores (default 0.5)
             bm25_weight: Weight for BM25 scores (default 0.5)
+            server_side_fusion: Let the vector store fuse dense and sparse BM25
+                results in one query (QdrantStorage with sparse=True). The
+                weights do not apply; fusion is Reciprocal Rank Fusion.
+            chunk_store: Where to fetch text for the final results (anything
+                with a `hydrate(keys)` method taking (doc_id, chunk_id)
+                keys, e.g. a ChunkStore).
+                Defaults to the vector store.
+            parallel_legs: Run the BM25 leg concurrently with query embedding
+                plus vector search instead of one after the other
+            vector_timeout: Seconds the vector leg (embedding + search) may take
+                before it is dropped from the results (None = no limit); for
+                `retrieve_many`, counted from the start of the batch. Only
+                enforced with parallel_legs
+            bm25_timeout: Seconds the BM25 leg may take (None = no limit)
+            executor: Thread pool for the legs; by default the retriever owns
+                one of RETRIEVER_MAX_WORKERS threads, reused across queries
+            embedding_cache: Normalized query text -> query embedding. Defaults
+                to an LRUCache sized by QUERY_EMBEDDING_CACHE_SIZE/_TTL
+            result_cache: (query, top_k, weights, use_contextual, filter,
+                index version) -> fused results. Defaults to an LRUCache sized by
+                RESULT_CACHE_SIZE/_TTL; emptied whenever the indexes change
+            fusion: How the two legs are combined: "minmax" (weighted sum of
+                min-max normalized scores), "zscore" or "rrf" (Reciprocal
+                Rank Fusion, weighted by the same weights)
+            rrf_k: Rank offset for "rrf" fusion
+            adaptive_depth: Start with top_k candidates per leg and double
+                the depth only while deeper lists could still change the
+                fused top_k (see `rrf_top_k_is_final`), up to
+                top_k * max_depth_factor. The result is the same as a fetch
+                at that maximum depth. Needs "rrf" fusion: min-max and
+                z-score results depend on the depth itself, so they always
+                use top_k * 2, and enabling it with them raises ValueError.
+            max_depth_factor: Upper bound of the adaptive depth, in multiples of top_k
+            duplicates: DuplicateMap of the chunks dropped as near-duplicates
+                at ingestion (see src.dedup); when given, every result gets
+                'references' citing the copies of its chunk
+            profile: Default search profile (see src.profiles) of queries
+                that do not pass their own
         """
-        self.vector_store = vector_store
-        self.bm25_index = bm25_index
+        if bm25_index is None and not server_side_fusion:
+            raise ValueError("bm25_index is required unless server_side_fusion is enabled")
+        if fusion not in FUSION_STRATEGIES:
+            raise ValueError(f"Unknown fusion strategy '{fusion}', expected one of {FUSION_STRATEGIES}")
+        if adaptive_depth and fusion != "rrf":
+            raise ValueError(f"Adaptive candidate depth needs rrf fusion, not '{fusion}' (set ADAPTIVE_CANDIDATE_DEPTH=false)")
+        # Everything a query reads from the indexes; replaced as a whole by `publish`
+        self._snapshot = IndexSnapshot(0, vector_store, bm25_index, chunk_store, duplicates)
         self.embedder = embedder
         self.vector_weight = vector_weight
         self.bm25_weight = bm25_weight
+        self.fusion = fusion
+        self.rrf_k = rrf_k
+        self.adaptive_depth = adaptive_depth
+        self.max_depth_factor = max_depth_factor
+        self.server_side_fusion = server_side_fusion
+        self.profile = self._resolve_profile(profile)
+        self.parallel_legs = parallel_legs
+        self.vector_timeout = vector_timeout
+        self.bm25_timeout = bm25_timeout
+        self._owns_executor = executor is None and parallel_legs
+        self._executor = executor
+        if self._owns_executor:
+            self._executor = ThreadPoolExecutor(
+                max_workers=RETRIEVER_MAX_WORKERS,
+                thread_name_prefix="retriever-leg"
+            )
+        self.embedding_cache = embedding_cache if embedding_cache is not None else LRUCache(
+            QUERY_EMBEDDING_CACHE_SIZE, QUERY_EMBEDDING_CACHE_TTL
+        )
+        self.result_cache = result_cache if result_cache is not None else LRUCache(
+            RESULT_CACHE_SIZE, RESULT_CACHE_TTL
+        )
+        self._cached_index_version = None
+        self._version_lock = threading.Lock()
 
-    def _normalize_scores(self, results: List[Dict]) -> List[Dict]:
+    @property
+    def snapshot(self) -> IndexSnapshot:
+        """The live index snapshot."""
+        return self._snapshot
+
+    @property
+    def vector_store(self):
+        return self._snapshot.vector_store
+
+    @property
+    def bm25_index(self):
+        return self._snapshot.bm25_index
+
+    @property
+    def chunk_store(self):
+        return self._snapshot.chunk_store
+
+    @property
+    def duplicates(self):
+        return self._snapshot.duplicates
+
+    def publish(self, snapshot: IndexSnapshot) -> IndexSnapshot:
         """
-        Normalize scores to 0-1 range using min-max normalization.
+        Switch to a new index snapshot (see src.snapshots.SnapshotManager).
+
+        A single reference assignment: queries read the snapshot once when
+        they start, so queries in flight finish on the previous version and
+        later ones see the new one, without any lock on the query path.
 
-        Args:
-            results: List of result dictionaries with 'score' field
-            
         Returns:
-            List of results with normalized scores
+            The previous snapshot
         """
-        if not results:
-            return results
-        scores=[r['score'] for r in results]
-        min_score = min(scores)
-        max_score = max(scores)
-        
-        # Avoid division by zero
-        score_range = max_score - min_score
+        if snapshot.bm25_index is None and not self.server_side_fusion:
+            raise ValueError("bm25_index is required unless server_side_fusion is enabled")
+        previous, self._snapshot = self._snapshot, snapshot
+        return previous
 
-        if score_range == 0:
-            # All scores are the same 
-            for result in results:
-                result['normalized_score'] = 1.0
-            return results
-        
-        # Min-max normalization: (score - min) / (max - min)
-        for result in results: 
-            result['normalized_score'] = (result['score'] - min_score) / score_range
-        
-        return results
+    def close(self) -> None:
+        """
+        Shut down the leg thread pool if the retriever created it.
+        """
+        if self._owns_executor:
+            self._executor.shutdown(wait=False)
+
+    def cache_stats(self) -> Dict[str, Dict]:
+        """
+        Hit/miss counters and hit rates of the embedding and result caches.
+        """
+        return {
+            'embedding': self.embedding_cache.stats(),
+            'results': self.result_cache.stats()
+        }
+
+    def _resolve_profile(self, profile: Union[str, Dict, SearchProfile, None]) -> SearchProfile:
+        """
+        SearchProfile of a query: `profile` resolved, or the retriever's
+        default when None. Server-side fusion always runs both legs.
+        """
+        profile = self.profile if profile is None else resolve_profile(profile)
+        if self.server_side_fusion and not (profile.vector and profile.bm25):
+            raise ValueError("Search profiles cannot skip a leg with server_side_fusion")
+        return profile
+
+    def _index_version(self, snapshot: IndexSnapshot):
+        """
+        Combined version of the indexes the results depend on. When a newer
+        one shows up (new snapshot published, chunks ingested, store reset)
+        cached results are dropped. Queries still running on an older
+        snapshot do not clear the cache again; their results are keyed by
+        their own version anyway.
+        """
+        version = (
+            snapshot.version,
+            getattr(snapshot.vector_store, 'version', 0),
+            getattr(snapshot.bm25_index, 'version', 0)
+        )
+        if self._cached_index_version is None or version > self._cached_index_version:
+            with self._version_lock:
+                if self._cached_index_version is None or version > self._cached_index_version:
+                    self.result_cache.clear()
+                    self._cached_index_version = version
+        return version
+
+    def _result_key(
+            self,
+            snapshot: IndexSnapshot,
+            query: str,
+            top_k: int,
+            use_contextual: bool,
+            filter: Optional[Dict] = None,
+            profile: SearchProfile = SearchProfile()
+        ):
+        return (
+            normalize_query(query),
+            top_k,
+            profile,
+            self.vector_weight,
+            self.bm25_weight,
+            self.fusion,
+            self.rrf_k,
+            self._depth_policy(),
+            use_contextual,
+            filter_key(filter),  # Also rejects a malformed filter before any search runs
+            self.server_side_fusion,
+            self._index_version(snapshot)
+        )
+
+    def _depth_policy(self):
+        return ("adaptive", self.max_depth_factor) if self.adaptive_depth else "fixed"
+
+    def _depth_range(self, top_k: int, profile: SearchProfile = SearchProfile()):
+        """
+        (first, maximum) candidates to request per leg. A single leg needs
+        no more than top_k; a profile's depth_factor fixes the depth.
+        """
+        if not (profile.vector and profile.bm25):
+            return top_k, top_k
+        if profile.depth_factor is not None:
+            return top_k * profile.depth_factor, top_k * profile.depth_factor
+        if self.adaptive_depth:
+            return top_k, top_k * self.max_depth_factor
+        return top_k * 2, top_k * 2
+
+    def _next_depth(
+            self,
+            vector_results: List[Dict],
+            bm25_results: List[Dict],
+            top_k: int,
+            depth: int,
+            max_depth: int
+        ) -> Optional[int]:
+        """
+        Depth of the next fetch, or None once deeper lists cannot change the
+        fused top_k. The depth doubles while the legs mostly agree on the
+        top_k; when fewer than half of it comes from both legs the fetch goes
+        straight to `max_depth`, which is where such queries end up anyway.
+        """
+        if depth >= max_depth:
+            return None
+        keys = {}
+        final, overlap = rrf_top_k_is_final(
+            *leg_arrays(vector_results, keys),
+            *leg_arrays(bm25_results, keys),
+            top_k=top_k,
+            depth=depth,
+            weights=(self.vector_weight, self.bm25_weight),
+            rrf_k=self.rrf_k
+        )
+        if final:
+            return None
+        return min(depth * 2, max_depth) if overlap >= 0.5 else max_depth
+
+    def _embed_query(self, query: str) -> np.ndarray:
+        """
+        Query embedding, served from the embedding cache when possible.
+        The cache key is the normalized query, but the model embeds the
+        query as typed. Cached embeddings are shared between threads, so
+        they are read-only.
+        """
+        key = normalize_query(query)
+        embedding = self.embedding_cache.get(key)
+        if embedding is None:
+            embedding = np.array(self.embedder.embed_query(query))
+            embedding.setflags(write=False)
+            self.embedding_cache.put(key, embedding)
+        return embedding
+
+    def _embed_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        Embeddings for a batch of queries; only cache misses go to the model,
+        in one batch (first spelling of each normalized query, as typed).
+        """
+        keys = [normalize_query(query) for query in queries]
+        embeddings = {key: self.embedding_cache.get(key) for key in keys}
+        originals = {}
+        for key, query in zip(keys, queries):
+            if embeddings[key] is None:
+                originals.setdefault(key, query)
+        if originals:
+            missing = list(originals)
+            vectors = np.array(self.embedder.embed_queries([originals[key] for key in missing]))
+            for key, embedding in zip(missing, vectors):
+                embedding.setflags(write=False)
+                embeddings[key] = embedding
+                self.embedding_cache.put(key, embedding)
+        return np.stack([embeddings[key] for key in keys])
 
     def retrieve(
             self, 
             query: str, 
             top_k: int = 10,
-            use_contextual: bool = True
+            use_contextual: bool = True,
+            filter: Optional[Dict] = None,
+            profile: Union[str, Dict, SearchProfile, None] = None
         ) -> List[Dict]:
         """
         Perform hybrid retrieval combining vector and BM25 search.
@@ -73,67 +408,442 @@ class HybridRetriever:
             query: Search query string
             top_k: Number of results to return
             use_contextual: Use contextual embeddings for vector search
+            filter: Metadata filter (see src.metadata) applied to both legs
+            profile: Search profile name ("fast", "balanced", "exhaustive"),
+                dict of settings or SearchProfile; None uses the retriever's
             
         Returns:
-            List of top_k results sorted by combined score
-        """
-        # Step 1: Vector search
-        query_embedding = self.embedder.embed_query(query)
-        vector_results = self.vector_store.search(
-            query_embedding, 
-            top_k=top_k * 2 , 
-            use_contextual=use_contextual
-        )
+            RetrievalResults: top_k results sorted by combined score; its
+            `partial` flag is set when a leg missed its deadline or failed
+        """
+        start = time.perf_counter()
+        snapshot = self._snapshot  # This query runs on this version from start to finish
+        profile = self._resolve_profile(profile)
+        key = self._result_key(snapshot, query, top_k, use_contextual, filter, profile)
+        cached = self.result_cache.get(key)
+        if cached is not None:
+            metrics.count("retriever.result_cache", outcome="hit")
+            return RetrievalResults(_copy_results(cached), cached=True, profile=profile)
+        metrics.count("retriever.result_cache", outcome="miss")
+
+        if self.server_side_fusion:
+            query_embedding = self._embed_query(query)
+            results = RetrievalResults(
+                self._retrieve_server_side(snapshot, query, query_embedding, top_k, use_contextual, filter, profile),
+                profile=profile
+            )
+            stages = {}
+        else:
+            depth, max_depth = self._depth_range(top_k, profile)
+            rounds, timings = 0, {}
+            while True:
+                # Step 1 + 2: Vector leg (embed + search) and BM25 leg; the
+                # query embedding is cached, so deeper rounds only search again
+                elapsed = time.perf_counter() - start
+                vector_results, bm25_results, failed_legs, round_timings = self._run_legs(
+                    lambda: self._vector_leg(snapshot, query, depth, use_contextual, filter, profile),
+                    lambda: self._bm25_leg(snapshot, query, depth, filter, profile),
+                    timeouts=(
+                        None if self.vector_timeout is None else self.vector_timeout - elapsed,
+                        None if self.bm25_timeout is None else self.bm25_timeout - elapsed
+                    )
+                )
+                rounds += 1
+                for leg, seconds in round_timings.items():
+                    timings[leg] = timings.get(leg, 0.0) + seconds
+                next_depth = None if failed_legs else self._next_depth(
+                    vector_results, bm25_results, top_k, depth, max_depth
+                )
+                if next_depth is None:
+                    break
+                depth = next_depth
+
+            fuse_start = time.perf_counter()
+            fused = self._fuse(snapshot, vector_results, bm25_results, top_k)
+            hydrate_start = time.perf_counter()
+            results = RetrievalResults(
+                self._hydrate(snapshot, fused),
+                partial=bool(failed_legs),
+                failed_legs=failed_legs,
+                timings=timings,
+                depth=depth,
+                rounds=rounds,
+                profile=profile
+            )
+            stages = dict(timings, fuse=hydrate_start - fuse_start, hydrate=time.perf_counter() - hydrate_start)
 
-        # Query BM25 index
-        bm25_results = self.bm25_index.search(query, top_k=top_k * 2)
+        # Partial results are not cached: the next call may get both legs
+        if not results.partial:
+            self.result_cache.put(key, _copy_results(results))
+        if metrics.enabled():
+            stages['total'] = time.perf_counter() - start
+            metrics.record_trace(
+                "retriever.retrieve", stages,
+                depth=results.depth, rounds=results.rounds, failed_legs=sorted(results.failed_legs)
+            )
+        return results
 
-        # Normalize scores
-        vector_results = self._normalize_scores(vector_results)
-        bm25_results = self._normalize_scores(bm25_results)
+    def retrieve_many(
+            self,
+            queries: List[str],
+            top_k: int = 10,
+            use_contextual: bool = True,
+            filter: Optional[Dict] = None,
+            profile: Union[str, Dict, SearchProfile, None] = None
+        ) -> List[List[Dict]]:
+        """
+        Hybrid retrieval for a batch of queries (evaluation, offline question sets).
 
-        # Step 3: Merge results by Chunk_id
-        merged_results = {}
+        Queries are embedded in batches, vector searches go to the store in a
+        single batch request and BM25 scores the whole batch at once; results
+        are then fused per query exactly as in `retrieve`.
 
-        # Add vector results
-        for result in vector_results:
-            chunk_id = result['chunk_id']
-            merged_results[chunk_id] = {
-                'chunk_id': chunk_id,
-                'chunk_text': result['chunk_text'],
-                'context': result['context'],
-                'vector_score': result['normalized_score'],
-                'bm25_score': 0.0  # Default if not found in BM25
-            }
+        Args:
+            queries: Search query strings
+            top_k: Number of results to return per query
+            use_contextual: Use contextual embeddings for vector search
+            filter: Metadata filter applied to every query
+            profile: Search profile applied to every query (see `retrieve`)
 
-        # Add/update BM25 results
-        for result in bm25_results:
-            chunk_id = result['chunk_id']
-            if chunk_id in merged_results:
-                merged_results[chunk_id]['bm25_score'] = result['normalized_score']
-            else:
-                # Add new entry 
-                merged_results[chunk_id] = {
-                    'chunk_id': chunk_id,
-                    'chunk_text': result['chunk_text'],
-                    'context': result.get('context', ''),
-                    'vector_score': 0.0,  # Default if not found in vector search
-                    'bm25_score': result['normalized_score']
-                }
-        
-        # Step 4: Compute combined score 
-        for chunk_id, result in merged_results.items():
-            combined_score = (
-                self.vector_weight * result['vector_score'] +
-                self.bm25_weight * result['bm25_score']
+        Returns:
+            One RetrievalResults per query, in input order
+        """
+        if not queries:
+            return []
+        snapshot = self._snapshot
+        profile = self._resolve_profile(profile)
+        keys = [self._result_key(snapshot, query, top_k, use_contextual, filter, profile) for query in queries]
+        batch = [self.result_cache.get(key) for key in keys]
+        todo = [i for i, cached in enumerate(batch) if cached is None]
+        fresh = set(todo)
+        metrics.count("retriever.result_cache", len(queries) - len(todo), outcome="hit")
+        metrics.count("retriever.result_cache", len(todo), outcome="miss")
+        if todo:
+            with metrics.span("retriever.retrieve_batch"):
+                computed = self._retrieve_batch(
+                    snapshot, [queries[i] for i in todo], top_k, use_contextual, filter, profile
+                )
+            for i, results in zip(todo, computed):
+                batch[i] = results
+                if not results.partial:
+                    self.result_cache.put(keys[i], _copy_results(results))
+        return [
+            results if i in fresh else RetrievalResults(_copy_results(results), cached=True, profile=profile)
+            for i, results in enumerate(batch)
+        ]
+
+    def _retrieve_batch(
+            self,
+            snapshot: IndexSnapshot,
+            queries: List[str],
+            top_k: int,
+            use_contextual: bool,
+            filter: Optional[Dict] = None,
+            profile: SearchProfile = SearchProfile()
+        ) -> List[RetrievalResults]:
+        """
+        Uncached part of `retrieve_many`.
+        """
+        scope = _scope(filter)
+        if self.server_side_fusion:
+            embeddings = self._embed_queries(queries)
+            return [
+                RetrievalResults(
+                    self._retrieve_server_side(snapshot, query, embedding, top_k, use_contextual, filter, profile),
+                    profile=profile
+                )
+                for query, embedding in zip(queries, embeddings)
+            ]
+
+        start = time.perf_counter()
+        first_depth, max_depth = self._depth_range(top_k, profile)
+        embeddings = None
+        # depth -> queries still to fetch at that depth (adaptive depth may need several rounds)
+        pending = {first_depth: list(range(len(queries)))}
+        vector_batches, bm25_batches = [None] * len(queries), [None] * len(queries)
+        depths, rounds = [first_depth] * len(queries), [0] * len(queries)
+        failures, timings = [{}] * len(queries), {}
+        while pending:
+            depth = min(pending)
+            batch = pending.pop(depth)
+
+            def vector_leg():
+                nonlocal embeddings
+                if not profile.vector:
+                    return None
+                if embeddings is None:
+                    embeddings = self._embed_queries(queries)
+                return snapshot.vector_store.search_batch(
+                    embeddings[batch],
+                    top_k=depth,
+                    use_contextual=use_contextual,
+                    with_payload=["chunk_id"],
+                    **scope,
+                    **profile.vector_options()
+                )
+
+            def bm25_leg():
+                if not profile.bm25:
+                    return None
+                return snapshot.bm25_index.search_many(
+                    [queries[i] for i in batch], top_k=depth, **scope, **profile.bm25_options()
+                )
+
+            # Deadlines count from the start of the batch, as from the start of a single query
+            elapsed = time.perf_counter() - start
+            vector_round, bm25_round, failed_legs, round_timings = self._run_legs(
+                vector_leg,
+                bm25_leg,
+                timeouts=(
+                    None if self.vector_timeout is None else self.vector_timeout - elapsed,
+                    None if self.bm25_timeout is None else self.bm25_timeout - elapsed
+                )
+            )
+            for leg, seconds in round_timings.items():
+                timings[leg] = timings.get(leg, 0.0) + seconds
+            vector_round = vector_round or [[] for _ in batch]
+            bm25_round = bm25_round or [[] for _ in batch]
+
+            for i, vector_results, bm25_results in zip(batch, vector_round, bm25_round):
+                vector_batches[i], bm25_batches[i] = vector_results, bm25_results
+                depths[i], failures[i] = depth, failed_legs
+                rounds[i] += 1
+                next_depth = None if failed_legs else self._next_depth(
+                    vector_results, bm25_results, top_k, depth, max_depth
+                )
+                if next_depth is not None:
+                    pending.setdefault(next_depth, []).append(i)
+
+        fused = [
+            self._fuse(snapshot, vector_results, bm25_results, top_k)
+            for vector_results, bm25_results in zip(vector_batches, bm25_batches)
+        ]
+        # One bulk hydration for every query's final results
+        self._hydrate(snapshot, [result for results in fused for result in results])
+        return [
+            RetrievalResults(
+                results,
+                partial=bool(failures[i]),
+                failed_legs=failures[i],
+                timings=dict(timings),
+                depth=depths[i],
+                rounds=rounds[i],
+                profile=profile
             )
-            result['combined_score'] = combined_score
+            for i, results in enumerate(fused)
+        ]
+
+    def _fuse(
+            self,
+            snapshot: IndexSnapshot,
+            vector_results: List[Dict],
+            bm25_results: List[Dict],
+            top_k: int
+        ) -> List[Dict]:
+        """
+        Merge the two legs by chunk key (doc_id, chunk_id) with the
+        configured fusion strategy (see `src.fusion.fuse`) and build result
+        dicts for the top_k only. The leg results are not modified.
+        """
+        keys = {}
+        vector_ids, vector_scores = leg_arrays(vector_results, keys)
+        bm25_ids, bm25_scores = leg_arrays(bm25_results, keys)
+        key_list = list(keys)
+        fused = fuse(
+            vector_ids, vector_scores, bm25_ids, bm25_scores,
+            top_k=top_k,
+            strategy=self.fusion,
+            weights=(self.vector_weight, self.bm25_weight),
+            rrf_k=self.rrf_k
+        )
+
+        final_results = []
+        for key_id, combined, vector_score, bm25_score, bm25_pos in zip(
+            fused.ids.tolist(),
+            fused.scores.tolist(),
+            fused.vector_scores.tolist(),
+            fused.bm25_scores.tolist(),
+            fused.bm25_positions.tolist()
+        ):
+            # BM25 results already hold the text in memory; the rest is hydrated later
+            bm25_hit = bm25_results[bm25_pos] if bm25_pos >= 0 else None
+            doc_id, chunk_id = key_list[key_id]
+            final_results.append({
+                'doc_id': doc_id,
+                'chunk_id': chunk_id,
+                'chunk_text': bm25_hit['chunk_text'] if bm25_hit else None,
+                'context': bm25_hit.get('context', '') if bm25_hit else None,
+                'vector_score': vector_score,
+                'bm25_score': bm25_score,
+                'combined_score': combined
+            })
+        return self._cite(snapshot, final_results)
 
-        # Step 5: Sort by combined score and return top_k
-        final_results = sorted(
-            merged_results.values(),
-            key=lambda x: x['combined_score'],
-            reverse=True
-        )[:top_k]
+    def _cite(self, snapshot: IndexSnapshot, results: List[Dict]) -> List[Dict]:
+        """
+        Add the near-duplicate copies of each result's chunk as 'references'
+        (only when the snapshot has a DuplicateMap).
+        """
+        if snapshot.duplicates is not None:
+            for result in results:
+                # Copies: the DuplicateMap is shared by every query on the snapshot
+                result['references'] = [
+                    dict(reference) for reference in snapshot.duplicates.get((result['doc_id'], result['chunk_id']))
+                ]
+        return results
 
-        return final_results
\ No newline at end of file
+    def _vector_leg(
+            self,
+            snapshot: IndexSnapshot,
+            query: str,
+            depth: int,
+            use_contextual: bool,
+            filter: Optional[Dict] = None,
+            profile: SearchProfile = SearchProfile()
+        ) -> List[Dict]:
+        """
+        Embed the query and search the vector store (nothing if the profile
+        skips the vector leg).
+        """
+        if not profile.vector:
+            return []
+        query_embedding = self._embed_query(query)
+        # IDs and scores only (chunk key): text is hydrated for the final top_k
+        return snapshot.vector_store.search(
+            query_embedding,
+            top_k=depth,
+            use_contextual=use_contextual,
+            with_payload=["chunk_id"],
+            **_scope(filter),
+            **profile.vector_options()
+        )
+
+    def _bm25_leg(
+            self,
+            snapshot: IndexSnapshot,
+            query: str,
+            depth: int,
+            filter: Optional[Dict] = None,
+            profile: SearchProfile = SearchProfile()
+        ) -> List[Dict]:
+        """
+        Query the BM25 index (nothing if the profile skips the BM25 leg).
+        """
+        if not profile.bm25:
+            return []
+        return snapshot.bm25_index.search(query, top_k=depth, **_scope(filter), **profile.bm25_options())
+
+    def _run_legs(self, vector_leg, bm25_leg, timeouts=(None, None)):
+        """
+        Run both search legs, concurrently when `parallel_legs` is set.
+
+        Args:
+            vector_leg: Callable returning the vector results
+            bm25_leg: Callable returning the BM25 results
+            timeouts: (vector, bm25) deadlines in seconds, None for no limit
+
+        Each leg gets its own deadline measured from the start of the query.
+        A leg that misses it (or raises) contributes no results and is
+        reported in `failed_legs`; the thread keeps running in the pool until
+        it finishes, but the query does not wait for it. If both legs fail
+        the first error is raised. Sequential legs run on the calling thread,
+        which cannot be interrupted, so they have no deadlines; a leg that
+        raises is still dropped the same way.
+
+        Returns:
+            (vector_results, bm25_results, failed_legs, timings)
+        """
+        timings = {}
+
+        def timed(name, leg):
+            def run():
+                t0 = time.perf_counter()
+                results = leg()
+                timings[name] = time.perf_counter() - t0
+                return results
+            return run
+
+        legs = {
+            'vector': (timed('vector', vector_leg), timeouts[0]),
+            'bm25': (timed('bm25', bm25_leg), timeouts[1])
+        }
+
+        results, errors = {}, {}
+        if not self.parallel_legs:
+            for name, (run, _) in legs.items():
+                try:
+                    results[name] = run()
+                except Exception as e:
+                    results[name] = []
+                    errors[name] = e
+        else:
+            start = time.perf_counter()
+            futures = {name: self._executor.submit(run) for name, (run, _) in legs.items()}
+            for name, (_, timeout) in legs.items():
+                remaining = None if timeout is None else max(0.0, timeout - (time.perf_counter() - start))
+                try:
+                    results[name] = futures[name].result(timeout=remaining)
+                except Exception as e:  # Includes TimeoutError from a missed deadline
+                    results[name] = []
+                    errors[name] = e
+
+        if len(errors) == len(legs):
+            raise errors['vector']
+        failed_legs = {
+            name: 'timed out' if isinstance(e, TimeoutError) else repr(e)
+            for name, e in errors.items()
+        }
+        # Copy: legs that missed their deadline may still write their timing
+        return results['vector'], results['bm25'], failed_legs, dict(timings)
+
+    def _hydrate(self, snapshot: IndexSnapshot, results: List[Dict]) -> List[Dict]:
+        """
+        Fill in text for results that only came back with IDs and scores,
+        with one bulk lookup for the final results only.
+        """
+        missing = [(r['doc_id'], r['chunk_id']) for r in results if r['chunk_text'] is None]
+        if not missing:
+            return results
+        payloads = snapshot.chunk_store.hydrate(missing)
+        for result in results:
+            if result['chunk_text'] is None:
+                payload = payloads.get((result['doc_id'], result['chunk_id']), {})
+                result['chunk_text'] = payload.get('chunk_text', '')
+                result['context'] = payload.get('context', '')
+        return results
+
+    def _retrieve_server_side(
+            self,
+            snapshot: IndexSnapshot,
+            query: str,
+            query_embedding: np.ndarray,
+            top_k: int,
+            use_contextual: bool,
+            filter: Optional[Dict] = None,
+            profile: SearchProfile = SearchProfile()
+        ) -> List[Dict]:
+        """
+        Single round-trip hybrid retrieval: the vector store runs both the
+        dense and the sparse BM25 leg and fuses them (RRF).
+
+        Results carry only 'combined_score'; per-leg scores are not returned
+        by a fused query. Of the profile settings only depth_factor applies.
+        """
+        hits = snapshot.vector_store.hybrid_search(
+            query_embedding,
+            query,
+            top_k=top_k,
+            use_contextual=use_contextual,
+            candidates=top_k * (profile.depth_factor or 2),
+            **_scope(filter)
+        )
+        return self._cite(snapshot, [
+            {
+                'doc_id': hit.get('doc_id') or DEFAULT_DOC_ID,
+                'chunk_id': hit['chunk_id'],
+                'chunk_text': hit['chunk_text'],
+                'context': hit['context'],
+                'combined_score': hit['score']
+            }
+            for hit in hits
+        ])
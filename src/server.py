@@ -0,0 +1,457 @@
+"""
+Long-lived query service over HybridRetriever.
+
+Loads the embedder and attaches to the persisted indexes once, then answers
+queries over HTTP until stopped. Concurrent requests are grouped into
+micro-batches and answered with one `retrieve_many` call per batch.
+
+    python main.py data/mydocument.pdf --local-store --save-index   # ingest once
+    python -m src.server --local-store                              # serve
+
+Endpoints:
+    POST /query     {"query": "...", "top_k": 10, "use_contextual": true,
+                     "filter": {"doc_id": "..."}, "profile": "fast"}
+                    (filter optional, see src.metadata; profile optional, a
+                    name or a dict of settings, see src.profiles)
+    GET  /healthz   200 while the process is up
+    GET  /readyz    200 once models and indexes are loaded, 503 before
+    GET  /metrics   Prometheus text format (with --metrics or METRICS_ENABLED=true)
+"""
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+import warnings
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Union
+
+from src import metrics
+from src.bm25_index import BM25Index
+from src.bundle import MANIFEST_FILE, POSTINGS_DIR
+from src.chunk_store import ChunkStore
+from src.compression import with_stored_projection
+from src.dedup import DuplicateMap
+from src.embedder import Embedder
+from src.metadata import filter_key, normalize_filter
+from src.profiles import SearchProfile, resolve_profile
+from src.retriever import HybridRetriever
+from src.vector_store import create_vector_store
+from config import (
+    VECTOR_BACKEND,
+    INDEX_DIR,
+    SERVER_HOST,
+    SERVER_PORT,
+    SERVER_MAX_BATCH_SIZE,
+    SERVER_BATCH_WAIT_MS
+)
+
+# Files written by `main.py --save-index` inside INDEX_DIR (an index bundle has
+# CHUNK_STORE_DIR and POSTINGS_DIR instead of BM25_FILE, see src.bundle)
+BM25_FILE = "bm25.jsonl"
+CHUNK_STORE_DIR = "chunks"
+FINGERPRINT_FILE = "fingerprint"
+
+
+def saved_fingerprint(index_dir: str) -> Optional[str]:
+    """
+    Corpus fingerprint the files in `index_dir` were built from: the one
+    `main.py --save-index` writes, else an imported bundle's; None if
+    neither is there.
+    """
+    fingerprint_path = os.path.join(index_dir, FINGERPRINT_FILE)
+    if os.path.exists(fingerprint_path):
+        with open(fingerprint_path) as f:
+            return f.read().strip() or None
+    manifest_path = os.path.join(index_dir, MANIFEST_FILE)
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            return json.load(f).get("collection_metadata", {}).get("fingerprint")
+    return None
+
+
+def load_retriever(
+    index_dir: str = INDEX_DIR,
+    backend: str = VECTOR_BACKEND,
+    collection_name: str = "interactive_session",
+    embedder=None,
+    **store_kwargs
+) -> HybridRetriever:
+    """
+    Attach to persisted indexes without re-ingesting anything.
+
+    The vector store is opened as is (the Qdrant collection, or the
+    memory-mapped local store), BM25 is memory-mapped from saved postings
+    (an imported bundle) or rebuilt from the saved chunk text (or, without
+    a saved index, from the vector store payloads) and, when present, the
+    saved ChunkStore serves hydration. If the saved files were built from
+    another corpus than the collection (e.g. a reload published a new
+    version under the alias), they are ignored with a warning: BM25 is
+    rebuilt from the payloads, which also serve hydration. Near-duplicate
+    references stored in the collection metadata are cited in the results,
+    and a stored embedding projection (src.compression) is applied to queries.
+
+    Args:
+        index_dir: Directory written by `main.py --save-index`, or an imported bundle
+        backend: Vector store backend, "qdrant" or "local"
+        collection_name: Collection holding the ingested chunks
+        embedder: Query embedder; defaults to a new Embedder
+        **store_kwargs: Passed to the vector store constructor (e.g. path)
+
+    Returns:
+        A ready HybridRetriever
+    """
+    vector_store = create_vector_store(backend, collection_name=collection_name, **store_kwargs)
+    if vector_store.count() == 0:
+        raise ValueError(f"Collection '{collection_name}' ({backend}) is empty; ingest a document first")
+    metadata = vector_store.metadata()
+    saved, stored = saved_fingerprint(index_dir), metadata.get("fingerprint")
+    stale = saved is not None and stored is not None and saved != stored
+    if stale:
+        warnings.warn(
+            f"Index files in {index_dir} were built from corpus {saved[:12]}, collection "
+            f"'{vector_store.collection_name}' holds {stored[:12]}; rebuilding BM25 from the collection"
+        )
+    chunk_store_path = os.path.join(index_dir, CHUNK_STORE_DIR)
+    chunk_store = ChunkStore.open(chunk_store_path) if os.path.isdir(chunk_store_path) and not stale else None
+    postings_path = os.path.join(index_dir, POSTINGS_DIR)
+    bm25_path = os.path.join(index_dir, BM25_FILE)
+    if chunk_store is not None and os.path.isdir(postings_path):
+        bm25_index = BM25Index.open_postings(postings_path, chunk_store)
+    elif os.path.exists(bm25_path) and not stale:
+        bm25_index = BM25Index.load(bm25_path)
+    else:
+        bm25_index = BM25Index.from_vector_store(vector_store)
+    if embedder is None:
+        embedder = Embedder()
+        embedder.warm_up()  # Ready means the first query does not pay for loading the model
+    duplicates = DuplicateMap.from_metadata(metadata)
+    return HybridRetriever(
+        vector_store=vector_store,
+        bm25_index=bm25_index,
+        embedder=with_stored_projection(embedder, metadata),
+        chunk_store=chunk_store,
+        duplicates=duplicates if len(duplicates) else None
+    )
+
+
+class MicroBatcher:
+    """
+    Groups concurrent queries into `retrieve_many` calls.
+
+    The first queued query opens a batch; the batch is dispatched when it
+    holds `max_batch_size` queries or `max_wait` seconds have passed,
+    whichever comes first. Queries with different (top_k, use_contextual,
+    filter, profile) in the same batch are split into one call per setting.
+
+    Args:
+        retriever: HybridRetriever answering the batches
+        max_batch_size: Maximum queries per batch
+        max_wait: Seconds the first query of a batch waits for others
+    """
+
+    def __init__(
+        self,
+        retriever: HybridRetriever,
+        max_batch_size: int = SERVER_MAX_BATCH_SIZE,
+        max_wait: float = SERVER_BATCH_WAIT_MS / 1000
+    ) -> None:
+        self.retriever = retriever
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.batches = 0
+        self.queries = 0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(
+        self,
+        query: str,
+        top_k: int = 10,
+        use_contextual: bool = True,
+        filter: Optional[Dict] = None,
+        profile: Union[str, Dict, SearchProfile, None] = None
+    ) -> Future:
+        """
+        Queue a query; the future resolves to its RetrievalResults. A None
+        profile uses the retriever's default. A malformed filter or profile
+        fails this query's future only, without reaching the worker.
+        """
+        if self._closed:
+            raise RuntimeError("MicroBatcher is closed")
+        future = Future()
+        try:
+            key = filter_key(filter)
+            profile = None if profile is None else resolve_profile(profile)  # Hashable, for grouping
+        except (ValueError, TypeError) as e:
+            future.set_exception(e)
+            return future
+        self._queue.put((query, top_k, use_contextual, filter, key, profile, future))
+        return future
+
+    def _collect(self) -> Optional[List]:
+        item = self._queue.get()
+        if item is None:
+            return None
+        batch = [item]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)  # Let the loop exit after this batch
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            groups: Dict = {}
+            filters: Dict = {}
+            for query, top_k, use_contextual, filter, key, profile, future in batch:
+                group = (top_k, use_contextual, key, profile)
+                filters.setdefault(group, filter)
+                groups.setdefault(group, []).append((query, future))
+            for group, items in groups.items():
+                top_k, use_contextual, _, profile = group
+                try:
+                    results = self.retriever.retrieve_many(
+                        [query for query, _ in items],
+                        top_k=top_k,
+                        use_contextual=use_contextual,
+                        filter=filters[group],
+                        profile=profile
+                    )
+                except Exception as e:
+                    for _, future in items:
+                        future.set_exception(e)
+                    continue
+                for (_, future), result in zip(items, results):
+                    future.set_result(result)
+                self.batches += 1
+                self.queries += len(items)
+                metrics.count("server.batches")
+                metrics.count("server.queries", len(items))
+
+    def close(self) -> None:
+        """
+        Stop the worker after the queued queries are answered.
+        """
+        self._closed = True
+        self._queue.put(None)
+        self._worker.join()
+
+
+class QueryService:
+    """
+    Owns the retriever and the micro-batcher, and tracks readiness.
+
+    `start()` runs the (slow) loader in a background thread so the HTTP
+    server can answer health checks while models and indexes load.
+
+    Args:
+        loader: Callable returning a ready HybridRetriever (e.g. `load_retriever`)
+        max_batch_size: See MicroBatcher
+        max_wait: See MicroBatcher
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[], HybridRetriever],
+        max_batch_size: int = SERVER_MAX_BATCH_SIZE,
+        max_wait: float = SERVER_BATCH_WAIT_MS / 1000
+    ) -> None:
+        self.loader = loader
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.retriever: Optional[HybridRetriever] = None
+        self.batcher: Optional[MicroBatcher] = None
+        self.error: Optional[str] = None
+        self._ready = threading.Event()
+
+    def start(self, background: bool = True) -> None:
+        """
+        Load models and indexes, in a background thread by default.
+        """
+        if background:
+            threading.Thread(target=self._load, name="index-loader", daemon=True).start()
+        else:
+            self._load()
+
+    def _load(self) -> None:
+        try:
+            self.retriever = self.loader()
+            self.batcher = MicroBatcher(self.retriever, self.max_batch_size, self.max_wait)
+            self._ready.set()
+        except Exception as e:
+            self.error = repr(e)
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        return self._ready.wait(timeout)
+
+    def query(
+        self,
+        query: str,
+        top_k: int = 10,
+        use_contextual: bool = True,
+        timeout: Optional[float] = None,
+        filter: Optional[Dict] = None,
+        profile: Union[str, Dict, SearchProfile, None] = None
+    ):
+        """
+        Answer one query through the micro-batcher.
+        """
+        if not self.ready:
+            raise RuntimeError("Service is not ready")
+        return self.batcher.submit(query, top_k, use_contextual, filter, profile).result(timeout=timeout)
+
+    def stats(self) -> Dict:
+        stats = {"ready": self.ready}
+        if self.batcher is not None:
+            stats["batches"] = self.batcher.batches
+            stats["queries"] = self.batcher.queries
+        if self.retriever is not None:
+            stats["cache"] = self.retriever.cache_stats()
+        return stats
+
+    def close(self) -> None:
+        if self.batcher is not None:
+            self.batcher.close()
+        if self.retriever is not None:
+            self.retriever.close()
+
+
+def _results_json(results) -> Dict:
+    return {
+        "results": [dict(result) for result in results],
+        "partial": results.partial,
+        "failed_legs": results.failed_legs,
+        "cached": results.cached,
+        "timings": results.timings
+    }
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """
+    HTTP front end of a QueryService (set as `service` on the server).
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args) -> None:  # Keep the console quiet
+        pass
+
+    def _send(self, status: int, body, content_type: str = "application/json") -> None:
+        payload = (json.dumps(body) if content_type == "application/json" else body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self) -> None:
+        service = self.server.service
+        if self.path == "/healthz":
+            self._send(200, {"status": "ok"})
+        elif self.path == "/readyz":
+            if service.ready:
+                self._send(200, {"status": "ready"})
+            else:
+                self._send(503, {"status": "loading" if service.error is None else "failed", "error": service.error})
+        elif self.path == "/stats":
+            self._send(200, service.stats())
+        elif self.path == "/metrics":
+            self._send(200, metrics.prometheus_text(), content_type="text/plain; version=0.0.4")
+        else:
+            self._send(404, {"error": "not found"})
+
+    def do_POST(self) -> None:
+        service = self.server.service
+        if self.path != "/query":
+            self._send(404, {"error": "not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            query = request["query"]
+            top_k = int(request.get("top_k", 10))
+            use_contextual = bool(request.get("use_contextual", True))
+            filter = normalize_filter(request.get("filter"))
+            profile = None if request.get("profile") is None else resolve_profile(request["profile"])
+        except (ValueError, KeyError, TypeError) as e:
+            self._send(400, {"error": f"bad request: {e!r}"})
+            return
+        if not service.ready:
+            self._send(503, {"error": "service is not ready"})
+            return
+        try:
+            results = service.query(query, top_k=top_k, use_contextual=use_contextual, filter=filter, profile=profile)
+        except Exception as e:
+            self._send(500, {"error": repr(e)})
+            return
+        self._send(200, _results_json(results))
+
+
+class QueryHTTPServer(ThreadingHTTPServer):
+    """
+    One thread per connection, with a listen backlog sized for bursts of
+    concurrent clients (the socketserver default of 5 resets connections).
+    """
+    daemon_threads = True
+    request_queue_size = 128
+
+
+def make_server(service: QueryService, host: str = SERVER_HOST, port: int = SERVER_PORT) -> ThreadingHTTPServer:
+    """
+    HTTP server for `service` (port 0 picks a free port).
+    """
+    server = QueryHTTPServer((host, port), QueryHandler)
+    server.service = service
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve hybrid retrieval over HTTP")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--index-dir", default=INDEX_DIR)
+    parser.add_argument("--collection", default="interactive_session")
+    parser.add_argument("--local-store", action="store_true", help="Use the in-process vector store")
+    parser.add_argument("--metrics", action="store_true", help="Record metrics for GET /metrics")
+    args = parser.parse_args()
+
+    if args.metrics:
+        metrics.enable()
+
+    backend = "local" if args.local_store else VECTOR_BACKEND
+    service = QueryService(lambda: load_retriever(args.index_dir, backend, args.collection))
+    service.start()
+    server = make_server(service, args.host, args.port)
+    print(f"Serving on http://{server.server_address[0]}:{server.server_address[1]} (loading indexes...)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Versioned index snapshots: re-index next to the live indexes, then switch.
+
+An IndexSnapshot bundles everything a query reads: the vector store, the
+BM25 index, the chunk store used for hydration and the near-duplicate
+references. HybridRetriever holds exactly one snapshot and every query
+reads that reference once, up front, so a query runs on one version from
+start to finish without taking a lock.
+
+Re-indexing with a SnapshotManager never touches the live indexes:
+
+    manager = SnapshotManager(retriever, alias="interactive_session")
+    store = manager.new_vector_store()     # new versioned collection
+    store.add_chunks(chunks)
+    bm25 = BM25Index(); bm25.add_documents(chunks)
+    manager.publish(store, bm25)            # alias + retriever switch
+
+`publish` points the collection alias at the new collection (one atomic
+alias update on Qdrant, an atomically replaced pointer file for the local
+store) and swaps the retriever's snapshot reference. Queries already
+running keep their reference to the old snapshot and finish on it. Once the
+last of them is done the old snapshot is unreachable; a `weakref.finalize`
+callback then queues its collection for deletion, which happens on the next
+`publish` or `collect` (never on a query thread).
+"""
+import itertools
+import threading
+import uuid
+import weakref
+from collections import deque
+from typing import List
+
+from src import metrics
+
+
+def versioned_name(alias: str) -> str:
+    """Name of a new versioned collection behind `alias`: `<alias>-<random suffix>`."""
+    return f"{alias}-{uuid.uuid4().hex[:12]}"
+
+
+class IndexSnapshot:
+    """
+    One immutable version of the indexes a query runs against.
+
+    Args:
+        version: Snapshot number, increasing with every publish
+        vector_store: VectorStore of this version
+        bm25_index: BM25Index of this version (None with server-side fusion)
+        chunk_store: Where final results are hydrated from; defaults to the vector store
+        duplicates: DuplicateMap of this version, or None
+    """
+
+    __slots__ = ("version", "vector_store", "bm25_index", "chunk_store", "duplicates", "__weakref__")
+
+    def __init__(self, version: int, vector_store, bm25_index=None, chunk_store=None, duplicates=None) -> None:
+        self.version = version
+        self.vector_store = vector_store
+        self.bm25_index = bm25_index
+        self.chunk_store = chunk_store if chunk_store is not None else vector_store
+        self.duplicates = duplicates
+
+    def __repr__(self) -> str:
+        return f"IndexSnapshot(version={self.version}, collection={getattr(self.vector_store, 'collection_name', None)!r})"
+
+
+class SnapshotManager:
+    """
+    Builds and publishes new snapshots for a HybridRetriever, and drops the
+    collections of versions no query uses any more.
+
+    Publishing is serialized with a lock; queries never take it.
+
+    Args:
+        retriever: HybridRetriever to switch; its current snapshot is the live version
+        alias: Collection alias that always names the live collection, so a
+            restarted process or the query server attaches to it by name
+    """
+
+    def __init__(self, retriever, alias: str) -> None:
+        self.retriever = retriever
+        self.alias = alias
+        self._versions = itertools.count(retriever.snapshot.version + 1)
+        self._publish_lock = threading.Lock()
+        self._retired: deque = deque()  # Stores of unreachable snapshots, appended by finalizers
+
+    def new_vector_store(self):
+        """
+        Empty vector store for the next version: a new collection named
+        `<alias>-<random suffix>` with the live store's backend and settings.
+        """
+        return self.retriever.snapshot.vector_store.sibling(versioned_name(self.alias))
+
+    @metrics.timed("snapshots.publish")
+    def publish(self, vector_store, bm25_index=None, chunk_store=None, duplicates=None) -> IndexSnapshot:
+        """
+        Make the given indexes the live version.
+
+        The alias is pointed at `vector_store`'s collection first, then the
+        retriever's snapshot reference is swapped. The previous snapshot's
+        collection is dropped once no query holds that snapshot any more
+        (unless the new snapshot reuses the same vector store).
+
+        Returns:
+            The published snapshot
+        """
+        with self._publish_lock:
+            snapshot = IndexSnapshot(next(self._versions), vector_store, bm25_index, chunk_store, duplicates)
+            vector_store.set_alias(self.alias)
+            previous = self.retriever.publish(snapshot)
+            if previous is not None and previous.vector_store is not vector_store:
+                # The callback must not reference the snapshot, only the store to drop
+                weakref.finalize(previous, self._retired.append, previous.vector_store)
+            del previous  # Without queries in flight the old snapshot is released here
+            metrics.count("snapshots.published")
+            self.collect()
+            return snapshot
+
+    def collect(self) -> List[str]:
+        """
+        Drop the collections of snapshots that are no longer reachable.
+
+        Returns:
+            Names of the dropped collections
+        """
+        dropped = []
+        while self._retired:
+            store = self._retired.popleft()
+            store.drop()
+            dropped.append(getattr(store, "collection_name", None))
+        metrics.count("snapshots.dropped", len(dropped))
+        return dropped
+
+    @property
+    def pending(self) -> int:
+        """Retired collections waiting for `collect`."""
+        return len(self._retired)
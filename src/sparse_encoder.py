@@ -0,0 +1,119 @@
+import zlib
+from collections import Counter
+from typing import List, Dict, Tuple, Optional
+from src.bm25_index import tokenize, document_text
+
+# Same defaults as rank_bm25.BM25Okapi, which backs BM25Index
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+
+def token_index(token: str) -> int:
+    """
+    Stable 32-bit index of a token in the sparse vector space.
+
+    Hashing avoids storing a vocabulary: a query encoded by any process maps
+    to the same dimensions as the documents ingested by another one.
+    """
+    return zlib.crc32(token.encode("utf-8"))
+
+
+class SparseBM25Encoder:
+    """
+    Encode chunks and queries as BM25-style sparse vectors for Qdrant.
+
+    Documents carry the BM25 term-frequency saturation
+    tf * (k1 + 1) / (tf + k1 * (1 - b + b * dl / avgdl)); the IDF factor is
+    applied server-side by the collection's `Modifier.IDF`, so queries only
+    carry term counts and no corpus statistics are needed at query time.
+    Terms come from the same analyzer as BM25Index.
+    """
+
+    def __init__(
+        self,
+        k1: float = BM25_K1,
+        b: float = BM25_B,
+        avgdl: Optional[float] = None,
+        documents: int = 0
+    ) -> None:
+        """
+        Args:
+            k1: Term-frequency saturation
+            b: Document-length normalization
+            avgdl: Average document length in tokens; set by `fit` if not given
+            documents: Number of documents `avgdl` was computed over
+        """
+        self.k1 = k1
+        self.b = b
+        self.avgdl = avgdl
+        self.documents = documents
+
+    def fit(self, chunks: List[Dict]) -> "SparseBM25Encoder":
+        """
+        Compute the average document length from a batch of chunks.
+        """
+        lengths = [len(tokenize(document_text(chunk))) for chunk in chunks]
+        self.avgdl = (sum(lengths) / len(lengths)) if lengths else 1.0
+        self.documents = len(lengths)
+        return self
+
+    def update(self, chunks: List[Dict]) -> "SparseBM25Encoder":
+        """
+        Fold a batch of new chunks into the running average document length
+        (`fit` if nothing was counted yet). Documents encoded before keep
+        the weights computed with the average at the time.
+        """
+        if self.avgdl is None or not self.documents:
+            return self.fit(chunks)
+        lengths = [len(tokenize(document_text(chunk))) for chunk in chunks]
+        if lengths:
+            total = self.avgdl * self.documents + sum(lengths)
+            self.documents += len(lengths)
+            self.avgdl = total / self.documents
+        return self
+
+    def reset(self) -> None:
+        """Forget the corpus statistics."""
+        self.avgdl = None
+        self.documents = 0
+
+    def to_metadata(self) -> Dict:
+        """Corpus statistics, for `VectorStore.set_metadata`."""
+        return {"bm25_avgdl": self.avgdl, "bm25_documents": self.documents}
+
+    def load_metadata(self, metadata: Dict, documents: int = 0) -> None:
+        """
+        Restore the statistics stored with `to_metadata`. `documents` is
+        used for collections stored before the document count was.
+        """
+        self.avgdl = metadata.get("bm25_avgdl")
+        self.documents = metadata.get("bm25_documents", documents if self.avgdl is not None else 0)
+
+    def _encode(self, weights: Dict[str, float]) -> Tuple[List[int], List[float]]:
+        # Distinct tokens can share a hash bucket; their weights add up
+        merged: Dict[int, float] = {}
+        for token, weight in weights.items():
+            index = token_index(token)
+            merged[index] = merged.get(index, 0.0) + weight
+        indices = sorted(merged)
+        return indices, [merged[i] for i in indices]
+
+    def encode_document(self, chunk: Dict) -> Tuple[List[int], List[float]]:
+        """
+        Sparse (indices, values) for a chunk's context + chunk_text.
+        """
+        if self.avgdl is None:
+            raise ValueError("SparseBM25Encoder is not fitted. Call fit() with the corpus first.")
+        tokens = tokenize(document_text(chunk))
+        norm = self.k1 * (1 - self.b + self.b * len(tokens) / max(self.avgdl, 1e-9))
+        weights = {
+            token: tf * (self.k1 + 1) / (tf + norm)
+            for token, tf in Counter(tokens).items()
+        }
+        return self._encode(weights)
+
+    def encode_query(self, query: str) -> Tuple[List[int], List[float]]:
+        """
+        Sparse (indices, values) for a query: one count per occurrence of each term.
+        """
+        return self._encode(dict(Counter(tokenize(query))))
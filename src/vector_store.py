@@ -1,79 +1,755 @@
-from qdrant_client import QdrantClient
-from qdrant_client.models import NamedVector, Distance, VectorParams, PointStruct
+from __future__ import annotations
 from config import(
     QDRANT_URL,
+    QDRANT_PREFER_GRPC,
+    QDRANT_GRPC_PORT,
+    QDRANT_POOL_SIZE,
+    QDRANT_QUANTIZATION,
+    QDRANT_ON_DISK_VECTORS,
+    QDRANT_HNSW_M,
+    QDRANT_HNSW_EF_CONSTRUCT,
+    QDRANT_SPARSE_BM25,
+    VECTOR_BACKEND,
+    BUNDLE_UPLOAD_BATCH_SIZE,
+    BUNDLE_UPLOAD_WORKERS,
     COLLECTION_NAME,
     EMBEDDING_DIMENSION,
     TOP_K_RETRIEVAL
 )
 import numpy as np
-from typing import List, Dict
+from typing import List, Dict, Optional, Union, Iterable, Iterator
 import uuid
+import threading
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from src.sparse_encoder import SparseBM25Encoder
+from src.chunk_store import TEXT_FIELDS
+from src.metadata import (
+    DEFAULT_DOC_ID,
+    KEYWORD_FIELDS,
+    INTEGER_FIELDS,
+    chunk_metadata,
+    split_key,
+    to_qdrant_filter
+)
+from src import metrics
+from src.lazy import lazy_import
+
+# Imported on first use (connecting to Qdrant), not when the module loads
+qdrant_client = lazy_import("qdrant_client")
+models = lazy_import("qdrant_client.models")
+
+QUANTIZATION_TYPES = ("none", "scalar", "binary")
+SPARSE_VECTOR_NAME = "bm25"
+DENSE_VECTOR_NAMES = ("embedding", "contextual_embedding")
+SCROLL_BATCH_SIZE = 1024  # Points per scroll request when reading a whole collection
+# Namespace for deterministic point IDs, so a chunk's point can be fetched by its key
+POINT_ID_NAMESPACE = uuid.UUID("5b0c5f4e-3f7a-4d2b-9a63-0f4a1c6e8d21")
+# Payload fields identifying a chunk, returned with every hit
+KEY_FIELDS = ("doc_id", "chunk_id")
+
+PayloadSelector = Union[bool, List[str]]
+
+
+def point_id(chunk_id, doc_id: str = DEFAULT_DOC_ID) -> str:
+    """
+    Deterministic Qdrant point ID for a chunk of a document. Chunks of the
+    default document keep the IDs of collections ingested before doc_id.
+    """
+    name = str(chunk_id) if doc_id == DEFAULT_DOC_ID else f"{doc_id}/{chunk_id}"
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, name))
+
+
+def _payload_selector(with_payload: PayloadSelector) -> PayloadSelector:
+    """
+    Normalize a `with_payload` argument; the key fields (doc_id, chunk_id)
+    are always returned so results can be merged and hydrated later.
+    """
+    if isinstance(with_payload, bool):
+        return with_payload
+    fields = list(with_payload)
+    fields.extend(field for field in KEY_FIELDS if field not in fields)
+    return fields
+
+
+def _payload_index_schemas() -> Dict[str, models.PayloadSchemaType]:
+    """
+    Payload indexes created on every collection, for filtered search.
+    """
+    schemas = {field: models.PayloadSchemaType.KEYWORD for field in KEYWORD_FIELDS}
+    schemas.update({field: models.PayloadSchemaType.INTEGER for field in INTEGER_FIELDS})
+    return schemas
+
+
+def _vectors_config(on_disk: bool = False) -> Dict[str, models.VectorParams]:
+    """
+    Named vector configuration shared by the sync and async stores.
+
+    Args:
+        on_disk: Keep the original float32 vectors on disk (memory-mapped)
+    """
+    return {
+        "embedding": models.VectorParams(
+            size=EMBEDDING_DIMENSION,
+            distance=models.Distance.COSINE,
+            on_disk=on_disk
+        ),
+        "contextual_embedding": models.VectorParams(
+            size=EMBEDDING_DIMENSION,
+            distance=models.Distance.COSINE,
+            on_disk=on_disk
+        )
+    }
+
+
+def _quantization_config(quantization: str):
+    """
+    Build the Qdrant quantization config for "none", "scalar" (int8) or "binary".
+
+    Quantized vectors are always kept in RAM; the originals follow `on_disk`
+    and are only read back when a search asks for rescoring.
+    """
+    if quantization not in QUANTIZATION_TYPES:
+        raise ValueError(
+            f"Unknown quantization '{quantization}', expected one of {QUANTIZATION_TYPES}"
+        )
+    if quantization == "scalar":
+        return models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(
+                type=models.ScalarType.INT8,
+                quantile=0.99,
+                always_ram=True
+            )
+        )
+    if quantization == "binary":
+        return models.BinaryQuantization(
+            binary=models.BinaryQuantizationConfig(always_ram=True)
+        )
+    return None
+
+
+def _collection_params(
+    quantization: str,
+    on_disk: bool,
+    hnsw_m: int,
+    hnsw_ef_construct: int,
+    sparse: bool = False
+) -> Dict:
+    """
+    Keyword arguments for `create_collection`, shared by the sync and async stores.
+
+    With `sparse`, a third named vector holds BM25-style sparse vectors whose
+    IDF is computed by Qdrant (`Modifier.IDF`).
+    """
+    params = {
+        "vectors_config": _vectors_config(on_disk=on_disk),
+        "hnsw_config": models.HnswConfigDiff(m=hnsw_m, ef_construct=hnsw_ef_construct),
+        "quantization_config": _quantization_config(quantization)
+    }
+    if sparse:
+        params["sparse_vectors_config"] = {
+            SPARSE_VECTOR_NAME: models.SparseVectorParams(modifier=models.Modifier.IDF)
+        }
+    return params
+
+
+def _search_params(
+    hnsw_ef: Optional[int] = None,
+    exact: bool = False,
+    rescore: Optional[bool] = None,
+    oversampling: Optional[float] = None
+) -> Optional[models.SearchParams]:
+    """
+    Per-query search parameters, or None to use the collection defaults.
+    """
+    quantization = None
+    if rescore is not None or oversampling is not None:
+        quantization = models.QuantizationSearchParams(
+            rescore=rescore,
+            oversampling=oversampling
+        )
+    if hnsw_ef is None and not exact and quantization is None:
+        return None
+    return models.SearchParams(hnsw_ef=hnsw_ef, exact=exact, quantization=quantization)
+
+
+def _build_points(chunks: List[Dict], sparse_encoder: Optional[SparseBM25Encoder] = None) -> List[models.PointStruct]:
+    """
+    Convert enriched chunks into Qdrant points with dual named vectors,
+    plus the BM25 sparse vector when a `sparse_encoder` is given. The
+    payload holds the text and the document metadata.
+    """
+    points = []
+    for chunk in chunks:
+        vector = {
+            "embedding": chunk["embedding"].tolist(),
+            "contextual_embedding": chunk["contextual_embedding"].tolist()
+        }
+        if sparse_encoder is not None:
+            indices, values = sparse_encoder.encode_document(chunk)
+            vector[SPARSE_VECTOR_NAME] = models.SparseVector(indices=indices, values=values)
+        metadata = chunk_metadata(chunk)
+        point = models.PointStruct(
+            id=point_id(chunk["chunk_id"], metadata["doc_id"]), # Re-adding a chunk overwrites its point
+            vector=vector,
+            payload={
+                "chunk_text": chunk["chunk_text"],
+                "context": chunk["context"],
+                "chunk_id": chunk["chunk_id"],
+                **metadata
+            }
+        )
+        points.append(point)
+    return points
+
+
+def _batch_requests(
+    query_vectors: np.ndarray,
+    top_k: int,
+    use_contextual: bool,
+    search_params: Optional[models.SearchParams],
+    with_payload: PayloadSelector,
+    filter: Optional[Dict] = None
+) -> List[models.QueryRequest]:
+    """
+    One QueryRequest per query vector for the batch query endpoint.
+    """
+    vector_name = "contextual_embedding" if use_contextual else "embedding"
+    query_filter = to_qdrant_filter(filter)
+    return [
+        models.QueryRequest(
+            query=vector.tolist(),
+            using=vector_name,
+            limit=top_k,
+            filter=query_filter,
+            params=search_params,
+            with_payload=_payload_selector(with_payload)
+        )
+        for vector in np.asarray(query_vectors)
+    ]
+
+
+def _hybrid_query(
+    query_vector: np.ndarray,
+    query_text: str,
+    sparse_encoder: SparseBM25Encoder,
+    top_k: int,
+    use_contextual: bool,
+    candidates: Optional[int],
+    filter: Optional[Dict] = None
+) -> Dict:
+    """
+    Keyword arguments for a single prefetch + RRF fusion `query_points` call.
+    A filter applies to both prefetches.
+    """
+    vector_name = "contextual_embedding" if use_contextual else "embedding"
+    candidates = candidates or top_k * 2
+    indices, values = sparse_encoder.encode_query(query_text)
+    query_filter = to_qdrant_filter(filter)
+    return {
+        "prefetch": [
+            models.Prefetch(query=query_vector.tolist(), using=vector_name, filter=query_filter, limit=candidates),
+            models.Prefetch(
+                query=models.SparseVector(indices=indices, values=values),
+                using=SPARSE_VECTOR_NAME,
+                filter=query_filter,
+                limit=candidates
+            )
+        ],
+        "query": models.FusionQuery(fusion=models.Fusion.RRF),
+        "limit": top_k
+    }
+
+
+def _in_process(client) -> bool:
+    """Whether a QdrantClient runs Qdrant in-process (":memory:" or a local path), not over the network."""
+    options = getattr(client, "init_options", {})
+    return options.get("location") == ":memory:" or options.get("path") is not None
+
+
+class _SerializedClient:
+    """
+    In-process QdrantClient whose calls run one at a time.
+
+    The embedded engine (":memory:" or a local path) does no locking of its
+    own, so concurrent queries and upserts from several threads race. A
+    remote client is thread-safe (pooled HTTP/gRPC connections) and is used
+    directly.
+    """
+
+    def __init__(self, client) -> None:
+        self._client = client
+        self._lock = threading.RLock()
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self._client, name)
+        if not callable(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            with self._lock:
+                return attribute(*args, **kwargs)
+        return call
+
+
+def _parse_hits(hits) -> List[Dict]:
+    """
+    Convert scored points returned by Qdrant into result dictionaries
+    holding the selected payload fields and the score.
+    """
+    return [
+        {**hit.payload, "score": hit.score}
+        for hit in hits
+        if hit.payload is not None
+    ]
+
+
+def _hydrate_ids(chunk_ids: Iterable) -> Dict[str, object]:
+    """
+    Point ID -> requested item (chunk key or bare chunk_id) for `hydrate`.
+    """
+    ids = {}
+    for item in chunk_ids:
+        doc_id, chunk_id = split_key(item)
+        ids[point_id(chunk_id, doc_id)] = item
+    return ids
+
+
+def _parse_records(records, requested: Dict[str, object]) -> Dict:
+    """
+    Map retrieved points to {requested item: payload}.
+    """
+    return {
+        requested[str(record.id)]: record.payload
+        for record in records
+        if record.payload is not None
+    }
 
-class QdrantStorage:
+
+class VectorStore:
+    """
+    Interface shared by the vector-store backends.
+
+    Backends store the two named vectors ("embedding" and
+    "contextual_embedding") per chunk and return search hits as
+    dictionaries with 'chunk_text', 'context', 'doc_id', 'chunk_id' and
+    'score'. A chunk is identified by (doc_id, chunk_id); searches take an
+    optional metadata `filter` (see src.metadata).
+    Use `create_vector_store` to pick a backend from configuration.
+
+    `version` is bumped by every `add_chunks` and `reset`, so callers that
+    cache search results can tell when the index has changed.
+
+    Collection-level `metadata()` survives restarts; ingestion stores a
+    corpus fingerprint there so a later run can reattach to the collection
+    (`is_compatible`) instead of re-ingesting.
+
+    `sibling`, `set_alias` and `drop` let src.snapshots build a new version
+    of the index in its own collection and switch to it under a stable
+    alias.
+    """
+
+    collection_name: str
+    version: int = 0
+
+    def add_chunks(self, chunks: List[Dict]) -> None:
+        raise NotImplementedError
+
+    def search(
+        self,
+        query_vector: np.ndarray,
+        top_k: int = TOP_K_RETRIEVAL,
+        use_contextual: bool = True,
+        hnsw_ef: Optional[int] = None,
+        exact: bool = False,
+        rescore: Optional[bool] = None,
+        oversampling: Optional[float] = None,
+        with_payload: PayloadSelector = True,
+        filter: Optional[Dict] = None
+    ) -> List[Dict]:
+        raise NotImplementedError
+
+    def search_batch(
+        self,
+        query_vectors: np.ndarray,
+        top_k: int = TOP_K_RETRIEVAL,
+        use_contextual: bool = True,
+        hnsw_ef: Optional[int] = None,
+        exact: bool = False,
+        rescore: Optional[bool] = None,
+        oversampling: Optional[float] = None,
+        with_payload: PayloadSelector = True,
+        filter: Optional[Dict] = None
+    ) -> List[List[Dict]]:
+        """Search for many query vectors (one row each) in one call."""
+        raise NotImplementedError
+
+    def hydrate(self, chunk_ids: Iterable, fields: Iterable[str] = TEXT_FIELDS) -> Dict:
+        """
+        Fetch payload `fields` for many chunks at once. Items are chunk keys
+        (doc_id, chunk_id) or chunk_ids of the default document; returns
+        {item: payload}.
+        """
+        raise NotImplementedError
+
+    def hybrid_search(
+        self,
+        query_vector: np.ndarray,
+        query_text: str,
+        top_k: int = TOP_K_RETRIEVAL,
+        use_contextual: bool = True,
+        candidates: Optional[int] = None,
+        filter: Optional[Dict] = None
+    ) -> List[Dict]:
+        """Dense + sparse search fused by the backend in a single query."""
+        raise NotImplementedError(f"{type(self).__name__} does not support server-side hybrid search")
+
+    def reset(self) -> None:
+        """Drop every stored chunk and start with an empty collection."""
+        raise NotImplementedError
+
+    def count(self) -> int:
+        """Number of stored chunks."""
+        raise NotImplementedError
+
+    def scroll(
+        self,
+        fields: Iterable[str] = TEXT_FIELDS,
+        batch_size: int = SCROLL_BATCH_SIZE,
+        with_vectors: bool = False
+    ) -> Iterator[Dict]:
+        """
+        Payloads (doc_id, chunk_id plus `fields`) of every stored chunk;
+        with `with_vectors` also both (normalized) dense vectors as arrays.
+        """
+        raise NotImplementedError
+
+    def bulk_add(
+        self,
+        chunk_store,
+        batch_size: int = BUNDLE_UPLOAD_BATCH_SIZE,
+        workers: int = BUNDLE_UPLOAD_WORKERS
+    ) -> None:
+        """
+        Add every chunk of a ChunkStore (e.g. a memory-mapped one), reading
+        `batch_size` rows at a time. Backends that upload over the network
+        send up to `workers` batches concurrently.
+        """
+        for start in range(0, len(chunk_store), batch_size):
+            self.add_chunks([chunk_store[row] for row in range(start, min(start + batch_size, len(chunk_store)))])
+
+    def metadata(self) -> Dict:
+        """Collection-level metadata (e.g. the corpus fingerprint)."""
+        raise NotImplementedError
+
+    def set_metadata(self, metadata: Dict) -> None:
+        """Merge `metadata` into the collection-level metadata."""
+        raise NotImplementedError
+
+    def sibling(self, collection_name: str) -> "VectorStore":
+        """Empty store for another collection, with this store's backend and settings."""
+        raise NotImplementedError
+
+    def set_alias(self, alias: str) -> None:
+        """
+        Atomically point `alias` at this collection; opening a store with the
+        alias as its collection name then attaches to this collection.
+        """
+        raise NotImplementedError
+
+    def drop(self) -> None:
+        """Delete the collection for good (used for retired snapshots)."""
+        raise NotImplementedError
+
+    def _schema_matches(self) -> bool:
+        """Whether the stored vectors have the names and dimension this store expects."""
+        return True
+
+    def is_compatible(self, fingerprint: str) -> bool:
+        """
+        Whether the collection already holds the corpus identified by
+        `fingerprint`, with the expected vectors, so it can be reused as is.
+        """
+        return (
+            self.count() > 0
+            and self.metadata().get("fingerprint") == fingerprint
+            and self._schema_matches()
+        )
+
+
+class QdrantStorage(VectorStore):
     """
     Manage vector storage and retrieval using Qdrant.
     """
 
-    def __init__(self, collection_name: str = COLLECTION_NAME) -> None:
-        self.client = QdrantClient(url=QDRANT_URL)
-        self.collection_name = collection_name
+    def __init__(
+        self,
+        collection_name: str = COLLECTION_NAME,
+        url: str = QDRANT_URL,
+        prefer_grpc: bool = QDRANT_PREFER_GRPC,
+        grpc_port: int = QDRANT_GRPC_PORT,
+        quantization: str = QDRANT_QUANTIZATION,
+        on_disk: bool = QDRANT_ON_DISK_VECTORS,
+        hnsw_m: int = QDRANT_HNSW_M,
+        hnsw_ef_construct: int = QDRANT_HNSW_EF_CONSTRUCT,
+        sparse: bool = QDRANT_SPARSE_BM25,
+        client=None
+    ) -> None:
+        """
+        Args:
+            collection_name: Name of the Qdrant collection, or an alias of one
+            url: Qdrant server URL, or ":memory:" for an in-process instance
+            prefer_grpc: Use the gRPC transport instead of REST/JSON
+            grpc_port: Port of the Qdrant gRPC endpoint
+            quantization: "none", "scalar" (int8) or "binary"
+            on_disk: Keep original vectors on disk, only quantized ones in RAM
+            hnsw_m: HNSW graph degree (edges per node)
+            hnsw_ef_construct: HNSW candidate list size while building the graph
+            sparse: Also store BM25 sparse vectors, enabling `hybrid_search`
+            client: Existing QdrantClient to share (url, prefer_grpc and grpc_port are then unused)
+
+        A store may be shared by many threads: a remote client is
+        thread-safe, an in-process one is serialized (see _SerializedClient).
+        """
+        client = client if client is not None else qdrant_client.QdrantClient(
+            location=url,
+            prefer_grpc=prefer_grpc,
+            grpc_port=grpc_port
+        )
+        if _in_process(client) and not isinstance(client, _SerializedClient):
+            client = _SerializedClient(client)
+        self.client = client
+        # An alias is resolved once: this store keeps using that collection after the alias moves
+        self.collection_name = self._resolve_alias(collection_name)
+        self._index_options = {
+            "quantization": quantization,
+            "on_disk": on_disk,
+            "hnsw_m": hnsw_m,
+            "hnsw_ef_construct": hnsw_ef_construct
+        }
+        self.collection_params = _collection_params(
+            quantization, on_disk, hnsw_m, hnsw_ef_construct, sparse
+        )
+        self.sparse_encoder = SparseBM25Encoder() if sparse else None
         self._create_collection()
+        if self.sparse_encoder is not None:
+            # Documents added to an existing collection continue its avgdl (every stored point is a document)
+            self.sparse_encoder.load_metadata(self.metadata(), documents=self.count())
+    def _resolve_alias(self, name: str) -> str:
+        """
+        Collection `name` points to if it is an alias, else `name` itself.
+        """
+        for alias in self.client.get_aliases().aliases:
+            if alias.alias_name == name:
+                return alias.collection_name
+        return name
     def _create_collection(self) -> None:
         """
-        Create a new collection if it doesn't exist.
+        Create a new collection if it doesn't exist, with payload indexes on
+        the metadata fields (also added to older collections missing them).
         """
         if not self.client.collection_exists(self.collection_name):
             self.client.create_collection(
                 collection_name=self.collection_name,
-                vectors_config={
-                    "embedding": VectorParams(
-                        size=EMBEDDING_DIMENSION,
-                        distance=Distance.COSINE
-                    ),
-                    "contextual_embedding": VectorParams(
-                        size=EMBEDDING_DIMENSION,
-                        distance=Distance.COSINE
-                    )
-                }
+                **self.collection_params
             )
+        indexed = self.client.get_collection(self.collection_name).payload_schema or {}
+        for field, schema in _payload_index_schemas().items():
+            if field not in indexed:
+                with warnings.catch_warnings():  # The in-process ":memory:" Qdrant ignores payload indexes and warns
+                    warnings.simplefilter("ignore", UserWarning)
+                    self.client.create_payload_index(self.collection_name, field_name=field, field_schema=schema)
+    def reset(self) -> None:
+        """
+        Delete the collection and recreate it empty.
+        """
+        self.client.delete_collection(collection_name=self.collection_name)
+        self._create_collection()
+        if self.sparse_encoder is not None:
+            self.sparse_encoder.reset()
+        self.version += 1
+    def sibling(self, collection_name: str) -> "QdrantStorage":
+        """
+        Store for another collection with the same index settings, sharing
+        this store's client.
+        """
+        return QdrantStorage(
+            collection_name,
+            sparse=self.sparse_encoder is not None,
+            client=self.client,
+            **self._index_options
+        )
+    def set_alias(self, alias: str) -> None:
+        """
+        Point `alias` at this collection in one atomic alias update.
+
+        A collection literally named `alias` (created before aliases were
+        used) is deleted first, since Qdrant names share one namespace; that
+        one-time migration is the only non-atomic step.
+        """
+        if alias == self.collection_name:
+            return
+        if self._resolve_alias(alias) == alias and self.client.collection_exists(alias):
+            self.client.delete_collection(collection_name=alias)
+        self.client.update_collection_aliases(change_aliases_operations=[
+            models.DeleteAliasOperation(delete_alias=models.DeleteAlias(alias_name=alias)),
+            models.CreateAliasOperation(create_alias=models.CreateAlias(
+                collection_name=self.collection_name,
+                alias_name=alias
+            ))
+        ])
+    def drop(self) -> None:
+        """
+        Delete the collection (and any alias still pointing at it).
+        """
+        self.client.delete_collection(collection_name=self.collection_name)
+        self.version += 1
+    def count(self) -> int:
+        """
+        Number of points stored in the collection.
+        """
+        return self.client.count(collection_name=self.collection_name, exact=True).count
+    def scroll(
+        self,
+        fields: Iterable[str] = TEXT_FIELDS,
+        batch_size: int = SCROLL_BATCH_SIZE,
+        with_vectors: bool = False
+    ) -> Iterator[Dict]:
+        """
+        Payloads of every stored point, `batch_size` points per request.
+
+        Args:
+            fields: Payload fields to return besides doc_id and chunk_id
+            batch_size: Points per scroll request
+            with_vectors: Also return both dense vectors (float32 arrays)
+
+        Yields:
+            Payload dicts (doc_id, chunk_id plus `fields`), in point ID order
+        """
+        selector = _payload_selector(list(fields))
+        offset = None
+        while True:
+            records, offset = self.client.scroll(
+                collection_name=self.collection_name,
+                limit=batch_size,
+                offset=offset,
+                with_payload=selector,
+                with_vectors=list(DENSE_VECTOR_NAMES) if with_vectors else False
+            )
+            for record in records:
+                if record.payload is None:
+                    continue
+                if with_vectors:
+                    yield {
+                        **record.payload,
+                        **{name: np.asarray(record.vector[name], dtype=np.float32) for name in DENSE_VECTOR_NAMES}
+                    }
+                else:
+                    yield record.payload
+            if offset is None:
+                return
+    def metadata(self) -> Dict:
+        """
+        Collection metadata stored by Qdrant alongside the collection config.
+        """
+        return dict(self.client.get_collection(self.collection_name).config.metadata or {})
+    def set_metadata(self, metadata: Dict) -> None:
+        """
+        Merge `metadata` into the collection metadata.
+        """
+        self.client.update_collection(collection_name=self.collection_name, metadata=metadata)
+    def _schema_matches(self) -> bool:
+        params = self.client.get_collection(self.collection_name).config.params
+        vectors = params.vectors if isinstance(params.vectors, dict) else {}
+        if set(vectors) != set(DENSE_VECTOR_NAMES):
+            return False
+        if any(vectors[name].size != EMBEDDING_DIMENSION for name in DENSE_VECTOR_NAMES):
+            return False
+        has_sparse = SPARSE_VECTOR_NAME in (params.sparse_vectors or {})
+        return has_sparse == (self.sparse_encoder is not None)
+    @metrics.timed("vector_store.add_chunks", backend="qdrant")
     def add_chunks(self, chunks: List[Dict]) -> None:
         """
         Add document chunks to the collection.
 
         Args:
             chunks (List[Dict]): List of document chunks with 'embedding', 'contextual_embedding', and 'metadata'.
+
+        With sparse vectors, each batch is folded into the stored average
+        document length; earlier points keep the average of their batch, so
+        `bulk_add` of the whole corpus gives exact BM25 statistics.
         """
-        points = []
-        for chunk in chunks:
-            point = PointStruct(
-                id=str(uuid.uuid4()), # Generate a unique ID for each chunk
-                vector={
-                    "embedding": chunk["embedding"].tolist(),
-                    "contextual_embedding": chunk["contextual_embedding"].tolist()
-                },
-                payload={
-                    "chunk_text": chunk["chunk_text"],
-                    "context": chunk["context"],
-                    "chunk_id": chunk["chunk_id"]
-                }
-            )
-            points.append(point)
+        if self.sparse_encoder is not None:
+            self.sparse_encoder.update(chunks)
+            self.set_metadata(self.sparse_encoder.to_metadata())
         self.client.upsert(
             collection_name=self.collection_name,
-            points=points
+            points=_build_points(chunks, self.sparse_encoder)
         )
-    def search(self, query_vector: np.ndarray, top_k: int = TOP_K_RETRIEVAL, use_contextual: bool = True) -> List[Dict]:
+        self.version += 1
+    @metrics.timed("vector_store.bulk_add", backend="qdrant")
+    def bulk_add(
+        self,
+        chunk_store,
+        batch_size: int = BUNDLE_UPLOAD_BATCH_SIZE,
+        workers: int = BUNDLE_UPLOAD_WORKERS
+    ) -> None:
+        """
+        Upload every chunk of a ChunkStore with `workers` concurrent upserts.
+
+        Each worker reads its own `batch_size` rows from the store, so memory
+        stays at about `workers` batches however large the store is. Sparse
+        vectors are fitted on the whole store first. The in-process Qdrant
+        is not thread-safe and gains nothing from concurrency, so it is
+        loaded with a single worker.
+        """
+        if _in_process(self.client):
+            workers = 1
+        if self.sparse_encoder is not None:
+            self.sparse_encoder.update(chunk_store)
+            self.set_metadata(self.sparse_encoder.to_metadata())
+
+        def upload(start: int) -> None:
+            batch = [chunk_store[row] for row in range(start, min(start + batch_size, len(chunk_store)))]
+            self.client.upsert(
+                collection_name=self.collection_name,
+                points=_build_points(batch, self.sparse_encoder)
+            )
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            list(executor.map(upload, range(0, len(chunk_store), batch_size)))
+        self.version += 1
+    @metrics.timed("vector_store.search", backend="qdrant")
+    def search(
+        self,
+        query_vector: np.ndarray,
+        top_k: int = TOP_K_RETRIEVAL,
+        use_contextual: bool = True,
+        hnsw_ef: Optional[int] = None,
+        exact: bool = False,
+        rescore: Optional[bool] = None,
+        oversampling: Optional[float] = None,
+        with_payload: PayloadSelector = True,
+        filter: Optional[Dict] = None
+    ) -> List[Dict]:
         """
         Docstring for search
-        
+
         Search for similar chunks using vector similarity.
-        
+
         Args:
             query_vector: The query embedding
             top_k: Number of results to return
             use_contextual: Whether to use contextual embeddings
-            
+            hnsw_ef: HNSW search beam width for this query (higher = better recall, slower)
+            exact: Bypass the HNSW index and do an exact scan
+            rescore: Rescore quantized candidates with the original vectors
+            oversampling: Fetch top_k * oversampling quantized candidates before rescoring
+            with_payload: True for the full payload, or a list of payload fields
+                (e.g. ["chunk_id"] for an IDs-and-scores-only search; see `hydrate`)
+            filter: Metadata filter (see src.metadata), applied by Qdrant
+                over the payload indexes
+
         Returns:
             List of matching chunks with scores
         """
@@ -83,15 +759,375 @@ class QdrantStorage:
             collection_name=self.collection_name,
             query=query_vector.tolist(),
             using=vector_name,
-            limit=top_k
-        ).points    
-        return [
-            {
-                "chunk_text": hit.payload["chunk_text"],
-                "context": hit.payload["context"],
-                "chunk_id": hit.payload["chunk_id"],
-                "score": hit.score  
-            }
-            for hit in results
-            if hit.payload is not None
-        ]
\ No newline at end of file
+            query_filter=to_qdrant_filter(filter),
+            limit=top_k,
+            search_params=_search_params(hnsw_ef, exact, rescore, oversampling),
+            with_payload=_payload_selector(with_payload)
+        ).points
+        return _parse_hits(results)
+    @metrics.timed("vector_store.search_batch", backend="qdrant")
+    def search_batch(
+        self,
+        query_vectors: np.ndarray,
+        top_k: int = TOP_K_RETRIEVAL,
+        use_contextual: bool = True,
+        hnsw_ef: Optional[int] = None,
+        exact: bool = False,
+        rescore: Optional[bool] = None,
+        oversampling: Optional[float] = None,
+        with_payload: PayloadSelector = True,
+        filter: Optional[Dict] = None
+    ) -> List[List[Dict]]:
+        """
+        Search for many query vectors through Qdrant's batch query endpoint.
+
+        Args:
+            query_vectors: 2-D array, one query embedding per row
+            top_k, use_contextual, hnsw_ef, exact, rescore, oversampling,
+            with_payload, filter: As in `search`, applied to every query
+
+        Returns:
+            One list of matching chunks per query, in input order
+        """
+        if len(query_vectors) == 0:
+            return []
+        responses = self.client.query_batch_points(
+            collection_name=self.collection_name,
+            requests=_batch_requests(
+                query_vectors,
+                top_k,
+                use_contextual,
+                _search_params(hnsw_ef, exact, rescore, oversampling),
+                with_payload,
+                filter
+            )
+        )
+        return [_parse_hits(response.points) for response in responses]
+    @metrics.timed("vector_store.hydrate", backend="qdrant")
+    def hydrate(self, chunk_ids: Iterable, fields: Iterable[str] = TEXT_FIELDS) -> Dict:
+        """
+        Fetch payload fields for many chunks in one round-trip.
+
+        Args:
+            chunk_ids: Chunk keys (doc_id, chunk_id), or chunk_ids of the default document
+            fields: Payload fields to return
+
+        Returns:
+            Dict mapping each requested item to its payload (doc_id, chunk_id plus `fields`)
+        """
+        ids = _hydrate_ids(chunk_ids)
+        if not ids:
+            return {}
+        records = self.client.retrieve(
+            collection_name=self.collection_name,
+            ids=list(ids),
+            with_payload=_payload_selector(list(fields))
+        )
+        return _parse_records(records, ids)
+    @metrics.timed("vector_store.hybrid_search", backend="qdrant")
+    def hybrid_search(
+        self,
+        query_vector: np.ndarray,
+        query_text: str,
+        top_k: int = TOP_K_RETRIEVAL,
+        use_contextual: bool = True,
+        candidates: Optional[int] = None,
+        filter: Optional[Dict] = None
+    ) -> List[Dict]:
+        """
+        Dense + BM25 sparse search fused server-side with Reciprocal Rank Fusion.
+
+        One round-trip replaces a vector search, a local BM25 search and the
+        client-side merge. Requires a collection created with `sparse=True`.
+
+        Args:
+            query_vector: The query embedding
+            query_text: The raw query, encoded with the BM25 analyzer
+            top_k: Number of fused results to return
+            use_contextual: Whether to use contextual embeddings for the dense leg
+            candidates: Candidates per leg before fusion (default top_k * 2)
+            filter: Metadata filter applied to both legs
+
+        Returns:
+            List of matching chunks with their fused score
+        """
+        if self.sparse_encoder is None:
+            raise ValueError("hybrid_search requires a collection created with sparse=True")
+        results = self.client.query_points(
+            collection_name=self.collection_name,
+            **_hybrid_query(query_vector, query_text, self.sparse_encoder, top_k, use_contextual, candidates, filter)
+        ).points
+        return _parse_hits(results)
+
+
+class AsyncQdrantStorage:
+    """
+    Async counterpart of QdrantStorage built on AsyncQdrantClient.
+
+    A single instance multiplexes many concurrent queries over a shared
+    connection pool, so callers can serve requests from an event loop
+    instead of dedicating a thread to each one.
+
+    `collection_name` may be a snapshot alias (see src.snapshots): Qdrant
+    resolves it on every request, so the storage follows each publish.
+
+    Use the `create` classmethod, which also makes sure the collection exists:
+
+        storage = await AsyncQdrantStorage.create(prefer_grpc=True)
+        results = await storage.search(query_embedding, top_k=5)
+        await storage.close()
+    """
+
+    def __init__(
+        self,
+        collection_name: str = COLLECTION_NAME,
+        url: str = QDRANT_URL,
+        prefer_grpc: bool = QDRANT_PREFER_GRPC,
+        grpc_port: int = QDRANT_GRPC_PORT,
+        pool_size: int = QDRANT_POOL_SIZE,
+        quantization: str = QDRANT_QUANTIZATION,
+        on_disk: bool = QDRANT_ON_DISK_VECTORS,
+        hnsw_m: int = QDRANT_HNSW_M,
+        hnsw_ef_construct: int = QDRANT_HNSW_EF_CONSTRUCT,
+        sparse: bool = QDRANT_SPARSE_BM25,
+        client=None
+    ) -> None:
+        """
+        Args:
+            collection_name: Name of the Qdrant collection
+            url: Qdrant server URL, or ":memory:" for an in-process instance
+            prefer_grpc: Use the gRPC transport instead of REST/JSON
+            grpc_port: Port of the Qdrant gRPC endpoint
+            pool_size: Maximum number of pooled connections (HTTP) or channels (gRPC)
+            quantization: "none", "scalar" (int8) or "binary"
+            on_disk: Keep original vectors on disk, only quantized ones in RAM
+            hnsw_m: HNSW graph degree (edges per node)
+            hnsw_ef_construct: HNSW candidate list size while building the graph
+            sparse: Also store BM25 sparse vectors, enabling `hybrid_search`
+            client: Existing AsyncQdrantClient to share (url, prefer_grpc, grpc_port and pool_size are then unused)
+        """
+        self.client = client if client is not None else qdrant_client.AsyncQdrantClient(
+            location=url,
+            prefer_grpc=prefer_grpc,
+            grpc_port=grpc_port,
+            pool_size=pool_size
+        )
+        self.collection_name = collection_name
+        self.collection_params = _collection_params(
+            quantization, on_disk, hnsw_m, hnsw_ef_construct, sparse
+        )
+        self.sparse_encoder = SparseBM25Encoder() if sparse else None
+
+    @classmethod
+    async def create(cls, *args, **kwargs) -> "AsyncQdrantStorage":
+        """
+        Build a storage instance and create its collection if needed.
+        """
+        storage = cls(*args, **kwargs)
+        await storage._create_collection()
+        if storage.sparse_encoder is not None:
+            # Documents added later continue the avgdl the collection was ingested with
+            count = (await storage.client.count(collection_name=storage.collection_name, exact=True)).count
+            storage.sparse_encoder.load_metadata(await storage.metadata(), documents=count)
+        return storage
+
+    async def _create_collection(self) -> None:
+        """
+        Create a new collection if it doesn't exist, with payload indexes on
+        the metadata fields.
+        """
+        if not await self.client.collection_exists(self.collection_name):
+            await self.client.create_collection(
+                collection_name=self.collection_name,
+                **self.collection_params
+            )
+        indexed = (await self.client.get_collection(self.collection_name)).payload_schema or {}
+        for field, schema in _payload_index_schemas().items():
+            if field not in indexed:
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore", UserWarning)
+                    await self.client.create_payload_index(self.collection_name, field_name=field, field_schema=schema)
+
+    async def metadata(self) -> Dict:
+        """
+        Collection metadata stored by Qdrant alongside the collection config.
+        """
+        return dict((await self.client.get_collection(self.collection_name)).config.metadata or {})
+
+    async def set_metadata(self, metadata: Dict) -> None:
+        """
+        Merge `metadata` into the collection metadata.
+        """
+        await self.client.update_collection(collection_name=self.collection_name, metadata=metadata)
+
+    @metrics.timed("vector_store.add_chunks", backend="qdrant_async")
+    async def add_chunks(self, chunks: List[Dict]) -> None:
+        """
+        Add document chunks to the collection.
+
+        Args:
+            chunks: List of document chunks with 'embedding' and 'contextual_embedding'
+        """
+        if self.sparse_encoder is not None:
+            self.sparse_encoder.update(chunks)
+            await self.set_metadata(self.sparse_encoder.to_metadata())
+        await self.client.upsert(
+            collection_name=self.collection_name,
+            points=_build_points(chunks, self.sparse_encoder)
+        )
+
+    @metrics.timed("vector_store.search", backend="qdrant_async")
+    async def search(
+        self,
+        query_vector: np.ndarray,
+        top_k: int = TOP_K_RETRIEVAL,
+        use_contextual: bool = True,
+        hnsw_ef: Optional[int] = None,
+        exact: bool = False,
+        rescore: Optional[bool] = None,
+        oversampling: Optional[float] = None,
+        with_payload: PayloadSelector = True,
+        filter: Optional[Dict] = None
+    ) -> List[Dict]:
+        """
+        Search for similar chunks using vector similarity.
+
+        Args:
+            query_vector: The query embedding
+            top_k: Number of results to return
+            use_contextual: Whether to use contextual embeddings
+            hnsw_ef: HNSW search beam width for this query
+            exact: Bypass the HNSW index and do an exact scan
+            rescore: Rescore quantized candidates with the original vectors
+            oversampling: Fetch top_k * oversampling quantized candidates before rescoring
+            with_payload: True for the full payload, or a list of payload fields
+            filter: Metadata filter (see src.metadata)
+
+        Returns:
+            List of matching chunks with scores
+        """
+        vector_name = "contextual_embedding" if use_contextual else "embedding"
+
+        response = await self.client.query_points(
+            collection_name=self.collection_name,
+            query=query_vector.tolist(),
+            using=vector_name,
+            query_filter=to_qdrant_filter(filter),
+            limit=top_k,
+            search_params=_search_params(hnsw_ef, exact, rescore, oversampling),
+            with_payload=_payload_selector(with_payload)
+        )
+        return _parse_hits(response.points)
+
+    @metrics.timed("vector_store.search_batch", backend="qdrant_async")
+    async def search_batch(
+        self,
+        query_vectors: np.ndarray,
+        top_k: int = TOP_K_RETRIEVAL,
+        use_contextual: bool = True,
+        hnsw_ef: Optional[int] = None,
+        exact: bool = False,
+        rescore: Optional[bool] = None,
+        oversampling: Optional[float] = None,
+        with_payload: PayloadSelector = True,
+        filter: Optional[Dict] = None
+    ) -> List[List[Dict]]:
+        """
+        Search for many query vectors through Qdrant's batch query endpoint.
+
+        Returns:
+            One list of matching chunks per query, in input order
+        """
+        if len(query_vectors) == 0:
+            return []
+        responses = await self.client.query_batch_points(
+            collection_name=self.collection_name,
+            requests=_batch_requests(
+                query_vectors,
+                top_k,
+                use_contextual,
+                _search_params(hnsw_ef, exact, rescore, oversampling),
+                with_payload,
+                filter
+            )
+        )
+        return [_parse_hits(response.points) for response in responses]
+
+    @metrics.timed("vector_store.hydrate", backend="qdrant_async")
+    async def hydrate(self, chunk_ids: Iterable, fields: Iterable[str] = TEXT_FIELDS) -> Dict:
+        """
+        Fetch payload fields for many chunks in one round-trip.
+
+        Args:
+            chunk_ids: Chunk keys (doc_id, chunk_id), or chunk_ids of the default document
+            fields: Payload fields to return
+
+        Returns:
+            Dict mapping each requested item to its payload (doc_id, chunk_id plus `fields`)
+        """
+        ids = _hydrate_ids(chunk_ids)
+        if not ids:
+            return {}
+        records = await self.client.retrieve(
+            collection_name=self.collection_name,
+            ids=list(ids),
+            with_payload=_payload_selector(list(fields))
+        )
+        return _parse_records(records, ids)
+
+    @metrics.timed("vector_store.hybrid_search", backend="qdrant_async")
+    async def hybrid_search(
+        self,
+        query_vector: np.ndarray,
+        query_text: str,
+        top_k: int = TOP_K_RETRIEVAL,
+        use_contextual: bool = True,
+        candidates: Optional[int] = None,
+        filter: Optional[Dict] = None
+    ) -> List[Dict]:
+        """
+        Dense + BM25 sparse search fused server-side with Reciprocal Rank Fusion.
+
+        Args:
+            query_vector: The query embedding
+            query_text: The raw query, encoded with the BM25 analyzer
+            top_k: Number of fused results to return
+            use_contextual: Whether to use contextual embeddings for the dense leg
+            candidates: Candidates per leg before fusion (default top_k * 2)
+            filter: Metadata filter applied to both legs
+
+        Returns:
+            List of matching chunks with their fused score
+        """
+        if self.sparse_encoder is None:
+            raise ValueError("hybrid_search requires a collection created with sparse=True")
+        response = await self.client.query_points(
+            collection_name=self.collection_name,
+            **_hybrid_query(query_vector, query_text, self.sparse_encoder, top_k, use_contextual, candidates, filter)
+        )
+        return _parse_hits(response.points)
+
+    async def close(self) -> None:
+        """
+        Close the underlying connection pool.
+        """
+        await self.client.close()
+
+
+def create_vector_store(backend: str = VECTOR_BACKEND, **kwargs) -> VectorStore:
+    """
+    Create a vector store for the configured backend.
+
+    Args:
+        backend: "qdrant" (server or ":memory:") or "local" (in-process, memory-mapped)
+        **kwargs: Passed to the backend constructor (e.g. collection_name)
+
+    Returns:
+        A VectorStore instance
+    """
+    if backend == "qdrant":
+        return QdrantStorage(**kwargs)
+    if backend == "local":
+        from src.local_vector_store import LocalVectorStore
+        return LocalVectorStore(**kwargs)
+    raise ValueError(f"Unknown vector store backend '{backend}', expected 'qdrant' or 'local'")
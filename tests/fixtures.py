@@ -0,0 +1,64 @@
+"""
+Shared offline test fixtures: synthetic chunks, hashing embeddings and in-process indexes (no model, no Qdrant server)
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from typing import Dict, List, Optional, Tuple
+from benchmarks.synthetic import make_corpus, fake_context, HashingEmbedder
+from src.bm25_index import BM25Index
+from src.local_vector_store import LocalVectorStore
+from src.retriever import HybridRetriever
+
+
+def make_chunks(
+    count: int = 200,
+    words_per_chunk: int = 40,
+    vocabulary_size: int = 800,
+    seed: int = 0,
+    doc_id: Optional[str] = None,
+    embed: bool = True
+) -> List[Dict]:
+    """
+    Synthetic chunks with fake contexts, embedded with the HashingEmbedder
+    unless `embed` is False.
+
+    Args:
+        count: Number of chunks (chunk_ids 1..count)
+        words_per_chunk, vocabulary_size, seed: Passed to `make_corpus`
+        doc_id: Set on every chunk if given
+        embed: Add both embeddings
+    """
+    chunks = make_corpus(count, words_per_chunk=words_per_chunk, vocabulary_size=vocabulary_size, seed=seed)
+    for chunk in chunks:
+        chunk['context'] = fake_context(chunk)
+        if doc_id is not None:
+            chunk['doc_id'] = doc_id
+    if embed:
+        HashingEmbedder().embed_chunks(chunks)
+    return chunks
+
+
+def make_indexes(chunks, store=None) -> Tuple[object, BM25Index]:
+    """
+    Load embedded `chunks` into `store` (a new in-memory LocalVectorStore by
+    default) and a new BM25Index.
+
+    Returns:
+        (store, bm25)
+    """
+    store = store if store is not None else LocalVectorStore(path=None)
+    store.add_chunks(chunks)
+    bm25 = BM25Index()
+    bm25.add_documents(chunks)
+    return store, bm25
+
+
+def make_retriever(chunks, store=None, embedder=None, **options) -> HybridRetriever:
+    """
+    HybridRetriever over `make_indexes(chunks, store)`, querying with
+    `embedder` (a HashingEmbedder by default); `options` go to HybridRetriever.
+    """
+    store, bm25 = make_indexes(chunks, store)
+    return HybridRetriever(store, bm25, embedder if embedder is not None else HashingEmbedder(), **options)
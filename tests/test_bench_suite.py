@@ -0,0 +1,113 @@
+"""
+Test the benchmark suite: word chunking, regression comparison and a small offline run
+"""
+import sys
+import os
+import argparse
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.bench_suite import word_chunks, compare, run_suite, INGEST_STAGES, QUERY_MODES, LATENCY_KEYS
+
+
+def make_results(commit: str, per_second: float, p99_ms: float, recall: float = 1.0):
+    latency = {key: p99_ms for key in LATENCY_KEYS}
+    return {
+        "meta": {"commit": commit},
+        "ingest": {stage: {"per_second": per_second} for stage in INGEST_STAGES},
+        "query": {mode: dict(latency) for mode in QUERY_MODES},
+        "profiles": {"fast": dict(latency, recall=recall)}
+    }
+
+
+def test_word_chunks():
+    """Chunks tile the text with the requested overlap; bad overlaps are rejected"""
+    print("\n" + "=" * 50)
+    print("TEST: Word chunking")
+    print("=" * 50)
+
+    text = " ".join(f"w{i}" for i in range(25))
+    chunks = word_chunks(text, size=10, overlap=3)
+    assert [(c['start_token'], c['end_token']) for c in chunks] == [(0, 10), (7, 17), (14, 24), (21, 25)]
+    assert [c['chunk_id'] for c in chunks] == [1, 2, 3, 4]
+    assert chunks[-1]['chunk_text'] == "w21 w22 w23 w24"
+    print("✅ Size 10, overlap 3: four chunks, the last one short")
+
+    assert word_chunks("", size=10, overlap=3) == []
+    assert len(word_chunks("one two", size=10, overlap=0)) == 1
+    print("✅ Empty and shorter-than-a-chunk texts")
+
+    for overlap in (10, 12, -1):
+        try:
+            word_chunks(text, size=10, overlap=overlap)
+            assert False, f"overlap {overlap} should raise"
+        except ValueError:
+            pass
+    print("✅ Overlap outside [0, size) raises instead of looping forever")
+
+    print("✅ Word chunking test passed\n")
+
+
+def test_compare():
+    """Only changes for the worse beyond the threshold are regressions"""
+    print("\n" + "=" * 50)
+    print("TEST: Regression comparison")
+    print("=" * 50)
+
+    baseline = make_results("base", per_second=100.0, p99_ms=10.0)
+    assert compare(baseline, make_results("same", per_second=105.0, p99_ms=10.5), threshold=0.1) == []
+    print("✅ Changes within the threshold are not flagged")
+
+    faster = make_results("fast", per_second=200.0, p99_ms=5.0, recall=1.0)
+    assert compare(baseline, faster, threshold=0.1) == []
+    print("✅ Improvements are not flagged")
+
+    slower = make_results("slow", per_second=50.0, p99_ms=20.0, recall=0.5)
+    regressions = compare(baseline, slower, threshold=0.1)
+    assert set(regressions) == (
+        {f"ingest.{stage}/s" for stage in INGEST_STAGES}
+        | {f"query.{mode}.{key}" for mode in QUERY_MODES for key in LATENCY_KEYS}
+        | {f"profile.fast.{key}" for key in LATENCY_KEYS}
+        | {"profile.fast.recall"}
+    )
+    print("✅ Lower throughput or recall and higher latency are flagged")
+
+    partial = make_results("partial", per_second=50.0, p99_ms=20.0)
+    del partial["ingest"]["embed"], partial["query"]["vector"], partial["profiles"]["fast"]
+    regressions = compare(baseline, partial, threshold=0.1)
+    assert "ingest.embed/s" not in regressions and not any(name.startswith(("query.vector.", "profile.")) for name in regressions)
+    assert "ingest.load/s" in regressions
+    print("✅ Metrics missing from either run are skipped")
+
+    zero = make_results("zero", per_second=0.0, p99_ms=0.0, recall=0.0)
+    assert set(compare(zero, baseline, threshold=0.1)) == {f"query.{mode}.{key}" for mode in QUERY_MODES for key in LATENCY_KEYS} | {f"profile.fast.{key}" for key in LATENCY_KEYS}
+    assert compare(zero, zero, threshold=0.1) == []
+    print("✅ Latency rising from a zero baseline is a regression, throughput rising from zero is not")
+
+    print("✅ Regression comparison test passed\n")
+
+
+def test_run_suite():
+    """A tiny offline run reports every stage, query mode and profile"""
+    print("\n" + "=" * 50)
+    print("TEST: Offline suite run")
+    print("=" * 50)
+
+    args = argparse.Namespace(
+        chunks=40, queries=10, warmup=2, top_k=5, seed=0, backend="local", qdrant_url=":memory:",
+        chunker="words", real_model=False, embed_delay_ms=0.0, context_delay_ms=0.0
+    )
+    results = run_suite(args)
+    assert results["meta"]["chunks"] > 0
+    assert set(results["ingest"]) == set(INGEST_STAGES)
+    assert set(results["query"]) == set(QUERY_MODES)
+    assert results["profiles"]["exhaustive"]["recall"] == 1.0
+    assert compare(results, results, threshold=0.1) == []
+    print(f"✅ {results['meta']['chunks']} chunks, {len(results['profiles'])} profiles; a run does not regress against itself")
+
+    print("✅ Offline suite run test passed\n")
+
+
+if __name__ == "__main__":
+    test_word_chunks()
+    test_compare()
+    test_run_suite()
@@ -0,0 +1,169 @@
+"""
+Test portable index bundles: export, verified import and replica bootstrap
+"""
+import sys
+import os
+import tempfile
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+from benchmarks.synthetic import make_queries, HashingEmbedder
+from src.bundle import export_bundle, import_bundle, read_manifest, prompt_hash, MANIFEST_FILE
+from src.dedup import DuplicateMap
+from src.metadata import annotate_chunks
+from src.vector_store import QdrantStorage
+from src.local_vector_store import LocalVectorStore
+from src.retriever import HybridRetriever
+from src.server import load_retriever
+from tests.fixtures import make_chunks, make_indexes
+
+
+def make_source(path: str):
+    """An ingested local collection with metadata, plus its BM25 index."""
+    chunks = make_chunks(150, seed=4)
+    annotate_chunks(chunks, 'report', source='report.pdf', tags=['finance'])
+    for chunk in chunks:
+        chunk['page'] = (chunk['chunk_id'] - 1) // 10 + 1
+    store, bm25 = make_indexes(chunks, LocalVectorStore(collection_name="source", path=path))
+    duplicates = DuplicateMap({('report', 1): [{'doc_id': 'report', 'chunk_id': 99, 'source': 'report.pdf', 'page': 4}]})
+    store.set_metadata(duplicates.to_metadata())
+    store.set_metadata({"fingerprint": "abc"})
+    return chunks, store, bm25
+
+
+def test_export_import():
+    """A bundle restores the same vectors, BM25 scores and metadata in any backend"""
+    print("\n" + "=" * 50)
+    print("TEST: Bundle export and import")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        chunks, source, bm25 = make_source(tmp)
+        bundle_path = os.path.join(tmp, "bundle")
+        manifest = export_bundle(source, bundle_path)
+        assert manifest['chunks'] == len(chunks)
+        assert manifest['context_prompt_sha256'] == prompt_hash()
+        assert manifest['collection_metadata']['fingerprint'] == "abc"
+        assert not os.path.exists(bundle_path + ".partial")
+        print(f"✅ Exported {manifest['chunks']} chunks, {len(manifest['files'])} checksummed files")
+
+        queries = make_queries(chunks, 8, seed=2)
+        embedder = HashingEmbedder()
+        for target in (
+            LocalVectorStore(collection_name="replica", path=tmp),
+            QdrantStorage(collection_name="replica", url=":memory:")
+        ):
+            bundle = import_bundle(bundle_path, target, batch_size=32, workers=3)
+            assert target.count() == len(chunks)
+            assert target.is_compatible("abc")
+            assert DuplicateMap.from_metadata(target.metadata()).get(('report', 1))[0]['page'] == 4
+            for query in queries:
+                vector = embedder.embed_query(query)
+                expected = source.search(vector, top_k=10, with_payload=["chunk_id"])
+                hits = target.search(vector, top_k=10, exact=True, with_payload=["chunk_id"])
+                assert np.allclose([h['score'] for h in hits], [h['score'] for h in expected], atol=1e-5)
+                restored = bundle.bm25_index.search(query, top_k=10, filter={'page': {'lte': 5}})
+                original = bm25.search(query, top_k=10, filter={'page': {'lte': 5}})
+                assert np.allclose([r['score'] for r in restored], [r['score'] for r in original])
+                assert {r['chunk_id'] for r in restored} == {r['chunk_id'] for r in original}
+            print(f"✅ {type(target).__name__}: same vector hits and BM25 scores as the source")
+
+    print("✅ Bundle export/import test passed\n")
+
+
+def test_sparse_bundle():
+    """A bundle imported into a hybrid collection is only compatible when opened with sparse vectors"""
+    print("\n" + "=" * 50)
+    print("TEST: Bundle into a sparse BM25 collection")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        chunks, source, _ = make_source(tmp)
+        bundle_path = os.path.join(tmp, "bundle")
+        export_bundle(source, bundle_path)
+        target = QdrantStorage(collection_name="hybrid", url=":memory:", sparse=True)
+        import_bundle(bundle_path, target)
+        query = make_queries(chunks, 1, seed=3)[0]
+        assert len(target.hybrid_search(HashingEmbedder().embed_query(query), query, top_k=5)) == 5
+        reopened = QdrantStorage(collection_name="hybrid", sparse=True, client=target.client)
+        assert reopened.is_compatible("abc") and reopened.sparse_encoder.avgdl is not None
+        assert not QdrantStorage(collection_name="hybrid", client=target.client).is_compatible("abc")
+        print("✅ Opened with sparse=True (src.bundle --server-fusion) the hybrid collection matches; dense-only does not")
+
+    print("✅ Sparse bundle test passed\n")
+
+
+def test_bundle_verification():
+    """Corrupted bundles and mismatched models are rejected"""
+    print("\n" + "=" * 50)
+    print("TEST: Bundle verification")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _, source, _ = make_source(tmp)
+        bundle_path = os.path.join(tmp, "bundle")
+        export_bundle(source, bundle_path)
+        try:
+            export_bundle(source, bundle_path)
+        except FileExistsError:
+            print("✅ An existing bundle is never overwritten")
+        else:
+            raise AssertionError("Exporting over an existing bundle should fail")
+
+        with open(os.path.join(bundle_path, "chunks", "text.bin"), "r+b") as f:
+            f.write(b"X")
+        try:
+            read_manifest(bundle_path)
+        except ValueError:
+            print("✅ A corrupted file fails the checksum")
+        else:
+            raise AssertionError("Corrupted bundle should be rejected")
+
+        manifest_path = os.path.join(bundle_path, MANIFEST_FILE)
+        with open(manifest_path) as f:
+            text = f.read()
+        with open(manifest_path, "w") as f:
+            f.write(text.replace('"embedding_dimension": 384', '"embedding_dimension": 768'))
+        try:
+            read_manifest(bundle_path, verify=False)
+        except ValueError:
+            print("✅ A bundle embedded with another dimension is rejected")
+        else:
+            raise AssertionError("Dimension mismatch should be rejected")
+
+    print("✅ Bundle verification test passed\n")
+
+
+def test_replica_bootstrap():
+    """The query server serves an imported bundle like the source does"""
+    print("\n" + "=" * 50)
+    print("TEST: Replica bootstrap from a bundle")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        chunks, source, bm25 = make_source(tmp)
+        bundle_path = os.path.join(tmp, "bundle")
+        export_bundle(source, bundle_path)
+        replica_dir = os.path.join(tmp, "replica")
+        import_bundle(bundle_path, LocalVectorStore(collection_name="live", path=replica_dir))
+
+        embedder = HashingEmbedder()
+        replica = load_retriever(bundle_path, "local", "live", embedder=embedder, path=replica_dir)
+        assert replica.bm25_index.bm25 is None  # Memory-mapped postings, nothing re-tokenized
+        original = HybridRetriever(source, bm25, embedder, parallel_legs=False)
+        for query in make_queries(chunks, 5, seed=9):
+            expected = original.retrieve(query, top_k=5)
+            results = replica.retrieve(query, top_k=5)
+            assert [r['chunk_text'] for r in results] == [r['chunk_text'] for r in expected]
+        assert [ref['chunk_id'] for ref in replica.duplicates.get(('report', 1))] == [99]
+        replica.close()
+        print("✅ Replica answers like the source with zero ingestion calls")
+
+    print("✅ Replica bootstrap test passed\n")
+
+
+if __name__ == "__main__":
+    test_export_import()
+    test_sparse_bundle()
+    test_bundle_verification()
+    test_replica_bootstrap()
@@ -0,0 +1,172 @@
+"""
+Test payload-light search and lazy chunk hydration
+"""
+import sys
+import os
+import tempfile
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+from benchmarks.synthetic import make_queries, HashingEmbedder
+from src.chunk_store import ChunkStore, ChunkView
+from src.embedder import Embedder
+from src.vector_store import QdrantStorage
+from src.local_vector_store import LocalVectorStore
+from src.bm25_index import BM25Index
+from src.retriever import HybridRetriever
+from tests.fixtures import make_chunks as make_corpus_chunks
+from config import EMBEDDING_DIMENSION
+
+
+class StubEmbedder:
+    def embed_query(self, text):
+        seed = sum(text.encode('utf-8'))
+        return np.random.default_rng(seed).standard_normal(EMBEDDING_DIMENSION).astype(np.float32)
+
+
+def make_chunks(n: int) -> list:
+    rng = np.random.default_rng(0)
+    topics = ['revenue', 'growth', 'risk', 'ünïcode', 'compliance', 'hiring']
+    return [
+        {
+            'chunk_id': i + 1,
+            'chunk_text': f'Section {i + 1} covers {topics[i % len(topics)]} in detail.',
+            'context': f'From the annual report, part {i + 1}.',
+            'embedding': rng.standard_normal(EMBEDDING_DIMENSION).astype(np.float32),
+            'contextual_embedding': rng.standard_normal(EMBEDDING_DIMENSION).astype(np.float32)
+        }
+        for i in range(n)
+    ]
+
+
+def test_chunk_store():
+    print("=" * 50)
+    print("TEST: Chunk store and lazy hydration")
+    print("=" * 50)
+
+    chunks = make_chunks(40)
+    store = ChunkStore.build(chunks)
+    hydrated = store.hydrate([4, 17, 999])
+    assert set(hydrated) == {4, 17}
+    assert hydrated[4]['chunk_text'] == chunks[3]['chunk_text']
+    assert hydrated[17]['context'] == chunks[16]['context']
+    print("✅ In-memory store hydrates by chunk_id")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store.save(tmp)
+        mapped = ChunkStore.open(tmp)
+        assert isinstance(mapped.buffer, np.memmap)
+        assert mapped.hydrate([4, 17]) == hydrated
+        print("✅ Memory-mapped store returns the same text")
+
+    qdrant = QdrantStorage(collection_name="test_hydration", url=":memory:")
+    qdrant.add_chunks(chunks)
+    query = np.random.default_rng(1).standard_normal(EMBEDDING_DIMENSION).astype(np.float32)
+    light = qdrant.search(query, top_k=5, with_payload=["chunk_id"])
+    full = qdrant.search(query, top_k=5)
+    assert all(set(hit) == {'doc_id', 'chunk_id', 'score'} for hit in light)
+    assert [h['chunk_id'] for h in light] == [h['chunk_id'] for h in full]
+    assert qdrant.hydrate([full[0]['chunk_id']])[full[0]['chunk_id']]['chunk_text'] == full[0]['chunk_text']
+    print("✅ Qdrant search returns keys and scores only, hydrate fetches text")
+
+    # Re-adding a chunk_id overwrites its point in both backends
+    qdrant.add_chunks(chunks[:5])
+    local = LocalVectorStore(path=None)
+    local.add_chunks(chunks)
+    local.add_chunks(chunks[:5])
+    assert qdrant.count() == local.count() == 40
+    print("✅ Re-adding chunks overwrites instead of duplicating")
+
+    bm25 = BM25Index()
+    bm25.add_documents(chunks)
+    for chunk_store in (None, store):
+        retriever = HybridRetriever(qdrant, bm25, StubEmbedder(), chunk_store=chunk_store)
+        results = retriever.retrieve('revenue growth report', top_k=5)
+        assert len(results) == 5
+        by_id = {c['chunk_id']: c for c in chunks}
+        for result in results:
+            assert result['chunk_text'] == by_id[result['chunk_id']]['chunk_text']
+            assert result['context'] == by_id[result['chunk_id']]['context']
+    print("✅ HybridRetriever hydrates only the final results")
+
+    print("✅ Chunk store test passed\n")
+
+
+class StubModel:
+    """SentenceTransformer stand-in built on the hashing embedder."""
+
+    def __init__(self):
+        self.hashing = HashingEmbedder()
+
+    def encode(self, texts, batch_size=32):
+        if isinstance(texts, str):
+            return self.hashing.embed_text(texts)
+        return np.stack([self.hashing.embed_text(text) for text in texts])
+
+
+def test_columnar_store():
+    print("=" * 50)
+    print("TEST: Columnar chunk store")
+    print("=" * 50)
+
+    chunks = make_corpus_chunks(120, vocabulary_size=500, embed=False)
+    store = ChunkStore.build(chunks)
+    assert len(store) == len(chunks) and store.embeddings == {}
+    view = store[3]
+    assert isinstance(view, ChunkView) and view['chunk_id'] == chunks[3]['chunk_id']
+    assert dict(view) == {
+        **{k: chunks[3][k] for k in ('chunk_id', 'chunk_text', 'context')},
+        'doc_id': '', 'source': '', 'page': None, 'tags': []
+    }
+    assert [v['chunk_text'] for v in store] == [c['chunk_text'] for c in chunks]
+    assert store.get(chunks[-1]['chunk_id'])['context'] == chunks[-1]['context'] and store.get(-5) is None
+    print("✅ Rows are exposed as dict-like views over the columns")
+
+    Embedder(model=StubModel()).embed_chunks(store)
+    HashingEmbedder().embed_chunks(chunks)
+    for name in ('embedding', 'contextual_embedding'):
+        assert store.embeddings[name].shape == (len(chunks), 384)
+        assert np.allclose(store.embeddings[name], np.stack([c[name] for c in chunks]), atol=1e-6)
+    assert np.shares_memory(store[7]['embedding'], store.embeddings['embedding'])
+    print("✅ Embedder fills one matrix per embedding type; views share its memory")
+
+    half = ChunkStore.build(chunks, dtype="float16")
+    assert half.embeddings['contextual_embedding'].dtype == np.float16
+    assert half.embeddings['embedding'].nbytes * 2 == store.embeddings['embedding'].nbytes
+    print("✅ float16 storage halves the embedding matrices")
+
+    queries = make_queries(chunks, 10)
+    from_dicts, from_store = BM25Index(), BM25Index()
+    from_dicts.add_documents(chunks)
+    from_store.add_documents(store)
+    assert from_store.documents is store
+    assert from_store.search_many(queries, top_k=5) == from_dicts.search_many(queries, top_k=5)
+    print("✅ BM25Index indexes the store directly, same results as chunk dicts")
+
+    embedder = HashingEmbedder()
+    dict_vectors, store_vectors = LocalVectorStore(path=None), LocalVectorStore(path=None)
+    dict_vectors.add_chunks(chunks)
+    store_vectors.add_chunks(store)
+    for query in queries:
+        vector = embedder.embed_query(query)
+        expected = dict_vectors.search(vector, top_k=5)
+        results = store_vectors.search(vector, top_k=5)
+        assert [r['chunk_id'] for r in results] == [r['chunk_id'] for r in expected]
+        assert np.allclose([r['score'] for r in results], [r['score'] for r in expected], atol=1e-5)
+    print("✅ LocalVectorStore ingests the embedding matrices as a whole")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        half.save(tmp)
+        mapped = ChunkStore.open(tmp)
+        assert mapped.dtype == np.float16
+        assert isinstance(mapped.embeddings['embedding'], np.memmap)
+        assert np.array_equal(mapped[10]['contextual_embedding'], half[10]['contextual_embedding'])
+        assert mapped[10]['chunk_text'] == chunks[10]['chunk_text']
+        print("✅ Saved embeddings are memory-mapped on open")
+
+    print("✅ Columnar store test passed\n")
+
+
+if __name__ == "__main__":
+    test_chunk_store()
+    test_columnar_store()
@@ -0,0 +1,196 @@
+"""
+Test embedding compression: projections, the compressed embedder and float16 bundles
+"""
+import sys
+import os
+import tempfile
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+from benchmarks.synthetic import make_queries, HashingEmbedder
+from src.bm25_index import BM25Index
+from src.bundle import export_bundle, read_manifest
+from src.chunk_store import ChunkStore
+from src.compression import CompressedEmbedder, EmbeddingProjection, with_stored_projection
+from src.embedder import Embedder
+from src.local_vector_store import LocalVectorStore
+from src.retriever import HybridRetriever
+from src.server import load_retriever
+from tests.fixtures import make_chunks as make_corpus_chunks
+from config import EMBEDDING_MODEL_DIMENSION
+
+DIMENSION = 64
+
+
+def make_chunks():
+    return make_corpus_chunks(200, seed=6, embed=False)
+
+
+def test_projection():
+    """PCA and Matryoshka projections: unit rows, ranking kept, metadata round trip"""
+    print("\n" + "=" * 50)
+    print("TEST: Embedding projections")
+    print("=" * 50)
+
+    chunks = make_chunks()
+    embedder = HashingEmbedder()
+    matrix = embedder.embed_chunks(ChunkStore.build(chunks)).embeddings['contextual_embedding']
+    queries = embedder.embed_queries(make_queries(chunks, 20, seed=3))
+
+    pca = EmbeddingProjection.fit(matrix, 128)
+    projected = pca.transform(matrix)
+    assert projected.shape == (len(chunks), 128) and projected.dtype == np.float32
+    assert np.allclose(np.linalg.norm(projected, axis=1), 1.0, atol=1e-5)
+    assert pca.transform(queries[0]).shape == (128,)
+    assert 0 < pca.retained_energy < 1
+    truth = np.argsort(-(queries @ np.asarray(matrix).T), axis=1)[:, 0]
+    top = np.argsort(-(pca.transform(queries) @ projected.T), axis=1)[:, :5]
+    assert np.mean([t in row for t, row in zip(truth, top)]) >= 0.8
+    print(f"✅ PCA to 128 dimensions keeps {pca.retained_energy:.0%} of the energy and the nearest chunks")
+
+    restored = EmbeddingProjection.from_metadata(pca.to_metadata())
+    assert np.array_equal(restored.transform(queries), pca.transform(queries))
+    matryoshka = EmbeddingProjection.fit(matrix, DIMENSION, method="matryoshka")
+    restored = EmbeddingProjection.from_metadata(matryoshka.to_metadata())
+    vector = np.random.default_rng(0).standard_normal(384).astype(np.float32)
+    assert np.allclose(restored.transform(vector), vector[:DIMENSION] / np.linalg.norm(vector[:DIMENSION]))
+    assert EmbeddingProjection.from_metadata({}) is None
+    print("✅ Projections survive the collection metadata round trip")
+
+    for bad in (lambda: EmbeddingProjection.fit(matrix, 500), lambda: EmbeddingProjection("svd", 8, 384)):
+        try:
+            bad()
+        except ValueError:
+            continue
+        raise AssertionError("Invalid projection should be rejected")
+    print("✅ Unknown methods and dimensions above the model's are rejected")
+
+    print("✅ Projection test passed\n")
+
+
+def test_matryoshka_dimensions():
+    """Matryoshka truncation up to the model dimension; larger or empty outputs are rejected"""
+    print("\n" + "=" * 50)
+    print("TEST: Matryoshka dimensions")
+    print("=" * 50)
+
+    model = HashingEmbedder()
+    matrix = model.embed_chunks(ChunkStore.build(make_chunks())).embeddings['embedding']
+    full = EmbeddingProjection.fit(matrix, model.dimension, method="matryoshka")
+    assert np.allclose(full.transform(matrix), matrix, atol=1e-6)
+    print(f"✅ Truncating to the model's own {model.dimension} dimensions keeps the (unit) embeddings")
+
+    for dimension in (model.dimension + 1, 4 * model.dimension, 0, -8):
+        for method in ("matryoshka", "pca"):
+            try:
+                EmbeddingProjection.fit(matrix, dimension, method=method)
+            except ValueError:
+                pass
+            else:
+                raise AssertionError(f"{method} to {dimension} dimensions should be rejected")
+            try:
+                CompressedEmbedder(model, method=method, dimension=dimension)
+            except ValueError:
+                pass
+            else:
+                raise AssertionError(f"CompressedEmbedder({method}, {dimension}) should be rejected")
+    print("✅ Dimensions above the model's or below 1 are rejected by fit and by CompressedEmbedder")
+
+    real = Embedder()
+    assert real.dimension == EMBEDDING_MODEL_DIMENSION
+    try:
+        CompressedEmbedder(real, method="matryoshka", dimension=EMBEDDING_MODEL_DIMENSION + 1)
+    except ValueError:
+        assert not real.loaded
+        print("✅ The model embedder reports its dimension unloaded, so oversized projections fail before any embedding")
+    else:
+        raise AssertionError("An oversized projection of the model embedder should be rejected up front")
+    assert Embedder(model_name="another-model").dimension is None
+
+    class SizelessModel:
+        """Model stand-in that does not report its dimension (like a lazily loaded one)."""
+
+        def embed_chunks(self, chunks):
+            return model.embed_chunks(chunks)
+
+    assert not hasattr(SizelessModel(), "dimension")
+    embedder = CompressedEmbedder(SizelessModel(), method="matryoshka", dimension=model.dimension + 1)
+    try:
+        embedder.embed_chunks(make_chunks())
+    except ValueError:
+        assert embedder.projection is None
+        print("✅ Without a reported model dimension, the oversized projection fails when it is fitted")
+    else:
+        raise AssertionError("An oversized projection should fail when fitted")
+
+    stored = EmbeddingProjection.fit(np.zeros((1, 2 * model.dimension)), 2 * DIMENSION, method="matryoshka")
+    try:
+        CompressedEmbedder(model, projection=stored).embed_query("query")
+    except ValueError:
+        print("✅ A stored projection from a larger model refuses this model's embeddings")
+    else:
+        raise AssertionError("Embeddings of the wrong dimension should be rejected")
+
+    print("✅ Matryoshka dimension test passed\n")
+
+
+def test_compressed_retrieval():
+    """Chunks and queries share the projection, in the retriever and the server"""
+    print("\n" + "=" * 50)
+    print("TEST: Compressed embedder end to end")
+    print("=" * 50)
+
+    chunks = make_chunks()
+    embedder = CompressedEmbedder(HashingEmbedder(), method="pca", dimension=DIMENSION)
+    try:
+        embedder.embed_query("too early")
+    except RuntimeError:
+        print("✅ Queries need a fitted projection")
+    else:
+        raise AssertionError("Query embedding without a projection should fail")
+
+    chunk_store = embedder.embed_chunks(ChunkStore.build(chunks))
+    assert chunk_store.embeddings['embedding'].shape == (len(chunks), DIMENSION)
+    dict_chunks = CompressedEmbedder(HashingEmbedder(), projection=embedder.projection).embed_chunks(make_chunks())
+    assert np.allclose(dict_chunks[0]['contextual_embedding'], chunk_store.embeddings['contextual_embedding'][0], atol=1e-6)
+    print(f"✅ ChunkStore and dict chunks are projected to {DIMENSION} dimensions")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = LocalVectorStore(collection_name="compressed", path=tmp, dimension=DIMENSION, dtype="float16")
+        store.add_chunks(chunk_store)
+        store.set_metadata(embedder.projection.to_metadata())
+        bm25 = BM25Index()
+        bm25.add_documents(chunk_store)
+        retriever = HybridRetriever(store, bm25, embedder, parallel_legs=False)
+        query = make_queries(chunks, 1, seed=4)[0]
+        expected = retriever.retrieve(query, top_k=5)
+        assert len(expected) == 5
+
+        # A fresh process: the projection comes from the collection metadata
+        served = load_retriever(tmp, "local", "compressed", embedder=HashingEmbedder(), path=tmp, dimension=DIMENSION, dtype="float16")
+        results = served.retrieve(query, top_k=5)
+        assert [r['chunk_id'] for r in results] == [r['chunk_id'] for r in expected]
+        assert with_stored_projection(HashingEmbedder(), {}).__class__ is HashingEmbedder
+        print("✅ The server projects queries with the stored projection")
+
+        bundle_path = os.path.join(tmp, "bundle")
+        manifest = export_bundle(store, bundle_path, dtype="float16")
+        assert manifest['embedding_dtype'] == "float16" and manifest['embedding_compression'] == "pca"
+        assert manifest['embedding_dimension'] == DIMENSION
+        assert os.path.getsize(os.path.join(bundle_path, "chunks", "contextual_embedding.npy")) < len(chunks) * DIMENSION * 4
+        try:
+            read_manifest(bundle_path)
+        except ValueError:
+            print("✅ A compressed bundle is refused by a process configured for full-size vectors")
+        else:
+            raise AssertionError("Dimension mismatch should be rejected")
+        retriever.close()
+        served.close()
+
+    print("✅ Compressed retrieval test passed\n")
+
+
+if __name__ == "__main__":
+    test_projection()
+    test_matryoshka_dimensions()
+    test_compressed_retrieval()
@@ -0,0 +1,216 @@
+"""
+Test concurrent readers: one shared HybridRetriever, its caches and stores under many threads
+"""
+import sys
+import os
+import gc
+import tempfile
+import threading
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+from benchmarks.bench_concurrency import answer, build_retriever, run_load
+from benchmarks.synthetic import make_queries, HashingEmbedder
+from src.cache import LRUCache
+from src.embedder import Embedder
+from src.local_vector_store import LocalVectorStore
+from src.retriever import HybridRetriever
+from src.snapshots import SnapshotManager
+from src.vector_store import QdrantStorage
+from tests.fixtures import make_chunks as make_corpus_chunks, make_indexes
+
+
+def make_chunks(count=300, seed=9, embed=False):
+    return make_corpus_chunks(count, seed=seed, doc_id="doc", embed=embed)
+
+
+def test_concurrent_retrieval():
+    """Many clients get the same answers as a sequential run, whatever they do with them"""
+    print("\n" + "=" * 50)
+    print("TEST: Concurrent retrieval")
+    print("=" * 50)
+
+    chunks = make_chunks()
+    queries = make_queries(chunks, 40, seed=2)
+    for result_cache in (False, True):
+        retriever = build_retriever(chunks, embed_delay=0.0005, result_cache=result_cache)
+        expected = {query: answer(retriever.retrieve(query, top_k=5)) for query in queries}
+        assert any(ref for results in expected.values() for *_, ref in results)
+        report = run_load(retriever, queries, clients=16, requests_per_client=30, expected=expected, top_k=5)
+        assert report.requests == 16 * 30 and report.errors == 0 and report.mismatches == 0
+        again = {query: answer(retriever.retrieve(query, top_k=5)) for query in queries}
+        assert again == expected
+        retriever.close()
+        print(f"✅ 16 clients, result cache {'on' if result_cache else 'off'}: {report.qps:.0f} qps, no errors or mismatches")
+
+    print("✅ Concurrent retrieval test passed\n")
+
+
+def test_no_shared_state():
+    """Results, references and cached embeddings are not shared with callers"""
+    print("\n" + "=" * 50)
+    print("TEST: Returned results are private")
+    print("=" * 50)
+
+    chunks = make_chunks(100)
+    retriever = build_retriever(chunks, embed_delay=0, result_cache=True)
+    query = make_queries(chunks, 1, seed=5)[0]
+    first = retriever.retrieve(query, top_k=10)
+    expected = answer(first)
+    cited = [r for r in first if r['references']]
+    assert cited, "the DuplicateMap should cite a copy of some result"
+    references_before = [dict(ref) for ref in retriever.duplicates.get((cited[0]['doc_id'], cited[0]['chunk_id']))]
+    for result in first:
+        result['chunk_text'] = "changed"
+        result['references'].append({'chunk_id': -1})
+        for reference in result['references']:
+            reference['doc_id'] = "changed"
+    cached = retriever.retrieve(query, top_k=10)
+    assert cached.cached and answer(cached) == expected
+    assert retriever.duplicates.get((cited[0]['doc_id'], cited[0]['chunk_id'])) == references_before
+    print("✅ Changing results and references leaves the cache and the DuplicateMap alone")
+
+    embedding = retriever._embed_query(query)
+    try:
+        embedding[0] = 1.0
+    except ValueError:
+        print("✅ Cached query embeddings are read-only")
+    else:
+        raise AssertionError("Cached query embeddings should be read-only")
+    retriever.close()
+
+    print("✅ Shared state test passed\n")
+
+
+def test_in_process_qdrant():
+    """Concurrent queries against an in-process Qdrant collection"""
+    print("\n" + "=" * 50)
+    print("TEST: Concurrent readers on in-process Qdrant")
+    print("=" * 50)
+
+    chunks = make_chunks(200, embed=True)
+    storage, bm25 = make_indexes(chunks, QdrantStorage(collection_name="test_concurrency", url=":memory:"))
+    retriever = HybridRetriever(storage, bm25, HashingEmbedder(), result_cache=LRUCache(0))
+    queries = make_queries(chunks, 20, seed=4)
+    expected = {query: answer(retriever.retrieve(query, top_k=5)) for query in queries}
+    report = run_load(retriever, queries, clients=8, requests_per_client=10, expected=expected, top_k=5)
+    assert report.errors == 0 and report.mismatches == 0
+    retriever.close()
+    print(f"✅ 8 clients, {report.requests} queries: no errors or mismatches")
+
+    print("✅ In-process Qdrant test passed\n")
+
+
+def test_publish_under_load():
+    """Publishing a new version while clients query: every answer is wholly one version"""
+    print("\n" + "=" * 50)
+    print("TEST: Publish under concurrent load")
+    print("=" * 50)
+
+    old_chunks = make_chunks(150, seed=9, embed=True)
+    new_chunks = make_chunks(150, seed=10, embed=True)
+    queries = make_queries(old_chunks, 10, seed=6) + make_queries(new_chunks, 10, seed=6)
+    for result_cache in (False, True):
+        with tempfile.TemporaryDirectory() as tmp:
+            old_store, old_bm25 = make_indexes(old_chunks, LocalVectorStore(collection_name="live-1", path=tmp))
+            old_store.set_alias("live")
+            retriever = HybridRetriever(
+                old_store, old_bm25, HashingEmbedder(delay=0.0005),
+                result_cache=None if result_cache else LRUCache(0)
+            )
+            manager = SnapshotManager(retriever, alias="live")
+            new_store, new_bm25 = make_indexes(new_chunks, manager.new_vector_store())
+            reference = HybridRetriever(new_store, new_bm25, HashingEmbedder(), parallel_legs=False)
+            old = {query: answer(retriever.retrieve(query, top_k=5)) for query in queries}
+            new = {query: answer(reference.retrieve(query, top_k=5)) for query in queries}
+            reference.close()
+            assert all(old[query] != new[query] for query in queries)
+
+            stop = threading.Event()
+            seen = {}
+            failures = []
+
+            def client(index: int) -> None:
+                versions = seen.setdefault(index, [])
+                n = index
+                while not stop.is_set():
+                    query = queries[n % len(queries)]
+                    n += 1
+                    try:
+                        results = retriever.retrieve(query, top_k=5)
+                    except Exception as e:
+                        failures.append(repr(e))
+                        continue
+                    got = answer(results)
+                    versions.append(1 if got == new[query] else 0 if got == old[query] else None)
+                    for result in results:
+                        result['chunk_text'] = None
+
+            threads = [threading.Thread(target=client, args=(i,)) for i in range(8)]
+            for thread in threads:
+                thread.start()
+            time.sleep(0.1)
+            manager.publish(new_store, new_bm25)
+            time.sleep(0.1)
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+            assert not failures, failures[:3]
+            assert all(None not in versions for versions in seen.values()), "an answer mixed both versions"
+            assert any(0 in versions for versions in seen.values()) and any(1 in versions for versions in seen.values())
+            # A client's next query starts after it saw the new version, so it never goes back
+            assert all(versions == sorted(versions) for versions in seen.values())
+            assert {query: answer(retriever.retrieve(query, top_k=5)) for query in queries} == new
+            total = sum(len(versions) for versions in seen.values())
+            print(f"✅ Result cache {'on' if result_cache else 'off'}: {total} answers from 8 clients, each wholly the old or the new version")
+
+            gc.collect()
+            assert manager.collect() == ["live-1"]
+            retriever.close()
+    print("✅ The old collection is dropped once the load has moved on")
+
+    print("✅ Publish under load test passed\n")
+
+
+def test_embedder_concurrency_bound():
+    """At most max_concurrency encode calls run at once"""
+    print("\n" + "=" * 50)
+    print("TEST: Bounded embedder concurrency")
+    print("=" * 50)
+
+    class SlowModel:
+        def __init__(self):
+            self.running = 0
+            self.peak = 0
+            self.lock = threading.Lock()
+
+        def encode(self, texts, **kwargs):
+            with self.lock:
+                self.running += 1
+                self.peak = max(self.peak, self.running)
+            time.sleep(0.01)
+            with self.lock:
+                self.running -= 1
+            return np.zeros((len(texts), 4), dtype=np.float32) if isinstance(texts, list) else np.zeros(4, dtype=np.float32)
+
+    model = SlowModel()
+    embedder = Embedder(model=model, max_concurrency=2)
+    threads = [threading.Thread(target=embedder.embed_query, args=(f"query {i}",)) for i in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert model.peak == 2 and model.running == 0
+    print("✅ 12 threads, at most 2 encode calls at a time")
+
+    print("✅ Embedder concurrency test passed\n")
+
+
+if __name__ == "__main__":
+    test_concurrent_retrieval()
+    test_no_shared_state()
+    test_in_process_qdrant()
+    test_publish_under_load()
+    test_embedder_concurrency_bound()
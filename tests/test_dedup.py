@@ -0,0 +1,127 @@
+"""
+Test near-duplicate chunk detection at ingestion
+"""
+import sys
+import os
+import tempfile
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+from benchmarks.synthetic import make_corpus, fake_context, HashingEmbedder
+from src.dedup import MinHashDeduplicator, DuplicateMap, shingles
+from src.metadata import annotate_chunks
+from src.local_vector_store import LocalVectorStore
+from src.retriever import HybridRetriever
+from tests.fixtures import make_indexes
+
+DISCLAIMER = (
+    "This report contains forward-looking statements that involve risks and uncertainties. "
+    "Actual results may differ materially from those expressed or implied in these statements. "
+    "The company undertakes no obligation to update any forward-looking statement after the date of this report."
+)
+
+
+def make_chunks() -> list:
+    """
+    40 distinct chunks, with the disclaimer repeated on pages 1, 3 and 5
+    (the last copy with a few words changed).
+    """
+    chunks = make_corpus(40, words_per_chunk=60, vocabulary_size=2000)
+    annotate_chunks(chunks, 'annual-2023', source='annual-2023.pdf')
+    for chunk in chunks:
+        chunk['page'] = (chunk['chunk_id'] - 1) // 8 + 1
+    for i, page in ((0, 1), (16, 3), (32, 5)):
+        chunks[i]['chunk_text'] = DISCLAIMER
+        chunks[i]['page'] = page
+    chunks[32]['chunk_text'] = DISCLAIMER.replace("materially", "significantly") + " See note 12."
+    return chunks
+
+
+def test_minhash():
+    """Signatures estimate the Jaccard similarity of word shingles"""
+    print("\n" + "=" * 50)
+    print("TEST: MinHash signatures")
+    print("=" * 50)
+
+    deduplicator = MinHashDeduplicator(num_perm=256, bands=64)
+    corpus = make_corpus(2, words_per_chunk=200, vocabulary_size=5000)
+    a = corpus[0]['chunk_text']
+    words = a.split()
+    b = " ".join(words[:150] + corpus[1]['chunk_text'].split()[:50])
+    exact = len(set(shingles(a)) & set(shingles(b))) / len(set(shingles(a)) | set(shingles(b)))
+    estimate = np.mean(deduplicator.signature(a) == deduplicator.signature(b))
+    assert abs(estimate - exact) < 0.1, (estimate, exact)
+    assert np.array_equal(deduplicator.signature(a), deduplicator.signature(a.upper()))
+    assert deduplicator.signature("") is None
+    print(f"✅ Estimated Jaccard {estimate:.2f} vs exact {exact:.2f}")
+
+    try:
+        MinHashDeduplicator(num_perm=100, bands=32)
+    except ValueError:
+        print("✅ num_perm must be a multiple of bands")
+    else:
+        raise AssertionError("num_perm=100 with 32 bands should be rejected")
+
+    print("✅ MinHash test passed\n")
+
+
+def test_deduplicate():
+    """Copies map to the first chunk and keep their own doc_id, chunk_id and page"""
+    print("\n" + "=" * 50)
+    print("TEST: Near-duplicate chunks")
+    print("=" * 50)
+
+    chunks = make_chunks()
+    deduplication = MinHashDeduplicator(threshold=0.7).deduplicate(chunks)
+    kept_ids = [chunk['chunk_id'] for chunk in deduplication.chunks]
+    assert kept_ids == [c['chunk_id'] for c in chunks if c['chunk_id'] not in (17, 33)]
+    assert deduplication.stats == {
+        'chunks': 40,
+        'canonical': 38,
+        'duplicates': 2,
+        'duplicate_words': len(chunks[16]['chunk_text'].split()) + len(chunks[32]['chunk_text'].split())
+    }
+    assert [(ref['chunk_id'], ref['page']) for ref in deduplication.duplicates.get(('annual-2023', 1))] == [(17, 3), (33, 5)]
+    assert len(deduplication.duplicates) == 2
+    print(f"✅ {deduplication.stats['duplicates']} copies mapped to their canonical chunk")
+
+    strict = MinHashDeduplicator(threshold=1.0).deduplicate(chunks)
+    assert strict.stats['duplicates'] == 1  # The edited copy is no longer close enough
+    print("✅ Threshold controls how similar a copy must be")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = LocalVectorStore(collection_name="dedup", path=tmp)
+        store.set_metadata(deduplication.duplicates.to_metadata())
+        reopened = DuplicateMap.from_metadata(LocalVectorStore(collection_name="dedup", path=tmp).metadata())
+        assert reopened.references == deduplication.duplicates.references
+    print("✅ References survive a restart through the collection metadata")
+
+    print("✅ Deduplication test passed\n")
+
+
+def test_retriever_cites_duplicates():
+    """Results for a canonical chunk cite every copy"""
+    print("\n" + "=" * 50)
+    print("TEST: Citing near-duplicates")
+    print("=" * 50)
+
+    deduplication = MinHashDeduplicator(threshold=0.7).deduplicate(make_chunks())
+    chunks = deduplication.chunks
+    for chunk in chunks:
+        chunk['context'] = fake_context(chunk)
+    HashingEmbedder().embed_chunks(chunks)
+    store, bm25 = make_indexes(chunks)
+    retriever = HybridRetriever(store, bm25, HashingEmbedder(), duplicates=deduplication.duplicates, parallel_legs=False)
+    results = retriever.retrieve("forward-looking statements risks uncertainties", top_k=3)
+    assert results[0]['chunk_id'] == 1
+    assert [ref['page'] for ref in results[0]['references']] == [3, 5]
+    assert all(result['references'] == [] for result in results[1:])
+    print("✅ The canonical chunk cites pages 3 and 5")
+
+    print("✅ Citation test passed\n")
+
+
+if __name__ == "__main__":
+    test_minhash()
+    test_deduplicate()
+    test_retriever_cites_duplicates()
@@ -0,0 +1,197 @@
+"""
+Test document metadata, filtered search and multi-document collections
+"""
+import sys
+import os
+import tempfile
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+from benchmarks.synthetic import make_queries, HashingEmbedder
+from src.metadata import FilterIndex, annotate_chunks, normalize_filter
+from src.chunk_store import ChunkStore
+from src.bm25_index import BM25Index
+from src.vector_store import QdrantStorage
+from src.local_vector_store import LocalVectorStore
+from src.retriever import HybridRetriever
+from tests.fixtures import make_chunks
+
+DOCUMENTS = ('annual-2022', 'annual-2023', 'handbook')
+
+
+def make_documents(chunks_per_document: int = 60) -> list:
+    """
+    Chunks of three documents that reuse the same chunk_ids (1..n), with
+    sources, pages and tags.
+    """
+    chunks = []
+    for d, doc_id in enumerate(DOCUMENTS):
+        document = make_chunks(chunks_per_document, seed=d, embed=False)
+        annotate_chunks(document, doc_id, source=f'{doc_id}.pdf', tags=['finance'] if d < 2 else ['hr'])
+        for chunk in document:
+            chunk['page'] = (chunk['chunk_id'] - 1) // 10 + 1
+        chunks.extend(document)
+    return HashingEmbedder().embed_chunks(chunks)
+
+
+def matches(chunk, filter) -> bool:
+    """Brute-force evaluation of a filter on one chunk."""
+    for field, condition in normalize_filter(filter).items():
+        if isinstance(condition, dict):
+            page = chunk.get('page')
+            if page is None or page < condition.get('gte', page) or page > condition.get('lte', page):
+                return False
+        elif field == 'tags':
+            if not set(chunk.get('tags') or []) & set(condition):
+                return False
+        elif chunk.get(field) not in condition:
+            return False
+    return True
+
+
+FILTERS = [
+    {'doc_id': 'annual-2023'},
+    {'doc_id': ['annual-2022', 'handbook'], 'page': {'gte': 2, 'lte': 4}},
+    {'tags': 'finance', 'page': {'lte': 1}},
+    {'source': 'handbook.pdf', 'page': [3, 6]},
+    {'doc_id': 'missing'},
+    {'page': {'gte': 5, 'lte': 2}},
+    {'doc_id': 'handbook', 'tags': 'finance'}
+]
+
+
+def test_filter_index():
+    """FilterIndex selects exactly the rows a brute-force scan does"""
+    print("\n" + "=" * 50)
+    print("TEST: Filter index")
+    print("=" * 50)
+
+    chunks = make_documents()
+    index = FilterIndex.from_chunks(chunks)
+    assert index.select(None) is None and index.select({}) is None
+    for filter in FILTERS:
+        selection = index.select(filter)
+        expected = [row for row, chunk in enumerate(chunks) if matches(chunk, filter)]
+        assert selection.rows.tolist() == expected, filter
+        assert np.flatnonzero(selection.mask).tolist() == expected
+        assert index.select(dict(reversed(list(filter.items())))) is selection  # Cached by canonical form
+    print("✅ Selections match a brute-force scan and are cached")
+
+    for bad in ({'author': 'x'}, {'page': {'gt': 3}}, {'page': {}}, {'tags': {'gte': 1}}, {'doc_id': 3}, {'page': []}, ['doc_id']):
+        try:
+            normalize_filter(bad)
+        except ValueError:
+            continue
+        raise AssertionError(f"{bad!r} should be rejected")
+    print("✅ Malformed filters are rejected")
+
+    print("✅ Filter index test passed\n")
+
+
+def test_filtered_search():
+    """Both legs return the top-k of the matching subset only"""
+    print("\n" + "=" * 50)
+    print("TEST: Filtered BM25 and vector search")
+    print("=" * 50)
+
+    chunks = make_documents()
+    queries = make_queries(chunks, 10)
+    embedder = HashingEmbedder()
+    bm25 = BM25Index()
+    bm25.add_documents(ChunkStore.build(chunks))
+    local = LocalVectorStore(path=None)
+    local.add_chunks(chunks)
+    qdrant = QdrantStorage(collection_name="test_filters", url=":memory:")
+    qdrant.add_chunks(chunks)
+    assert local.count() == qdrant.count() == len(chunks)
+    print("✅ Chunks with the same chunk_id in different documents are stored apart")
+
+    for filter in FILTERS:
+        keep = [chunk for chunk in chunks if matches(chunk, filter)]
+        keys = {(c['doc_id'], c['chunk_id']) for c in keep}
+        for query, filtered in zip(queries, bm25.search_many(queries, top_k=10, filter=filter)):
+            # Same scores as the unfiltered top-k restricted to the subset (tied chunks may swap)
+            everything = bm25.search(query, top_k=len(chunks))
+            expected = [r for r in everything if (r['doc_id'], r['chunk_id']) in keys][:10]
+            assert all((r['doc_id'], r['chunk_id']) in keys for r in filtered)
+            assert np.allclose([r['score'] for r in filtered], [r['score'] for r in expected])
+            assert filtered == bm25.search(query, top_k=10, filter=filter)
+
+            vector = embedder.embed_query(query)
+            everything = local.search(vector, top_k=len(chunks))
+            expected = [r['score'] for r in everything if (r['doc_id'], r['chunk_id']) in keys][:10]
+            for hits in (
+                local.search(vector, top_k=10, filter=filter),
+                qdrant.search(vector, top_k=10, exact=True, filter=filter, with_payload=["chunk_id"])
+            ):
+                assert all((r['doc_id'], r['chunk_id']) in keys for r in hits)
+                assert np.allclose([r['score'] for r in hits], expected, atol=1e-5)
+    print("✅ BM25, local and Qdrant filtered searches return the matching top-k")
+
+    print("✅ Filtered search test passed\n")
+
+
+def test_multi_document_retrieval():
+    """The retriever keeps documents apart and applies one filter to both legs"""
+    print("\n" + "=" * 50)
+    print("TEST: Multi-document retrieval")
+    print("=" * 50)
+
+    chunks = make_documents()
+    store = ChunkStore.build(chunks)
+    bm25 = BM25Index()
+    bm25.add_documents(store)
+    local = LocalVectorStore(path=None)
+    local.add_chunks(chunks)
+    by_key = {(c['doc_id'], c['chunk_id']): c for c in chunks}
+    queries = make_queries(chunks, 8, seed=3)
+
+    for chunk_store in (None, store):
+        retriever = HybridRetriever(local, bm25, HashingEmbedder(), chunk_store=chunk_store, parallel_legs=False)
+        for query in queries:
+            results = retriever.retrieve(query, top_k=10)
+            assert len({(r['doc_id'], r['chunk_id']) for r in results}) == len(results)
+            for result in results:
+                assert result['chunk_text'] == by_key[(result['doc_id'], result['chunk_id'])]['chunk_text']
+            scoped = retriever.retrieve(query, top_k=10, filter={'doc_id': 'handbook'})
+            assert scoped and all(r['doc_id'] == 'handbook' for r in scoped)
+            for result in scoped:
+                assert result['chunk_text'] == by_key[('handbook', result['chunk_id'])]['chunk_text']
+        many = retriever.retrieve_many(queries, top_k=10, filter={'doc_id': 'handbook'})
+        assert all(r['doc_id'] == 'handbook' for results in many for r in results)
+    print("✅ Results are keyed and hydrated by (doc_id, chunk_id)")
+
+    for empty in ({'doc_id': 'missing'}, {'page': {'gte': 5, 'lte': 2}}, {'doc_id': 'handbook', 'tags': 'finance'}):
+        assert retriever.retrieve(queries[0], top_k=10, filter=empty) == []
+        assert retriever.retrieve_many(queries, top_k=10, filter=empty) == [[] for _ in queries]
+    print("✅ A filter that matches nothing returns no results, not an error")
+
+    for bad in ({'author': 'x'}, {'page': {'gt': 3}}, {'page': []}):
+        for call in (lambda: retriever.retrieve(queries[0], filter=bad), lambda: retriever.retrieve_many(queries, filter=bad)):
+            try:
+                call()
+            except ValueError:
+                continue
+            raise AssertionError(f"{bad!r} should be rejected")
+    print("✅ Unknown fields and malformed conditions are rejected by retrieve and retrieve_many")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store.save(tmp)
+        mapped = ChunkStore.open(tmp)
+        assert mapped.get(('annual-2023', 7))['chunk_text'] == by_key[('annual-2023', 7)]['chunk_text']
+        assert mapped.get(7) is None
+        assert dict(mapped[65])['doc_id'] == chunks[65]['doc_id']
+        assert mapped[65]['page'] == chunks[65]['page']
+        saved = os.path.join(tmp, 'bm25.jsonl')
+        bm25.save(saved)
+        loaded = BM25Index.load(saved)
+        assert loaded.search(queries[0], filter={'tags': 'hr'}) == bm25.search(queries[0], filter={'tags': 'hr'})
+    print("✅ Metadata survives saving the chunk store and the BM25 index")
+
+    print("✅ Multi-document retrieval test passed\n")
+
+
+if __name__ == "__main__":
+    test_filter_index()
+    test_filtered_search()
+    test_multi_document_retrieval()
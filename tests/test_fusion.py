@@ -0,0 +1,80 @@
+"""
+Test the vectorized fusion strategies against straightforward reference code
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+from src.fusion import fuse, leg_arrays, minmax, zscore, rrf, rrf_top_k_is_final
+
+
+def make_leg(rng, n, id_range):
+    ids = rng.choice(id_range, size=n, replace=False)
+    scores = np.sort(rng.random(n))[::-1]
+    return [{'chunk_id': int(i), 'score': float(s)} for i, s in zip(ids, scores)]
+
+
+def reference_minmax(vector_results, bm25_results, top_k, weights):
+    """The dict-based merge HybridRetriever used before the fusion module."""
+    merged = {}
+    for results, leg in ((vector_results, 0), (bm25_results, 1)):
+        normalized = minmax(np.array([r['score'] for r in results]))
+        for result, score in zip(results, normalized):
+            entry = merged.setdefault(result['chunk_id'], [0.0, 0.0])
+            entry[leg] = score
+    combined = {cid: weights[0] * v + weights[1] * b for cid, (v, b) in merged.items()}
+    return sorted(combined.items(), key=lambda item: item[1], reverse=True)[:top_k]
+
+
+def test_fusion():
+    print("=" * 50)
+    print("TEST: Fusion strategies")
+    print("=" * 50)
+
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        vector_results = make_leg(rng, 40, 100)
+        bm25_results = make_leg(rng, 30, 100)
+        expected = reference_minmax(vector_results, bm25_results, 10, (0.7, 0.3))
+        fused = fuse(*leg_arrays(vector_results), *leg_arrays(bm25_results), top_k=10, weights=(0.7, 0.3))
+        assert fused.ids.tolist() == [cid for cid, _ in expected]
+        assert np.allclose(fused.scores, [score for _, score in expected])
+    print("✅ Min-max fusion matches the dict-based merge")
+
+    vector_results = [{'chunk_id': 'a', 'score': 0.9}, {'chunk_id': 'b', 'score': 0.5}]
+    bm25_results = [{'chunk_id': 'b', 'score': 12.0}, {'chunk_id': 'c', 'score': 3.0}]
+    fused = fuse(*leg_arrays(vector_results), *leg_arrays(bm25_results), top_k=3, strategy="rrf", rrf_k=60)
+    assert fused.ids.tolist() == ['b', 'a', 'c']
+    assert np.isclose(fused.scores[0], 0.5 / 62 + 0.5 / 61)
+    assert fused.vector_positions.tolist() == [1, 0, -1]
+    assert fused.bm25_positions.tolist() == [0, -1, 1]
+    print("✅ RRF uses ranks only and reports each leg's positions")
+
+    assert np.allclose(zscore(np.array([1.0, 2.0, 3.0])), [-1.2247449, 0.0, 1.2247449])
+    assert np.allclose(rrf(np.array([0.1, 0.9])), [1 / 62, 1 / 61])
+    fused = fuse(*leg_arrays(vector_results), *leg_arrays([]), top_k=5, strategy="zscore")
+    assert fused.ids.tolist() == ['a', 'b'] and fused.bm25_positions.tolist() == [-1, -1]
+    assert len(fuse(*leg_arrays([]), *leg_arrays([]), top_k=5).ids) == 0
+    print("✅ Z-score and empty legs")
+
+    ids = np.arange(10)
+    scores = np.linspace(1, 0, 10)
+    # Both legs agree on the order: the top 2 cannot change however deep we go
+    assert rrf_top_k_is_final(ids, scores, ids, scores, top_k=2, depth=10) == (True, 1.0)
+    # Disjoint legs: a candidate missing from one leg may still rank high in it
+    final, overlap = rrf_top_k_is_final(ids, scores, ids + 100, scores, top_k=2, depth=10)
+    assert not final and overlap == 0.0
+    # Exhausted legs (fewer hits than requested) leave nothing unseen
+    assert rrf_top_k_is_final(ids, scores, ids + 100, scores, top_k=2, depth=20)[0]
+    print("✅ RRF top-k bounds")
+
+    for strategy in ("minmax", "zscore", "rrf"):
+        before = [dict(r) for r in vector_results]
+        fuse(*leg_arrays(vector_results), *leg_arrays(bm25_results), top_k=2, strategy=strategy)
+        assert vector_results == before
+    print("✅ Fusion test passed\n")
+
+
+if __name__ == "__main__":
+    test_fusion()
@@ -0,0 +1,51 @@
+"""
+Test that heavy dependencies and the API key are only needed on first use
+"""
+import sys
+import os
+import json
+import subprocess
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+HEAVY = ["torch", "sentence_transformers", "qdrant_client", "anthropic"]
+
+
+def run_without_api_key(code: str) -> str:
+    env = {key: value for key, value in os.environ.items() if key != "ANTHROPIC_API_KEY"}
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    return result.stdout.strip().splitlines()[-1]
+
+
+def test_lazy_imports():
+    print("=" * 50)
+    print("TEST: Lazy imports and deferred API key check")
+    print("=" * 50)
+
+    loaded = json.loads(run_without_api_key(
+        "import sys, json\n"
+        "import src.retriever, src.vector_store, src.local_vector_store, src.contextualizer, src.reranker, src.server\n"
+        "from src.embedder import Embedder\n"
+        "from src.vector_store import create_vector_store\n"
+        "embedder = Embedder()\n"
+        "create_vector_store('local', path=None)\n"
+        f"print(json.dumps([name for name in {HEAVY!r} if name in sys.modules] + ([] if not embedder.loaded else ['model'])))"
+    ))
+    assert loaded == [], loaded
+    print("✅ Importing the library loads no model, torch, qdrant_client or anthropic")
+
+    message = run_without_api_key(
+        "from config import get_api_key\n"
+        "try:\n"
+        "    get_api_key()\n"
+        "except ValueError as e:\n"
+        "    print(e)"
+    )
+    assert "ANTHROPIC_API_KEY" in message
+    print("✅ Missing API key only raises when the key is requested")
+    print("✅ Lazy import test passed\n")
+
+
+if __name__ == "__main__":
+    test_lazy_imports()
@@ -0,0 +1,77 @@
+"""
+Test the in-process vector store against an in-memory Qdrant instance
+"""
+import sys
+import os
+import tempfile
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+from src.local_vector_store import LocalVectorStore
+from src.vector_store import QdrantStorage
+from config import EMBEDDING_DIMENSION
+
+
+def make_chunks(n: int, seed: int = 0) -> list:
+    rng = np.random.default_rng(seed)
+    return [
+        {
+            'chunk_id': i + 1,
+            'chunk_text': f'Chunk number {i + 1}',
+            'context': f'Context for chunk {i + 1}',
+            'embedding': rng.standard_normal(EMBEDDING_DIMENSION).astype(np.float32),
+            'contextual_embedding': rng.standard_normal(EMBEDDING_DIMENSION).astype(np.float32)
+        }
+        for i in range(n)
+    ]
+
+
+def test_local_vector_store():
+    print("=" * 50)
+    print("TEST: Local Vector Store")
+    print("=" * 50)
+
+    chunks = make_chunks(300)
+    query = np.random.default_rng(1).standard_normal(EMBEDDING_DIMENSION).astype(np.float32)
+
+    local = LocalVectorStore(path=None)
+    local.add_chunks(chunks)
+    assert local.count() == 300
+
+    qdrant = QdrantStorage(collection_name="test_local_parity", url=":memory:")
+    qdrant.add_chunks(chunks)
+
+    for use_contextual in (True, False):
+        expected = qdrant.search(query, top_k=10, use_contextual=use_contextual)
+        results = local.search(query, top_k=10, use_contextual=use_contextual)
+        assert [r['chunk_id'] for r in results] == [r['chunk_id'] for r in expected]
+        assert np.allclose([r['score'] for r in results], [r['score'] for r in expected], atol=1e-5)
+    print("✅ Same ranking and scores as Qdrant")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = LocalVectorStore(collection_name="persisted", path=tmp)
+        store.add_chunks(chunks[:200])
+        store.add_chunks(chunks[200:])
+        reopened = LocalVectorStore(collection_name="persisted", path=tmp)
+        assert reopened.count() == 300
+        assert reopened.search(query, top_k=5) == store.search(query, top_k=5)
+        print("✅ Reopened memory-mapped store returns the same results")
+
+        half = LocalVectorStore(collection_name="half", path=tmp, dtype="float16")
+        half.add_chunks(chunks)
+        top_full = [r['chunk_id'] for r in local.search(query, top_k=5)]
+        top_half = [r['chunk_id'] for r in half.search(query, top_k=5)]
+        assert len(set(top_full) & set(top_half)) >= 4
+        print("✅ float16 storage keeps the top results")
+
+        reopened.reset()
+        assert reopened.count() == 0
+        assert reopened.search(query, top_k=5) == []
+        assert LocalVectorStore(collection_name="persisted", path=tmp).count() == 0
+        print("✅ Reset removes stored chunks")
+
+    print("✅ Local vector store test passed\n")
+
+
+if __name__ == "__main__":
+    test_local_vector_store()
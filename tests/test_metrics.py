@@ -0,0 +1,126 @@
+"""
+Test the instrumentation layer (spans, counters, histograms, traces, exporters)
+"""
+import sys
+import os
+import logging
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.synthetic import make_queries
+from src import metrics
+from src.metrics import MetricsRegistry, LogExporter
+from tests.fixtures import make_chunks, make_retriever
+
+
+class ListExporter:
+    def __init__(self):
+        self.spans = []
+        self.traces = []
+
+    def export_span(self, name, seconds, labels):
+        self.spans.append((name, labels))
+
+    def export_trace(self, trace):
+        self.traces.append(trace)
+
+
+@metrics.timed("test.noop")
+def noop():
+    return None
+
+
+def test_metrics():
+    print("=" * 50)
+    print("TEST: Metrics")
+    print("=" * 50)
+
+    registry = MetricsRegistry()
+    exporter = ListExporter()
+    try:
+        metrics.disable()
+        with metrics.span("test.block"):
+            pass
+        noop()
+        metrics.count("test.counter")
+        assert not metrics.registry().histogram("test.block") and metrics.registry().counter("test.counter") == 0
+        print("✅ Nothing recorded while disabled")
+
+        metrics.enable(registry, exporters=[exporter])
+        with metrics.span("test.block", kind="a"):
+            time.sleep(0.002)
+        try:
+            with metrics.span("test.block", kind="a"):
+                raise KeyError("boom")
+        except KeyError:
+            pass
+        noop()
+        metrics.count("test.counter", 2, kind="a")
+        assert registry.histogram("test.block", kind="a").count == 1
+        assert registry.histogram("test.block", kind="a", error="KeyError").count == 1
+        assert registry.histogram("test.block", kind="a").quantile(0.5) >= 0.002
+        assert registry.histogram("test.noop").count == 1
+        assert registry.counter("test.counter", kind="a") == 2
+        assert [name for name, _ in exporter.spans] == ["test.block", "test.block", "test.noop"]
+        print("✅ Spans, decorator, error label and counters recorded")
+
+        chunks = make_chunks(200, words_per_chunk=60)
+        retriever = make_retriever(chunks)
+        query = make_queries(chunks, 1)[0]
+        retriever.retrieve(query, top_k=5)
+        retriever.retrieve(query, top_k=5)
+        retriever.close()
+
+        trace = registry.traces[-1]
+        assert trace["name"] == "retriever.retrieve"
+        assert set(trace["stages"]) == {"vector", "bm25", "fuse", "hydrate", "total"}
+        assert trace["stages"]["total"] >= max(trace["stages"]["vector"], trace["stages"]["bm25"])
+        assert len(registry.traces) == 1 and exporter.traces == [trace]
+        assert registry.histogram("retriever.retrieve.stage", stage="bm25").count == 1
+        assert registry.histogram("bm25.search").count == 1
+        assert registry.histogram("vector_store.search", backend="local").count == 1
+        assert registry.counter("retriever.result_cache", outcome="hit") == 1
+        assert registry.counter("retriever.result_cache", outcome="miss") == 1
+        print("✅ Per-query trace breaks retrieve down by leg; module spans recorded")
+
+        text = metrics.prometheus_text(registry)
+        assert "# TYPE bm25_search_seconds histogram" in text
+        assert 'bm25_search_seconds_bucket{le="+Inf"} 1' in text
+        assert 'retriever_result_cache_total{outcome="hit"} 1' in text
+        assert 'vector_store_search_seconds_count{backend="local"} 1' in text
+        print("✅ Prometheus text exposition")
+
+        records = []
+        handler = logging.Handler()
+        handler.emit = records.append
+        logger = logging.getLogger("test_metrics")
+        logger.setLevel(logging.DEBUG)
+        logger.addHandler(handler)
+        metrics.enable(exporters=[LogExporter(logger)])
+        with metrics.span("test.logged"):
+            pass
+        assert records and "test.logged" in records[0].getMessage()
+        print("✅ Log exporter")
+
+        metrics.disable()
+        n = 200_000
+        t0 = time.perf_counter()
+        for _ in range(n):
+            noop()
+        wrapped = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        for _ in range(n):
+            noop.__wrapped__()
+        plain = time.perf_counter() - t0
+        overhead = (wrapped - plain) / n
+        assert overhead < 2e-6
+        print(f"✅ Disabled overhead {overhead * 1e9:.0f} ns per call")
+    finally:
+        metrics.disable()
+        metrics.enable(MetricsRegistry(), exporters=[])
+        metrics.disable()
+    print("✅ Metrics test passed\n")
+
+
+if __name__ == "__main__":
+    test_metrics()
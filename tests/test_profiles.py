@@ -0,0 +1,222 @@
+"""
+Test per-query search profiles: validation, BM25 pruning and what reaches each leg
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+from benchmarks.synthetic import make_queries, HashingEmbedder
+from src.bm25_index import BM25Index
+from src.local_vector_store import LocalVectorStore
+from src.profiles import SearchProfile, SEARCH_PROFILES, resolve_profile
+from src.retriever import HybridRetriever
+from tests.fixtures import make_chunks, make_indexes, make_retriever as make_hybrid
+
+
+class RecordingStore(LocalVectorStore):
+    """Local store remembering the search options of every call."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.calls = []
+
+    def search(self, query_vector, top_k=10, **options):
+        self.calls.append(dict(options, top_k=top_k))
+        return LocalVectorStore.search_batch(self, np.asarray(query_vector)[None, :], top_k=top_k, **options)[0]
+
+    def search_batch(self, query_vectors, top_k=10, **options):
+        self.calls.append(dict(options, top_k=top_k))
+        return super().search_batch(query_vectors, top_k=top_k, **options)
+
+
+class RecordingBM25(BM25Index):
+    """BM25 index counting its searches."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.calls = 0
+
+    def search(self, query, top_k=5, **options):
+        self.calls += 1
+        return super().search(query, top_k=top_k, **options)
+
+    def search_many(self, queries, top_k=5, **options):
+        self.calls += 1
+        return super().search_many(queries, top_k=top_k, **options)
+
+
+def make_retriever(**options):
+    chunks = make_chunks(120, vocabulary_size=600, seed=3)
+    retriever = make_hybrid(chunks, store=RecordingStore(path=None), parallel_legs=False, **options)
+    return chunks, retriever
+
+
+def test_resolve_profile():
+    """Names, dicts and SearchProfiles resolve; bad settings are rejected"""
+    print("\n" + "=" * 50)
+    print("TEST: Resolving search profiles")
+    print("=" * 50)
+
+    assert resolve_profile(None) == SEARCH_PROFILES["balanced"]
+    assert resolve_profile("fast").hnsw_ef == 32
+    custom = resolve_profile({"base": "fast", "hnsw_ef": 64, "bm25": False})
+    assert custom == SEARCH_PROFILES["fast"]._replace(hnsw_ef=64, bm25=False)
+    assert resolve_profile(custom) is custom
+    print("✅ Names, dicts on top of a base profile and SearchProfiles")
+
+    for bad in (
+        "turbo",
+        {"hnsw": 64},
+        {"hnsw_ef": 0},
+        {"depth_factor": 1.5},
+        {"exact": "yes"},
+        {"oversampling": 0.5},
+        {"vector": False, "bm25": False},
+        42
+    ):
+        try:
+            resolve_profile(bad)
+        except ValueError:
+            continue
+        raise AssertionError(f"{bad!r} should be rejected")
+    print("✅ Unknown names and settings, and out-of-range values raise ValueError")
+
+    assert SearchProfile(hnsw_ef=32, exact=True).vector_options() == {"hnsw_ef": 32, "exact": True}
+    assert SearchProfile().vector_options() == {} and SearchProfile().bm25_options() == {}
+    print("✅ Only non-default options are passed on")
+
+    print("✅ Profile resolution test passed\n")
+
+
+def test_bm25_pruning():
+    """max_terms scores only the rarest query terms"""
+    print("\n" + "=" * 50)
+    print("TEST: BM25 query-term pruning")
+    print("=" * 50)
+
+    bm25 = BM25Index()
+    bm25.add_documents([
+        {'chunk_id': 1, 'chunk_text': "common common rare"},
+        {'chunk_id': 2, 'chunk_text': "common words only"},
+        {'chunk_id': 3, 'chunk_text': "common again here"}
+    ])
+    full = bm25.search("common rare", top_k=3)
+    pruned = bm25.search("common rare", top_k=3, max_terms=1)
+    assert {r['chunk_id'] for r in full} == {1, 2, 3}
+    assert [r['chunk_id'] for r in pruned] == [1]
+    assert [[r['chunk_id'] for r in results] for results in bm25.search_many(["common rare"], top_k=3, max_terms=1)] == [[1]]
+    print("✅ The common term is dropped, the rare one kept (search and search_many)")
+
+    assert bm25.search("common rare", top_k=3, max_terms=5) == full
+    print("✅ A limit above the query length changes nothing")
+
+    print("✅ BM25 pruning test passed\n")
+
+
+def test_profiles_reach_legs():
+    """Vector options, candidate depth and skipped legs follow the profile"""
+    print("\n" + "=" * 50)
+    print("TEST: Profiles in the retriever")
+    print("=" * 50)
+
+    chunks, retriever = make_retriever()
+    store = retriever.vector_store
+    query = make_queries(chunks, 1, seed=1)[0]
+
+    retriever.retrieve(query, top_k=5, profile="fast")
+    assert store.calls[-1]['hnsw_ef'] == 32 and store.calls[-1]['top_k'] == 5
+    retriever.retrieve(query, top_k=5, profile="exhaustive")
+    assert store.calls[-1]['exact'] is True and store.calls[-1]['rescore'] is True
+    assert store.calls[-1]['top_k'] == 5 * SEARCH_PROFILES["exhaustive"].depth_factor
+    retriever.retrieve_many([query, "another query"], top_k=5, profile={"hnsw_ef": 99})
+    assert store.calls[-1]['hnsw_ef'] == 99
+    print("✅ hnsw_ef, exact search and depth reach the vector store (retrieve and retrieve_many)")
+
+    calls = len(store.calls)
+    results = retriever.retrieve(query, top_k=5, profile={"vector": False})
+    assert len(store.calls) == calls and results and all(r['vector_score'] == 0 for r in results)
+    results = retriever.retrieve(query, top_k=5, profile={"bm25": False})
+    assert store.calls[-1]['top_k'] == 5 and all(r['bm25_score'] == 0 for r in results)
+    print("✅ Skipped legs are not queried; a single leg fetches only top_k")
+
+    first = retriever.retrieve(query, top_k=5, profile="balanced")
+    assert not first.cached and retriever.retrieve(query, top_k=5).cached
+    assert retriever.retrieve(query, top_k=5, profile={"hnsw_ef": 7}).cached is False
+    print("✅ Results are cached per profile")
+
+    default = HybridRetriever(store, retriever.bm25_index, HashingEmbedder(), parallel_legs=False, profile="fast")
+    default.retrieve(query, top_k=5)
+    assert store.calls[-1]['hnsw_ef'] == 32
+    print("✅ The retriever's default profile applies to queries without one")
+
+    retriever.close()
+    default.close()
+    print("✅ Retriever profile test passed\n")
+
+
+def test_legs_turned_off():
+    """A profile that turns a leg off never queries it and ranks by the other leg alone"""
+    print("\n" + "=" * 50)
+    print("TEST: Profiles without one leg")
+    print("=" * 50)
+
+    chunks = make_chunks(120, vocabulary_size=600, seed=3)
+    store, _ = make_indexes(chunks, RecordingStore(path=None))
+    bm25 = RecordingBM25()
+    bm25.add_documents(chunks)
+    retriever = HybridRetriever(store, bm25, HashingEmbedder(), parallel_legs=False)
+    queries = make_queries(chunks, 6, seed=4)
+    keys = lambda results: [(r['doc_id'], r['chunk_id']) for r in results]
+
+    store_calls = len(store.calls)
+    single = [retriever.retrieve(query, top_k=5, profile={"vector": False}) for query in queries]
+    many = retriever.retrieve_many(queries, top_k=5, profile={"vector": False})
+    assert len(store.calls) == store_calls
+    assert [keys(results) for results in many] == [keys(results) for results in single]
+    expected = [[(r['doc_id'], r['chunk_id']) for r in bm25.search(query, top_k=5)] for query in queries]
+    assert [keys(results) for results in single] == expected
+    print("✅ Vector leg off: the store is not searched; retrieve and retrieve_many rank by BM25")
+
+    bm25_calls = bm25.calls
+    single = [retriever.retrieve(query, top_k=5, profile={"bm25": False}) for query in queries]
+    many = retriever.retrieve_many(queries, top_k=5, profile={"bm25": False})
+    assert bm25.calls == bm25_calls
+    assert [keys(results) for results in many] == [keys(results) for results in single]
+    embedder = HashingEmbedder()
+    expected = [[(r['doc_id'], r['chunk_id']) for r in store.search(embedder.embed_query(query), top_k=5)] for query in queries]
+    assert [keys(results) for results in single] == expected
+    print("✅ BM25 leg off: the index is not searched; retrieve and retrieve_many rank by vector similarity")
+
+    bm25_only = HybridRetriever(store, bm25, HashingEmbedder(), parallel_legs=False, profile={"vector": False})
+    store_calls = len(store.calls)
+    bm25_only.retrieve(queries[0], top_k=5)
+    assert len(store.calls) == store_calls
+    bm25_only.retrieve(queries[0], top_k=5, profile="balanced")
+    assert len(store.calls) == store_calls + 1
+    print("✅ A leg turned off by the default profile comes back with a per-query profile")
+
+    fused = HybridRetriever(store, None, HashingEmbedder(), server_side_fusion=True, parallel_legs=False)
+    for leg in ("vector", "bm25"):
+        for call in (
+            lambda: fused.retrieve(queries[0], top_k=5, profile={leg: False}),
+            lambda: fused.retrieve_many(queries, top_k=5, profile={leg: False}),
+            lambda: HybridRetriever(store, None, HashingEmbedder(), server_side_fusion=True, profile={leg: False})
+        ):
+            try:
+                call()
+            except ValueError:
+                continue
+            raise AssertionError(f"turning the {leg} leg off should be rejected with server_side_fusion")
+    print("✅ Server-side fusion rejects profiles that turn a leg off")
+
+    for open_retriever in (retriever, bm25_only, fused):
+        open_retriever.close()
+    print("✅ Legs turned off test passed\n")
+
+
+if __name__ == "__main__":
+    test_resolve_profile()
+    test_bm25_pruning()
+    test_profiles_reach_legs()
+    test_legs_turned_off()
@@ -0,0 +1,167 @@
+"""
+Test the Qdrant collection and search configuration (quantization, on-disk vectors, HNSW, per-query params)
+
+The in-process Qdrant accepts these settings but does not apply them, so the
+config objects are checked as built and as passed to the client.
+"""
+import sys
+import os
+import warnings
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import qdrant_client
+from qdrant_client import models
+from src.profiles import SEARCH_PROFILES, resolve_profile
+from src.vector_store import (
+    QdrantStorage,
+    SPARSE_VECTOR_NAME,
+    _collection_params,
+    _quantization_config,
+    _search_params
+)
+from tests.fixtures import make_chunks
+from config import EMBEDDING_DIMENSION
+
+
+class RecordingClient:
+    """QdrantClient wrapper remembering the keyword arguments of some calls."""
+
+    RECORDED = ("create_collection", "query_points", "query_batch_points")
+
+    def __init__(self, client):
+        self._client = client
+        self.calls = {name: [] for name in self.RECORDED}
+
+    def __getattr__(self, name):
+        attribute = getattr(self._client, name)
+        if name not in self.RECORDED:
+            return attribute
+
+        def call(*args, **kwargs):
+            self.calls[name].append(kwargs)
+            return attribute(*args, **kwargs)
+        return call
+
+
+def test_quantization_config():
+    """Scalar int8 and binary quantization, kept in RAM; unknown types rejected"""
+    print("\n" + "=" * 50)
+    print("TEST: Quantization config")
+    print("=" * 50)
+
+    scalar = _quantization_config("scalar")
+    assert isinstance(scalar, models.ScalarQuantization)
+    assert scalar.scalar.type == models.ScalarType.INT8
+    assert scalar.scalar.quantile == 0.99 and scalar.scalar.always_ram is True
+    print("✅ scalar: INT8, quantile 0.99, always in RAM")
+
+    binary = _quantization_config("binary")
+    assert isinstance(binary, models.BinaryQuantization) and binary.binary.always_ram is True
+    print("✅ binary: always in RAM")
+
+    assert _quantization_config("none") is None
+    for bad in ("int8", "product", "", None):
+        try:
+            _quantization_config(bad)
+        except ValueError:
+            continue
+        raise AssertionError(f"quantization {bad!r} should be rejected")
+    try:
+        QdrantStorage(collection_name="test_bad_quantization", url=":memory:", quantization="int4")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("QdrantStorage should reject an unknown quantization")
+    print("✅ none builds no config; unknown types raise ValueError")
+
+    print("✅ Quantization config test passed\n")
+
+
+def test_collection_params():
+    """Vector params, HNSW and quantization as built and as sent to create_collection"""
+    print("\n" + "=" * 50)
+    print("TEST: Collection params")
+    print("=" * 50)
+
+    for on_disk in (False, True):
+        params = _collection_params("scalar", on_disk, hnsw_m=32, hnsw_ef_construct=256)
+        assert set(params["vectors_config"]) == {"embedding", "contextual_embedding"}
+        for vector in params["vectors_config"].values():
+            assert vector.size == EMBEDDING_DIMENSION and vector.distance == models.Distance.COSINE
+            assert vector.on_disk is on_disk
+        assert params["hnsw_config"] == models.HnswConfigDiff(m=32, ef_construct=256)
+        assert params["quantization_config"] == _quantization_config("scalar")
+        assert "sparse_vectors_config" not in params
+    print("✅ on_disk on both named vectors, HnswConfigDiff(m, ef_construct), quantization")
+
+    sparse = _collection_params("none", False, 16, 100, sparse=True)
+    assert sparse["quantization_config"] is None
+    assert sparse["sparse_vectors_config"][SPARSE_VECTOR_NAME].modifier == models.Modifier.IDF
+    print("✅ Sparse vectors with Qdrant-side IDF when enabled")
+
+    client = RecordingClient(qdrant_client.QdrantClient(location=":memory:"))
+    storage = QdrantStorage(
+        collection_name="test_config", client=client,
+        quantization="binary", on_disk=True, hnsw_m=48, hnsw_ef_construct=400
+    )
+    created = client.calls["create_collection"][-1]
+    assert created["collection_name"] == "test_config"
+    assert created["hnsw_config"] == models.HnswConfigDiff(m=48, ef_construct=400)
+    assert created["quantization_config"] == _quantization_config("binary")
+    assert all(vector.on_disk for vector in created["vectors_config"].values())
+    storage.reset()
+    assert client.calls["create_collection"][-1] == created
+    sibling = storage.sibling("test_config-2")
+    assert client.calls["create_collection"][-1] == dict(created, collection_name="test_config-2")
+    assert sibling.collection_params == storage.collection_params
+    print("✅ QdrantStorage sends the settings to create_collection, also on reset and for siblings")
+
+    print("✅ Collection params test passed\n")
+
+
+def test_search_params():
+    """hnsw_ef, exact and quantization search params for each profile"""
+    print("\n" + "=" * 50)
+    print("TEST: Search params per profile")
+    print("=" * 50)
+
+    expected = {
+        "fast": models.SearchParams(hnsw_ef=32, exact=False, quantization=None),
+        "balanced": None,
+        "exhaustive": models.SearchParams(
+            hnsw_ef=None, exact=True, quantization=models.QuantizationSearchParams(rescore=True, oversampling=None)
+        )
+    }
+    assert set(expected) == set(SEARCH_PROFILES)
+    for name, params in expected.items():
+        assert _search_params(**SEARCH_PROFILES[name].vector_options()) == params, name
+    custom = resolve_profile({"hnsw_ef": 128, "rescore": False, "oversampling": 2.0})
+    assert _search_params(**custom.vector_options()) == models.SearchParams(
+        hnsw_ef=128, exact=False, quantization=models.QuantizationSearchParams(rescore=False, oversampling=2.0)
+    )
+    assert _search_params(oversampling=3.0).quantization == models.QuantizationSearchParams(rescore=None, oversampling=3.0)
+    print("✅ Built per profile; balanced leaves the collection defaults")
+
+    client = RecordingClient(qdrant_client.QdrantClient(location=":memory:"))
+    storage = QdrantStorage(collection_name="test_search_params", client=client, quantization="scalar")
+    storage.add_chunks(make_chunks(20))
+    vector = np.ones(EMBEDDING_DIMENSION, dtype=np.float32) / np.sqrt(EMBEDDING_DIMENSION)
+    for name, params in expected.items():
+        options = SEARCH_PROFILES[name].vector_options()
+        with warnings.catch_warnings():  # The in-process Qdrant warns that it ignores search_params
+            warnings.simplefilter("ignore", UserWarning)
+            assert len(storage.search(vector, top_k=3, **options)) == 3
+            storage.search_batch(np.stack([vector, vector]), top_k=3, **options)
+        assert client.calls["query_points"][-1]["search_params"] == params
+        requests = client.calls["query_batch_points"][-1]["requests"]
+        assert [request.params for request in requests] == [params, params]
+    print("✅ search and search_batch send them to Qdrant")
+
+    print("✅ Search params test passed\n")
+
+
+if __name__ == "__main__":
+    test_quantization_config()
+    test_collection_params()
+    test_search_params()
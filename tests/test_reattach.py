@@ -0,0 +1,72 @@
+"""
+Test reattaching to an existing collection (metadata, fingerprint, scroll)
+"""
+import sys
+import os
+import tempfile
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.local_vector_store import LocalVectorStore
+from src.vector_store import QdrantStorage
+from src.bm25_index import BM25Index
+from tests.fixtures import make_chunks
+
+
+def build_chunks(n_chunks: int = 120):
+    return make_chunks(n_chunks, vocabulary_size=500)
+
+
+def check_store(store, chunks):
+    assert not store.is_compatible("abc")  # Empty
+    store.add_chunks(chunks)
+    assert not store.is_compatible("abc")  # No fingerprint yet
+    store.set_metadata({"fingerprint": "abc"})
+    assert store.is_compatible("abc") and not store.is_compatible("other")
+
+    payloads = sorted(store.scroll(batch_size=50), key=lambda chunk: chunk['chunk_id'])
+    assert [p['chunk_id'] for p in payloads] == [c['chunk_id'] for c in chunks]
+    assert all(p['chunk_text'] == c['chunk_text'] and p['context'] == c['context']
+               for p, c in zip(payloads, chunks))
+
+    expected = BM25Index()
+    expected.add_documents(chunks)
+    rebuilt = BM25Index.from_vector_store(store)
+    query = chunks[7]['chunk_text'].split()[3]
+    assert rebuilt.search(query, top_k=5) == expected.search(query, top_k=5)
+
+    store.reset()
+    assert store.metadata().get("fingerprint") is None and not store.is_compatible("abc")
+
+
+def test_reattach():
+    print("=" * 50)
+    print("TEST: Reattach to an existing collection")
+    print("=" * 50)
+
+    chunks = build_chunks()
+    check_store(QdrantStorage(collection_name="test_reattach", url=":memory:"), chunks)
+    print("✅ Qdrant: fingerprint in collection metadata, scroll rebuilds BM25")
+
+    sparse = QdrantStorage(collection_name="test_reattach_sparse", url=":memory:", sparse=True)
+    sparse.add_chunks(chunks)
+    assert sparse.metadata()["bm25_avgdl"] == sparse.sparse_encoder.avgdl
+    plain = QdrantStorage(collection_name="test_reattach_sparse", url=":memory:")
+    plain.client = sparse.client  # Same in-memory instance, store opened without sparse vectors
+    sparse.set_metadata({"fingerprint": "abc"})
+    assert sparse.is_compatible("abc") and not plain.is_compatible("abc")
+    print("✅ Sparse avgdl stored with the collection; vector layout mismatch is not compatible")
+
+    check_store(LocalVectorStore(path=None), chunks)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = LocalVectorStore(collection_name="docs", path=tmp)
+        store.add_chunks(chunks)
+        store.set_metadata({"fingerprint": "abc"})
+        reopened = LocalVectorStore(collection_name="docs", path=tmp)
+        assert reopened.is_compatible("abc")
+        assert len(list(reopened.scroll())) == len(chunks)
+    print("✅ Local store: metadata persisted in meta.json and survives a reopen")
+    print("✅ Reattach test passed\n")
+
+
+if __name__ == "__main__":
+    test_reattach()
@@ -0,0 +1,91 @@
+"""
+Test the reranking stage with a tiny local stand-in for the cross-encoder
+"""
+import sys
+import os
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.reranker import Reranker
+from src.cache import LRUCache
+
+
+class OverlapModel:
+    """Scores a pair by the fraction of query words found in the passage (0..1)."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.pairs = []
+
+    def predict(self, pairs, batch_size=32):
+        self.pairs.extend(pairs)
+        time.sleep(self.delay * len(pairs))
+        scores = []
+        for query, passage in pairs:
+            words = set(query.lower().split())
+            scores.append(len(words & set(passage.lower().split())) / len(words))
+        return scores
+
+
+def make_candidates(n: int):
+    """Retrieval results, best first, where only a few deep candidates match the query well."""
+    candidates = []
+    for i in range(n):
+        text = "quarterly revenue grew" if i in (7, 12) else f"unrelated filler text number {i}"
+        candidates.append({
+            'chunk_id': i,
+            'chunk_text': text,
+            'context': '',
+            'combined_score': 1.0 - i / n
+        })
+    return candidates
+
+
+def test_reranker():
+    print("=" * 50)
+    print("TEST: Cross-encoder reranking stage")
+    print("=" * 50)
+
+    candidates = make_candidates(20)
+    model = OverlapModel()
+    reranker = Reranker(model=model, batch_size=20, weight=0.8, cache=LRUCache(0))
+    results = reranker.rerank("quarterly revenue", candidates, top_n=3)
+    assert [r['chunk_id'] for r in results[:2]] == [7, 12]
+    assert results[0]['rerank_score'] == 1.0 and not results.partial
+    assert 'final_score' not in candidates[0]
+    print("✅ Best matches move to the top, inputs untouched")
+
+    early = Reranker(model=OverlapModel(), batch_size=4, weight=0.5, cache=LRUCache(0))
+    strong = [dict(c, chunk_text="quarterly revenue") if c['chunk_id'] < 4 else c for c in candidates]
+    results = early.rerank("quarterly revenue", strong, top_n=3)
+    assert len(early.model.pairs) == 4
+    full = Reranker(model=OverlapModel(), batch_size=100, weight=0.5, cache=LRUCache(0))
+    assert [r['chunk_id'] for r in results] == [r['chunk_id'] for r in full.rerank("quarterly revenue", strong, top_n=3)]
+    print("✅ Stops after the first batch once no other candidate can enter the top_n")
+
+    cached = Reranker(model=OverlapModel(), batch_size=8)
+    first = cached.rerank("quarterly revenue", candidates, top_n=3)
+    scored = len(cached.model.pairs)
+    again = cached.rerank("  Quarterly revenue ", candidates, top_n=3)
+    assert len(cached.model.pairs) == scored and again == first
+    assert cached.cache_stats()['hits'] == scored
+    print("✅ Scores cached per (query, chunk)")
+
+    capped = Reranker(model=OverlapModel(), max_length=4, cache=LRUCache(0))
+    capped.rerank("revenue", [dict(candidates[0], chunk_text="x" * 1000)], top_n=1)
+    assert len(capped.model.pairs[0][1]) == 16
+    print("✅ Passages capped at max_length")
+
+    slow = Reranker(model=OverlapModel(delay=0.01), batch_size=4, weight=1.0, cache=LRUCache(0))
+    t0 = time.perf_counter()
+    results = slow.rerank("quarterly revenue", make_candidates(40), top_n=3, budget=0.1)
+    elapsed = time.perf_counter() - t0
+    assert results.partial and 'rerank' in results.failed_legs
+    assert len(slow.model.pairs) < 40 and elapsed < 0.15
+    assert len(results) == 3
+    print(f"✅ Latency budget respected ({elapsed * 1000:.0f} ms, {len(slow.model.pairs)} of 40 pairs scored)")
+    print("✅ Reranker test passed\n")
+
+
+if __name__ == "__main__":
+    test_reranker()
@@ -0,0 +1,249 @@
+"""
+Test HybridRetriever behaviour with offline stand-ins (no Qdrant, no model)
+"""
+import sys
+import os
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+from benchmarks.synthetic import make_queries, HashingEmbedder
+from src.retriever import HybridRetriever
+from src.cache import LRUCache
+from src.fusion import fuse, leg_arrays
+from tests.fixtures import make_chunks, make_indexes
+
+
+def build_indexes(n_chunks: int = 200):
+    chunks = make_chunks(n_chunks, words_per_chunk=60)
+    store, bm25 = make_indexes(chunks)
+    return chunks, HashingEmbedder(), store, bm25
+
+
+class SlowBM25:
+    """Wraps a BM25Index and delays every search."""
+
+    def __init__(self, index, delay):
+        self.index = index
+        self.delay = delay
+
+    def search(self, query, top_k=5, **options):
+        time.sleep(self.delay)
+        return self.index.search(query, top_k=top_k, **options)
+
+    def search_many(self, queries, top_k=5, **options):
+        time.sleep(self.delay)
+        return self.index.search_many(queries, top_k=top_k, **options)
+
+
+class BrokenBM25:
+    """BM25 stand-in whose searches always fail."""
+
+    def search(self, query, top_k=5, **options):
+        raise RuntimeError("BM25 index unavailable")
+
+    def search_many(self, queries, top_k=5, **options):
+        raise RuntimeError("BM25 index unavailable")
+
+
+def test_parallel_legs():
+    print("=" * 50)
+    print("TEST: Concurrent search legs")
+    print("=" * 50)
+
+    chunks, embedder, store, bm25 = build_indexes()
+    queries = make_queries(chunks, 10)
+
+    sequential = HybridRetriever(store, bm25, embedder, parallel_legs=False)
+    parallel = HybridRetriever(store, bm25, embedder)
+    for query in queries:
+        expected = sequential.retrieve(query, top_k=5)
+        results = parallel.retrieve(query, top_k=5)
+        assert results == expected
+        assert not results.partial
+        assert set(results.timings) == {'vector', 'bm25'}
+    print("✅ Parallel legs return the same results as sequential legs")
+
+    slow = HybridRetriever(store, SlowBM25(bm25, delay=0.5), embedder, bm25_timeout=0.05)
+    t0 = time.perf_counter()
+    results = slow.retrieve(queries[0], top_k=5)
+    elapsed = time.perf_counter() - t0
+    assert results.partial and 'bm25' in results.failed_legs
+    assert len(results) == 5 and all(r['bm25_score'] == 0.0 for r in results)
+    assert all(r['chunk_text'] for r in results)
+    assert elapsed < 0.4
+    print(f"✅ Slow BM25 leg dropped after its deadline ({elapsed * 1000:.0f} ms), vector results returned")
+
+    t0 = time.perf_counter()
+    batched = slow.retrieve_many(queries[1:4], top_k=5)
+    elapsed = time.perf_counter() - t0
+    assert elapsed < 0.4
+    for results in batched:
+        assert results.partial and 'bm25' in results.failed_legs
+        assert len(results) == 5 and all(r['bm25_score'] == 0.0 and r['chunk_text'] for r in results)
+    assert not slow.retrieve_many(queries[1:2], top_k=5)[0].cached  # Partial results are not cached
+    print(f"✅ retrieve_many drops the slow BM25 leg too ({elapsed * 1000:.0f} ms), vector results returned")
+
+    broken = HybridRetriever(store, BrokenBM25(), embedder, parallel_legs=False)
+    for results in (broken.retrieve(queries[0], top_k=5), broken.retrieve_many(queries[:2], top_k=5)[0]):
+        assert results.partial and 'RuntimeError' in results.failed_legs['bm25'] and len(results) == 5
+    print("✅ Sequential legs drop a failing leg instead of raising")
+
+    for retriever in (sequential, parallel, slow, broken):
+        retriever.close()
+    print("✅ Retriever test passed\n")
+
+
+def test_retrieve_many():
+    print("=" * 50)
+    print("TEST: Batch retrieval")
+    print("=" * 50)
+
+    chunks, embedder, store, bm25 = build_indexes()
+    queries = make_queries(chunks, 12) + ["zzzz unknown words"]
+
+    for query in queries:
+        expected = bm25.bm25.get_scores(bm25._tokenize(query))
+        assert np.allclose(bm25._score_batch([bm25._tokenize(query)])[0], expected)
+    assert bm25.search_many(queries, top_k=8) == [bm25.search(q, top_k=8) for q in queries]
+    print("✅ BM25 postings scores match rank_bm25, search_many matches search")
+
+    retriever = HybridRetriever(store, bm25, embedder, result_cache=LRUCache(0))
+    batched = retriever.retrieve_many(queries, top_k=5)
+    assert len(batched) == len(queries)
+    for query, results in zip(queries, batched):
+        # Batched float32 matmul may round vector scores differently in the last digits
+        expected = retriever.retrieve(query, top_k=5)
+        assert [r['chunk_id'] for r in results] == [r['chunk_id'] for r in expected]
+        assert np.allclose([r['combined_score'] for r in results],
+                           [r['combined_score'] for r in expected], atol=1e-5)
+        assert all(r['chunk_text'] for r in results)
+    assert retriever.retrieve_many([]) == []
+    retriever.close()
+    print("✅ retrieve_many returns the same results as retrieve per query")
+    print("✅ Batch retrieval test passed\n")
+
+
+def test_adaptive_depth():
+    print("=" * 50)
+    print("TEST: Adaptive candidate depth")
+    print("=" * 50)
+
+    chunks, embedder, store, bm25 = build_indexes()
+    queries = make_queries(chunks, 30, words_per_query=2)
+    top_k, max_depth = 5, 40
+
+    retriever = HybridRetriever(
+        store, bm25, embedder, fusion="rrf", adaptive_depth=True, max_depth_factor=8, result_cache=LRUCache(0)
+    )
+    depths = []
+    for query in queries:
+        results = retriever.retrieve(query, top_k=top_k)
+        vector = store.search(embedder.embed_query(query), top_k=max_depth, with_payload=["chunk_id"])
+        deep = fuse(*leg_arrays(vector), *leg_arrays(bm25.search(query, top_k=max_depth)), top_k=top_k, strategy="rrf")
+        assert [r['chunk_id'] for r in results] == deep.ids.tolist()
+        assert results.depth in (5, 10, 20, 40) and results.rounds <= 4
+        depths.append(results.depth)
+    assert min(depths) < max_depth and sum(depths) / len(depths) < max_depth
+    print(f"✅ Same top_k as a depth-{max_depth} fetch, average depth {sum(depths) / len(depths):.1f}")
+
+    batched = retriever.retrieve_many(queries, top_k=top_k)
+    assert all(results.depth in (5, 10, 20, 40) for results in batched)
+    retriever.close()
+    print("✅ retrieve_many records a depth per query")
+
+    fixed = HybridRetriever(store, bm25, embedder, fusion="minmax", adaptive_depth=False)
+    results = fixed.retrieve(queries[0], top_k=top_k)
+    assert results.depth == top_k * 2 and results.rounds == 1
+    fixed.close()
+    print("✅ Min-max fusion keeps the fixed top_k * 2 depth")
+
+    for fusion in ("minmax", "zscore"):
+        try:
+            HybridRetriever(store, bm25, embedder, fusion=fusion, adaptive_depth=True)
+        except ValueError:
+            continue
+        raise AssertionError(f"Adaptive depth with {fusion} fusion should be rejected")
+    print("✅ Adaptive depth with min-max or z-score fusion is rejected")
+    print("✅ Adaptive depth test passed\n")
+
+
+class CountingEmbedder(HashingEmbedder):
+    """HashingEmbedder that counts how many texts reach the model."""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+        self.texts = []
+
+    def embed_query(self, query):
+        self.calls += 1
+        self.texts.append(query)
+        return super().embed_query(query)
+
+    def embed_queries(self, queries):
+        self.calls += len(queries)
+        self.texts.extend(queries)
+        return super().embed_queries(queries)
+
+
+def test_caches():
+    print("=" * 50)
+    print("TEST: Query embedding and result caches")
+    print("=" * 50)
+
+    now = [0.0]
+    cache = LRUCache(2, ttl=10, clock=lambda: now[0])
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)  # Evicts 'b', the least recently used
+    assert cache.get('b') is None and cache.get('c') == 3
+    now[0] = 11
+    assert cache.get('a') is None
+    assert cache.stats()['hits'] == 2 and cache.stats()['misses'] == 2
+    print("✅ LRU and TTL eviction")
+
+    chunks, _, store, bm25 = build_indexes()
+    embedder = CountingEmbedder()
+    retriever = HybridRetriever(store, bm25, embedder)
+    query = make_queries(chunks, 1)[0]
+
+    first = retriever.retrieve(query, top_k=5)
+    again = retriever.retrieve(f"  {query.upper()} ", top_k=5)
+    assert not first.cached and again.cached and again == first
+    again[0]['chunk_text'] = 'mutated by caller'
+    assert retriever.retrieve(query, top_k=5) == first
+    assert embedder.calls == 1
+    print("✅ Repeated (normalized) query served from the result cache")
+
+    other_k = retriever.retrieve(query, top_k=3)
+    assert not other_k.cached and embedder.calls == 1
+    print("✅ Different top_k misses the result cache but reuses the embedding")
+
+    new_chunk = dict(chunks[0], chunk_id=10_000)
+    store.add_chunks([new_chunk])
+    after_ingest = retriever.retrieve(query, top_k=5)
+    assert not after_ingest.cached and len(retriever.result_cache) == 1
+    print("✅ Ingestion bumps the index version and invalidates cached results")
+
+    batched = retriever.retrieve_many([query, make_queries(chunks, 2)[1]], top_k=5)
+    assert batched[0].cached and not batched[1].cached
+    stats = retriever.cache_stats()
+    assert stats['results']['hits'] == 3 and stats['embedding']['hits'] >= 2
+    print(f"✅ Hit rates: embedding {stats['embedding']['hit_rate']:.0%}, results {stats['results']['hit_rate']:.0%}")
+
+    retriever.retrieve("  Which MODEL  ", top_k=5)
+    retriever.retrieve_many(["Another Query", "another   query", "ANOTHER query"], top_k=5)
+    assert embedder.texts[-2:] == ["  Which MODEL  ", "Another Query"]
+    print("✅ The model embeds queries as typed; the normalized form is only the cache key")
+
+    retriever.close()
+    print("✅ Cache test passed\n")
+
+
+if __name__ == "__main__":
+    test_parallel_legs()
+    test_retrieve_many()
+    test_adaptive_depth()
+    test_caches()
@@ -0,0 +1,209 @@
+"""
+Test the query server with offline stand-ins (no Qdrant, no model)
+"""
+import sys
+import os
+import json
+import tempfile
+import threading
+import warnings
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.synthetic import make_queries, HashingEmbedder
+from src.local_vector_store import LocalVectorStore
+from src.retriever import HybridRetriever
+from src.cache import LRUCache
+from src.server import MicroBatcher, QueryService, make_server, load_retriever, BM25_FILE, CHUNK_STORE_DIR, FINGERPRINT_FILE
+from src.chunk_store import ChunkStore
+from tests.fixtures import make_chunks, make_indexes
+
+
+def build_chunks(n_chunks: int = 200):
+    return make_chunks(n_chunks, words_per_chunk=60)
+
+
+def get(url):
+    try:
+        with urllib.request.urlopen(url) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def post(url, body):
+    request = urllib.request.Request(
+        url, data=json.dumps(body).encode("utf-8"), headers={"Content-Type": "application/json"}
+    )
+    with urllib.request.urlopen(request) as response:
+        return response.status, json.loads(response.read())
+
+
+def test_server():
+    print("=" * 50)
+    print("TEST: Query server")
+    print("=" * 50)
+
+    chunks = build_chunks()
+    store, bm25 = make_indexes(chunks)
+    loaded = threading.Event()
+
+    def loader():
+        loaded.wait()
+        return HybridRetriever(store, bm25, HashingEmbedder(), result_cache=LRUCache(0))
+
+    service = QueryService(loader, max_batch_size=16, max_wait=0.02)
+    service.start()
+    server = make_server(service, "127.0.0.1", 0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    assert get(base + "/healthz")[0] == 200
+    assert get(base + "/readyz")[0] == 503
+    print("✅ Healthy but not ready while indexes load")
+
+    loaded.set()
+    assert service.wait_ready(timeout=5)
+    assert get(base + "/readyz")[0] == 200
+    print("✅ Ready once the loader finishes")
+
+    queries = make_queries(chunks, 40)
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        responses = list(pool.map(lambda q: post(base + "/query", {"query": q, "top_k": 5}), queries))
+    reference = HybridRetriever(store, bm25, HashingEmbedder(), result_cache=LRUCache(0))
+    for query, (status, body) in zip(queries, responses):
+        assert status == 200 and not body["partial"]
+        expected = reference.retrieve(query, top_k=5)
+        assert [r["chunk_id"] for r in body["results"]] == [r["chunk_id"] for r in expected]
+    stats = get(base + "/stats")[1]
+    assert stats["queries"] == len(queries) and stats["batches"] < len(queries)
+    print(f"✅ {len(queries)} concurrent queries answered in {stats['batches']} micro-batches")
+
+    try:
+        post(base + "/query", {"top_k": 5})
+        assert False, "missing query should be rejected"
+    except urllib.error.HTTPError as e:
+        assert e.code == 400
+    print("✅ Malformed request rejected with 400")
+
+    with urllib.request.urlopen(base + "/metrics") as response:
+        assert response.status == 200 and response.headers["Content-Type"].startswith("text/plain")
+    print("✅ Prometheus metrics endpoint")
+
+    server.shutdown()
+    server.server_close()
+    service.close()
+    reference.close()
+    print("✅ Server test passed\n")
+
+
+def test_bad_queries_in_a_batch():
+    """A malformed query fails its own future; the batcher keeps answering the others"""
+    print("=" * 50)
+    print("TEST: Malformed queries in a micro-batch")
+    print("=" * 50)
+
+    chunks = build_chunks(80)
+    store, bm25 = make_indexes(chunks)
+    retriever = HybridRetriever(store, bm25, HashingEmbedder(), result_cache=LRUCache(0), parallel_legs=False)
+    batcher = MicroBatcher(retriever, max_batch_size=8, max_wait=0.05)
+    query = make_queries(chunks, 1)[0]
+
+    good = batcher.submit(query, top_k=5)
+    for bad in ({'author': 'x'}, {'page': {'gt': 3}}, {'page': [None]}, ['doc_id']):
+        try:
+            batcher.submit(query, top_k=5, filter=bad).result(timeout=5)
+        except (ValueError, TypeError):
+            continue
+        raise AssertionError(f"filter {bad!r} should fail its query")
+    filtered = batcher.submit(query, top_k=5, filter={'doc_id': ''})
+    assert len(good.result(timeout=5)) == 5 and len(filtered.result(timeout=5)) == 5
+    assert len(batcher.submit(query, top_k=5).result(timeout=5)) == 5
+    print("✅ Malformed filters fail their own query; the worker keeps answering")
+
+    by_name = batcher.submit(query, top_k=5, profile="fast")
+    by_dict = batcher.submit(query, top_k=5, profile={"base": "fast"})
+    bm25_only = batcher.submit(query, top_k=5, profile={"vector": False})
+    for bad in ({"hnsw": 64}, {"hnsw_ef": 0}, "turbo", {"vector": False, "bm25": False}, 42):
+        try:
+            batcher.submit(query, top_k=5, profile=bad).result(timeout=5)
+        except ValueError:
+            continue
+        raise AssertionError(f"profile {bad!r} should fail its query")
+    assert [r['chunk_id'] for r in by_dict.result(timeout=5)] == [r['chunk_id'] for r in by_name.result(timeout=5)]
+    expected = retriever.retrieve(query, top_k=5, profile={"vector": False})
+    assert [r['chunk_id'] for r in bm25_only.result(timeout=5)] == [r['chunk_id'] for r in expected]
+    assert len(batcher.submit(query, top_k=5).result(timeout=5)) == 5
+    print("✅ Dict profiles are batched like named ones; bad profiles fail their own query")
+
+    batcher.close()
+    retriever.close()
+    print("✅ Malformed query test passed\n")
+
+
+def test_load_retriever():
+    print("=" * 50)
+    print("TEST: Attach to persisted indexes")
+    print("=" * 50)
+
+    chunks = build_chunks(50)
+    query = make_queries(chunks, 1)[0]
+    with tempfile.TemporaryDirectory() as tmp:
+        index_dir = os.path.join(tmp, "index")
+        try:
+            load_retriever(index_dir, "local", collection_name="docs", embedder=HashingEmbedder(), path=tmp)
+            assert False, "empty collection should raise"
+        except ValueError:
+            pass
+
+        store, bm25 = make_indexes(chunks, LocalVectorStore(collection_name="docs", path=tmp))
+
+        retriever = load_retriever(index_dir, "local", collection_name="docs", embedder=HashingEmbedder(), path=tmp)
+        assert retriever.bm25_index.search(query, top_k=5) == bm25.search(query, top_k=5)
+        retriever.close()
+        print("✅ Without a saved index, BM25 is rebuilt from the stored payloads")
+
+        bm25.save(os.path.join(index_dir, BM25_FILE))
+        retriever = load_retriever(index_dir, "local", collection_name="docs", embedder=HashingEmbedder(), path=tmp)
+        assert retriever.bm25_index.search(query, top_k=5) == bm25.search(query, top_k=5)
+        assert len(retriever.retrieve(query, top_k=5)) == 5
+        retriever.close()
+        print("✅ Retriever attached to the saved store and BM25 index without re-ingesting")
+
+        # Saved files and collection from the same corpus: the files are used
+        ChunkStore.build(chunks).save(os.path.join(index_dir, CHUNK_STORE_DIR))
+        with open(os.path.join(index_dir, FINGERPRINT_FILE), "w") as f:
+            f.write("corpus-a")
+        store.set_metadata({"fingerprint": "corpus-a"})
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            retriever = load_retriever(index_dir, "local", collection_name="docs", embedder=HashingEmbedder(), path=tmp)
+        assert isinstance(retriever.chunk_store, ChunkStore)
+        retriever.close()
+
+        # A reload replaced the collection's corpus; the saved files are stale
+        new_chunks = make_chunks(50, words_per_chunk=60, seed=7)
+        store.reset()
+        new_store, new_bm25 = make_indexes(new_chunks, store)
+        new_store.set_metadata({"fingerprint": "corpus-b"})
+        new_query = make_queries(new_chunks, 1, seed=3)[0]
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            retriever = load_retriever(index_dir, "local", collection_name="docs", embedder=HashingEmbedder(), path=tmp)
+        assert any("corpus-a" in str(w.message) for w in caught)
+        assert retriever.chunk_store is retriever.vector_store
+        assert retriever.bm25_index.search(new_query, top_k=5) == new_bm25.search(new_query, top_k=5)
+        new_text = {c['chunk_id']: c['chunk_text'] for c in new_chunks}
+        results = retriever.retrieve(new_query, top_k=5)
+        assert len(results) == 5 and all(r['chunk_text'] == new_text[r['chunk_id']] for r in results)
+        retriever.close()
+    print("✅ Saved files from another corpus are ignored with a warning; BM25 and hydration use the collection")
+    print("✅ Load test passed\n")
+
+
+if __name__ == "__main__":
+    test_server()
+    test_bad_queries_in_a_batch()
+    test_load_retriever()
@@ -0,0 +1,184 @@
+"""
+Test versioned index snapshots: publishing, in-flight queries and cleanup
+"""
+import sys
+import os
+import gc
+import tempfile
+import threading
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.synthetic import make_queries, HashingEmbedder
+from src.vector_store import QdrantStorage
+from src.local_vector_store import LocalVectorStore
+from src.retriever import HybridRetriever
+from src.snapshots import SnapshotManager
+from tests.fixtures import make_chunks, make_indexes
+
+ALIAS = "live"
+
+
+def make_version(store, seed: int):
+    """Fill `store` with a corpus of its own and return (chunks, bm25)."""
+    chunks = make_chunks(80, vocabulary_size=600, seed=seed)
+    _, bm25 = make_indexes(chunks, store)
+    return chunks, bm25
+
+
+class GatedBM25:
+    """Wraps a BM25Index; searches signal `entered` and then wait for `gate`."""
+
+    def __init__(self, index):
+        self.index = index
+        self.entered = threading.Event()
+        self.gate = threading.Event()
+
+    def search(self, query, top_k=5, **options):
+        self.entered.set()
+        self.gate.wait(10)
+        return self.index.search(query, top_k=top_k, **options)
+
+    def search_many(self, queries, top_k=5, **options):
+        self.entered.set()
+        self.gate.wait(10)
+        return self.index.search_many(queries, top_k=top_k, **options)
+
+
+def check_publish(first_store):
+    """Publish a second version behind the alias and retire the first."""
+    first_chunks, first_bm25 = make_version(first_store, seed=1)
+    first_store.set_alias(ALIAS)
+    retriever = HybridRetriever(first_store, first_bm25, HashingEmbedder(), parallel_legs=False)
+    manager = SnapshotManager(retriever, alias=ALIAS)
+    query = make_queries(first_chunks, 1, seed=5)[0]
+    before = retriever.retrieve(query, top_k=5)
+    first_text = {c['chunk_id']: c['chunk_text'] for c in first_chunks}
+    assert all(r['chunk_text'] == first_text[r['chunk_id']] for r in before)
+
+    # A query in flight holds the snapshot it started with
+    in_flight = retriever.snapshot
+    second_store = manager.new_vector_store()
+    second_chunks, second_bm25 = make_version(second_store, seed=2)
+    published = manager.publish(second_store, second_bm25)
+    assert retriever.snapshot is published and published.version == 1
+    assert retriever.vector_store is second_store and retriever.bm25_index is second_bm25
+
+    after = retriever.retrieve(query, top_k=5)
+    second_text = {c['chunk_id']: c['chunk_text'] for c in second_chunks}
+    assert all(r['chunk_text'] == second_text[r['chunk_id']] for r in after)
+    print("✅ Queries after publish run on the new version (result cache not reused)")
+
+    assert manager.pending == 0 and first_store.count() == len(first_chunks)
+    old = retriever._retrieve_batch(in_flight, [query], 5, True, None)[0]
+    assert [r['chunk_text'] for r in old] == [r['chunk_text'] for r in before]
+    print("✅ The old version keeps serving queries that still hold it")
+
+    del in_flight, old
+    gc.collect()
+    assert manager.pending == 1
+    assert manager.collect() == [first_store.collection_name]
+    print("✅ The old collection is dropped once no query holds its snapshot")
+    return second_store, second_chunks
+
+
+def test_publish_mid_query():
+    """A query running while a new version is published finishes on the version it started with"""
+    print("\n" + "=" * 50)
+    print("TEST: Publish while a query is running")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        first_store = LocalVectorStore(collection_name="live-1", path=tmp, dimension=HashingEmbedder().dimension)
+        first_chunks, first_bm25 = make_version(first_store, seed=1)
+        first_store.set_alias(ALIAS)
+        gated = GatedBM25(first_bm25)
+        retriever = HybridRetriever(first_store, gated, HashingEmbedder())
+        manager = SnapshotManager(retriever, alias=ALIAS)
+        query = make_queries(first_chunks, 1, seed=5)[0]
+        first_text = {c['chunk_id']: c['chunk_text'] for c in first_chunks}
+
+        outcome = {}
+
+        def reader():
+            try:
+                outcome['results'] = retriever.retrieve(query, top_k=5)
+            except Exception as e:
+                outcome['error'] = e
+
+        thread = threading.Thread(target=reader)
+        thread.start()
+        assert gated.entered.wait(10), "the reader should reach the BM25 leg"
+
+        second_store = manager.new_vector_store()
+        second_chunks, second_bm25 = make_version(second_store, seed=2)
+        published = manager.publish(second_store, second_bm25)
+        assert retriever.snapshot is published and retriever.bm25_index is second_bm25
+        gc.collect()
+        assert manager.pending == 0 and first_store.count() == len(first_chunks)
+        assert os.path.exists(os.path.join(tmp, "live-1"))
+        print("✅ Publishing does not wait for the reader, and keeps its collection")
+
+        second_text = {c['chunk_id']: c['chunk_text'] for c in second_chunks}
+        during = retriever.retrieve(query, top_k=5)  # The new version's BM25 is not gated
+        assert during and all(r['chunk_text'] == second_text[r['chunk_id']] for r in during)
+
+        gated.gate.set()
+        thread.join(10)
+        assert not thread.is_alive() and 'error' not in outcome
+        results = outcome.pop('results')
+        assert results and all(r['chunk_text'] == first_text[r['chunk_id']] for r in results)
+        print("✅ The reader gets the old version's results; new queries get the new version")
+
+        del results
+        gc.collect()
+        assert manager.pending == 1
+        assert manager.collect() == ["live-1"]
+        assert not os.path.exists(os.path.join(tmp, "live-1"))
+        assert len(retriever.retrieve(query, top_k=5)) == 5
+        retriever.close()
+        print("✅ The old collection is dropped only after the reader has finished")
+
+    print("✅ Publish mid-query test passed\n")
+
+
+def test_local_snapshots():
+    """Local backend: pointer files as aliases, directories as versions"""
+    print("\n" + "=" * 50)
+    print("TEST: Local store snapshots")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        first = LocalVectorStore(collection_name="live-1", path=tmp, dimension=HashingEmbedder().dimension)
+        second, chunks = check_publish(first)
+        assert not os.path.exists(os.path.join(tmp, "live-1"))
+        reopened = LocalVectorStore(collection_name=ALIAS, path=tmp, dimension=second.dimension)
+        assert reopened.collection_name == second.collection_name
+        assert reopened.count() == len(chunks)
+        print("✅ Opening the alias attaches to the published collection")
+
+    print("✅ Local snapshot test passed\n")
+
+
+def test_qdrant_snapshots():
+    """Qdrant backend: one collection alias switched atomically"""
+    print("\n" + "=" * 50)
+    print("TEST: Qdrant snapshots")
+    print("=" * 50)
+
+    # A collection named like the alias, created before aliases were used
+    legacy = QdrantStorage(collection_name=ALIAS, url=":memory:")
+    first = legacy.sibling("live-1")
+    second, chunks = check_publish(first)
+    reopened = QdrantStorage(collection_name=ALIAS, client=second.client)
+    assert reopened.collection_name == second.collection_name
+    assert reopened.count() == len(chunks)
+    assert not second.client.collection_exists("live-1")
+    print("✅ The alias replaced the legacy collection and follows each publish")
+
+    print("✅ Qdrant snapshot test passed\n")
+
+
+if __name__ == "__main__":
+    test_publish_mid_query()
+    test_local_snapshots()
+    test_qdrant_snapshots()
@@ -0,0 +1,173 @@
+"""
+Test server-side hybrid search with BM25 sparse vectors (in-memory Qdrant)
+"""
+import sys
+import os
+import asyncio
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+from src import metrics
+from src.metrics import MetricsRegistry
+from src.sparse_encoder import SparseBM25Encoder, token_index
+from src.vector_store import QdrantStorage, AsyncQdrantStorage
+from src.retriever import HybridRetriever
+from config import EMBEDDING_DIMENSION
+
+TEXTS = [
+    ('Artificial Intelligence is transforming technology across industries.', 'This discusses AI impact.'),
+    ('Machine learning algorithms process large amounts of data efficiently.', 'This covers ML algorithms.'),
+    ('Deep learning models require significant computational resources.', 'This explains deep learning.'),
+    ('Natural language processing enables computers to understand human language.', 'This discusses NLP.'),
+    ('Computer vision systems can identify objects in images and videos.', 'This covers computer vision.'),
+]
+
+
+class StubEmbedder:
+    """Deterministic stand-in for Embedder: one fixed random vector per text."""
+
+    def __init__(self):
+        self.rng = np.random.default_rng(0)
+        self.vectors = {}
+
+    def embed_query(self, text):
+        if text not in self.vectors:
+            self.vectors[text] = self.rng.standard_normal(EMBEDDING_DIMENSION).astype(np.float32)
+        return self.vectors[text]
+
+
+def make_chunks(embedder):
+    return [
+        {
+            'chunk_id': i + 1,
+            'chunk_text': text,
+            'context': context,
+            'embedding': embedder.embed_query(text),
+            'contextual_embedding': embedder.embed_query(f'{context}\n\n{text}')
+        }
+        for i, (text, context) in enumerate(TEXTS)
+    ]
+
+
+def test_sparse_hybrid():
+    print("=" * 50)
+    print("TEST: Server-side hybrid search (sparse BM25)")
+    print("=" * 50)
+
+    embedder = StubEmbedder()
+    chunks = make_chunks(embedder)
+
+    encoder = SparseBM25Encoder().fit(chunks)
+    doc_indices, doc_values = encoder.encode_document(chunks[1])
+    query_indices, _ = encoder.encode_query('ML algorithms')
+    assert set(query_indices) <= set(doc_indices)
+    assert doc_indices == sorted(doc_indices) and all(v > 0 for v in doc_values)
+    assert token_index('algorithms') in doc_indices
+    print("✅ Query terms map to the same sparse dimensions as documents")
+
+    storage = QdrantStorage(collection_name="test_sparse_hybrid", url=":memory:", sparse=True)
+    storage.add_chunks(chunks)
+
+    query = 'machine learning algorithms'
+    results = storage.hybrid_search(embedder.embed_query(query), query, top_k=3)
+    assert len(results) == 3
+    assert results[0]['chunk_id'] == 2
+    print(f"✅ Fused top result: {results[0]['chunk_text']}")
+
+    retriever = HybridRetriever(
+        vector_store=storage,
+        bm25_index=None,
+        embedder=embedder,
+        server_side_fusion=True
+    )
+    fused = retriever.retrieve(query, top_k=2)
+    assert [r['chunk_id'] for r in fused] == [r['chunk_id'] for r in results[:2]]
+    assert all('combined_score' in r for r in fused)
+    print("✅ HybridRetriever uses a single fused query")
+
+    plain = QdrantStorage(collection_name="test_dense_only", url=":memory:")
+    try:
+        plain.hybrid_search(embedder.embed_query(query), query)
+        raise AssertionError("hybrid_search should require sparse=True")
+    except ValueError:
+        print("✅ Dense-only collections reject hybrid_search")
+
+    print("✅ Sparse hybrid test passed\n")
+
+
+def test_incremental_avgdl():
+    """Batches added one after the other keep avgdl at the whole corpus' average"""
+    print("\n" + "=" * 50)
+    print("TEST: Incremental sparse ingestion")
+    print("=" * 50)
+
+    embedder = StubEmbedder()
+    chunks = make_chunks(embedder)
+    expected = SparseBM25Encoder().fit(chunks).avgdl
+    assert abs(SparseBM25Encoder().fit(chunks[:2]).update(chunks[2:]).avgdl - expected) < 1e-9
+
+    storage = QdrantStorage(collection_name="test_incremental", url=":memory:", sparse=True)
+    storage.add_chunks(chunks[:2])
+    first = storage.sparse_encoder.avgdl
+    restarted = QdrantStorage(collection_name="test_incremental", sparse=True, client=storage.client)
+    assert restarted.sparse_encoder.avgdl == first and restarted.sparse_encoder.documents == 2
+    restarted.add_chunks(chunks[2:])
+    assert abs(restarted.sparse_encoder.avgdl - expected) < 1e-9
+    assert restarted.metadata()["bm25_avgdl"] == restarted.sparse_encoder.avgdl
+    assert restarted.metadata()["bm25_documents"] == len(chunks)
+    print("✅ A later batch updates the stored avgdl, also after a restart")
+
+    # Collections stored before the document count was: every point counts
+    legacy = SparseBM25Encoder()
+    legacy.load_metadata({"bm25_avgdl": first}, documents=2)
+    assert legacy.documents == 2 and abs(legacy.update(chunks[2:]).avgdl - expected) < 1e-9
+    restarted.reset()
+    assert restarted.sparse_encoder.avgdl is None
+    restarted.add_chunks(chunks[:1])
+    assert restarted.sparse_encoder.documents == 1
+    print("✅ Older metadata falls back to the point count; reset starts over")
+
+    print("✅ Incremental sparse ingestion test passed\n")
+
+
+def test_async_sparse_metadata():
+    """AsyncQdrantStorage stores avgdl with the collection and reads it back"""
+    print("\n" + "=" * 50)
+    print("TEST: Async sparse collection metadata")
+    print("=" * 50)
+
+    async def run():
+        embedder = StubEmbedder()
+        chunks = make_chunks(embedder)
+        storage = await AsyncQdrantStorage.create(collection_name="test_async_sparse", url=":memory:", sparse=True)
+        await storage.add_chunks(chunks[:3])
+        avgdl = storage.sparse_encoder.avgdl
+        assert (await storage.metadata())["bm25_avgdl"] == avgdl
+        print("✅ avgdl is stored in the collection metadata")
+
+        # A restarted process sharing the collection continues the stored avgdl
+        restarted = await AsyncQdrantStorage.create(collection_name="test_async_sparse", sparse=True, client=storage.client)
+        assert restarted.sparse_encoder.avgdl == avgdl and restarted.sparse_encoder.documents == 3
+        await restarted.add_chunks(chunks[3:])
+        assert abs(restarted.sparse_encoder.avgdl - SparseBM25Encoder().fit(chunks).avgdl) < 1e-9
+        print("✅ A new instance continues it instead of refitting on the next batch")
+
+        registry = MetricsRegistry()
+        metrics.enable(registry)
+        try:
+            results = await restarted.search(embedder.embed_query(TEXTS[0][0]), top_k=2)
+        finally:
+            metrics.disable()
+        assert len(results) == 2
+        assert registry.histogram("vector_store.search", backend="qdrant_async").count == 1
+        print("✅ Async calls record metrics spans")
+        await storage.close()
+
+    asyncio.run(run())
+    print("✅ Async sparse metadata test passed\n")
+
+
+if __name__ == "__main__":
+    test_sparse_hybrid()
+    test_incremental_avgdl()
+    test_async_sparse_metadata()